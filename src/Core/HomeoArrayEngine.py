@@ -0,0 +1,213 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+
+Whole-homeostat array engine: packs all the units and connections of a
+Homeostat into flat numpy arrays and advances the homeostat for many ticks
+inside a single compiled kernel (Core.HomeoJIT._jit_run_homeostat), instead
+of dispatching HomeoUnit.selfUpdate() in Python for every unit on every tick.
+
+The engine covers HomeoUnit, HomeoUnitAristotelian and HomeoUnitNewtonian
+units with linear or proportional needles, and both discrete and continuous
+uniselectors. Discrete uniselectors are still operated by their own Python
+objects: the kernel stops at the end of any tick in which one fires, the
+engine calls HomeoUnit.operateUniselector() and resumes.
+Units with transducers or other overridden update methods are not supported,
+see HomeoArrayEngine.canRun().
+'''
+
+from Core.HomeoUnit import HomeoUnit
+from Core.HomeoUnitAristotelian import HomeoUnitAristotelian
+from Core.HomeoUnitNewtonian import HomeoUnitNewtonian
+from Core.HomeoUniselectorContinuous import HomeoUniselectorContinuous
+from Core.HomeoJIT import _jit_run_homeostat
+import numpy as np
+
+
+class HomeoArrayEngineError(Exception):
+    pass
+
+class HomeoArrayEngine(object):
+    '''
+    HomeoArrayEngine runs a Homeostat on flat arrays. It is created on a homeostat,
+    packs its state with pack(), advances it with runFor(ticks) and writes the
+    final state back into the unit and connection objects with unpack().
+    runFor() packs and unpacks by itself, so the usual pattern is simply:
+
+        HomeoArrayEngine(aHomeostat).runFor(ticks)
+
+    The engine does not collect data, log states or emit GUI signals while it runs.
+    Homeostat.runFor() only hands control to it when none of these is needed.
+
+    Instance Variables:
+        homeostat      <aHomeostat>    the homeostat being run
+        units          <aList>         the homeostat's units, in update order
+        connections    <aList>         the packed connections, in CSR order
+    '''
+
+    kinds = {'linear': 0, 'proportional': 1, 'newtonian': 2}
+
+    @classmethod
+    def unitKind(cls, aHomeoUnit):
+        '''Return the kernel code for the needle dynamics of aHomeoUnit,
+           or None if the unit cannot be run by the engine'''
+
+        if type(aHomeoUnit) in (HomeoUnit, HomeoUnitAristotelian):
+            if aHomeoUnit.needleCompMethod in ('linear', 'proportional'):
+                return cls.kinds[aHomeoUnit.needleCompMethod]
+        elif type(aHomeoUnit) is HomeoUnitNewtonian:
+            if aHomeoUnit.needleCompMethod == 'linear':
+                return cls.kinds['newtonian']
+        return None
+
+    @classmethod
+    def canRun(cls, aHomeostat):
+        '''Check that every unit of aHomeostat has dynamics the kernel implements
+           and that all connections come from units belonging to the homeostat'''
+
+        units = aHomeostat.homeoUnits
+        if not units:
+            return False
+        for unit in units:
+            if cls.unitKind(unit) is None:
+                return False
+            for conn in unit.inputConnections:
+                if conn.isActive() and conn.incomingUnit not in units:
+                    return False
+        return True
+
+    def __init__(self, aHomeostat):
+        if not HomeoArrayEngine.canRun(aHomeostat):
+            raise HomeoArrayEngineError("The homeostat contains units the array engine cannot run")
+        self.homeostat = aHomeostat
+        self.units = list(aHomeostat.homeoUnits)
+        self.connections = []
+
+    def pack(self):
+        '''Copy the state and parameters of units and connections into flat arrays'''
+
+        units = self.units
+        n = len(units)
+        index = dict((id(unit), i) for i, unit in enumerate(units))
+
+        self.kind = np.array([HomeoArrayEngine.unitKind(u) for u in units], dtype=np.int64)
+        self.active = np.array([u.isActive() for u in units], dtype=np.bool_)
+        self.dev = np.array([u._criticalDeviation for u in units], dtype=np.float64)
+        self.vel = np.array([u._currentVelocity for u in units], dtype=np.float64)
+        self.acc = np.array([getattr(u, '_lastAcceleration', 0.0) for u in units], dtype=np.float64)
+        self.out = np.array([u._currentOutput for u in units], dtype=np.float64)
+        self.torque = np.array([u._inputTorque for u in units], dtype=np.float64)
+        self.noise = np.array([u._noise for u in units], dtype=np.float64)
+        self.noiseCode = np.array([u.noiseCode for u in units], dtype=np.int64)
+        self.visc = np.array([u._viscosity for u in units], dtype=np.float64)
+        self.mass = np.array([u._needleUnit._mass for u in units], dtype=np.float64)
+        self.maxDev = np.array([u._maxDeviation for u in units], dtype=np.float64)
+        self.outLow = np.array([u._outputRange['low'] for u in units], dtype=np.float64)
+        self.outHigh = np.array([u._outputRange['high'] for u in units], dtype=np.float64)
+        self.dtFast = np.array([getattr(u, '_dt_fast', 1.0) for u in units], dtype=np.float64)
+        self.critThreshold = np.array([u._critThreshold for u in units], dtype=np.float64)
+
+        self.uniselMode = np.zeros(n, dtype=np.int64)
+        self.ouParams = np.ones((n, 7), dtype=np.float64)
+        for i, u in enumerate(units):
+            if u.uniselectorActive:
+                if isinstance(u.uniselector, HomeoUniselectorContinuous):
+                    self.uniselMode[i] = 2
+                    self.ouParams[i] = u.uniselector.ouParameters()
+                else:
+                    self.uniselMode[i] = 1
+        self.uniselTime = np.array([u._uniselectorTime for u in units], dtype=np.int64)
+        self.uniselInterval = np.array([u._uniselectorTimeInterval for u in units], dtype=np.int64)
+        self.uniselActivated = np.array([u._uniselectorActivated for u in units], dtype=np.int64)
+
+        "Connections in CSR layout: only active connections are packed"
+        self.connections = []
+        ptr = [0]
+        for unit in units:
+            self.connections.extend(c for c in unit.inputConnections if c.isActive())
+            ptr.append(len(self.connections))
+        conns = self.connections
+        self.connPtr = np.array(ptr, dtype=np.int64)
+        self.connSrc = np.array([index[id(c._incomingUnit)] for c in conns], dtype=np.int64)
+        self.connLive = np.array([c._incomingUnit.isActive() for c in conns], dtype=np.bool_)
+        self.connUnisel = np.array([c._state == 'uniselector' for c in conns], dtype=np.bool_)
+        self.connWeight = np.array([c._weight for c in conns], dtype=np.float64)
+        self.connSwitch = np.array([c._switch for c in conns], dtype=np.float64)
+        self.connNoise = np.array([c._noise for c in conns], dtype=np.float64)
+        self.connNoiseCode = np.array([c.noiseCode for c in conns], dtype=np.int64)
+        self.fired = np.zeros(n, dtype=np.bool_)
+
+    def repackConnectionsOf(self, unitIndex):
+        '''Re-read the weights and switches of the connections of one unit,
+           after its uniselector has changed them'''
+
+        for c in range(self.connPtr[unitIndex], self.connPtr[unitIndex + 1]):
+            self.connWeight[c] = self.connections[c]._weight
+            self.connSwitch[c] = self.connections[c]._switch
+
+    def advance(self, ticks):
+        '''Run the kernel for up to ticks ticks and return the number of ticks run.
+           Stops early at the end of a tick in which a discrete uniselector fired.'''
+
+        maxViscosity = float(HomeoUnit.DefaultParameters['maxViscosity'])
+        supply = self.homeostat.noiseSupply
+        supply.ensureBlockSize(len(self.units) + 2 * len(self.connSrc))
+        return _jit_run_homeostat(ticks, self.kind, self.active, self.dev, self.vel,
+                                  self.acc, self.out, self.torque, self.noise,
+                                  self.visc, maxViscosity, self.mass, self.maxDev,
+                                  self.outLow, self.outHigh, self.dtFast,
+                                  self.critThreshold, self.uniselMode, self.uniselTime,
+                                  self.uniselInterval, self.uniselActivated,
+                                  self.ouParams, self.noiseCode, self.connPtr, self.connSrc,
+                                  self.connLive, self.connUnisel, self.connWeight,
+                                  self.connSwitch, self.connNoise, self.connNoiseCode,
+                                  self.fired, supply.normals, supply.uniforms,
+                                  supply.cursor, supply.rng, supply.uniformRng)
+
+    def operateFiredUniselectors(self):
+        '''Operate, in unit order, the discrete uniselectors that fired in the last tick'''
+
+        for i in np.flatnonzero(self.fired):
+            unit = self.units[i]
+            unit._time = self.homeostat._time - 1
+            unit.operateUniselector()
+            self.repackConnectionsOf(i)
+        self.fired[:] = False
+
+    def runFor(self, ticks):
+        '''Advance the homeostat until its time reaches ticks, then write back its state'''
+
+        hom = self.homeostat
+        self.pack()
+        while hom._time < ticks:
+            done = self.advance(ticks - hom._time)
+            hom._time += done
+            if self.fired.any():
+                self.operateFiredUniselectors()
+        self.unpack()
+
+    def unpack(self):
+        '''Write the packed state back into the unit and connection objects'''
+
+        lastTick = self.homeostat._time - 1
+        for i, u in enumerate(self.units):
+            if lastTick >= 0:
+                u._time = lastTick
+            if not self.active[i]:
+                continue
+            u._criticalDeviation = float(self.dev[i])
+            u._currentOutput = float(self.out[i])
+            u._inputTorque = float(self.torque[i])
+            u._nextDeviation = 0
+            u._uniselectorTime = int(self.uniselTime[i])
+            u._uniselectorActivated = int(self.uniselActivated[i])
+            if self.kind[i] == HomeoArrayEngine.kinds['newtonian']:
+                u._currentVelocity = float(self.vel[i])
+                u._lastAcceleration = float(self.acc[i])
+            if self.uniselMode[i] == 2:
+                for c in range(self.connPtr[i], self.connPtr[i + 1]):
+                    conn = self.connections[c]
+                    conn._weight = float(self.connWeight[c])
+                    conn._switch = float(self.connSwitch[c])
+            u._jit_dirty = True
@@ -0,0 +1,370 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+
+Compact checkpoints of homeostats, and cheap cloning.
+
+Homeostat.saveTo pickles the whole object graph, data collector and run
+history included, and breaks as soon as something that cannot be pickled
+(a socket, a Qt object) is reachable from it. A HomeoCheckpoint only records
+what the next ticks depend on: the parameters and dynamic state of every
+unit, of its needle unit, uniselector and input connections, the clock and
+run flags of the homeostat and the state of its random stream (generators
+and the noise values already drawn but not used yet). restore() builds a new
+homeostat from it without going through the constructors of the units, so a
+checkpoint can be restored many times, e.g. to fork many continuations from
+one burn-in state (see Homeostat.clone()), and a restored homeostat continues
+exactly as the original would have.
+
+The data collector, run file writer, state logger, tick hooks and
+fast-forward detector of the homeostat are not part of a checkpoint: a
+restored homeostat starts with an empty collector of the same class and none
+of the others.
+
+Nor are the transducers of the units of robotic homeostats, which hold on to
+the simulated robot. Those checkpoints are restored with restoreInto() into a
+homeostat rebuilt the same way (same units and connections, already connected
+to its robot), which takes the recorded state and keeps its transducers,
+collector and hooks.
+
+A checkpoint file consists of:
+
+    8 bytes       magic string b'HOMEOCKP'
+    4 bytes       format version (little-endian uint32)
+    4 bytes       length of the description (little-endian uint32)
+    description   a JSON dictionary with the classes and attributes of all the
+                  objects; numpy arrays are replaced by {"__array__": index}
+    padding       spaces up to a multiple of 64 bytes
+    arrays        the raw data of the arrays, one after the other, with the
+                  dtypes, shapes and offsets listed in the description
+'''
+
+from Core.HomeoRandom import HomeoNoiseSupply, generatorState, generatorFromState
+import numpy as np
+import importlib, json
+
+
+class HomeoCheckpointError(Exception):
+    pass
+
+
+Magic = b'HOMEOCKP'
+Version = 1
+HeaderAlignment = 64
+
+"Homeostat attributes recorded in a checkpoint"
+HomeostatAttributes = ('_time', '_microTime', '_slowingFactor', '_collectsData',
+                       '_headless', '_usesArrayEngine')
+
+"Attributes of the units of robotic homeostats holding their transducers"
+TransducerAttributes = ('_transducer', 'transducer')
+
+"Attributes holding other objects, rebuilt separately, or caches rebuilt on first use"
+ExcludedUnitAttributes = frozenset(('_needleUnit', '_uniselector', '_inputConnections',
+                                    '_noiseSupply', '_ouNetwork', '_ouIndex', '_fileOut') +
+                                   TransducerAttributes)
+ExcludedConnectionAttributes = frozenset(('_incomingUnit', 'outgoingUnit'))
+
+_classes = {}
+_immutableTypes = frozenset((type(None), bool, int, float, str))
+
+
+def className(aClass):
+    return '%s.%s' % (aClass.__module__, aClass.__qualname__)
+
+def classNamed(aString):
+    '''Return the class recorded in a checkpoint as aString'''
+
+    aClass = _classes.get(aString)
+    if aClass is None:
+        moduleName, name = aString.rsplit('.', 1)
+        try:
+            aClass = getattr(importlib.import_module(moduleName), name)
+        except (ImportError, AttributeError):
+            raise HomeoCheckpointError("Unknown class %s in checkpoint" % aString)
+        _classes[aString] = aClass
+    return aClass
+
+def plainValue(value, where):
+    '''Return a copy of value made of None, booleans, numbers, strings, lists,
+       dictionaries with string keys and numpy arrays only'''
+
+    if type(value) in _immutableTypes or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.copy()
+    if isinstance(value, (list, tuple)):
+        return [plainValue(v, where) for v in value]
+    if isinstance(value, dict):
+        if not all(isinstance(k, str) for k in value):
+            raise HomeoCheckpointError("Cannot checkpoint %s: a dictionary has keys that are not strings" % where)
+        return dict((k, plainValue(v, where)) for k, v in value.items())
+    raise HomeoCheckpointError("Cannot checkpoint %s: %s values are not supported" % (where, type(value).__name__))
+
+def copiedValue(value):
+    '''Return a copy of a plain value that does not share its lists, dictionaries and arrays'''
+
+    if isinstance(value, np.ndarray):
+        return value.copy()
+    if isinstance(value, list):
+        return [copiedValue(v) for v in value]
+    if isinstance(value, dict):
+        return dict((k, copiedValue(v)) for k, v in value.items())
+    return value
+
+def objectDescription(anObject, excluded = frozenset()):
+    '''Return the class and plain attributes of anObject, skipping excluded attributes
+       and the arrays the units cache for the compiled kernels'''
+
+    attributes = {}
+    for name, value in anObject.__dict__.items():
+        if name in excluded or name.startswith('_jit_'):
+            continue
+        if type(value) in _immutableTypes:
+            attributes[name] = value
+        else:
+            attributes[name] = plainValue(value, '%s of %s' % (name, type(anObject).__name__))
+    return {'class': className(type(anObject)), 'attributes': attributes}
+
+def objectFrom(description):
+    '''Return a new object as described by objectDescription, without calling its constructor'''
+
+    aClass = classNamed(description['class'])
+    anObject = aClass.__new__(aClass)
+    anObject.__dict__.update({k: (v if type(v) in _immutableTypes else copiedValue(v))
+                              for k, v in description['attributes'].items()})
+    return anObject
+
+def updateFrom(anObject, description):
+    '''Give anObject the attributes recorded in description'''
+
+    anObject.__dict__.update({k: (v if type(v) in _immutableTypes else copiedValue(v))
+                              for k, v in description['attributes'].items()})
+
+
+class HomeoCheckpoint(object):
+    '''
+    HomeoCheckpoint records the parameters and dynamic state of a homeostat in plain
+    Python values and numpy arrays.
+
+        checkpoint = HomeoCheckpoint.of(aHomeostat)     # or aHomeostat.checkpoint()
+        checkpoint.saveTo(filename)
+        ...
+        homeostat = HomeoCheckpoint.readFrom(filename).restore()
+
+    Instance Variables:
+        homeostat      <aDictionary>   class, recorded attributes and data collector class of the homeostat
+        units          <aList>         one description per unit, with its needle unit, uniselector and connections
+        random         <aDictionary>   state of the random stream of the homeostat, or None if it has none yet
+    '''
+
+    @classmethod
+    def of(cls, aHomeostat):
+        units = aHomeostat.homeoUnits
+        index = dict((id(unit), i) for i, unit in enumerate(units))
+        supply = getattr(aHomeostat, '_noiseSupply', None)
+        rng = getattr(aHomeostat, '_rng', None)
+
+        unitDescriptions = []
+        for unit in units:
+            description = objectDescription(unit, ExcludedUnitAttributes)
+            description['needleUnit'] = objectDescription(unit.needleUnit)
+            uniselector = getattr(unit, '_uniselector', None)
+            description['uniselector'] = objectDescription(uniselector) if uniselector is not None else None
+            connections = []
+            for conn in unit.inputConnections:
+                incoming = index.get(id(conn.incomingUnit))
+                if incoming is None:
+                    raise HomeoCheckpointError("Unit %s has a connection from %s, which is not part of the homeostat"
+                                               % (unit.name, conn.incomingUnit.name))
+                connDescription = objectDescription(conn, ExcludedConnectionAttributes)
+                connDescription['incoming'] = incoming
+                connections.append(connDescription)
+            description['connections'] = connections
+            description['sharesNoiseSupply'] = (supply is not None and
+                                                getattr(unit, '_noiseSupply', None) is supply)
+            description['hasTransducer'] = any(unit.__dict__.get(name) is not None
+                                               for name in TransducerAttributes)
+            unitDescriptions.append(description)
+
+        homeostat = {'class': className(type(aHomeostat)),
+                     'attributes': dict((name, plainValue(getattr(aHomeostat, name), name))
+                                        for name in HomeostatAttributes if hasattr(aHomeostat, name)),
+                     'dataCollector': className(type(aHomeostat.dataCollector))}
+        if rng is None:
+            random = None
+        elif supply is not None and supply.rng is rng:
+            random = {'supply': supply.getState()}
+        else:
+            random = {'rng': generatorState(rng)}
+        return cls(homeostat, unitDescriptions, random)
+
+    def __init__(self, homeostat, units, random):
+        self.homeostat = homeostat
+        self.units = units
+        self.random = random
+
+    def restore(self):
+        '''Return a new homeostat in the recorded state'''
+
+        if any(description.get('hasTransducer') for description in self.units):
+            raise HomeoCheckpointError("The checkpoint has units connected to transducers: "
+                                       "restore it into a rebuilt homeostat with restoreInto()")
+        homeostatClass = classNamed(self.homeostat['class'])
+        homeostat = homeostatClass()
+        homeostat.__dict__.update(self.homeostat['attributes'])
+        collectorClass = classNamed(self.homeostat['dataCollector'])
+        if type(homeostat.dataCollector) is not collectorClass:
+            homeostat.dataCollector = collectorClass()
+
+        supply = None
+        if self.random is not None:
+            if 'supply' in self.random:
+                supply = HomeoNoiseSupply.fromState(self.random['supply'])
+                homeostat._rng = supply.rng
+                homeostat._noiseSupply = supply
+            else:
+                homeostat._rng = generatorFromState(self.random['rng'])
+
+        units = [objectFrom(description) for description in self.units]
+        for unit, description in zip(units, self.units):
+            unit._needleUnit = objectFrom(description['needleUnit'])
+            if description['uniselector'] is not None:
+                unit._uniselector = objectFrom(description['uniselector'])
+            connections = []
+            for connDescription in description['connections']:
+                conn = objectFrom(connDescription)
+                conn._incomingUnit = units[connDescription['incoming']]
+                conn.outgoingUnit = unit
+                connections.append(conn)
+            unit._inputConnections = connections
+            unit._noiseSupply = supply if description['sharesNoiseSupply'] else None
+            unit._jit_dirty = True
+        homeostat._homeoUnits = units
+        return homeostat
+
+    def restoreInto(self, aHomeostat):
+        '''Put aHomeostat in the recorded state. aHomeostat must have been built as the
+           checkpointed one: units of the same classes, in the same order, with
+           connections from the same units. Its objects are updated in place, so its
+           transducers, data collector and hooks are kept'''
+
+        units = aHomeostat.homeoUnits
+        if len(units) != len(self.units):
+            raise HomeoCheckpointError("The checkpoint has %d units, the homeostat %d"
+                                       % (len(self.units), len(units)))
+        index = dict((id(unit), i) for i, unit in enumerate(units))
+        for unit, description in zip(units, self.units):
+            if className(type(unit)) != description['class']:
+                raise HomeoCheckpointError("Unit %s does not match the unit recorded in the checkpoint" % unit.name)
+            incoming = [index.get(id(conn.incomingUnit)) for conn in unit.inputConnections]
+            if incoming != [c['incoming'] for c in description['connections']]:
+                raise HomeoCheckpointError("The connections of unit %s do not match the checkpoint" % unit.name)
+
+        aHomeostat.__dict__.update(copiedValue(self.homeostat['attributes']))
+        supply = None
+        if self.random is None:
+            aHomeostat._rng = None
+            aHomeostat._noiseSupply = None
+        elif 'supply' in self.random:
+            supply = HomeoNoiseSupply.fromState(self.random['supply'])
+            aHomeostat._rng = supply.rng
+            aHomeostat._noiseSupply = supply
+        else:
+            aHomeostat.rng = generatorFromState(self.random['rng'])
+
+        for unit, description in zip(units, self.units):
+            updateFrom(unit, description)
+            updateFrom(unit._needleUnit, description['needleUnit'])
+            uniselectorDescription = description['uniselector']
+            uniselector = getattr(unit, '_uniselector', None)
+            if uniselectorDescription is None:
+                pass
+            elif uniselector is not None and className(type(uniselector)) == uniselectorDescription['class']:
+                updateFrom(uniselector, uniselectorDescription)
+            else:
+                unit._uniselector = objectFrom(uniselectorDescription)
+            for conn, connDescription in zip(unit.inputConnections, description['connections']):
+                updateFrom(conn, connDescription)
+            unit._noiseSupply = supply if description['sharesNoiseSupply'] else None
+            unit._jit_dirty = True
+        return aHomeostat
+
+#===============================================================================
+# Binary format
+#===============================================================================
+
+    def toBytes(self):
+        '''Return the checkpoint in the binary format described in the module comment'''
+
+        arrays = []
+        def encode(value):
+            if isinstance(value, np.ndarray):
+                arrays.append(np.ascontiguousarray(value))
+                return {'__array__': len(arrays) - 1}
+            if isinstance(value, list):
+                return [encode(v) for v in value]
+            if isinstance(value, dict):
+                return dict((k, encode(v)) for k, v in value.items())
+            return value
+
+        description = encode({'homeostat': self.homeostat, 'units': self.units, 'random': self.random})
+        layout = []
+        offset = 0
+        for array in arrays:
+            layout.append({'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset})
+            offset += array.nbytes
+        description['arrays'] = layout
+        encoded = json.dumps(description).encode('utf-8')
+        headerSize = len(Magic) + 8 + len(encoded)
+        padding = (-headerSize) % HeaderAlignment
+        chunks = [Magic, np.array([Version, len(encoded) + padding], dtype = '<u4').tobytes(),
+                  encoded + b' ' * padding]
+        chunks.extend(array.tobytes() for array in arrays)
+        return b''.join(chunks)
+
+    @classmethod
+    def fromBytes(cls, data):
+        if data[:len(Magic)] != Magic:
+            raise HomeoCheckpointError("Not a homeostat checkpoint")
+        version, descriptionSize = np.frombuffer(data[len(Magic):len(Magic) + 8], dtype = '<u4')
+        if version > Version:
+            raise HomeoCheckpointError("Unsupported checkpoint version %d" % version)
+        start = len(Magic) + 8
+        description = json.loads(data[start:start + int(descriptionSize)].decode('utf-8'))
+        start += int(descriptionSize)
+        arrays = []
+        for layout in description.pop('arrays'):
+            dtype = np.dtype(layout['dtype'])
+            count = int(np.prod(layout['shape']))
+            array = np.frombuffer(data, dtype = dtype, count = count, offset = start + layout['offset'])
+            arrays.append(array.reshape(layout['shape']).copy())
+
+        def decode(value):
+            if isinstance(value, dict):
+                if '__array__' in value and len(value) == 1:
+                    return arrays[value['__array__']]
+                return dict((k, decode(v)) for k, v in value.items())
+            if isinstance(value, list):
+                return [decode(v) for v in value]
+            return value
+
+        description = decode(description)
+        return cls(description['homeostat'], description['units'], description['random'])
+
+    def saveTo(self, filename):
+        '''Write the checkpoint on filename. Will erase filename if it exists already'''
+
+        fileOut = open(filename, 'wb')
+        fileOut.write(self.toBytes())
+        fileOut.close()
+
+    @classmethod
+    def readFrom(cls, filename):
+        fileIn = open(filename, 'rb')
+        data = fileIn.read()
+        fileIn.close()
+        return cls.fromBytes(data)
@@ -0,0 +1,498 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+'''
+from Core.HomeoDataCollector import HomeoDataCollector
+from Core.HomeoDataUnit import HomeoDataUnit
+from Core.HomeoRunFile import writeRunFile
+import numpy as np
+import sys, datetime
+
+
+class HomeoColumnarDataCollectorError(Exception):
+    pass
+
+class HomeoColumnarDataCollector(HomeoDataCollector):
+    '''HomeoColumnarDataCollector records the same data as HomeoDataCollector, but instead
+       of creating a HomeoDataUnit (and a dictionary of connections) for every unit at every tick,
+       it writes the values into preallocated numpy arrays, one row per tick:
+
+       - tick x unit arrays for critical deviation, uniselector activation, output,
+         maxDeviation and uniselector state
+       - an event log for the connections: the weight, switch, noise and state
+         (manual/uniselector) of a connection are logged together with the tick
+         only when one of them changes, that is when a uniselector fires or the user
+         edits a connection. Full tick x connection arrays are rebuilt on request by
+         connectionsAsNPArrays()
+
+       Critical deviation and uniselector activation are stored interleaved in a single
+       (tick, unit, 2) array, so criticalDevAsNPArrayForAllUnits returns a view
+       on the collected data instead of building it from lists.
+
+       By default the arrays grow as needed. With a fixed capacity the collector
+       becomes a ring buffer that keeps only the last capacity ticks, and the connection
+       events needed to rebuild the connections at those ticks. If a spillPath is also
+       given, a full buffer is saved to disk (as spillPath.NNNNN.npz) and emptied instead,
+       so that nothing is lost and memory use stays bounded.
+
+       The states property is kept for backward compatibility: it rebuilds the
+       dictionary of HomeoDataUnits of HomeoDataCollector from the arrays on request.
+       It is expensive and should not be used in long runs.
+
+        Instance Variables:
+            capacity       <anInteger>    maximum number of ticks kept in memory, or None for unbounded
+            spillPath      <aString>      prefix of the files a full buffer is spilled to, or None
+            spilledFiles   <aList>        the files already spilled, in chronological order
+            unitNames      <aList>        the names of the units, in column order
+            connKeys       <aList>        (unit name, incoming unit name) for each connection column
+            nEvents        <anInteger>    number of connection events in the log
+    '''
+
+    DefaultInitialRows = 1024
+    DefaultInitialEvents = 256
+
+#===============================================================================
+# Initialization and setters and getters
+#===============================================================================
+
+    def __init__(self, capacity = None, spillPath = None):
+        if capacity is not None and capacity < 1:
+            raise HomeoColumnarDataCollectorError("The capacity of a data collector must be positive")
+        if spillPath is not None and capacity is None:
+            raise HomeoColumnarDataCollectorError("Spilling to disk requires a fixed capacity")
+        self.capacity = capacity
+        self.spillPath = spillPath
+        self.spilledFiles = []
+        self.clear()
+
+    def clear(self):
+        '''Discard all collected data (but not the files already spilled)'''
+
+        self.unitNames = []
+        self._unitIndex = {}
+        self.connKeys = []
+        self._connIndex = {}
+        self._rows = 0
+        self._start = 0
+        self._rowOfTime = {}
+        self._lastTime = None
+        self._lastRow = None
+        self._statesCache = None
+        self._connCache = None
+        self._clearConnEvents()
+        self._allocate(self.capacity if self.capacity is not None else HomeoColumnarDataCollector.DefaultInitialRows, 0)
+
+    def _clearConnEvents(self):
+        self.nEvents = 0
+        self._lastConnValues = [None] * len(self.connKeys)
+        self._allocateConnEvents(HomeoColumnarDataCollector.DefaultInitialEvents)
+
+    def _allocateConnEvents(self, size):
+        self._eventTime = np.zeros(size, dtype = np.int64)
+        self._eventConn = np.zeros(size, dtype = np.int32)
+        self._eventWeight = np.zeros(size)
+        self._eventSwitch = np.zeros(size)
+        self._eventNoise = np.zeros(size)
+        self._eventState = np.zeros(size, dtype = np.int8)
+
+    def _allocate(self, rows, nUnits):
+        self._times = np.zeros(rows, dtype = np.int64)
+        self._devUnisel = np.full((rows, nUnits, 2), np.nan)
+        self._output = np.full((rows, nUnits), np.nan)
+        self._maxDeviation = np.full((rows, nUnits), np.nan)
+        self._uniselState = np.zeros((rows, nUnits), dtype = np.int8)
+
+    def _arrays(self):
+        return ('_times', '_devUnisel', '_output', '_maxDeviation', '_uniselState')
+
+    def _eventArrays(self):
+        return ('_eventTime', '_eventConn', '_eventWeight', '_eventSwitch', '_eventNoise', '_eventState')
+
+    def getStates(self):
+        '''Rebuild the time-indexed dictionary of HomeoDataUnits used by HomeoDataCollector.
+           The result is cached until new data are recorded'''
+
+        if self._statesCache is not None:
+            return self._statesCache
+        states = {}
+        conns = self.connectionsAsNPArrays()
+        for tick, row in enumerate(self._chronologicalRows()):
+            time = int(self._times[row])
+            states[time] = {}
+            for col, name in enumerate(self.unitNames):
+                if not np.isnan(self._devUnisel[row, col, 0]):
+                    states[time][name] = self._dataUnitAt(row, col, conns, tick)
+        self._statesCache = states
+        return states
+
+    def setStates(self, aValue):
+        '''Only clearing the data is allowed'''
+        if aValue:
+            raise HomeoColumnarDataCollectorError("The states of a columnar data collector cannot be assigned")
+        self.clear()
+
+    states = property(fget = lambda self: self.getStates(),
+                      fset = lambda self, value: self.setStates(value))
+
+    def _dataUnitAt(self, row, col, conns, tick):
+        name = self.unitNames[col]
+        dataUnit = HomeoDataUnit()
+        dataUnit.name = name
+        dataUnit.criticalDeviation = float(self._devUnisel[row, col, 0])
+        dataUnit.uniselectorActive = int(self._devUnisel[row, col, 1])
+        dataUnit.output = float(self._output[row, col])
+        dataUnit.maxDeviation = float(self._maxDeviation[row, col])
+        dataUnit.uniselectorState = bool(self._uniselState[row, col])
+        for incomingName, connCol in self._connIndex.get(name, {}).items():
+            if not np.isnan(conns['weight'][tick, connCol]):
+                dataUnit.connectedTo[incomingName] = [float(conns['weight'][tick, connCol]),
+                                                      float(conns['switch'][tick, connCol]),
+                                                      'uniselector' if conns['state'][tick, connCol] else 'manual',
+                                                      float(conns['noise'][tick, connCol])]
+        return dataUnit
+
+    def numberOfTicks(self):
+        '''Number of ticks currently held in memory'''
+
+        return self._rows
+
+    def times(self):
+        return self._times[self._chronologicalRows()]
+
+#===============================================================================
+# Accessing methods
+#===============================================================================
+
+    def atTimeIndexAddDataUnitForAUnit(self, timeIndex, aHomeoUnit):
+        '''Record the state of aHomeoUnit at time timeIndex'''
+
+        self._statesCache = None
+        self._connCache = None
+        if timeIndex == self._lastTime:
+            row = self._lastRow
+        else:
+            row = self._rowOfTime.get(timeIndex)
+            if row is None:
+                row = self._newRowFor(timeIndex)
+            self._lastTime = timeIndex
+            self._lastRow = row
+
+        name = aHomeoUnit.name
+        col = self._unitIndex.get(name)
+        if col is None:
+            col = self._addUnitColumn(name)
+        self._devUnisel[row, col, 0] = aHomeoUnit.criticalDeviation
+        self._devUnisel[row, col, 1] = aHomeoUnit.uniselectorActivated
+        self._output[row, col] = aHomeoUnit.currentOutput
+        self._maxDeviation[row, col] = aHomeoUnit.maxDeviation
+        self._uniselState[row, col] = aHomeoUnit.uniselectorActive
+
+        connIndex = self._connIndex[name]
+        lastConnValues = self._lastConnValues
+        for conn in aHomeoUnit.inputConnections:
+            incomingName = conn.incomingUnit.name
+            connCol = connIndex.get(incomingName)
+            if connCol is None:
+                connCol = self._addConnColumn(name, incomingName)
+            values = (conn.weight, conn.switch, conn.noise, conn.state == 'uniselector')
+            if values != lastConnValues[connCol]:
+                self._logConnEvent(timeIndex, connCol, values)
+
+    def _logConnEvent(self, timeIndex, connCol, values):
+        '''Append to the event log the new values of the connection in column connCol'''
+
+        n = self.nEvents
+        if n == self._eventTime.shape[0]:
+            if self.capacity is not None and self.spillPath is None:
+                "Ring buffer: first drop the events of the ticks no longer in memory"
+                self._trimConnEvents()
+            if self.nEvents > n // 2:
+                old = dict((name, getattr(self, name)) for name in self._eventArrays())
+                self._allocateConnEvents(2 * n)
+                for name, array in old.items():
+                    getattr(self, name)[:self.nEvents] = array[:self.nEvents]
+            n = self.nEvents
+        self._eventTime[n] = timeIndex
+        self._eventConn[n] = connCol
+        self._eventWeight[n], self._eventSwitch[n], self._eventNoise[n], self._eventState[n] = values
+        self.nEvents = n + 1
+        self._lastConnValues[connCol] = values
+
+    def _trimConnEvents(self):
+        '''Drop the events older than the oldest tick in memory, except the last one
+           of each connection, which gives its values at that tick.
+           The ring buffer drops a row at every tick, so the log is trimmed only when it is
+           full, and grown only when trimming frees less than half of it'''
+
+        if self._rows == 0:
+            return
+        n = self.nEvents
+        oldestTime = self._times[self._start]
+        eventTime = self._eventTime[:n]
+        old = np.flatnonzero(eventTime <= oldestTime)
+        "The event connectionsAsNPArrays takes for the oldest tick: the latest, then the last logged"
+        order = old[np.lexsort((eventTime[old], self._eventConn[old]))]
+        conns = self._eventConn[order]
+        last = order[np.append(conns[1:] != conns[:-1], True)] if len(order) else order
+        keep = np.sort(np.concatenate((last, np.flatnonzero(eventTime > oldestTime))))
+        for name in self._eventArrays():
+            array = getattr(self, name)
+            array[:len(keep)] = array[keep]
+        self.nEvents = len(keep)
+
+    def _newRowFor(self, timeIndex):
+        bufferRows = self._times.shape[0]
+        if self._rows == bufferRows:
+            if self.capacity is None:
+                self._resize(rows = bufferRows * 2)
+            elif self.spillPath is not None:
+                self.spill()
+            else:
+                "Ring buffer: overwrite the oldest row"
+                oldest = self._start
+                del self._rowOfTime[int(self._times[oldest])]
+                self._start = (self._start + 1) % bufferRows
+                self._rows -= 1
+        row = (self._start + self._rows) % self._times.shape[0]
+        self._rows += 1
+        self._times[row] = timeIndex
+        self._devUnisel[row] = np.nan
+        self._output[row] = np.nan
+        self._maxDeviation[row] = np.nan
+        self._rowOfTime[timeIndex] = row
+        return row
+
+    def _resize(self, rows = None, nUnits = None):
+        '''Reallocate the arrays with more rows or columns, keeping the data'''
+
+        old = dict((name, getattr(self, name)) for name in self._arrays())
+        oldRows = old['_times'].shape[0]
+        order = self._chronologicalRows()
+        self._allocate(rows or oldRows,
+                       nUnits if nUnits is not None else len(self.unitNames))
+        n = len(order)
+        for name, array in old.items():
+            new = getattr(self, name)
+            if array.ndim == 1:
+                new[:n] = array[order]
+            else:
+                new[:n, :array.shape[1]] = array[order]
+        self._start = 0
+        self._rowOfTime = dict((int(t), row) for row, t in enumerate(self._times[:n]))
+        self._lastTime = None
+        self._lastRow = None
+
+    def _addUnitColumn(self, name):
+        col = len(self.unitNames)
+        self.unitNames.append(name)
+        self._unitIndex[name] = col
+        self._connIndex[name] = {}
+        self._resize(nUnits = len(self.unitNames))
+        self._lastRow = self._rowOfTime.get(self._lastTime)
+        return col
+
+    def _addConnColumn(self, name, incomingName):
+        connCol = len(self.connKeys)
+        self.connKeys.append((name, incomingName))
+        self._connIndex[name][incomingName] = connCol
+        self._lastConnValues.append(None)
+        return connCol
+
+    def _chronologicalRows(self):
+        '''Indices of the rows in memory, oldest first'''
+
+        return (self._start + np.arange(self._rows)) % self._times.shape[0]
+
+    def _isContiguous(self):
+        return self._start + self._rows <= self._times.shape[0]
+
+    def _column(self, array):
+        '''array restricted to the rows in memory, in chronological order.
+           A view unless the ring buffer has wrapped around'''
+
+        if self._isContiguous():
+            return array[self._start:self._start + self._rows]
+        return array[self._chronologicalRows()]
+
+#===============================================================================
+# Saving methods
+#===============================================================================
+
+    def spill(self):
+        '''Save the rows held in memory to the next spill file and empty the buffer'''
+
+        filename = '%s.%05d.npz' % (self.spillPath, len(self.spilledFiles))
+        np.savez(filename,
+                 times = self._column(self._times),
+                 criticalDeviation = self._column(self._devUnisel)[:, :, 0],
+                 uniselectorActivated = self._column(self._devUnisel)[:, :, 1],
+                 output = self._column(self._output),
+                 maxDeviation = self._column(self._maxDeviation),
+                 uniselectorState = self._column(self._uniselState),
+                 connEventTime = self._eventTime[:self.nEvents],
+                 connEventConn = self._eventConn[:self.nEvents],
+                 connEventWeight = self._eventWeight[:self.nEvents],
+                 connEventSwitch = self._eventSwitch[:self.nEvents],
+                 connEventNoise = self._eventNoise[:self.nEvents],
+                 connEventState = self._eventState[:self.nEvents],
+                 unitNames = np.array(self.unitNames, dtype = str),
+                 connKeys = np.array(self.connKeys, dtype = str).reshape(-1, 2))
+        self.spilledFiles.append(filename)
+        "Every chunk starts with a full snapshot of the connections"
+        self._clearConnEvents()
+        self._statesCache = None
+        self._connCache = None
+        self._rows = 0
+        self._start = 0
+        self._rowOfTime = {}
+        self._lastTime = None
+        self._lastRow = None
+
+    def saveEssentialDataOnFile(self, aFilename):
+        '''Save essential data on a file in text format, in the same format
+           as HomeoDataCollector, without building the whole content in memory first.
+           Will erase aFilename if it exists already'''
+
+        fileOut = open(aFilename, 'w')
+        fileOut.write(self._plottingDataHeaderForR())
+        data = self.criticalDevAsNPArrayForAllUnits()
+        fmt = ','.join(['%r', '%d'] * len(self.unitNames))
+        for timeSlice in data:
+            fileOut.write(fmt % tuple(float(v) if i % 2 == 0 else int(v)
+                                      for i, v in enumerate(timeSlice)))
+            fileOut.write('\n')
+        fileOut.close()
+
+    def saveBinaryRunOnFile(self, aFilename, dtype = np.float64):
+        '''Save the data held in memory as a binary run file (see Core.HomeoRunFile),
+           which can be read back with np.memmap through HomeoRunFile.
+           Will erase aFilename if it exists already'''
+
+        columns = [self.times()[:, None]]
+        for col in range(len(self.unitNames)):
+            columns.append(self._column(self._devUnisel)[:, col, :1])
+            columns.append(self._column(self._output)[:, col, None])
+            columns.append(self._column(self._devUnisel)[:, col, 1:])
+        columns.append(self.connWeightsAsNPArray())
+        writeRunFile(aFilename, self.unitNames, self.connKeys, np.hstack(columns), dtype)
+
+#===============================================================================
+# Printing methods
+#===============================================================================
+
+    def _plottingDataHeaderForR(self):
+        aCharacter = ','
+        aString = '# Simulation data produced by HOMEO---the homeostat simulation program\n'
+        aString += '# Data printed on: '
+        aString += str(datetime.datetime.now())
+        aString += "\n"
+        aString += '# There were exactly %u units in this simulation' % len(self.unitNames)
+        aString += "\n"
+        aString += aCharacter.join(name + aCharacter + name + '_un.' for name in self.unitNames)
+        aString += "\n"
+        return aString
+
+    def printPlottingDataForROnAString(self, aString):
+        '''Append to aString the same multi-column representation as
+           HomeoDataCollector.printPlottingDataForROnAString'''
+
+        if self._rows == 0:
+            sys.stderr.write("DataCollector: There are no data to save")
+        aString += self._plottingDataHeaderForR()
+        data = self.criticalDevAsNPArrayForAllUnits()
+        lines = []
+        for timeSlice in data:
+            lines.append(",".join(str(float(v)) if i % 2 == 0 else str(int(v))
+                                  for i, v in enumerate(timeSlice)))
+        if lines:
+            aString += '\n'.join(lines) + '\n'
+        return aString
+
+#===============================================================================
+# Converting methods
+#===============================================================================
+
+    def criticalDevAsNPArrayForAllUnits(self):
+        '''Return a (ticks, 2 * units) array with, for each unit, the critical deviation
+           and the uniselector activation flag. The array is a view on the collected data
+           (not a copy) unless the ring buffer has wrapped around'''
+
+        data = self._column(self._devUnisel)
+        return data.reshape(data.shape[0], 2 * len(self.unitNames))
+
+    def criticalDevAsCollectionOfArraysForAllUnits(self):
+        return self.criticalDevAsNPArrayForAllUnits().tolist()
+
+    def criticalDevAsNPArrayForUnit(self, aHomeoUnit):
+        '''Return the critical deviations of aHomeoUnit at the ticks it was recorded.
+           A view on the collected data if it was recorded at every tick'''
+
+        col = self._unitIndex.get(aHomeoUnit.name)
+        if col is None:
+            return np.array([])
+        data = self._column(self._devUnisel)[:, col, 0]
+        if np.isnan(data).any():
+            return data[~np.isnan(data)]
+        return data
+
+    def criticalDevAsCollectionForUnit(self, aHomeoUnit):
+        return self.criticalDevAsNPArrayForUnit(aHomeoUnit).tolist()
+
+    def uniselectorActivatedAsNPArrayForAllUnits(self):
+        '''Return a (ticks, units) view of the uniselector activation flags'''
+
+        return self._column(self._devUnisel)[:, :, 1]
+
+    def uniselectorActivatedAsCollectionOfArraysForAllUnits(self):
+        return self.uniselectorActivatedAsNPArrayForAllUnits().tolist()
+
+    def outputAsNPArrayForAllUnits(self):
+        return self._column(self._output)
+
+    def connWeightsAsNPArray(self):
+        '''Return a (ticks, connections) array of signed weights (weight * switch),
+           with columns in the order of connKeys'''
+
+        conns = self.connectionsAsNPArrays()
+        return conns['weight'] * conns['switch']
+
+    def connectionsAsNPArrays(self):
+        '''Rebuild from the event log the (ticks, connections) arrays of weight, switch,
+           noise and state (1 for uniselector, 0 for manual) of the connections at the ticks
+           in memory, returned in a dictionary. Columns follow the order of connKeys.
+           Weights are NaN before the first event of a connection.
+           The result is cached until new data are recorded'''
+
+        if self._connCache is not None:
+            return self._connCache
+        times = self.times()
+        nConns = len(self.connKeys)
+        conns = {'weight': np.full((len(times), nConns), np.nan),
+                 'switch': np.zeros((len(times), nConns)),
+                 'noise': np.zeros((len(times), nConns)),
+                 'state': np.zeros((len(times), nConns), dtype = np.int8)}
+        n = self.nEvents
+        eventConn = self._eventConn[:n]
+        eventTime = self._eventTime[:n]
+        "Sort the events by connection and then by time, keeping the logging order for equal times"
+        order = np.lexsort((eventTime, eventConn))
+        bounds = np.searchsorted(eventConn[order], np.arange(nConns + 1))
+        for connCol in range(nConns):
+            events = order[bounds[connCol]:bounds[connCol + 1]]
+            if len(events) == 0:
+                continue
+            latest = np.searchsorted(eventTime[events], times, side = 'right') - 1
+            known = latest >= 0
+            events = events[latest[known]]
+            conns['weight'][known, connCol] = self._eventWeight[events]
+            conns['switch'][known, connCol] = self._eventSwitch[events]
+            conns['noise'][known, connCol] = self._eventNoise[events]
+            conns['state'][known, connCol] = self._eventState[events]
+        self._connCache = conns
+        return conns
+
+    def memoryUsage(self):
+        '''Bytes used by the arrays holding the collected data'''
+
+        return sum(getattr(self, name).nbytes for name in self._arrays() + self._eventArrays())
@@ -45,10 +45,14 @@ class HomeoConnection(object):
     switch               <anInteger>      polarity of the connection ( +1 or -1)
     weight               <aFloat>         weight of the connection : between 0 and 1
     noise                <aFloat>         possible noise on the connection (between 0--no noise - to 1, so noisy to break the connection)
+    noiseModel           <aString>        the HomeoNoise model of the noise (see HomeoNoise.modelNames()), 
+                                          by default 'DistortingNormalProportional'
     state                <aString>        determines whether the connection is governed by weight and switch or by the uniselector. 
                                           The value can only be 'manual' or 'uniselector'
     status               <aBoolean>        whether the connection is active or not. 
     '''
+
+    DefaultNoiseModel = 'DistortingNormalProportional'
     
     
     def __init__(self):
@@ -196,6 +200,26 @@ class HomeoConnection(object):
     
     noise = property(fget = lambda self: self.getNoise(),
                           fset = lambda self, value: self.setNoise(value))   
+
+    def getNoiseCode(self):
+        return getattr(self, '_noiseCode', HomeoNoise.modelCode(HomeoConnection.DefaultNoiseModel))
+    noiseCode = property(fget = lambda self: self.getNoiseCode())
+
+    def getNoiseModel(self):
+        return HomeoNoise.modelName(self.noiseCode)
+
+    def setNoiseModel(self, aModel):
+        '''
+        Set the HomeoNoise model of the noise, by name or by code.
+        Headless units holding the connection re-read their connections' models
+        '''
+        self._noiseCode = HomeoNoise.modelCode(aModel)
+        outgoingUnit = self.holdingUnit()
+        if outgoingUnit is not None:
+            outgoingUnit._jit_dirty = True
+
+    noiseModel = property(fget = lambda self: self.getNoiseModel(),
+                          fset = lambda self, value: self.setNoiseModel(value))
     def getState(self):
         return self._state
     
@@ -281,12 +305,23 @@ class HomeoConnection(object):
         
         return self._outgoingUnit
     
-    def output(self):
+    def holdingUnit(self):
+        '''Return the HomeoUnit holding the connection, or None.
+           The outgoingUnit method above shadows the outgoingUnit property,
+           so the unit assigned to outgoingUnit is an instance variable'''
+
+        return self.__dict__.get('outgoingUnit', self.__dict__.get('_outgoingUnit'))
+
+    def output(self, rng = None):
         ''''Return the value of the connection times the weight, possibly switched,  and  include  the noise. 
             The noise  is computed with the help of the HomeoNoise utility class. 
-            Several different algorithms are available, see the instance methods of HomeoNoise for details'''
+            Several different algorithms are available, selected by noiseModel, see HomeoNoise for details.
+            The noise is drawn from rng (a numpy Generator or a HomeoNoiseSupply),
+            by default the noise supply of the outgoing unit'''
         
-        connNoise = HomeoNoise.connNoise(self._incomingUnit.currentOutput, self._noise)
+        if rng is None:
+            rng = getattr(self.holdingUnit(), 'noiseSupply', None)
+        connNoise = HomeoNoise.algorithms[self.noiseCode](self._incomingUnit.currentOutput, self._noise, rng)
         hDebug('conn', ("The noise on the connection is %f" % connNoise))
         return (self._incomingUnit.currentOutput * self.switch * self.weight) + connNoise
     
@@ -0,0 +1,214 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+
+Steady-state and limit-cycle fast-forward for quiescent homeostats.
+
+Once an ultrastable homeostat has found a stable field its needles settle on
+an equilibrium (or, with coarse time steps, on a short cycle around it) and
+nothing changes any more until the end of the run: no needle reaches the
+critical range, so no uniselector fires and the weights stay put. Long Ashby
+runs spend most of their ticks there.
+
+A HomeoFastForward watches the state of the active units (deviations and
+velocities) after every tick. Each state is hashed, after rounding to a grid
+of step tolerance when a tolerance is given, and when the current state
+has already been seen p ticks before, the whole last period repeats the
+previous one (with a tolerance: the whole window of 2 * maxPeriod + 1 ticks
+repeats with period p) and every state in it is quiet (no needle in the
+critical range, no uniselector firing) the homeostat is in a fixed point
+(p = 1) or a limit cycle of period p. Without noise the tick map only depends on that
+state, so HomeostatSession can move the clock forward by a multiple of p
+without computing the skipped ticks: the units end the jump in exactly the
+state they would have reached. The data collector, run file, tick hooks and
+state logger still see every skipped tick, replayed from the recorded cycle.
+
+With tolerance 0 (the default) the detector only accepts homeostats whose
+active units and connections have no noise, and fast-forwarding does not
+change the results of a run. With a positive tolerance noisy homeostats are
+accepted too, states within tolerance of each other count as the same, and
+the skipped ticks replay the recorded cycle without drawing any noise: an
+approximation, to be asked for explicitly, with a tolerance well below the
+distance of the needles from the critical range.
+
+Enable with Homeostat.enableFastForward().
+'''
+
+from Core.HomeoArrayEngine import HomeoArrayEngine
+from Core.HomeoUniselectorContinuous import HomeoUniselectorContinuous
+from collections import deque
+import numpy as np
+
+
+class HomeoFastForward(object):
+    '''
+    HomeoFastForward detects fixed points and limit cycles of a homeostat.
+    HomeostatSession calls reset() when it prepares a run, observe() at the end
+    of every tick and, when observe() returns a period, jumps forward using the
+    recorded cycle (see cycleState() and restore()).
+
+    Instance Variables:
+        tolerance      <aFloat>        states closer than this (per variable) count as equal; 0 requires exact repetition
+        maxPeriod      <anInteger>     longest cycle looked for
+        checkInterval  <anInteger>     ticks run on the array engine before the first detection window (doubled after each unsuccessful one)
+        jumps          <aList>         (fromTick, toTick, period) of every jump taken
+        units          <aList>         the active units being watched
+    '''
+
+    DefaultMaxPeriod = 50
+    DefaultCheckInterval = 1000
+
+    def __init__(self, tolerance = 0.0, maxPeriod = DefaultMaxPeriod, checkInterval = DefaultCheckInterval):
+        if tolerance < 0:
+            raise ValueError("tolerance must not be negative")
+        if maxPeriod < 1:
+            raise ValueError("maxPeriod must be at least 1")
+        self.tolerance = float(tolerance)
+        self.maxPeriod = int(maxPeriod)
+        self.checkInterval = max(1, int(checkInterval))
+        self.jumps = []
+        self.units = []
+        self._clearHistory()
+
+    def getWindow(self):
+        '''Ticks of history needed to recognize a cycle of maxPeriod'''
+
+        return 2 * self.maxPeriod + 1
+    window = property(fget = lambda self: self.getWindow())
+
+    def ticksSkipped(self):
+        return sum(toTick - fromTick for fromTick, toTick, period in self.jumps)
+
+    def canFastForward(self, aHomeostat):
+        '''Check that the next tick of aHomeostat only depends on the state the receiver watches:
+           all active units have dynamics the array engine implements, none evolves its weights
+           continuously and, with tolerance 0, no noise enters the active units and connections'''
+
+        active = [u for u in aHomeostat.homeoUnits if u.isActive()]
+        if not active:
+            return False
+        for unit in active:
+            if HomeoArrayEngine.unitKind(unit) is None:
+                return False
+            if unit.uniselectorActive and isinstance(unit.uniselector, HomeoUniselectorContinuous):
+                return False
+            if self.tolerance == 0:
+                if unit.noise != 0:
+                    return False
+                for conn in unit.inputConnections:
+                    if conn.isActive() and conn.noise != 0:
+                        return False
+        return True
+
+    def reset(self, aHomeostat):
+        '''Start watching the active units of aHomeostat, forgetting the states seen so far'''
+
+        self.units = [u for u in aHomeostat.homeoUnits if u.isActive()]
+        self._critical = [(u._critThreshold * u._maxDeviation, u._critThreshold * u.minDeviation)
+                          for u in self.units]
+        self._clearHistory()
+
+    def _clearHistory(self):
+        self._keys = deque()                   # (tick, key) of the last 2 * maxPeriod + 1 states
+        self._lastSeen = {}                    # key -> last tick it was seen at
+        self._snapshots = {}                   # tick -> unit state, for the last maxPeriod + 1 ticks
+        self._quietSince = None
+
+    def _stateKey(self, values):
+        state = np.array(values, dtype=np.float64)
+        if self.tolerance > 0:
+            state = np.floor(state / self.tolerance + 0.5).astype(np.int64)
+        return state.tobytes()
+
+    def _snapshot(self):
+        return [(u._criticalDeviation, u._currentVelocity, getattr(u, '_lastAcceleration', 0.0),
+                 u._currentOutput, u._inputTorque) for u in self.units]
+
+    def isQuiet(self):
+        '''Check that no watched needle is in the critical range and no uniselector has just fired'''
+
+        for unit, (high, low) in zip(self.units, self._critical):
+            dev = unit._criticalDeviation
+            if dev >= high or dev <= low or unit._uniselectorActivated:
+                return False
+        return True
+
+    def observe(self, tick):
+        '''Record the state of the units at tick (the time of the homeostat after a tick).
+           Return the period of the cycle the homeostat has entered, or None'''
+
+        if not self.isQuiet():
+            self._clearHistory()
+            return None
+        values = []
+        for unit in self.units:
+            values.append(unit._criticalDeviation)
+            values.append(unit._currentVelocity)
+        if self._quietSince is None:
+            self._quietSince = tick
+
+        key = self._stateKey(values)
+        keys = self._keys
+        keys.append((tick, key))
+        self._snapshots[tick] = self._snapshot()
+        while keys[0][0] <= tick - self.window:
+            oldTick, oldKey = keys.popleft()
+            if self._lastSeen.get(oldKey) == oldTick:
+                del self._lastSeen[oldKey]
+        self._snapshots.pop(tick - self.maxPeriod - 1, None)
+
+        previous = self._lastSeen.get(key)
+        self._lastSeen[key] = tick
+        if previous is None:
+            return None
+        period = tick - previous
+        if period > self.maxPeriod:
+            return None
+        "Exact states repeat forever once a whole period has repeated. Approximate ones must"
+        "have repeated over the whole window, or a slow drift would pass for a fixed point"
+        span = 2 * period if self.tolerance == 0 else self.window
+        if tick - span + 1 < self._quietSince:
+            return None
+        recent = [k for t, k in keys if t > tick - span]
+        if recent[:-period] != recent[period:]:
+            return None
+        return period
+
+    def cycleState(self, tick, period, aTick):
+        '''Return the recorded state the units have at aTick (> tick) in the cycle
+           of period recognized at tick. The states come from the last period,
+           whose torques and accelerations were computed from states of the cycle too'''
+
+        return self._snapshots[tick - (tick - aTick) % period]
+
+    def restore(self, snapshot):
+        '''Put the units in the state recorded in snapshot'''
+
+        for unit, (dev, vel, acc, out, torque) in zip(self.units, snapshot):
+            unit._criticalDeviation = dev
+            unit._currentVelocity = vel
+            if hasattr(unit, '_lastAcceleration'):
+                unit._lastAcceleration = acc
+            unit._currentOutput = out
+            unit._inputTorque = torque
+            unit._nextDeviation = 0
+            unit._uniselectorActivated = 0
+
+    def advanceUniselectorTimes(self, ticks):
+        '''Advance the uniselector timers of the units by ticks in which the
+           uniselectors are checked but do not fire'''
+
+        for unit in self.units:
+            if not unit.uniselectorActive:
+                continue
+            interval = unit._uniselectorTimeInterval
+            elapsed = unit._uniselectorTime
+            if elapsed >= interval:
+                "the timer is reset at the first check"
+                elapsed, ticks = 0, ticks - 1
+            unit._uniselectorTime = (elapsed + ticks) % interval
+
+    def noteJump(self, fromTick, toTick, period):
+        self.jumps.append((fromTick, toTick, period))
+        self._clearHistory()
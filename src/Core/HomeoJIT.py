@@ -19,40 +19,113 @@ import numpy as np
 
 
 @njit(cache=True)
-def _jit_unit_noise(noise):
-    """Replacement for HomeoNoise.unitNoise().
-    Distorting-normal-linear noise: Gaussian(0, noise/3) clipped to [-noise, noise].
-    Uses np.random.normal instead of random.gauss (identical distribution)."""
-    if noise == 0.0:
-        return 0.0
-    val = np.random.normal(0.0, noise / 3.0)
-    if val < -noise:
-        return -noise
-    if val > noise:
-        return noise
-    return val
+def _jit_reserve(block, cursor, which, count, rng):
+    """Make sure the next count values of a block of a HomeoNoiseSupply (see
+    Core.HomeoRandom) are available: which = 0 for the normals block, 1 for
+    the uniforms block, and rng the Generator that block is drawn from.
+    When fewer are left, the unused values are moved to the front of the
+    block and the rest is drawn from rng, so the values handed out are
+    always the stream of rng, in order, whenever the block is refilled.
+    Kernels reserve the draws of a whole tick at once and then take them with
+    _jit_next, which keeps the refill test out of the inner loops."""
+    i = cursor[which]
+    n = block.shape[0]
+    if n - i >= count:
+        return
+    left = n - i
+    for j in range(left):
+        block[j] = block[i + j]
+    if which == 0:
+        for j in range(left, n):
+            block[j] = rng.standard_normal()
+    else:
+        for j in range(left, n):
+            block[j] = rng.random()
+    cursor[which] = 0
+
+
+@njit(cache=True)
+def _jit_next(block, cursor, which):
+    """Take the next value of a block, which must have been reserved."""
+    i = cursor[which]
+    cursor[which] = i + 1
+    return block[i]
+
+
+@njit(cache=True)
+def _jit_sign(x):
+    if x > 0.0:
+        return 1.0
+    if x < 0.0:
+        return -1.0
+    return 0.0
 
 
 @njit(cache=True)
-def _jit_conn_noise(current, noise):
-    """Replacement for HomeoNoise.connNoise().
-    Distorting-normal-proportional noise for connections."""
+def _jit_noise(code, current, noise, normals, uniforms, cursor):
+    """Compiled version of the noise models of Helpers.HomeoNoise.
+
+    code selects the model, as in HomeoNoise.algorithms:
+    code = 6 * mode + 2 * distribution + ratio, with
+    mode 0 = degrading, 1 = distorting;
+    distribution 0 = constant, 1 = normal, 2 = uniform;
+    ratio 0 = linear, 1 = proportional.
+    Units use 8 (distorting-normal-linear) and connections 9
+    (distorting-normal-proportional) by default.
+
+    Normals and uniforms are taken from the blocks of a HomeoNoiseSupply,
+    one of each at most, which must have been reserved (by _jit_reserve
+    in compiled code, HomeoNoiseSupply.reserve in Python), and scaled exactly as
+    HomeoNoiseSupply.normal() and uniform() do, so the values match
+    those of the Python implementation drawing from the same supply."""
     if noise == 0.0:
         return 0.0
-    if current != 0.0:
-        bound = noise * abs(current)
-    else:
+    distribution = (code % 6) // 2
+    proportional = code % 2 == 1
+    if code < 6:
+        # degrading: sign opposite to the current
+        sign = -_jit_sign(current)
+        if distribution == 0:
+            if current == 0.0:
+                return -noise
+            if proportional:
+                return -noise * current
+            return noise * sign
+        if distribution == 1:
+            if not proportional:
+                val = noise + (noise / 3.0) * _jit_next(normals, cursor, 0)
+                return max(0.0, min(2.0 * noise, val)) * sign
+            if current != 0.0:
+                max_abs = noise * abs(current) * 2.0
+            else:
+                max_abs = noise
+                sign = -1.0
+            val = max_abs / 2.0 + (max_abs / 6.0) * _jit_next(normals, cursor, 0)
+            return max(0.0, min(max_abs, val)) * sign
+        high = 2.0 * noise * abs(current) if proportional else 2.0 * noise
+        return high * _jit_next(uniforms, cursor, 1) * sign
+    # distorting: centered around 0
+    if distribution == 0:
+        sign = _jit_sign(-1.0 + 2.0 * _jit_next(uniforms, cursor, 1))
+        if proportional:
+            return noise * abs(current) * sign
+        return noise * sign
+    if distribution == 1:
         bound = noise
-    val = np.random.normal(0.0, bound / 3.0)
-    if val < -bound:
-        return -bound
-    if val > bound:
-        return bound
-    return val
+        if proportional and current != 0.0:
+            bound = noise * abs(current)
+        val = (bound / 3.0) * _jit_next(normals, cursor, 0)
+        if val < -bound:
+            return -bound
+        if val > bound:
+            return bound
+        return val
+    bound = noise * abs(current) if proportional else noise
+    return -bound + (bound - -bound) * _jit_next(uniforms, cursor, 1)
 
 
 @njit(cache=True)
-def _jit_compute_torque(outputs, switches, weights, noises):
+def _jit_compute_torque(outputs, switches, weights, noises, codes, normals, uniforms, cursor):
     """Replacement for the computeTorque list comprehension + conn.output() chain.
 
     Parameters
@@ -61,13 +134,17 @@ def _jit_compute_torque(outputs, switches, weights, noises):
     switches : float64 array — connection switch (+1/-1)
     weights : float64 array — connection weight (absolute)
     noises : float64 array — connection noise parameter
+    codes : int64 array — connection noise model (see _jit_noise)
+    normals, uniforms, cursor : the blocks of the HomeoNoiseSupply the
+        connection noise is drawn from, in which the caller must have
+        reserved a normal and a uniform per connection (HomeoNoiseSupply.reserve)
 
-    Returns the sum of (output * switch * weight + connNoise) for each connection.
+    Returns the sum of (output * switch * weight + noise) for each connection.
     """
     total = 0.0
     n = outputs.shape[0]
     for i in range(n):
-        cn = _jit_conn_noise(outputs[i], noises[i])
+        cn = _jit_noise(codes[i], outputs[i], noises[i], normals, uniforms, cursor)
         total += outputs[i] * switches[i] * weights[i] + cn
     return total
 
@@ -122,13 +199,430 @@ def _jit_compute_output(crit_dev, min_dev, max_dev, out_low, out_high):
     return out
 
 
+@njit(cache=True)
+def _jit_seed(seed):
+    """Seed the legacy random generator used inside compiled code. Numba keeps its
+    own generator state, independent of numpy.random.seed() called from Python.
+    The kernels below draw from the Generator they are passed instead."""
+    np.random.seed(seed)
+
+
 def warmup_jit():
     """Call each JIT function once with dummy data to trigger Numba compilation.
     This is a one-time cost (~1s) at simulation start."""
-    _jit_unit_noise(0.1)
-    _jit_conn_noise(0.5, 0.1)
+    rng = np.random.Generator(np.random.Philox(0))
+    normals = np.empty(4)
+    uniforms = np.empty(4)
+    cursor = np.array([4, 4], dtype=np.int64)
+    _jit_reserve(normals, cursor, 0, 1, rng)
+    _jit_reserve(uniforms, cursor, 1, 1, rng)
+    _jit_noise(8, 0.0, 0.1, normals, uniforms, cursor)
     dummy = np.array([0.5], dtype=np.float64)
-    _jit_compute_torque(dummy, dummy, dummy, dummy)
+    codes = np.array([9], dtype=np.int64)
+    _jit_compute_torque(dummy, dummy, dummy, dummy, codes, normals, uniforms, cursor)
     _jit_needle_position_base(1.0, 0.5, 10.0, 100.0, 0.0)
     _jit_needle_position_newtonian(1.0, 0.5, 0.1, 100.0, 0.0, 1.0)
     _jit_compute_output(0.0, -10.0, 10.0, -1.0, 1.0)
+    _jit_reserve(normals, cursor, 0, 1, rng)
+    _jit_ou_network(dummy.copy(), np.ones(1), np.array([0, 1], dtype=np.int64),
+                    np.ones(1, dtype=np.bool_), np.ones(1, dtype=np.bool_), dummy,
+                    np.ones((1, 7)), normals, cursor)
+
+
+@njit(cache=True)
+def _jit_needle_next(kind, torque, viscosity, max_viscosity, velocity, mass,
+                     crit_dev, max_dev, dt_fast):
+    """Next (unclipped) needle position for the needle dynamics coded by kind:
+    0 = linear, 1 = proportional, 2 = Newtonian (linear).
+
+    Returns (new_pos, acceleration); acceleration is 0 except for Newtonian units.
+    """
+    if kind == 2:
+        return _jit_needle_position_newtonian(torque, viscosity, velocity,
+                                              mass, crit_dev, dt_fast)
+    if kind == 1:
+        return crit_dev + (torque / (max_dev * 2.0)) * (1.0 - viscosity / max_viscosity) / mass, 0.0
+    return _jit_needle_position_base(torque, viscosity, max_viscosity, mass, crit_dev), 0.0
+
+
+@njit(cache=True)
+def _jit_settle_needle(kind, next_dev, velocity, acceleration, max_dev, dt_fast):
+    """Clip the needle to [-max_dev, max_dev] and update the velocity of Newtonian
+    units as HomeoUnitNewtonian.selfUpdate() does: a needle hitting the
+    end of the trough stops, otherwise v += a * dt_fast.
+
+    Returns (new_dev, new_velocity).
+    """
+    if kind == 2:
+        if not (-max_dev < next_dev < max_dev):
+            return max(-max_dev, min(max_dev, next_dev)), 0.0
+        return next_dev, velocity + acceleration * dt_fast
+    return max(-max_dev, min(max_dev, next_dev)), velocity
+
+
+@njit(cache=True)
+def _jit_stress(crit_dev, max_dev):
+    """Mirrors HomeoUnit.stressLevel()."""
+    if max_dev == 0.0:
+        return 0.0
+    return min(abs(crit_dev) / max_dev, 1.0)
+
+
+@njit(cache=True)
+def _jit_ou_coefficients(stress, tau_a, theta, sigma_base, sigma_crit, dt,
+                         stress_exponent, exact):
+    """Drift coefficient and diffusion scale of one step of
+    HomeoUniselectorContinuous at the given stress level, so that a step is
+    w + drift_coeff * w + diffusion_scale * N(0,1).
+    With exact != 0 the step is the exact OU transition over dt,
+    otherwise an Euler-Maruyama step.
+    Mirrors HomeoUniselectorContinuous.stepCoefficients()."""
+    shaped = min(max(stress, 0.0), 1.0) ** stress_exponent
+    sig = sigma_base + (sigma_crit - sigma_base) * shaped
+    rate = theta / tau_a
+    if exact != 0.0 and rate > 0.0:
+        return np.expm1(-rate * dt), sig * np.sqrt(-np.expm1(-2.0 * rate * dt) / (2.0 * rate))
+    return -rate * dt, sig * np.sqrt(dt)
+
+
+@njit(cache=True)
+def _jit_ou_step(weight, switch, drift_coeff, diffusion_scale, normals, cursor):
+    """One OU step on a signed weight. Returns the new (weight, switch)."""
+    w = weight * switch
+    w_new = w + drift_coeff * w + diffusion_scale * _jit_next(normals, cursor, 0)
+    if w_new < -1.0:
+        w_new = -1.0
+    elif w_new > 1.0:
+        w_new = 1.0
+    return abs(w_new), 1.0 if w_new >= 0 else -1.0
+
+
+@njit(cache=True)
+def _jit_ou_network(weights, switches, conn_ptr, conn_unisel, evolving, stress,
+                    ou_params, normals, cursor):
+    """One step of the continuous uniselectors of a whole network.
+
+    weights and switches hold the connections of all units in CSR layout (the
+    incoming connections of unit i are conn_ptr[i]:conn_ptr[i+1]); the
+    uniselector-controlled connections (conn_unisel) of the units flagged in
+    evolving are stepped in place, each unit with the stress level stress[i]
+    and the parameters ou_params[i] (tau_a, theta, sigma_base, sigma_crit,
+    dt, stress_exponent, exact). One normal per stepped connection is taken,
+    in order, from the normals block of a HomeoNoiseSupply, where it must
+    have been reserved."""
+    for i in range(evolving.shape[0]):
+        if not evolving[i]:
+            continue
+        drift_coeff, diffusion_scale = _jit_ou_coefficients(
+            stress[i], ou_params[i, 0], ou_params[i, 1], ou_params[i, 2],
+            ou_params[i, 3], ou_params[i, 4], ou_params[i, 5], ou_params[i, 6])
+        for c in range(conn_ptr[i], conn_ptr[i + 1]):
+            if conn_unisel[c]:
+                weights[c], switches[c] = _jit_ou_step(weights[c], switches[c], drift_coeff,
+                                                       diffusion_scale, normals, cursor)
+
+
+@njit(cache=True)
+def _jit_run_homeostat(n_ticks, kind, active, dev, vel, acc, out, torque,
+                       noise, visc, max_visc, mass, max_dev, out_low, out_high,
+                       dt_fast, crit_thresh, unisel_mode, unisel_time,
+                       unisel_interval, unisel_activated, ou_params, noise_code,
+                       conn_ptr, conn_src, conn_live, conn_unisel,
+                       conn_w, conn_s, conn_noise, conn_noise_code, fired,
+                       normals, uniforms, cursor, rng, uniform_rng):
+    """Advance a whole homeostat packed into flat arrays for up to n_ticks.
+
+    Units are updated in order within a tick, so each unit sees the outputs
+    its predecessors produced in the same tick, exactly as in Homeostat.runFor.
+    Connections are stored in CSR layout: the incoming connections of unit i
+    are conn_ptr[i]:conn_ptr[i+1].
+
+    kind        : 0 = linear, 1 = proportional, 2 = Newtonian (linear)
+    unisel_mode : 0 = uniselector off, 1 = discrete, 2 = continuous (OU)
+    ou_params   : (n, 7) array of tau_a, theta, sigma_base, sigma_crit, dt,
+                  stress_exponent, exact for continuous uniselectors
+    noise_code, conn_noise_code : noise models of units and connections (see _jit_noise)
+
+    Continuous uniselectors are stepped together at the end of each tick
+    (_jit_ou_network), with the stress level of their unit when it was
+    updated, as the headless units do (see HomeoUniselectorContinuousNetwork).
+
+    Discrete uniselectors cannot be operated inside the kernel. When one
+    fires, its flag in fired is set and the kernel returns at the end of
+    that tick, so the caller can operate it and resume.
+    All noise and continuous uniselector draws come from a HomeoNoiseSupply
+    (normals, uniforms and cursor, refilled from rng and uniform_rng), whose
+    blocks must hold at least twice the number of connections plus the number
+    of units.
+    Returns the number of ticks actually run.
+    """
+    n = kind.shape[0]
+    draws = n + 2 * conn_src.shape[0]
+    ou_evolving = np.zeros(n, dtype=np.bool_)
+    ou_stress = np.zeros(n)
+    for t in range(n_ticks):
+        any_fired = False
+        ou_evolving[:] = False
+        _jit_reserve(normals, cursor, 0, draws, rng)
+        _jit_reserve(uniforms, cursor, 1, n + conn_src.shape[0], uniform_rng)
+        for i in range(n):
+            if not active[i]:
+                continue
+            # 1. noise on the needle, torque and new needle position
+            dev[i] += _jit_noise(noise_code[i], dev[i], noise[i], normals, uniforms, cursor)
+            tq = 0.0
+            for c in range(conn_ptr[i], conn_ptr[i + 1]):
+                if conn_live[c]:
+                    o = out[conn_src[c]]
+                    tq += o * conn_s[c] * conn_w[c] + _jit_noise(conn_noise_code[c], o, conn_noise[c],
+                                                                 normals, uniforms, cursor)
+            torque[i] = tq
+            nxt, acc[i] = _jit_needle_next(kind[i], tq, visc[i], max_visc, vel[i],
+                                           mass[i], dev[i], max_dev[i], dt_fast[i])
+
+            # 2. uniselector
+            if unisel_mode[i] == 2:
+                ou_evolving[i] = True
+                ou_stress[i] = _jit_stress(dev[i], max_dev[i])
+            elif unisel_mode[i] == 1:
+                unisel_time[i] += 1
+                if unisel_time[i] >= unisel_interval[i]:
+                    if (nxt >= crit_thresh[i] * max_dev[i] or
+                            nxt <= -crit_thresh[i] * max_dev[i]):
+                        fired[i] = True
+                        any_fired = True
+                        unisel_activated[i] = 1
+                    else:
+                        unisel_activated[i] = 0
+                    unisel_time[i] = 0
+                else:
+                    unisel_activated[i] = 0
+            else:
+                unisel_activated[i] = 0
+
+            # 3. clip the needle and compute the output
+            dev[i], vel[i] = _jit_settle_needle(kind[i], nxt, vel[i], acc[i],
+                                                max_dev[i], dt_fast[i])
+            out[i] = _jit_compute_output(dev[i], -max_dev[i], max_dev[i],
+                                         out_low[i], out_high[i])
+        _jit_ou_network(conn_w, conn_s, conn_ptr, conn_unisel, ou_evolving, ou_stress,
+                        ou_params, normals, cursor)
+        if any_fired:
+            return t + 1
+    return n_ticks
+
+
+@njit(cache=True)
+def _jit_run_ensemble(n_ticks, kind, active, dev, vel, acc, out, torque,
+                      noise, visc, max_visc, mass, max_dev, out_low, out_high,
+                      dt_fast, crit_thresh, unisel_mode, unisel_time,
+                      unisel_interval, unisel_activated, ou_params, noise_code, unif_bounds,
+                      ashby_table, ashby_rows, ashby_index, ashby_unit_index,
+                      conn_order, conn_live, conn_unisel, weights, switches,
+                      conn_noise, conn_noise_code, firings, t0, window, burn_in, stability,
+                      normals, uniforms, cursors, ticks_run):
+    """Advance K independent homeostats sharing the same topology for n_ticks.
+
+    Unit state arrays have shape (K, n), connection arrays (K, n, n), where
+    [k, i, j] is the connection into unit i from unit j of replicate k.
+    conn_order[i] lists the source units of unit i in the order of its
+    inputConnections (padded with -1), so torques are summed and uniselector
+    values consumed in the same order as the object path.
+    conn_live and conn_unisel are (n, n) masks shared by all replicates.
+
+    unisel_mode : 0 = off, 1 = Ashby (stepping table), 2 = uniform random,
+                  3 = continuous (OU)
+    noise_code, conn_noise_code : noise models of units and connections (see _jit_noise)
+    Discrete uniselectors are operated inside the kernel, each replicate
+    firing independently; firings[k, i] counts how often they fired.
+
+    stability[k] holds the state of a StabilityTracker for replicate k:
+    (current run of non-critical ticks, first and last tick at which a
+    run of window ticks started after burn_in, or -1). t0 is the time
+    of the homeostats when the call starts.
+
+    Replicate k draws from its own HomeoNoiseSupply, whose blocks and cursor
+    are the rows normals[k], uniforms[k] and cursors[k] (see
+    HomeoNoiseSupply.shareBlocks); the blocks must hold at least n + 2 n^2 values.
+    The generators cannot be reached from here, so a replicate whose blocks
+    have fewer than n + 2 n^2 values left at the start of a tick stops there:
+    the caller refills its supply (HomeoNoiseSupply.reserve, which draws the
+    same values _jit_reserve would) and calls the kernel again.
+    ticks_run[k] counts the ticks replicate k has run out of n_ticks, and is where
+    the next call resumes it. Returns the number of replicates that stopped early.
+    """
+    K = kind.shape[0]
+    n = kind.shape[1]
+    draws = n + 2 * n * n
+    ou_evolving = np.zeros(n, dtype=np.bool_)
+    ou_stress = np.zeros(n)
+    stopped = 0
+    for k in range(K):
+        normals_k = normals[k]
+        uniforms_k = uniforms[k]
+        cursor = cursors[k]
+        for t in range(ticks_run[k], n_ticks):
+            if (normals_k.shape[0] - cursor[0] < draws or
+                    uniforms_k.shape[0] - cursor[1] < draws):
+                stopped += 1
+                break
+            ou_evolving[:] = False
+            for i in range(n):
+                if not active[k, i]:
+                    continue
+                # 1. noise on the needle, torque and new needle position
+                dev[k, i] += _jit_noise(noise_code[k, i], dev[k, i], noise[k, i],
+                                        normals_k, uniforms_k, cursor)
+                tq = 0.0
+                for c in range(n):
+                    j = conn_order[i, c]
+                    if j < 0:
+                        break
+                    if conn_live[i, j]:
+                        o = out[k, j]
+                        tq += (o * switches[k, i, j] * weights[k, i, j] +
+                               _jit_noise(conn_noise_code[k, i, j], o, conn_noise[k, i, j],
+                                          normals_k, uniforms_k, cursor))
+                torque[k, i] = tq
+                nxt, acc[k, i] = _jit_needle_next(kind[k, i], tq, visc[k, i], max_visc,
+                                                  vel[k, i], mass[k, i], dev[k, i],
+                                                  max_dev[k, i], dt_fast[k, i])
+
+                # 2. uniselector
+                mode = unisel_mode[k, i]
+                if mode == 3:
+                    ou_evolving[i] = True
+                    ou_stress[i] = _jit_stress(dev[k, i], max_dev[k, i])
+                elif mode == 1 or mode == 2:
+                    unisel_time[k, i] += 1
+                    if unisel_time[k, i] >= unisel_interval[k, i]:
+                        if (nxt >= crit_thresh[k, i] * max_dev[k, i] or
+                                nxt <= -crit_thresh[k, i] * max_dev[k, i]):
+                            # masked update: only this replicate's unit is rewired
+                            for c in range(n):
+                                j = conn_order[i, c]
+                                if j < 0:
+                                    break
+                                if not conn_unisel[i, j]:
+                                    continue
+                                if mode == 1:
+                                    ashby_unit_index[k, i] += 1
+                                    row = ashby_index[k, i] - 1
+                                    if row < 0:
+                                        row += ashby_rows[k, i]
+                                    w = ashby_table[k, i, row, ashby_unit_index[k, i] - 1]
+                                else:
+                                    low = unif_bounds[k, i, 0]
+                                    w = low + (unif_bounds[k, i, 1] - low) * _jit_next(uniforms_k, cursor, 1)
+                                if w == 0.0:
+                                    weights[k, i, j] = 0.0
+                                    switches[k, i, j] = 1.0
+                                else:
+                                    weights[k, i, j] = abs(w)
+                                    switches[k, i, j] = np.sign(w)
+                            if mode == 1:
+                                if ashby_index[k, i] == ashby_rows[k, i]:
+                                    ashby_index[k, i] = 0
+                                else:
+                                    ashby_index[k, i] += 1
+                                ashby_unit_index[k, i] = 0
+                            unisel_activated[k, i] = 1
+                            firings[k, i] += 1
+                        else:
+                            unisel_activated[k, i] = 0
+                        unisel_time[k, i] = 0
+                    else:
+                        unisel_activated[k, i] = 0
+                else:
+                    unisel_activated[k, i] = 0
+
+                # 3. clip the needle and compute the output
+                dev[k, i], vel[k, i] = _jit_settle_needle(kind[k, i], nxt, vel[k, i],
+                                                          acc[k, i], max_dev[k, i],
+                                                          dt_fast[k, i])
+                out[k, i] = _jit_compute_output(dev[k, i], -max_dev[k, i], max_dev[k, i],
+                                                out_low[k, i], out_high[k, i])
+
+            # continuous uniselectors, stepped together as in _jit_ou_network
+            for i in range(n):
+                if not ou_evolving[i]:
+                    continue
+                drift_coeff, diffusion_scale = _jit_ou_coefficients(
+                    ou_stress[i], ou_params[k, i, 0], ou_params[k, i, 1], ou_params[k, i, 2],
+                    ou_params[k, i, 3], ou_params[k, i, 4], ou_params[k, i, 5],
+                    ou_params[k, i, 6])
+                for c in range(n):
+                    j = conn_order[i, c]
+                    if j < 0:
+                        break
+                    if conn_unisel[i, j]:
+                        weights[k, i, j], switches[k, i, j] = _jit_ou_step(
+                            weights[k, i, j], switches[k, i, j],
+                            drift_coeff, diffusion_scale, normals_k, cursor)
+
+            # 4. stability tracking, as StabilityTracker.check(tick)
+            any_critical = False
+            for i in range(n):
+                if active[k, i]:
+                    thresh = crit_thresh[k, i] * max_dev[k, i]
+                    if dev[k, i] >= thresh or dev[k, i] <= -thresh:
+                        any_critical = True
+            if any_critical:
+                stability[k, 0] = 0
+            else:
+                stability[k, 0] += 1
+            if stability[k, 0] >= window:
+                stable_since = t0 + t + 1 - window
+                if stable_since >= burn_in:
+                    if stability[k, 1] < 0:
+                        stability[k, 1] = stable_since
+                    stability[k, 2] = stable_since
+            ticks_run[k] = t + 1
+    return stopped
+
+
+@njit(cache=True)
+def _jit_irradiances(body_x, body_y, body_angle, sensor_pos, sensor_angle,
+                     sensor_max_value, sensor_max_range, sensor_half_angle_range,
+                     light_pos, intensity, amb_ratio, atten_vec, out):
+    """Irradiance at each sensor of a Khepera robot from all the lights
+    (see KheperaRobot.irradAtSensors), written into out.
+
+    Sensor positions are relative to the body, sensor angles in radians from
+    the robot's heading, half angle ranges in degrees. Lights outside a
+    sensor's range or angle contribute 0, each light's contribution is
+    clipped to the sensor's max value.
+    """
+    cos_body = np.cos(body_angle)
+    sin_body = np.sin(body_angle)
+    for s in range(sensor_pos.shape[0]):
+        sx = body_x + cos_body * sensor_pos[s, 0] - sin_body * sensor_pos[s, 1]
+        sy = body_y + sin_body * sensor_pos[s, 0] + cos_body * sensor_pos[s, 1]
+        eye_angle = body_angle + sensor_angle[s]
+        normal_x = np.cos(eye_angle)
+        normal_y = np.sin(eye_angle)
+        total = 0.0
+        for l in range(light_pos.shape[0]):
+            vx = light_pos[l, 0] - sx
+            vy = light_pos[l, 1] - sy
+            distance = np.sqrt(vx * vx + vy * vy)
+            if distance > sensor_max_range[s]:
+                continue
+            if distance == 0.0:
+                cos_angle = 0.0
+            else:
+                cos_angle = (vx * normal_x + vy * normal_y) / distance
+                if cos_angle > 1.0:
+                    cos_angle = 1.0
+                elif cos_angle < -1.0:
+                    cos_angle = -1.0
+            if np.degrees(np.arccos(cos_angle)) > sensor_half_angle_range[s]:
+                continue
+            direct = intensity[l] * (1.0 - amb_ratio[l]) * cos_angle
+            attenuation = 1.0 / (atten_vec[l, 0] + atten_vec[l, 1] * distance
+                                 + atten_vec[l, 2] * distance * distance)
+            irradiance = (direct + intensity[l] * amb_ratio[l]) * attenuation
+            if irradiance > sensor_max_value[s]:
+                irradiance = sensor_max_value[s]
+            total += irradiance
+        out[s] = total
@@ -0,0 +1,250 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+
+Linear-stability oracle for homeostat configurations.
+
+Between two firings of the uniselectors a homeostat without noise is, as
+long as no needle and no output reaches the end of its range, an affine map
+from the state at one tick to the state at the next. HomeoLinearStability
+builds the matrix of that map from the current weights, switches, masses and
+viscosities of the units, composing the updates of the units in the order
+the homeostat performs them (each unit reads the outputs the units before it
+have just computed), and predicts from its eigenvalues whether the current
+configuration settles: the needles converge to the equilibrium when the
+spectral radius of the map is below 1, and the configuration is stable in
+Ashby's sense when that equilibrium is also within the critical range of
+every unit.
+
+The prediction holds for the linear regime only. A configuration predicted
+unstable drives its needles to the ends of their range, where they stay
+until a uniselector fires, so ultrastability searches can skip it without
+running it (see HomeoUniselectorAshby.screensStability).
+
+Units with linear or proportional needles (HomeoUnit, HomeoUnitAristotelian
+and their actuator subclasses) and Newtonian units with linear needles are
+analysed; the state of a Newtonian unit includes its velocity. Units of any
+other kind, such as the sensor units of the robotic experiments, are held
+fixed: their current outputs enter the map as constants. Inactive units are
+held fixed too, and, as in the simulation, feed no torque to the others.
+'''
+
+from Core.HomeoUnit import HomeoUnit
+from Core.HomeoArrayEngine import HomeoArrayEngine
+import numpy as np
+
+try:
+    from RobotSimulator.HomeoUnitNewtonianTransduc import (
+        HomeoUnitNewtonianActuator, HomeoUnitAristotelianActuator)
+    _has_transducer_classes = True
+except ImportError:
+    _has_transducer_classes = False
+
+
+class HomeoLinearStability(object):
+    '''
+    HomeoLinearStability analyses the linearized tick map of a set of units.
+    It packs the units and their active connections when created; the methods
+    computing the prediction take an optional array of signed connection weights
+    (one per packed connection, see weightsWith()) to try other weights without
+    changing the connections.
+
+        oracle = HomeoLinearStability.forHomeostat(aHomeostat)
+        oracle.spectralRadius()
+        oracle.isStable()
+
+    Instance Variables:
+        units          <aList>         the analysed units, in update order
+        fixedUnits     <aList>         the units held fixed (inactive or of other kinds)
+        connections    <aList>         the active connections into the analysed units
+        weights        <anArray>       the current signed weights of the connections
+        dimension      <anInteger>     number of state variables (deviations and Newtonian velocities)
+    '''
+
+    @classmethod
+    def unitKind(cls, aHomeoUnit):
+        '''Return the HomeoArrayEngine code of the needle dynamics of aHomeoUnit,
+           or None if the unit is held fixed'''
+
+        kind = HomeoArrayEngine.unitKind(aHomeoUnit)
+        if kind is None and _has_transducer_classes:
+            if isinstance(aHomeoUnit, HomeoUnitNewtonianActuator):
+                if aHomeoUnit.needleCompMethod == 'linear':
+                    kind = HomeoArrayEngine.kinds['newtonian']
+            elif isinstance(aHomeoUnit, HomeoUnitAristotelianActuator):
+                if aHomeoUnit.needleCompMethod in ('linear', 'proportional'):
+                    kind = HomeoArrayEngine.kinds[aHomeoUnit.needleCompMethod]
+        return kind
+
+    @classmethod
+    def forHomeostat(cls, aHomeostat):
+        return cls(aHomeostat.homeoUnits)
+
+    @classmethod
+    def forUnit(cls, aHomeoUnit, updateOrder = None):
+        '''Return an oracle on aHomeoUnit and all the units that feed into it,
+           directly or not: the only units whose dynamics affect aHomeoUnit.
+           The units are sorted as in updateOrder (usually the homeoUnits of their
+           homeostat) when given, otherwise aHomeoUnit comes first and the others
+           follow in the order of the connections reaching them'''
+
+        reached = [aHomeoUnit]
+        seen = set([id(aHomeoUnit)])
+        for unit in reached:
+            for conn in unit.inputConnections:
+                source = conn.incomingUnit
+                if conn.isActive() and id(source) not in seen:
+                    seen.add(id(source))
+                    reached.append(source)
+        if updateOrder is not None:
+            reached = [u for u in updateOrder if id(u) in seen]
+        return cls(reached)
+
+    def __init__(self, units):
+        self.units = []
+        self.fixedUnits = []
+        for unit in units:
+            if unit.isActive() and HomeoLinearStability.unitKind(unit) is not None:
+                self.units.append(unit)
+            else:
+                self.fixedUnits.append(unit)
+        self.pack()
+
+    def pack(self):
+        '''Read the parameters of the units and the weights of their connections'''
+
+        units = self.units
+        n = len(units)
+        index = dict((id(unit), i) for i, unit in enumerate(units))
+        maxViscosity = float(HomeoUnit.DefaultParameters['maxViscosity'])
+
+        self.kind = np.array([HomeoLinearStability.unitKind(u) for u in units], dtype=np.int64)
+        self.maxDev = np.array([u._maxDeviation for u in units], dtype=np.float64)
+        self.critThreshold = np.array([u._critThreshold for u in units], dtype=np.float64)
+        self.mass = np.array([u._needleUnit._mass for u in units], dtype=np.float64)
+        self.visc = np.array([u._viscosity for u in units], dtype=np.float64)
+        self.viscFactor = 1.0 - self.visc / maxViscosity
+        self.dtFast = np.array([getattr(u, '_dt_fast', 1.0) for u in units], dtype=np.float64)
+
+        "Outputs are affine in the deviation: out = outGain * dev + outOffset (before clipping)"
+        outLow = np.array([u._outputRange['low'] for u in units], dtype=np.float64)
+        outHigh = np.array([u._outputRange['high'] for u in units], dtype=np.float64)
+        self.outGain = (outHigh - outLow) / (2.0 * self.maxDev)
+        self.outOffset = outLow + self.maxDev * self.outGain
+
+        "State variables: the deviations of all units, then the velocities of the Newtonian units"
+        newtonian = HomeoArrayEngine.kinds['newtonian']
+        self.velIndex = -np.ones(n, dtype=np.int64)
+        nextIndex = n
+        for i in range(n):
+            if self.kind[i] == newtonian:
+                self.velIndex[i] = nextIndex
+                nextIndex += 1
+        self.dimension = nextIndex
+
+        "Connections: sources are analysed units (connSrc >= 0) or fixed ones, entering with their current output."
+        "As in HomeoUnit._sync_jit_arrays, inactive units do not feed their connections"
+        self.connections = []
+        dst = []
+        for i, unit in enumerate(units):
+            for conn in unit.inputConnections:
+                if conn.isActive() and conn.incomingUnit.isActive():
+                    self.connections.append(conn)
+                    dst.append(i)
+        conns = self.connections
+        self.connDst = np.array(dst, dtype=np.int64)
+        self.connSrc = np.array([index.get(id(c._incomingUnit), -1) for c in conns], dtype=np.int64)
+        self.connFixedOutput = np.array([c._incomingUnit._currentOutput for c in conns], dtype=np.float64)
+        self.weights = np.array([c._weight * c._switch for c in conns], dtype=np.float64)
+
+    def weightsWith(self, connections, signedWeights):
+        '''Return a copy of the current signed weights in which connections
+           (a sequence of packed connections) have the given signedWeights'''
+
+        weights = self.weights.copy()
+        position = dict((id(c), k) for k, c in enumerate(self.connections))
+        for conn, value in zip(connections, signedWeights):
+            k = position.get(id(conn))
+            if k is not None:
+                weights[k] = value
+        return weights
+
+    def systemMatrix(self, weights = None):
+        '''Return the (dimension + 1) x (dimension + 1) matrix of the affine tick map
+           in homogeneous coordinates: the state at the next tick is M @ (x, 1).
+           weights are the signed connection weights (default: the current ones)'''
+
+        if weights is None:
+            weights = self.weights
+        d = self.dimension
+        newtonian = HomeoArrayEngine.kinds['newtonian']
+        proportional = HomeoArrayEngine.kinds['proportional']
+        M = np.eye(d + 1)
+        for i in range(len(self.units)):
+            "Torque on unit i as an affine function of the state"
+            torque = np.zeros(d + 1)
+            for k in np.flatnonzero(self.connDst == i):
+                j = self.connSrc[k]
+                if j >= 0:
+                    torque[j] += weights[k] * self.outGain[j]
+                    torque[d] += weights[k] * self.outOffset[j]
+                else:
+                    torque[d] += weights[k] * self.connFixedOutput[k]
+            update = np.eye(d + 1)
+            if self.kind[i] == newtonian:
+                v = self.velIndex[i]
+                dt = self.dtFast[i]
+                "acceleration = (torque - viscosity * velocity) / mass"
+                acceleration = torque / self.mass[i]
+                acceleration[v] -= self.visc[i] / self.mass[i]
+                update[i] += 0.5 * dt * dt * acceleration
+                update[i, v] += dt
+                update[v] += dt * acceleration
+            else:
+                gain = self.viscFactor[i] / self.mass[i]
+                if self.kind[i] == proportional:
+                    gain /= 2.0 * self.maxDev[i]
+                update[i] += gain * torque
+            M = update @ M
+        return M
+
+    def eigenvalues(self, weights = None):
+        '''Return the eigenvalues of the linear part of the tick map'''
+
+        d = self.dimension
+        return np.linalg.eigvals(self.systemMatrix(weights)[:d, :d])
+
+    def spectralRadius(self, weights = None):
+        '''Return the largest modulus of the eigenvalues of the tick map:
+           deviations from the equilibrium shrink by about this factor per tick'''
+
+        if self.dimension == 0:
+            return 0.0
+        return float(np.max(np.abs(self.eigenvalues(weights))))
+
+    def equilibrium(self, weights = None):
+        '''Return the deviations of the units at the fixed point of the tick map,
+           or None if the map has no unique fixed point'''
+
+        d = self.dimension
+        M = self.systemMatrix(weights)
+        try:
+            state = np.linalg.solve(np.eye(d) - M[:d, :d], M[:d, d])
+        except np.linalg.LinAlgError:
+            return None
+        return state[:len(self.units)]
+
+    def isStable(self, weights = None, margin = 0.0):
+        '''Predict whether the configuration is stable: the spectral radius of the
+           tick map is below 1 - margin and its equilibrium lies within the
+           critical range of every unit'''
+
+        if not self.units:
+            return True
+        if self.spectralRadius(weights) >= 1.0 - margin:
+            return False
+        equilibrium = self.equilibrium(weights)
+        if equilibrium is None:
+            return False
+        return bool(np.all(np.abs(equilibrium) < self.critThreshold * self.maxDev))
@@ -0,0 +1,278 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+
+Random streams for homeostats.
+
+Every homeostat owns a numpy Generator (see Homeostat.rng) which all its noise
+and uniselector draws come from, in the object path, in the compiled kernels
+of Core.HomeoJIT and in the array engines alike. The generators use the
+counter-based Philox bit generator and are built from a SeedSequence, so:
+
+- a homeostat seeded with seedRandom(seed) produces the same run whatever
+  else happens in the process (other homeostats running, pool size,
+  scheduling order of a GA or of a seed sweep);
+- independent streams for the members of an ensemble, or for the individuals
+  of a GA, are spawned from one seed (spawnGenerators, seedForKey).
+
+A homeostat that is not explicitly seeded draws the entropy of its generator
+from numpy.random the first time it needs it, so seeding numpy.random before
+building and running a homeostat (as the experiment setups do) still makes
+runs repeatable. Units that are not part of a homeostat use defaultGenerator().
+
+The draws are not made one at a time: a HomeoNoiseSupply (see Homeostat.noiseSupply)
+fills blocks of standard normals and uniforms from the generator with one
+vectorized call, and units, connections, uniselectors and the compiled kernels
+consume them through a shared cursor, scaling them as needed.
+'''
+
+import numpy as np
+import zlib
+
+
+class HomeoRandomError(Exception):
+    pass
+
+
+BitGenerator = np.random.Philox
+
+_defaultGenerator = None
+_defaultNoiseSupply = None
+
+
+def newGenerator(seed = None):
+    '''Return a Generator for seed (an integer, a sequence of integers or a SeedSequence).
+       Without a seed, the entropy is drawn from numpy.random'''
+
+    if seed is None:
+        seed = np.random.randint(0, 2**32, size = 4, dtype = np.uint64)
+    elif isinstance(seed, np.random.Generator):
+        raise HomeoRandomError("newGenerator needs a seed, not a Generator")
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return np.random.Generator(BitGenerator(seed))
+
+
+def spawnGenerators(seed, count):
+    '''Return count independent Generators spawned from seed'''
+
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return [np.random.Generator(BitGenerator(child)) for child in seed.spawn(count)]
+
+
+def seedForKey(seed, key):
+    '''Return an integer seed for the stream identified by key (an integer or a string,
+       e.g. a GA individual ID) among the streams spawned from seed.
+       The result only depends on seed and key'''
+
+    if isinstance(key, str):
+        key = zlib.crc32(key.encode('utf-8'))
+    sequence = np.random.SeedSequence(seed, spawn_key = (int(key),))
+    return int(sequence.generate_state(1, dtype = np.uint32)[0])
+
+
+def generatorState(rng):
+    '''Return a dictionary with the state of rng: its bit generator state and
+       the seed sequence it was built from, which its spawned streams depend on'''
+
+    seedSequence = rng.bit_generator.seed_seq
+    return {'bitGenerator': rng.bit_generator.state,
+            'entropy': seedSequence.entropy,
+            'spawnKey': list(seedSequence.spawn_key),
+            'poolSize': seedSequence.pool_size,
+            'childrenSpawned': seedSequence.n_children_spawned}
+
+
+def generatorFromState(state):
+    '''Return a new Generator in the state returned by generatorState'''
+
+    seedSequence = np.random.SeedSequence(state['entropy'], spawn_key = tuple(state['spawnKey']),
+                                          pool_size = state['poolSize'],
+                                          n_children_spawned = state['childrenSpawned'])
+    bitGenerator = getattr(np.random, state['bitGenerator']['bit_generator'])(seedSequence)
+    bitGenerator.state = state['bitGenerator']
+    return np.random.Generator(bitGenerator)
+
+
+def defaultGenerator():
+    '''Return the generator used by units that do not belong to a homeostat'''
+
+    global _defaultGenerator
+    if _defaultGenerator is None:
+        _defaultGenerator = newGenerator()
+    return _defaultGenerator
+
+
+def seedDefaultGenerator(seed):
+    global _defaultGenerator, _defaultNoiseSupply
+    _defaultGenerator = newGenerator(seed)
+    _defaultNoiseSupply = None
+
+
+def defaultNoiseSupply():
+    '''Return the noise supply used by units that do not belong to a homeostat'''
+
+    global _defaultNoiseSupply
+    if _defaultNoiseSupply is None:
+        _defaultNoiseSupply = HomeoNoiseSupply(defaultGenerator())
+    return _defaultNoiseSupply
+
+
+class HomeoNoiseSupply(object):
+    '''
+    HomeoNoiseSupply hands out standard normals and uniforms in [0, 1) drawn from numpy
+    Generators in blocks of blockSize values, so that the per-draw cost of the generators
+    is paid once per block. It offers the subset of the Generator interface the units
+    and uniselectors use (normal, standard_normal, uniform, random), so it can be passed
+    wherever they expect a generator.
+
+    The normals are drawn from rng and the uniforms from uniformRng, a stream spawned
+    from rng, so that each kind of value is always its generator's stream in order,
+    however the two blocks happen to be refilled. The compiled kernels consume the same
+    blocks (see Core.HomeoJIT._jit_reserve and _jit_next), so a run draws the same
+    values whichever path it takes.
+
+    Instance Variables:
+        rng         <aGenerator>    the generator the normals are drawn from
+        uniformRng  <aGenerator>    the generator the uniforms are drawn from
+        normals     <anArray>       current block of standard normals
+        uniforms    <anArray>       current block of uniforms in [0, 1)
+        cursor      <anArray>       int64 positions of the next normal and of the next uniform.
+                                    A position equal to blockSize means the block is used up
+    '''
+
+    DefaultBlockSize = 4096
+
+    def __init__(self, rng, blockSize = DefaultBlockSize):
+        if blockSize < 1:
+            raise HomeoRandomError("The block size of a noise supply must be positive")
+        self.rng = rng
+        self.uniformRng = rng.spawn(1)[0]
+        self.normals = np.empty(blockSize)
+        self.uniforms = np.empty(blockSize)
+        self.cursor = np.array([blockSize, blockSize], dtype = np.int64)      # blocks are filled on first use
+
+    def blockSize(self):
+        return self.normals.shape[0]
+
+    def ensureBlockSize(self, size):
+        '''Grow the blocks to at least size values, keeping the values not used yet'''
+
+        if size <= self.blockSize():
+            return
+        for which, name in ((0, 'normals'), (1, 'uniforms')):
+            unused = getattr(self, name)[self.cursor[which]:]
+            block = np.empty(size)
+            block[size - len(unused):] = unused
+            self.cursor[which] = size - len(unused)
+            setattr(self, name, block)
+
+    def shareBlocks(self, normals, uniforms, cursor):
+        '''Copy blocks and cursor into normals, uniforms (arrays of blockSize values) and
+           cursor (two int64 positions) and keep them there from now on. Used to stack the
+           blocks of several supplies into the rows of (K, blockSize) arrays that one compiled
+           call can consume (see Core.HomeostatEnsemble.advance)'''
+
+        normals[:] = self.normals
+        uniforms[:] = self.uniforms
+        cursor[:] = self.cursor
+        self.normals = normals
+        self.uniforms = uniforms
+        self.cursor = cursor
+
+    def reserve(self, normals, uniforms = 0):
+        '''Make sure the next normals standard normals and uniforms uniforms are in the blocks,
+           as Core.HomeoJIT._jit_reserve does, so that compiled code can take them with
+           _jit_next without being passed the generators (which costs more than the draws)'''
+
+        self.ensureBlockSize(max(normals, uniforms))
+        if self.normals.shape[0] - self.cursor[0] < normals:
+            self._refill(self.normals, 0, self.rng.standard_normal)
+        if self.uniforms.shape[0] - self.cursor[1] < uniforms:
+            self._refill(self.uniforms, 1, self.uniformRng.random)
+
+    def _refill(self, block, which, draw):
+        "Move the unused values to the front of the block and draw the rest"
+        left = block.shape[0] - int(self.cursor[which])
+        block[:left] = block[block.shape[0] - left:]
+        draw(out = block[left:])
+        self.cursor[which] = 0
+
+    def fillNormals(self):
+        self.rng.standard_normal(out = self.normals)
+        self.cursor[0] = 0
+
+    def fillUniforms(self):
+        self.uniformRng.random(out = self.uniforms)
+        self.cursor[1] = 0
+
+    def _take(self, block, which, fill, size):
+        out = np.empty(size)
+        taken = 0
+        while taken < size:
+            if self.cursor[which] >= block.shape[0]:
+                fill()
+            i = int(self.cursor[which])
+            k = min(size - taken, block.shape[0] - i)
+            out[taken:taken + k] = block[i:i + k]
+            self.cursor[which] = i + k
+            taken += k
+        return out
+
+    def standard_normal(self, size = None):
+        '''Return the next standard normal, or an array of the next size ones'''
+        if size is not None:
+            return self._take(self.normals, 0, self.fillNormals, size)
+        i = self.cursor[0]
+        if i >= self.normals.shape[0]:
+            self.fillNormals()
+            i = 0
+        self.cursor[0] = i + 1
+        return float(self.normals[i])
+
+    def random(self, size = None):
+        '''Return the next uniform in [0, 1), or an array of the next size ones'''
+        if size is not None:
+            return self._take(self.uniforms, 1, self.fillUniforms, size)
+        i = self.cursor[1]
+        if i >= self.uniforms.shape[0]:
+            self.fillUniforms()
+            i = 0
+        self.cursor[1] = i + 1
+        return float(self.uniforms[i])
+
+    def getState(self):
+        '''Return a dictionary with the state of both generators and the values of
+           the blocks not used yet'''
+
+        return {'rng': generatorState(self.rng),
+                'uniformRng': generatorState(self.uniformRng),
+                'blockSize': self.blockSize(),
+                'normals': self.normals[self.cursor[0]:].copy(),
+                'uniforms': self.uniforms[self.cursor[1]:].copy()}
+
+    @classmethod
+    def fromState(cls, state, rng = None):
+        '''Return a new supply in the state returned by getState, drawing from rng
+           (by default a new generator in the state recorded for it)'''
+
+        supply = cls.__new__(cls)
+        supply.rng = rng if rng is not None else generatorFromState(state['rng'])
+        supply.uniformRng = generatorFromState(state['uniformRng'])
+        size = state['blockSize']
+        supply.normals = np.empty(size)
+        supply.uniforms = np.empty(size)
+        supply.cursor = np.array([size, size], dtype = np.int64)
+        for which, name in ((0, 'normals'), (1, 'uniforms')):
+            unused = state[name]
+            getattr(supply, name)[size - len(unused):] = unused
+            supply.cursor[which] = size - len(unused)
+        return supply
+
+    def normal(self, loc = 0.0, scale = 1.0, size = None):
+        return loc + scale * self.standard_normal(size)
+
+    def uniform(self, low = 0.0, high = 1.0, size = None):
+        return low + (high - low) * self.random(size)
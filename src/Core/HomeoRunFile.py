@@ -0,0 +1,241 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+
+Binary run format for long homeostat runs.
+
+A run file consists of a header followed by a block of raw floats, one row per tick:
+
+    8 bytes       magic string b'HOMEORUN'
+    4 bytes       format version (little-endian uint32)
+    4 bytes       length of the metadata (little-endian uint32)
+    metadata      a JSON dictionary with the dtype of the data, the names of the units,
+                  the (unit, incoming unit) keys of the connections and the column names
+    padding       spaces up to a multiple of 64 bytes
+    data          rows of columns: time, then criticalDeviation, output and
+                  uniselectorActivated for every unit, then the signed weight
+                  (weight * switch) of every connection
+
+The number of rows is not stored: it follows from the size of the file, so that a file
+is readable while it is being written and after an interrupted run.
+HomeoRunFileWriter writes the file incrementally during Homeostat.runFor
+(see Homeostat.recordRunOn), HomeoRunFile reads it with np.memmap, so that
+ranges of ticks or single units can be sliced without loading the whole run in memory.
+'''
+
+import numpy as np
+import json, os, datetime
+
+
+class HomeoRunFileError(Exception):
+    pass
+
+
+Magic = b'HOMEORUN'
+Version = 1
+HeaderAlignment = 64
+UnitFields = ('criticalDeviation', 'output', 'uniselectorActivated')
+
+
+def runFileColumns(unitNames, connKeys):
+    '''Return the names of the columns of a run file with the given units and connections'''
+
+    columns = ['time']
+    for name in unitNames:
+        columns.extend('%s.%s' % (name, field) for field in UnitFields)
+    columns.extend('%s<-%s.weight' % key for key in connKeys)
+    return columns
+
+def writeRunFileHeader(fileOut, unitNames, connKeys, dtype):
+    '''Write the header of a run file on the binary file fileOut'''
+
+    metadata = {'dtype': np.dtype(dtype).str,
+                'units': list(unitNames),
+                'connections': [list(key) for key in connKeys],
+                'columns': runFileColumns(unitNames, connKeys),
+                'created': str(datetime.datetime.now())}
+    encoded = json.dumps(metadata).encode('utf-8')
+    headerSize = len(Magic) + 8 + len(encoded)
+    padding = (-headerSize) % HeaderAlignment
+    fileOut.write(Magic)
+    fileOut.write(np.array([Version, len(encoded) + padding], dtype = '<u4').tobytes())
+    fileOut.write(encoded + b' ' * padding)
+
+def writeRunFile(filename, unitNames, connKeys, data, dtype = np.float64):
+    '''Write a complete run file from data, a (ticks, columns) array
+       with the layout given by runFileColumns. Will erase filename if it exists already'''
+
+    if data.shape[1] != len(runFileColumns(unitNames, connKeys)):
+        raise HomeoRunFileError("The data do not match the units and connections of the run file")
+    fileOut = open(filename, 'wb')
+    writeRunFileHeader(fileOut, unitNames, connKeys, dtype)
+    fileOut.write(np.ascontiguousarray(data, dtype = dtype).tobytes())
+    fileOut.close()
+
+
+class HomeoRunFileWriter(object):
+    '''
+    HomeoRunFileWriter records the state of a homeostat in a run file, one row per tick.
+    Rows are accumulated in a buffer and written to disk when the buffer is full
+    and when flush() is called. The units and connections recorded are those of the
+    homeostat when the writer is created.
+
+    Instance Variables:
+        filename       <aString>      the path of the run file
+        dtype          <aNumpyDtype>  float32 or float64
+        units          <aList>        the recorded units
+        connections    <aList>        the recorded connections, in the order of connKeys
+        connKeys       <aList>        (unit name, incoming unit name) for each connection
+    '''
+
+    def __init__(self, filename, aHomeostat, dtype = np.float64, bufferTicks = 4096):
+        self.filename = filename
+        self.dtype = np.dtype(dtype)
+        self.units = list(aHomeostat.homeoUnits)
+        self.connections = []
+        self.connKeys = []
+        for unit in self.units:
+            for conn in unit.inputConnections:
+                self.connections.append(conn)
+                self.connKeys.append((unit.name, conn.incomingUnit.name))
+        self._buffer = np.empty((bufferTicks, len(runFileColumns([u.name for u in self.units], self.connKeys))),
+                                dtype = self.dtype)
+        self._filled = 0
+        self._file = open(filename, 'wb')
+        writeRunFileHeader(self._file, [u.name for u in self.units], self.connKeys, self.dtype)
+        self._file.flush()
+
+    def recordTick(self, timeIndex):
+        '''Add a row with the current state of the homeostat at time timeIndex'''
+
+        values = [timeIndex]
+        for unit in self.units:
+            values.append(unit.criticalDeviation)
+            values.append(unit.currentOutput)
+            values.append(unit.uniselectorActivated)
+        for conn in self.connections:
+            values.append(conn.weight * conn.switch)
+        self._buffer[self._filled] = values
+        self._filled += 1
+        if self._filled == self._buffer.shape[0]:
+            self.flush()
+
+    def flush(self):
+        '''Write the buffered rows to disk'''
+
+        if self._file is None:
+            self._file = open(self.filename, 'ab')
+        if self._filled:
+            self._file.write(self._buffer[:self._filled].tobytes())
+            self._filled = 0
+        self._file.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+        self._file = None
+
+    def __getstate__(self):
+        "Pickled homeostats keep their writer, which reopens the file in append mode when needed"
+
+        if self._file is not None:
+            self.flush()
+        state = dict(self.__dict__)
+        state['_file'] = None
+        return state
+
+
+class HomeoRunFile(object):
+    '''
+    HomeoRunFile gives access to the data of a run file through a read-only np.memmap.
+    Only the parts of the file actually sliced are read from disk.
+
+    Instance Variables:
+        filename       <aString>      the path of the run file
+        unitNames      <aList>        the names of the recorded units
+        connKeys       <aList>        (unit name, incoming unit name) for each recorded connection
+        columns        <aList>        the names of the data columns
+        data           <aMemmap>      the (ticks, columns) data block
+    '''
+
+    def __init__(self, filename):
+        self.filename = filename
+        fileIn = open(filename, 'rb')
+        magic = fileIn.read(len(Magic))
+        if magic != Magic:
+            fileIn.close()
+            raise HomeoRunFileError("%s is not a homeostat run file" % filename)
+        version, metadataSize = np.frombuffer(fileIn.read(8), dtype = '<u4')
+        if version > Version:
+            fileIn.close()
+            raise HomeoRunFileError("Unsupported run file version %d" % version)
+        metadata = json.loads(fileIn.read(int(metadataSize)).decode('utf-8'))
+        fileIn.close()
+
+        self.metadata = metadata
+        self.unitNames = metadata['units']
+        self.connKeys = [tuple(key) for key in metadata['connections']]
+        self.columns = metadata['columns']
+        self._columnIndex = dict((name, i) for i, name in enumerate(self.columns))
+        dtype = np.dtype(metadata['dtype'])
+        offset = len(Magic) + 8 + int(metadataSize)
+        rowSize = dtype.itemsize * len(self.columns)
+        "A row still being written by an interrupted run is ignored"
+        rows = (os.path.getsize(filename) - offset) // rowSize
+        if rows > 0:
+            self.data = np.memmap(filename, dtype = dtype, mode = 'r', offset = offset,
+                                  shape = (rows, len(self.columns)))
+        else:
+            self.data = np.empty((0, len(self.columns)), dtype = dtype)
+
+    def numberOfTicks(self):
+        return self.data.shape[0]
+
+    def times(self):
+        return self.data[:, 0]
+
+    def columnIndex(self, name):
+        try:
+            return self._columnIndex[name]
+        except KeyError:
+            raise HomeoRunFileError("No column %s in run file %s" % (name, self.filename))
+
+    def rowsBetween(self, startTick = None, stopTick = None):
+        '''Return the slice of rows for the ticks t with startTick <= t < stopTick.
+           Assumes the ticks were recorded in increasing order, as runFor does'''
+
+        times = self.times()
+        start = 0 if startTick is None else int(np.searchsorted(times, startTick, side = 'left'))
+        stop = len(times) if stopTick is None else int(np.searchsorted(times, stopTick, side = 'left'))
+        return slice(start, stop)
+
+    def unitData(self, field, unitNames = None, startTick = None, stopTick = None):
+        '''Return a (ticks, units) array of field (one of UnitFields) for the given units
+           (all by default) in the given range of ticks'''
+
+        if field not in UnitFields:
+            raise HomeoRunFileError("Unknown unit field %s" % field)
+        if unitNames is None:
+            unitNames = self.unitNames
+        cols = [self.columnIndex('%s.%s' % (name, field)) for name in unitNames]
+        return self.data[self.rowsBetween(startTick, stopTick)][:, cols]
+
+    def criticalDeviations(self, unitNames = None, startTick = None, stopTick = None):
+        return self.unitData('criticalDeviation', unitNames, startTick, stopTick)
+
+    def connectionWeights(self, startTick = None, stopTick = None):
+        '''Return a (ticks, connections) array of signed weights, with columns in the order of connKeys'''
+
+        first = 1 + len(UnitFields) * len(self.unitNames)
+        return self.data[self.rowsBetween(startTick, stopTick), first:]
+
+    def criticalDevAsNPArrayForAllUnits(self, startTick = None, stopTick = None):
+        '''Return the same (ticks, 2 * units) layout as HomeoDataCollector.criticalDevAsNPArrayForAllUnits:
+           critical deviation and uniselector activation flag for each unit'''
+
+        cols = []
+        for name in self.unitNames:
+            cols.append(self.columnIndex('%s.criticalDeviation' % name))
+            cols.append(self.columnIndex('%s.uniselectorActivated' % name))
+        return self.data[self.rowsBetween(startTick, stopTick)][:, cols]
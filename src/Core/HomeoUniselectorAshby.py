@@ -26,6 +26,8 @@ class HomeoUniselectorAshby(HomeoUniselector):
     steps        <anInteger>       The number of possible steps in the Uniselector (default is 12, as per Ashby's implementation)
     index        <anInteger>       The index keeping track of which row of weight we should output next
     matrix        <aMatrix>       A matrix of size (unitsControlled x steps) holding all the possible weights
+    screensStability <aBoolean>   When True, positions whose weights the linear stability oracle predicts
+                                  unstable are skipped (see skipUnstablePositionsFor)
     '''
 
 
@@ -51,6 +53,7 @@ class HomeoUniselectorAshby(HomeoUniselector):
         self._ashbyKind = 'RandomizedValues'
         self.produceSequence()
         self._beeps = False
+        self._screensStability = False
         emitter(self).uniselSoundChanged.emit(self._beeps)
 
         
@@ -89,6 +92,15 @@ class HomeoUniselectorAshby(HomeoUniselector):
     
     ashbyKind = property(fget = lambda self: self.getAshbyKind(),
                           fset = lambda self, value: self.setAshbyKind(value))
+
+    def getScreensStability(self):
+        return getattr(self, '_screensStability', False)
+
+    def setScreensStability(self, aBoolean):
+        self._screensStability = bool(aBoolean)
+
+    screensStability = property(fget = lambda self: self.getScreensStability(),
+                          fset = lambda self, value: self.setScreensStability(value))
     
     def getUnitsControlled(self):
         return self._unitsControlled
@@ -196,8 +208,9 @@ class HomeoUniselectorAshby(HomeoUniselector):
         
         self._matrix = getattr(self,'produce'+ self.ashbyKind)()
         
-    def produceNewValue(self):
-        '''Return the weight for the next connection and advances the unitIndex'''
+    def produceNewValue(self, rng = None):
+        '''Return the weight for the next connection and advances the unitIndex.
+           The values come from the stepping matrix, so rng is not used'''
         if not self._unitIndex  > self._unitsControlled:
             if self._beeps:
                 # FIXME will need to put a beep here
@@ -207,6 +220,25 @@ class HomeoUniselectorAshby(HomeoUniselector):
         else:
             raise Exception('Too many units for the uniselector to control')
 
+    def skipUnstablePositionsFor(self, aHomeoUnit):
+        '''Advance the uniselector past the positions whose weights, given to the
+           uniselector-controlled connections of aHomeoUnit, leave the units feeding
+           aHomeoUnit in a configuration the linear stability oracle predicts unstable
+           (see Core.HomeoLinearStability). Each position is tried once.
+           Return True if the uniselector stops on a position predicted stable'''
+
+        from Core.HomeoLinearStability import HomeoLinearStability
+
+        oracle = HomeoLinearStability.forUnit(aHomeoUnit)
+        conns = [conn for conn in aHomeoUnit.inputConnections
+                 if conn.state == 'uniselector' and conn.active]
+        for position in range(self._matrix.shape[0]):
+            row = self._matrix[self._index - 1, :len(conns)]
+            if oracle.isStable(oracle.weightsWith(conns, row)):
+                return True
+            self.advance()
+        return False
+
     def advance(self):
         '''Advance the uniselector to the next position'''
         if self._index == self._matrix.shape[0]:
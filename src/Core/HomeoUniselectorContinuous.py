@@ -17,6 +17,10 @@ unit is near equilibrium) and a large noise (when the essential variable
 is critical).  The timescale separation tau_a >> 1 ensures that weights
 drift slowly relative to the fast needle dynamics.
 
+With exact = True the Euler-Maruyama step is replaced by the exact OU
+transition over dt (see stepCoefficients()), which stays stable and
+unbiased for values of dt comparable to tau_a / theta.
+
 This preserves Ashby's core hypothesis: adaptation operates on the
 parameters (weights), not within the dynamics.  The fast ODE is untouched.
 
@@ -44,6 +48,7 @@ class HomeoUniselectorContinuous(HomeoUniselector):
         dt           -- integration timestep (matches the fast dynamics)
         stress_exponent -- nonlinear shaping of stress level (1 = linear,
                           2 = quadratic, etc.)
+        exact        -- use the exact OU transition instead of Euler-Maruyama
     '''
 
     DefaultParameters = {
@@ -53,6 +58,7 @@ class HomeoUniselectorContinuous(HomeoUniselector):
         'sigma_crit': 0.1,
         'dt': 1.0,
         'stress_exponent': 2.0,
+        'exact': False,
     }
 
     def __init__(self):
@@ -65,6 +71,7 @@ class HomeoUniselectorContinuous(HomeoUniselector):
         self._sigma_crit = self.DefaultParameters['sigma_crit']
         self._dt = self.DefaultParameters['dt']
         self._stress_exponent = self.DefaultParameters['stress_exponent']
+        self._exact = self.DefaultParameters['exact']
 
     # --- Properties ---
 
@@ -118,6 +125,25 @@ class HomeoUniselectorContinuous(HomeoUniselector):
     stress_exponent = property(fget=lambda self: self.getStressExponent(),
                                fset=lambda self, value: self.setStressExponent(value))
 
+    def getDt(self):
+        return self._dt
+
+    def setDt(self, value):
+        if value > 0:
+            self._dt = float(value)
+
+    dt = property(fget=lambda self: self.getDt(),
+                  fset=lambda self, value: self.setDt(value))
+
+    def getExact(self):
+        return getattr(self, '_exact', False)
+
+    def setExact(self, value):
+        self._exact = bool(value)
+
+    exact = property(fget=lambda self: self.getExact(),
+                     fset=lambda self, value: self.setExact(value))
+
     # --- Core methods ---
 
     def sigma(self, stress_level):
@@ -132,68 +158,94 @@ class HomeoUniselectorContinuous(HomeoUniselector):
         shaped = s ** self._stress_exponent
         return self._sigma_base + (self._sigma_crit - self._sigma_base) * shaped
 
-    def evolve_weight(self, current_signed_weight, stress_level):
-        '''Integrate one Euler-Maruyama step for a single weight.
+    def stepCoefficients(self, stress_level):
+        '''Return (drift_coeff, diffusion_scale) of one step at the given
+        stress level, so that a step is
+            w_new = w + drift_coeff * w + diffusion_scale * N(0,1).
+
+        Euler-Maruyama gives drift_coeff = -(theta / tau_a) * dt and
+        diffusion_scale = sigma * sqrt(dt).  The exact OU transition over dt
+        gives drift_coeff = exp(-rate * dt) - 1 and
+        diffusion_scale = sigma * sqrt((1 - exp(-2 * rate * dt)) / (2 * rate)),
+        with rate = theta / tau_a: the two agree for rate * dt << 1.'''
+
+        sig = self.sigma(stress_level)
+        dt = self._dt
+        rate = self._theta / self._tau_a
+        if self.exact and rate > 0:
+            return (numpy.expm1(-rate * dt),
+                    sig * numpy.sqrt(-numpy.expm1(-2.0 * rate * dt) / (2.0 * rate)))
+        return -rate * dt, sig * numpy.sqrt(dt)
+
+    def ouParameters(self):
+        '''Return the parameters of the process in the order the compiled
+        kernels take them: tau_a, theta, sigma_base, sigma_crit, dt,
+        stress_exponent, exact (see Core.HomeoJIT._jit_ou_coefficients).'''
+
+        return (self._tau_a, self._theta, self._sigma_base, self._sigma_crit,
+                self._dt, self._stress_exponent, 1.0 if self.exact else 0.0)
+
+    def evolve_weight(self, current_signed_weight, stress_level, rng = None):
+        '''Integrate one step (Euler-Maruyama or exact) for a single weight.
 
         Parameters:
             current_signed_weight -- the current effective weight in [-1, 1]
             stress_level          -- float in [0, 1]
+            rng                   -- numpy Generator or HomeoNoiseSupply to draw from (default: numpy.random)
 
         Returns the new signed weight, clipped to [-1, 1].
         '''
 
         w = current_signed_weight
-        sig = self.sigma(stress_level)
-        dt = self._dt
+        drift_coeff, diffusion_scale = self.stepCoefficients(stress_level)
 
         # Ornstein-Uhlenbeck step:
         #   dw = -(theta / tau_a) * w * dt  +  sigma * sqrt(dt) * N(0,1)
-        drift = -(self._theta / self._tau_a) * w * dt
-        diffusion = sig * numpy.sqrt(dt) * numpy.random.randn()
+        drift = drift_coeff * w
+        diffusion = diffusion_scale * (numpy.random.randn() if rng is None else rng.standard_normal())
         w_new = w + drift + diffusion
 
         return numpy.clip(w_new, -1.0, 1.0)
 
-    def evolve_weights(self, connections, stress_level):
+    def evolve_weights(self, connections, stress_level, rng = None):
         '''Evolve all uniselector-controlled connection weights by one timestep.
 
         Parameters:
             connections  -- list of HomeoConnection objects (the unit's inputConnections)
             stress_level -- float in [0, 1]
+            rng          -- numpy Generator or HomeoNoiseSupply to draw from (default: numpy.random)
         '''
 
         for conn in connections:
             if conn.state == 'uniselector' and conn.isActive():
                 w = conn.weight * conn.switch   # current signed weight in [-1, 1]
-                w_new = self.evolve_weight(w, stress_level)
+                w_new = self.evolve_weight(w, stress_level, rng)
                 conn.newWeight(w_new)
 
-    def evolve_weights_jit(self, jit_weights, jit_switches, stress_level):
+    def evolve_weights_jit(self, jit_weights, jit_switches, stress_level, rng = None):
         '''Evolve weights in-place on the JIT arrays (headless/GA mode).
 
         Parameters:
             jit_weights  -- numpy float64 array of absolute weight values
             jit_switches -- numpy float64 array of signs (+1/-1)
             stress_level -- float in [0, 1]
+            rng          -- numpy Generator or HomeoNoiseSupply to draw from (default: numpy.random)
 
         Modifies jit_weights and jit_switches in place.
+        Headless homeostats step all their continuous uniselectors at once,
+        see HomeoUniselectorContinuousNetwork.
         '''
 
         n = jit_weights.shape[0]
-        sig = self.sigma(stress_level)
-        dt = self._dt
-        drift_coeff = -(self._theta / self._tau_a) * dt
-        diffusion_scale = sig * numpy.sqrt(dt)
+        drift_coeff, diffusion_scale = self.stepCoefficients(stress_level)
 
         # Vectorised: one randn per connection
-        noise = numpy.random.randn(n)
+        noise = numpy.random.randn(n) if rng is None else rng.standard_normal(n)
 
-        for i in range(n):
-            w = jit_weights[i] * jit_switches[i]  # signed weight
-            w_new = w + drift_coeff * w + diffusion_scale * noise[i]
-            w_new = numpy.clip(w_new, -1.0, 1.0)
-            jit_weights[i] = abs(w_new)
-            jit_switches[i] = 1.0 if w_new >= 0 else -1.0
+        w = jit_weights * jit_switches  # signed weights
+        w_new = numpy.clip(w + drift_coeff * w + diffusion_scale * noise, -1.0, 1.0)
+        numpy.abs(w_new, out=jit_weights)
+        jit_switches[:] = numpy.where(w_new >= 0, 1.0, -1.0)
 
     # --- Superclass interface (unused in continuous mode, but kept for compatibility) ---
 
@@ -201,7 +253,7 @@ class HomeoUniselectorContinuous(HomeoUniselector):
         '''No-op: the continuous uniselector has no stepping index.'''
         pass
 
-    def produceNewValue(self):
+    def produceNewValue(self, rng = None):
         '''Not used in continuous mode.  Returns a random value for
         compatibility with code that expects the discrete interface.'''
-        return numpy.random.uniform(self._lowerBound, self._upperBound)
+        return (numpy.random if rng is None else rng).uniform(self._lowerBound, self._upperBound)
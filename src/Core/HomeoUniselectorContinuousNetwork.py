@@ -0,0 +1,120 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+
+Network-level stepping of continuous (OU) uniselectors for headless runs.
+
+In a headless run every unit with a HomeoUniselectorContinuous used to call
+evolve_weights_jit() on each tick, computing sigma() in Python and looping over
+its connections. A HomeoUniselectorContinuousNetwork packs the uniselector-
+controlled connections of all those units into one signed weight array (CSR
+layout, as HomeoArrayEngine) and steps them all, after the units have been
+updated, with a single call of Core.HomeoJIT._jit_ou_network. Each unit only
+records its stress level when it updates.
+
+HomeostatSession builds one for headless homeostats that do not run on the
+array engine. The steps it takes are those of HomeoArrayEngine: the same
+draws, in the same order, from the homeostat's HomeoNoiseSupply.
+'''
+
+from Core.HomeoUniselectorContinuous import HomeoUniselectorContinuous
+from Core.HomeoJIT import _jit_ou_network
+import numpy as np
+
+
+class HomeoUniselectorContinuousNetwork(object):
+    '''
+    HomeoUniselectorContinuousNetwork steps the continuous uniselectors of a list of units.
+    attach() makes the units record their stress level in it instead of evolving their
+    own weights, step() evolves the weights of all the units that recorded one since
+    the previous step and writes them back into the connection objects, and detach()
+    gives the units back their own stepping.
+
+    Instance Variables:
+        units          <aList>         the units with an active continuous uniselector
+        connections    <aList>         their active input connections, in CSR order
+        weights        <anArray>       absolute weights of the connections
+        switches       <anArray>       signs of the connections
+        stress         <anArray>       stress level of each unit at its last update
+        evolving       <anArray>       whether each unit has updated since the last step
+    '''
+
+    @classmethod
+    def continuousUnitsIn(cls, units):
+        '''Return the units whose active uniselector is a HomeoUniselectorContinuous'''
+
+        return [u for u in units
+                if u.uniselectorActive and isinstance(u.uniselector, HomeoUniselectorContinuous)]
+
+    @classmethod
+    def forUnits(cls, units):
+        '''Return a network on the continuous units among units, or None if there are none'''
+
+        continuous = cls.continuousUnitsIn(units)
+        if not continuous:
+            return None
+        return cls(continuous)
+
+    def __init__(self, units):
+        self.units = list(units)
+        self.pack()
+
+    def pack(self):
+        '''Copy weights, switches and uniselector parameters of the units into arrays'''
+
+        n = len(self.units)
+        self.connections = []
+        ptr = [0]
+        for unit in self.units:
+            self.connections.extend(c for c in unit.inputConnections if c.isActive())
+            ptr.append(len(self.connections))
+        conns = self.connections
+        self.connPtr = np.array(ptr, dtype=np.int64)
+        self.connUnisel = np.array([c._state == 'uniselector' for c in conns], dtype=np.bool_)
+        self.weights = np.array([c._weight for c in conns], dtype=np.float64)
+        self.switches = np.array([c._switch for c in conns], dtype=np.float64)
+        self.ouParams = np.array([u.uniselector.ouParameters() for u in self.units],
+                                 dtype=np.float64).reshape(n, 7)
+        self.stress = np.zeros(n, dtype=np.float64)
+        self.evolving = np.zeros(n, dtype=np.bool_)
+        self.draws = int(self.connUnisel.sum())
+
+    def attach(self):
+        '''Make the units record their stress level in the receiver when they update'''
+
+        for i, unit in enumerate(self.units):
+            unit._ouNetwork = self
+            unit._ouIndex = i
+
+    def detach(self):
+        for unit in self.units:
+            if getattr(unit, '_ouNetwork', None) is self:
+                unit._ouNetwork = None
+
+    def noteStress(self, unitIndex, stressLevel):
+        '''Record the stress level of a unit that has just updated'''
+
+        self.stress[unitIndex] = stressLevel
+        self.evolving[unitIndex] = True
+
+    def step(self, noiseSupply):
+        '''Evolve the weights of the units that updated since the last step, drawing
+           from noiseSupply, and write them back into the connection objects'''
+
+        if not self.evolving.any():
+            return
+        noiseSupply.reserve(self.draws)
+        _jit_ou_network(self.weights, self.switches, self.connPtr, self.connUnisel,
+                        self.evolving, self.stress, self.ouParams,
+                        noiseSupply.normals, noiseSupply.cursor)
+        conns = self.connections
+        weights = self.weights.tolist()
+        switches = self.switches.tolist()
+        for i in np.flatnonzero(self.evolving):
+            for c in range(self.connPtr[i], self.connPtr[i + 1]):
+                conn = conns[c]
+                conn._weight = weights[c]
+                conn._switch = switches[c]
+            self.units[i]._jit_dirty = True
+        self.evolving[:] = False
@@ -117,6 +117,27 @@ class HomeoUniselectorContinuousTest(unittest.TestCase):
         self.assertTrue(np.all(weights <= 1.0))
         self.assertTrue(np.all(np.isin(switches, [-1.0, 1.0])))
 
+    def testExactStepMatchesEulerForSmallDt(self):
+        '''For rate * dt << 1 the exact transition reduces to Euler-Maruyama'''
+        self.unis.exact = False
+        euler = self.unis.stepCoefficients(0.5)
+        self.unis.exact = True
+        exact = self.unis.stepCoefficients(0.5)
+        self.assertAlmostEqual(euler[0], exact[0], places=8)
+        self.assertAlmostEqual(euler[1], exact[1], places=6)
+
+    def testExactStepStableForLargeDt(self):
+        '''With dt >> tau_a / theta the exact step decays to the stationary
+        distribution instead of overshooting'''
+        self.unis.tau_a = 10.0
+        self.unis.theta = 1.0
+        self.unis.dt = 200.0
+        self.unis.exact = True
+        drift_coeff, diffusion_scale = self.unis.stepCoefficients(1.0)
+        self.assertTrue(-1.0 <= drift_coeff <= 0.0)
+        stationary = self.unis.sigma(1.0) * np.sqrt(self.unis.tau_a / (2 * self.unis.theta))
+        self.assertAlmostEqual(diffusion_scale, stationary, places=6)
+
     def testAdvanceIsNoop(self):
         '''advance() should not raise'''
         self.unis.advance()  # should be a no-op
@@ -46,12 +46,13 @@ class HomeoUniselectorUniformRandom(HomeoUniselector):
              self._lowerBound = -aNumber
              self._upperBound = aNumber
              
-    def produceNewValue(self):
-        "produce a new random value uniformly distributed in the interval [lowerBoud, upperBound]"
+    def produceNewValue(self, rng = None):
+        '''produce a new random value uniformly distributed in the interval [lowerBoud, upperBound],
+           drawn from rng (a numpy Generator or a HomeoNoiseSupply) if given'''
 #        if self._beeps:
 #            pass
             #ring bell
-        return numpy.random.uniform(self._lowerBound, self._upperBound)
+        return (numpy.random if rng is None else rng).uniform(self._lowerBound, self._upperBound)
 
 
     def __init__(self):
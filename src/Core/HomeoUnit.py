@@ -4,8 +4,9 @@ from Core.HomeoUniselector import *
 from Core.HomeoUniselectorUniformRandom import  *
 from Core.HomeoUniselectorContinuous import HomeoUniselectorContinuous
 from Core.HomeoConnection import *
-from Core.HomeoJIT import (_jit_unit_noise, _jit_compute_torque,
+from Core.HomeoJIT import (_jit_noise, _jit_compute_torque,
                            _jit_needle_position_base, _jit_compute_output)
+from Core.HomeoRandom import defaultNoiseSupply
 from Helpers.General_Helper_Functions import withAllSubclasses
 import numpy as np
 import sys, pickle
@@ -54,6 +55,8 @@ class HomeoUnit(object):
                                                     The actual noise on each iteration is a *normally distributed value* centered around 0,  with 
                                                     standard deviation = to 1/3 of the noise value, and proportional to the absolute magnitude of noise's value.
                                                     In other words, noise is modeled as a kind of "static" distortion of fixed max magnitude
+    noiseModel                 <String>             The HomeoNoise model of the internal noise (see HomeoNoise.modelNames()), applied to the
+                                                    critical deviation. The default, 'DistortingNormalLinear', is the model described above
     potentiometer             <Float>               As per Ashby's implementation, it represents the weight of the unit's connection to itself. 
                                                     In our implementation it is always identical to the weight of a unit's 
                                                     first connection,---Check Design for a Brain, chp.8  for details
@@ -101,6 +104,7 @@ class HomeoUnit(object):
                               maxDeviation=10,
                               outputRange = unitRange,
                               noise = 0,                        # Initially set noise on self to 0, will change to a random value later 
+                              noiseModel = 'DistortingNormalLinear',   # HomeoNoise model of the unit's internal noise
                               potentiometer= 1,
                               time = 0,
                               switch = -1,                      # This value is used to control the polarity of a unit's self-connection
@@ -209,6 +213,7 @@ class HomeoUnit(object):
         self._maxDeviation = HomeoUnit.DefaultParameters['maxDeviation']     #set the critical deviation at time 0 to 0."
         self._outputRange = HomeoUnit.DefaultParameters['outputRange']
         self._noise = HomeoUnit.DefaultParameters['noise']
+        self._noiseCode = HomeoNoise.modelCode(HomeoUnit.DefaultParameters['noiseModel'])
         self._potentiometer = HomeoUnit.DefaultParameters['potentiometer']
         self._time = HomeoUnit.DefaultParameters['time']
         self._uniselectorTime = HomeoUnit.DefaultParameters['uniselectorTime']
@@ -304,6 +309,7 @@ class HomeoUnit(object):
         self._jit_switches = np.array([c._switch for c in active], dtype=np.float64)
         self._jit_weights = np.array([c._weight for c in active], dtype=np.float64)
         self._jit_noises = np.array([c._noise for c in active], dtype=np.float64)
+        self._jit_noise_codes = np.array([c.noiseCode for c in active], dtype=np.int64)
         self._jit_outputs = np.empty(len(active), dtype=np.float64)
         self._jit_dirty = False
 
@@ -488,14 +494,40 @@ class HomeoUnit(object):
         return self._noise
     noise = property(fget = lambda self: self.getNoise(),
                      fset = lambda self, value: self.setNoise(value))  
+
+    def getNoiseCode(self):
+        return getattr(self, '_noiseCode', HomeoNoise.modelCode(HomeoUnit.DefaultParameters['noiseModel']))
+    noiseCode = property(fget = lambda self: self.getNoiseCode())
+
+    def getNoiseModel(self):
+        return HomeoNoise.modelName(self.noiseCode)
+    def setNoiseModel(self, aModel):
+        '''Set the HomeoNoise model of the unit's internal noise, by name or by code.
+           Raise HomeoNoiseError for unknown models'''
+        self._noiseCode = HomeoNoise.modelCode(aModel)
+    noiseModel = property(fget = lambda self: self.getNoiseModel(),
+                          fset = lambda self, value: self.setNoiseModel(value))
         
     def setTime(self, aValue):
         self._time = aValue
     def getTime(self):
         return self._time
     time = property(fget = lambda self: self.getTime(),
-                    fset = lambda self, value: self.setTime(value))  
-    
+                    fset = lambda self, value: self.setTime(value))
+
+    def getNoiseSupply(self):
+        '''The HomeoNoiseSupply the unit's noise and uniselector draws come from.
+           Homeostats share their own supply with their units (see Homeostat.noiseSupply),
+           units on their own use Core.HomeoRandom.defaultNoiseSupply()'''
+        supply = getattr(self, '_noiseSupply', None)
+        if supply is None:
+            return defaultNoiseSupply()
+        return supply
+    def setNoiseSupply(self, aNoiseSupply):
+        self._noiseSupply = aNoiseSupply
+    noiseSupply = property(fget = lambda self: self.getNoiseSupply(),
+                           fset = lambda self, value: self.setNoiseSupply(value))
+
     def setUniselectorTime(self, aValue):
         self._uniselectorTime = aValue
     def getUniselectorTime(self):
@@ -1186,13 +1218,17 @@ class HomeoUnit(object):
             if isinstance(self.uniselector, HomeoUniselectorContinuous):
                 "Continuous mode: evolve weights at every timestep"
                 stress = self.stressLevel()
-                if self._headless:
+                network = getattr(self, '_ouNetwork', None)
+                if self._headless and network is not None:
+                    "stepped with the other units at the end of the tick"
+                    network.noteStress(self._ouIndex, stress)
+                elif self._headless:
                     if self._jit_dirty:
                         self._sync_jit_arrays()
                     self.uniselector.evolve_weights_jit(
-                        self._jit_weights, self._jit_switches, stress)
+                        self._jit_weights, self._jit_switches, stress, rng = self.noiseSupply)
                 else:
-                    self.uniselector.evolve_weights(self.inputConnections, stress)
+                    self.uniselector.evolve_weights(self.inputConnections, stress, rng = self.noiseSupply)
                 self._jit_dirty = True
             else:
                 "Discrete mode: original periodic uniselector logic"
@@ -1270,9 +1306,12 @@ class HomeoUnit(object):
                 self._sync_jit_arrays()
             for i, u in enumerate(self._jit_incoming_units):
                 self._jit_outputs[i] = u._currentOutput
+            supply = self.noiseSupply
+            supply.reserve(len(self._jit_outputs), len(self._jit_outputs))
             self._inputTorque = _jit_compute_torque(
                 self._jit_outputs, self._jit_switches,
-                self._jit_weights, self._jit_noises)
+                self._jit_weights, self._jit_noises, self._jit_noise_codes,
+                supply.normals, supply.uniforms, supply.cursor)
             return
 
         activeConnections = [conn for conn in self.inputConnections if (conn.isActive() and
@@ -1302,7 +1341,8 @@ class HomeoUnit(object):
         # print "and the sum is %f " % runningSum
         # print
         #=======================================================================
-        self.inputTorque = sum([conn.output() for conn in activeConnections])
+        supply = self.noiseSupply
+        self.inputTorque = sum([conn.output(supply) for conn in activeConnections])
         #print "the computed input torque is %f and the delta is %f" % (self.inputTorque, self.inputTorque - runningSum)
         "Testing"
         if self._debugMode:
@@ -1457,13 +1497,15 @@ class HomeoUnit(object):
 
         "We save the values about the units that have changed weights, old weights and new weight for debugging"
         weightChanges = []
+        if getattr(self.uniselector, 'screensStability', False):
+            self.uniselector.skipUnstablePositionsFor(self)
         for conn in self.inputConnections:
 #            if not conn.incomingUnit == self:                  #This is not necessary. Even though the default is 'manual' it is sometimes useful to operate on the self-connection "
             if conn.state ==  'uniselector' and conn.active:
                 change = []
                 change.append(conn.incomingUnit.name)
                 change.append(conn.weight)
-                changedWeight = self.uniselector.produceNewValue()
+                changedWeight = self.uniselector.produceNewValue(rng = self.noiseSupply)
                 change.append(changedWeight)
                 weightChanges.append(change)
                 conn.newWeight(changedWeight)
@@ -1488,13 +1530,16 @@ class HomeoUnit(object):
 
     def updateDeviationWithNoise(self):
         '''Apply the unit's internal noise to the critical deviation and update accordingly.
-           Computation of noise uses the utility HomeoNoise class'''
+           Computation of noise uses the algorithm of the utility HomeoNoise class selected by noiseModel'''
 
         if self._headless:
-            self._criticalDeviation += _jit_unit_noise(self._noise)
+            supply = self.noiseSupply
+            supply.reserve(1, 1)
+            self._criticalDeviation += _jit_noise(self.noiseCode, self._criticalDeviation, self._noise,
+                                                  supply.normals, supply.uniforms, supply.cursor)
             return
 
-        addedNoise = HomeoNoise.unitNoise(self.noise)
+        addedNoise = HomeoNoise.algorithms[self.noiseCode](self._criticalDeviation, self._noise, self.noiseSupply)
         hDebug('unit', ("Noise for unit %s is: %f" % (self.name, addedNoise)))
 #        sys.stderr.write("New noise is %f at time: %u\n" % (addedNoise, self.time))
 #        self.criticalDeviation = np.clip((self.criticalDeviation + addedNoise), self.minDeviation, self.maxDeviation)    # apply the noise to the critical deviation value"
@@ -234,13 +234,17 @@ class HomeoUnitNewtonian(HomeoUnit):
             if isinstance(self.uniselector, HomeoUniselectorContinuous):
                 "Continuous mode: evolve weights at every timestep"
                 stress = self.stressLevel()
-                if self._headless:
+                network = getattr(self, '_ouNetwork', None)
+                if self._headless and network is not None:
+                    "stepped with the other units at the end of the tick"
+                    network.noteStress(self._ouIndex, stress)
+                elif self._headless:
                     if self._jit_dirty:
                         self._sync_jit_arrays()
                     self.uniselector.evolve_weights_jit(
-                        self._jit_weights, self._jit_switches, stress)
+                        self._jit_weights, self._jit_switches, stress, rng = self.noiseSupply)
                 else:
-                    self.uniselector.evolve_weights(self.inputConnections, stress)
+                    self.uniselector.evolve_weights(self.inputConnections, stress, rng = self.noiseSupply)
                 self._jit_dirty = True
             else:
                 "Discrete mode: original periodic uniselector logic"
@@ -4,7 +4,14 @@ Created on Mar 13, 2013
 @author: stefano
 '''
 from Core.HomeoDataCollector import  *
-from Core.HomeoJIT import warmup_jit
+from Core.HomeoColumnarDataCollector import HomeoColumnarDataCollector
+from Core.HomeoArrayEngine import HomeoArrayEngine
+from Core.HomeoLinearStability import HomeoLinearStability
+from Core.HomeoFastForward import HomeoFastForward
+from Core.HomeoCheckpoint import HomeoCheckpoint, HomeoCheckpointError
+from Core.HomeoRunFile import HomeoRunFileWriter
+from Core.HomeostatSession import HomeostatSession
+from Core.HomeoRandom import newGenerator, HomeoNoiseSupply
 from Helpers.General_Helper_Functions import withAllSubclasses
 import time, sys, pickle
 from Helpers.QObjectProxyEmitter import emitter
@@ -36,6 +43,8 @@ class Homeostat(object):
         slowingFactor:       <milliseconds>   it slows down the simulation by inserting a slowingFactor wait after each cycle.
         isRunning            <aBoolean>       whether the homeostat is running
         usesSocket           <aBoolean>       whether the homeostat uses Socket and therefore cannot be pickled
+        usesArrayEngine      <aBoolean>       whether runFor may advance the homeostat with the compiled HomeoArrayEngine
+        tickHooks            <aList>          callables runFor calls with the new time at the end of every tick (see addTickHook)
         host                 <aString>        a string with the IP address of the host running the simulation, or 'localhost' 
         port                 <anInteger>      port number accepting robotic commands
         client               <a WebTCPClient> the cllient holding the network connection, including the socket
@@ -60,6 +69,16 @@ class Homeostat(object):
         else:
             raise HomeostatError("The loaded is not a valid homeostat")
 
+    @classmethod
+    def readCheckpointFrom(cls, filename):
+        '''Create a new Homeostat instance from a checkpoint written by saveCheckpointTo'''
+
+        try:
+            checkpoint = HomeoCheckpoint.readFrom(filename)
+        except HomeoCheckpointError as e:
+            raise HomeostatError("The file is not a homeostat checkpoint: %s" % e)
+        return checkpoint.restore()
+
 #===============================================================================
 # Initialization methods, getters and setters
 #===============================================================================
@@ -73,12 +92,16 @@ class Homeostat(object):
         self._time = 0                                  # a newly created homeostat starts at 0
         self._microTime = 0
         self._homeoUnits = []
-        self._dataCollector = HomeoDataCollector()
+        self._dataCollector = HomeoColumnarDataCollector()
         self._collectsData = True                       # default is to collect data. Can be turned off via accessor.
         self._slowingFactor = 10                        # Default slowing time is 10 milliseconds 
         self._isRunning = False                         # a new homeostat is not running
         self._headless = False                          # when True, skip signal emissions for GUI
         self._state_logger = None                       # optional HomeostatStateLogger
+        self._runFileWriter = None                      # optional HomeoRunFileWriter, see recordRunOn
+        self._tickHooks = []                            # called at the end of every tick, see addTickHook
+        self._fastForward = None                        # optional HomeoFastForward, see enableFastForward
+        self._usesArrayEngine = False                   # when True, runFor may use the compiled HomeoArrayEngine
         self._usesSocket = False
         if ip != None:
             self._ip = ip
@@ -138,6 +161,45 @@ class Homeostat(object):
     isRunning = property(fget = lambda self: self.getIsRunning(),
                          fset = lambda self, value: self.setIsRunning(value))
 
+    def getUsesArrayEngine(self):
+        return getattr(self, '_usesArrayEngine', False)
+    def setUsesArrayEngine(self,aValue):
+        self._usesArrayEngine = aValue
+    usesArrayEngine = property(fget = lambda self: self.getUsesArrayEngine(),
+                               fset = lambda self, value: self.setUsesArrayEngine(value))
+
+    def getRng(self):
+        '''The numpy Generator all the noise and uniselector draws of the homeostat
+           come from, in the object path and in the compiled kernels alike.
+           Created on first use from numpy.random unless set or seeded (see Core.HomeoRandom)'''
+        if getattr(self, '_rng', None) is None:
+            self._rng = newGenerator()
+        return self._rng
+    def setRng(self,aGenerator):
+        self._rng = aGenerator
+        self._noiseSupply = None
+    rng = property(fget = lambda self: self.getRng(),
+                   fset = lambda self, value: self.setRng(value))
+
+    def getNoiseSupply(self):
+        '''The HomeoNoiseSupply through which the units and the compiled kernels
+           draw from rng, in blocks'''
+        if getattr(self, '_noiseSupply', None) is None:
+            self._noiseSupply = HomeoNoiseSupply(self.rng)
+        return self._noiseSupply
+    noiseSupply = property(fget = lambda self: self.getNoiseSupply())
+
+    def seedRandom(self, seed):
+        '''Give the homeostat a fresh random stream built from seed, so that
+           its runs do not depend on any other use of random numbers in the process'''
+        self.rng = newGenerator(seed)
+
+    def shareRandomStream(self):
+        '''Let all the units draw from the noise supply of the homeostat'''
+        supply = self.noiseSupply
+        for unit in self.homeoUnits:
+            unit.noiseSupply = supply
+
 
 #===============================================================================
 # Testing methods
@@ -219,66 +281,61 @@ class Homeostat(object):
         self.restoreDefaultValuesForAllUnits()
         self.randomizeValuesforAllUnits()
 
+    def canRunOnArrayEngine(self):
+        '''Check whether runFor can hand the homeostat over to the compiled HomeoArrayEngine:
+           the engine must be enabled, no per-tick work (data collection, state logging,
+           tick hooks, GUI signals, slowing) may be requested, and all units must be supported'''
+
+        return (self.usesArrayEngine and
+                getattr(self, '_headless', False) and
+                not self.collectsData and
+                getattr(self, '_state_logger', None) is None and
+                getattr(self, '_runFileWriter', None) is None and
+                not getattr(self, '_tickHooks', None) and
+                not self.slowingFactor and
+                HomeoArrayEngine.canRun(self))
+
+    def linearStability(self):
+        '''Return a HomeoLinearStability oracle on the current configuration of the homeostat'''
+
+        return HomeoLinearStability.forHomeostat(self)
+
+    def predictsStability(self, margin = 0.0):
+        '''Predict from the linearized dynamics whether the current weights make
+           the homeostat stable, so experiments can skip configurations bound to
+           drive the essential variables out of range (see Core.HomeoLinearStability)'''
+
+        return self.linearStability().isStable(margin = margin)
+
     def runFor(self,ticks):
         '''Start the simulation by setting the units 'in motion' and run it 
            for a certain number of ticks. 
            This involves cycling through the units and asking them to update themselves, 
            then collecting data for each unit.
-           First check that there are enough data to start'''
+           First check that there are enough data to start.
+           If usesArrayEngine is set and canRunOnArrayEngine() allows it, the whole
+           run is carried out by HomeoArrayEngine in compiled code'''
 
-        sleepTime = self.slowingFactor
-
-        if self.isReadyToGo():
-            if self.time is None:
-                self.time = 0
-            "FOR TESTING"
-            outputString = ("INITIAL DATA AT TIME: %u and tick: %u \n" % (self.time,  ticks))
-            for unit in self.homeoUnits:
-                outputString += ('Unit %s with output %.3f and critical deviation %.3f \n' %
-                                 (unit.name,
-                                 unit.currentOutput,
-                                 unit.criticalDeviation))
-            "END TESTING"
-
-            if getattr(self, '_headless', False):
-                warmup_jit()
-                for unit in self.homeoUnits:
-                    if unit.isActive():
-                        unit._sync_jit_arrays()
-
-            while self.time < ticks:
-                for unit in self.homeoUnits:
-                    if self.collectsData:
-                        self.dataCollector.atTimeIndexAddDataUnitForAUnit(self.time, unit)
-                    unit.time =  self.time
-                    # sys.stderr.write("the status of %s in the function is %s and in the ivar is %s \n" % (unit.name, unit.isActive(), unit._status))
-#                     print "unit: %s of type %s about to update with value: %.3f" % (unit.name, type(unit), unit.criticalDeviation)
-                    if unit.isActive():
-                        unit.selfUpdate()
-                self.time +=  1
-                if self._state_logger is not None:
-                    self._state_logger.log_tick(self.time)
-                if not getattr(self, '_headless', False):
-                    emitter(self).homeostatTimeChanged.emit(self.time)
-                if sleepTime > 0:
-                    time.sleep(sleepTime / 1000)           # sleep accepts seconds, slowingFactor is in milliseconds
-        else:
+        if not self.isReadyToGo():
             sys.stderr.write('Warning: Homeostat is not ready to start')
-            
-        "FOR TESTING"
-        outputString = 'FINAL DATA AT TIME: %u and tick %u \n' % (self.time, ticks)
-        for unit in self.homeoUnits:
-            outputString += ('Unit %s with output %.3f and deviation %.3f \n' %
-                             (unit.name,
-                             unit.currentOutput,
-                             unit.criticalDeviation))
-        "END TESTING"
+            return
+        with self.session() as session:
+            session.runUntil(ticks)
 
     def runOnce(self):
-        "Advance the simulation by one tick"
+        '''Advance the simulation by one tick.
+           Callers advancing the homeostat tick by tick should rather step a session()'''
         
         upTo = self.time + 1
         self.runFor(upTo)
+
+    def session(self, slowed = True):
+        '''Return a HomeostatSession on the receiver. The readiness check, JIT warmup and
+           connection arrays sync runFor does at every call are done once, when the session
+           is created, and its step() advances the homeostat with no per-call preparation.
+           If slowed is False the session ignores slowingFactor'''
+
+        return HomeostatSession(self, slowed)
         
     def start(self):
         '''Start the simulation by setting the units "in motion." 
@@ -294,6 +351,7 @@ class Homeostat(object):
             if self.time is None:
                 self.time = 0
             self.isRunning = True
+            self.shareRandomStream()
             while self.isRunning:
                 for unit in self.homeoUnits:
                     unit.time = time
@@ -402,7 +460,19 @@ class Homeostat(object):
         for unit in self.homeoUnits:
             unit.initializeBasicParameters()
             unit.initializeUniselector()
-            
+
+    def setNoiseModels(self, unitModel = None, connectionModel = None):
+        '''Set the HomeoNoise model (a name or a code, see HomeoNoise.modelNames())
+           of the internal noise of all units and of the noise of all their connections.
+           None leaves the corresponding models unchanged'''
+
+        for unit in self.homeoUnits:
+            if unitModel is not None:
+                unit.noiseModel = unitModel
+            if connectionModel is not None:
+                for conn in unit.inputConnections:
+                    conn.noiseModel = connectionModel
+
     def unitWithName(self,aString):
         '''Return the Unit with name aString, if it exists,
         Return None Otherwise. Assumes units' names are unique '''
@@ -426,15 +496,101 @@ class Homeostat(object):
         pickler.dump(self)
         fileOut.close()
 
+    def checkpoint(self):
+        '''Return a HomeoCheckpoint with the parameters and dynamic state of the receiver,
+           random stream included, but not its data (see Core.HomeoCheckpoint)'''
+
+        return HomeoCheckpoint.of(self)
+
+    def saveCheckpointTo(self, filename):
+        '''Write a compact binary checkpoint of the receiver on filename,
+           to be read back with readCheckpointFrom.
+           It will erase the old content of filename'''
+
+        self.checkpoint().saveTo(filename)
+
+    def restoreCheckpoint(self, aCheckpoint):
+        '''Put the receiver back in the state recorded in aCheckpoint, a HomeoCheckpoint of
+           a homeostat built as the receiver. Units, connections, transducers, data collector
+           and hooks are kept, and take the recorded state (see HomeoCheckpoint.restoreInto)'''
+
+        try:
+            aCheckpoint.restoreInto(self)
+        except HomeoCheckpointError as e:
+            raise HomeostatError("Cannot restore the checkpoint: %s" % e)
+
+    def clone(self, seed = None):
+        '''Return a new homeostat in the same state as the receiver, with a copy of its
+           random stream (so it continues exactly as the receiver would) or, if seed is given,
+           a fresh stream built from seed. The clone starts with no data'''
+
+        clone = self.checkpoint().restore()
+        if seed is not None:
+            clone.seedRandom(seed)
+        return clone
+
+    def recordRunOn(self, filename, dtype = 'float64'):
+        '''Record the state of the homeostat at every tick of the following runs
+           in the binary run file filename (see Core.HomeoRunFile).
+           Will erase filename if it exists already. Return the writer'''
+
+        if getattr(self, '_runFileWriter', None) is not None:
+            self.stopRecordingRun()
+        self._runFileWriter = HomeoRunFileWriter(filename, self, dtype)
+        return self._runFileWriter
+
+    def stopRecordingRun(self):
+        "Close the run file opened by recordRunOn"
+
+        if getattr(self, '_runFileWriter', None) is not None:
+            self._runFileWriter.close()
+            self._runFileWriter = None
+
+    def addTickHook(self, hook):
+        '''Have runFor call hook with the new time at the end of every tick, after all the units
+           have updated themselves and before the tick is logged.
+           Used, for instance, to advance a robot simulation once per tick (see SimulatorBackendHOMEO)'''
+
+        if getattr(self, '_tickHooks', None) is None:
+            self._tickHooks = []
+        if hook not in self._tickHooks:
+            self._tickHooks.append(hook)
+
+    def removeTickHook(self, hook):
+        if hook in getattr(self, '_tickHooks', []):
+            self._tickHooks.remove(hook)
+
+    def enableFastForward(self, tolerance = 0.0, maxPeriod = HomeoFastForward.DefaultMaxPeriod):
+        '''Let runFor and sessions skip the ticks in which the homeostat sits in a quiet fixed
+           point or limit cycle (see Core.HomeoFastForward). Return the HomeoFastForward,
+           whose jumps list reports the ticks skipped.
+           Tick hooks must only look at the homeostat: during a jump they are called for every
+           skipped tick with the units in the state they would have had'''
+
+        self._fastForward = HomeoFastForward(tolerance, maxPeriod)
+        return self._fastForward
+
+    def disableFastForward(self):
+        self._fastForward = None
+
+    def getFastForward(self):
+        return getattr(self, '_fastForward', None)
+    fastForward = property(fget = lambda self: self.getFastForward())
+
     def flushData(self):
         "Clear all data from aDataCollector"
 
         self.initializeDataCollection()
 
     def initializeDataCollection(self):
-        "Trash the dataCollector, effectively flushing all collected data"
+        '''Trash the dataCollector, effectively flushing all collected data.
+           A columnar collector is replaced by a new one with the same capacity and spill path'''
 
-        self.dataCollector = HomeoDataCollector()
+        old = getattr(self, '_dataCollector', None)
+        if isinstance(old, HomeoColumnarDataCollector):
+            self.dataCollector = HomeoColumnarDataCollector(old.capacity, old.spillPath)
+        else:
+            self.dataCollector = HomeoColumnarDataCollector()
         
 #===============================================================================
 # Network-related
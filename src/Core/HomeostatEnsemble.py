@@ -0,0 +1,360 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+
+Batched ensemble simulator: K independent homeostats with the same topology
+(but different parameters, weights and initial states) are held as (K, n_units)
+and (K, n_units, n_units) arrays and advanced together by a single compiled
+kernel (Core.HomeoJIT._jit_run_ensemble).
+
+Unlike HomeoArrayEngine, the ensemble operates the discrete uniselectors
+(HomeoUniselectorAshby and HomeoUniselectorUniformRandom) inside the kernel,
+as masked updates of the weights of the replicate whose unit fired, so a
+seed sweep or a parameter scan costs one compiled loop instead of K Python runs.
+'''
+
+from Core.HomeoArrayEngine import HomeoArrayEngine
+from Core.HomeoUniselectorAshby import HomeoUniselectorAshby
+from Core.HomeoUniselectorUniformRandom import HomeoUniselectorUniformRandom
+from Core.HomeoUniselectorContinuous import HomeoUniselectorContinuous
+from Core.HomeoUnit import HomeoUnit
+from Core.HomeoJIT import _jit_run_ensemble
+from Core.HomeoRandom import spawnGenerators
+import numpy as np
+
+
+class HomeostatEnsembleError(Exception):
+    pass
+
+class HomeostatEnsemble(object):
+    '''
+    HomeostatEnsemble runs K homeostats sharing the same topology as one batch.
+    Typical use is a seed sweep over one of the AshbyOriginalExperiments setups:
+
+        ensemble = HomeostatEnsemble.fromSetup(setup_exp1_basic_ultrastability, range(100))
+        ensemble.runFor(5000)
+        ensemble.stabilityAchievedAt()
+
+    The homeostats keep their identity: unpack() (called at the end of runFor and
+    runWithEvents) writes the batched state back into their units and connections,
+    so they can be inspected, logged or run further with the usual object methods.
+
+    Two homeostats have the same topology when they have the same number of units
+    and their units have the same active incoming connections, from the same units,
+    in the same order and in the same manual/uniselector state. Unit status, unit
+    class, needle method and uniselector type may differ between replicates,
+    as may all the numeric parameters.
+
+    Instance Variables:
+        homeostats    <aList>          the K homeostats of the ensemble
+        metadata      <aList>          metadata returned by the setup functions, if any
+        seeds         <aList>          seeds used to build the homeostats, if known
+        supplies      <aList>          noise supplies of the homeostats, whose blocks are
+                                       stacked in normals, uniforms and cursors by pack()
+        window        <anInteger>      window of the stability tracker (non-critical ticks)
+        burnIn        <anInteger>      burn-in of the stability tracker
+    '''
+
+    uniselectorModes = {HomeoUniselectorAshby: 1,
+                        HomeoUniselectorUniformRandom: 2,
+                        HomeoUniselectorContinuous: 3}
+
+    @classmethod
+    def fromSetup(cls, setupFunction, seeds, **kwargs):
+        '''Build an ensemble by calling setupFunction(seed=seed) for each seed.
+           setupFunction may return a homeostat or, like the setup functions in
+           Simulator.AshbyOriginalExperiments, a (homeostat, seed, metadata) tuple'''
+
+        homeostats = []
+        metadata = []
+        usedSeeds = []
+        for seed in seeds:
+            result = setupFunction(seed=seed)
+            if isinstance(result, tuple):
+                homeostats.append(result[0])
+                usedSeeds.append(result[1])
+                metadata.append(result[2] if len(result) > 2 else None)
+            else:
+                homeostats.append(result)
+                usedSeeds.append(seed)
+                metadata.append(None)
+        ensemble = cls(homeostats, **kwargs)
+        ensemble.seeds = usedSeeds
+        ensemble.metadata = metadata
+        return ensemble
+
+    @classmethod
+    def topologyOf(cls, aHomeostat):
+        '''Return a hashable description of the connection pattern of aHomeostat'''
+
+        units = aHomeostat.homeoUnits
+        index = dict((id(unit), i) for i, unit in enumerate(units))
+        topology = []
+        for unit in units:
+            conns = tuple((index[id(c.incomingUnit)], c.state == 'uniselector')
+                          for c in unit.inputConnections if c.isActive())
+            topology.append(conns)
+        return tuple(topology)
+
+    def __init__(self, homeostats, seed = None, window = 200, burnIn = None):
+        '''Check that the homeostats can be batched and pack them.
+           Each replicate draws its noise and uniform uniselector values from the
+           random stream of its homeostat (see Homeostat.rng), so it runs exactly as
+           it would on its own. seed, if given, gives the homeostats independent
+           streams spawned from it'''
+
+        self.homeostats = list(homeostats)
+        if not self.homeostats:
+            raise HomeostatEnsembleError("An ensemble needs at least one homeostat")
+        for hom in self.homeostats:
+            if not HomeoArrayEngine.canRun(hom):
+                raise HomeostatEnsembleError("The homeostat contains units the ensemble cannot run")
+            if any(getattr(u.uniselector, 'screensStability', False) for u in hom.homeoUnits):
+                raise HomeostatEnsembleError("The ensemble cannot operate uniselectors that screen for stability")
+        topology = HomeostatEnsemble.topologyOf(self.homeostats[0])
+        for hom in self.homeostats[1:]:
+            if HomeostatEnsemble.topologyOf(hom) != topology:
+                raise HomeostatEnsembleError("All the homeostats of an ensemble must have the same topology")
+        for conns in topology:
+            sources = [src for src, isUnisel in conns]
+            if len(sources) != len(set(sources)):
+                raise HomeostatEnsembleError("A unit has more than one active connection from the same unit")
+        times = set(hom.time or 0 for hom in self.homeostats)
+        if len(times) > 1:
+            raise HomeostatEnsembleError("All the homeostats of an ensemble must be at the same time")
+
+        self.time = times.pop()
+        self.seeds = [None] * len(self.homeostats)
+        self.metadata = [None] * len(self.homeostats)
+        self.window = window
+        self.burnIn = burnIn if burnIn is not None else window
+        self.stability = np.zeros((len(self.homeostats), 3), dtype=np.int64)
+        self.stability[:, 1:] = -1
+        self.firings = None
+        if seed is not None:
+            for hom, rng in zip(self.homeostats, spawnGenerators(seed, len(self.homeostats))):
+                hom.rng = rng
+        self.pack()
+
+    def size(self):
+        return len(self.homeostats)
+
+#===============================================================================
+# Packing and unpacking
+#===============================================================================
+
+    def pack(self):
+        '''Copy units and connections of all the homeostats into batched arrays,
+           and stack the blocks of their noise supplies'''
+
+        engines = [HomeoArrayEngine(hom) for hom in self.homeostats]
+        for engine in engines:
+            engine.pack()
+        self.engines = engines
+        K = len(engines)
+        n = len(engines[0].units)
+
+        for name in ('kind', 'active', 'dev', 'vel', 'acc', 'out', 'torque', 'noise', 'noiseCode',
+                     'visc', 'mass', 'maxDev', 'outLow', 'outHigh', 'dtFast',
+                     'critThreshold', 'uniselTime', 'uniselInterval', 'uniselActivated'):
+            setattr(self, name, np.stack([getattr(engine, name) for engine in engines]))
+        self.ouParams = np.stack([engine.ouParams for engine in engines])
+
+        "Uniselectors"
+        self.uniselMode = np.zeros((K, n), dtype=np.int64)
+        self.unifBounds = np.zeros((K, n, 2), dtype=np.float64)
+        self.ashbyRows = np.ones((K, n), dtype=np.int64)
+        self.ashbyIndex = np.zeros((K, n), dtype=np.int64)
+        self.ashbyUnitIndex = np.zeros((K, n), dtype=np.int64)
+        tables = {}
+        for k, engine in enumerate(engines):
+            for i, unit in enumerate(engine.units):
+                if not unit.uniselectorActive:
+                    continue
+                mode = HomeostatEnsemble.uniselectorModes.get(type(unit.uniselector))
+                if mode is None:
+                    raise HomeostatEnsembleError("The ensemble cannot operate uniselectors of class %s" %
+                                                 type(unit.uniselector).__name__)
+                self.uniselMode[k, i] = mode
+                if mode == 1:
+                    tables[(k, i)] = unit.uniselector.matrix()
+                    self.ashbyRows[k, i] = unit.uniselector.matrix().shape[0]
+                    self.ashbyIndex[k, i] = unit.uniselector._index
+                    self.ashbyUnitIndex[k, i] = unit.uniselector._unitIndex
+                elif mode == 2:
+                    self.unifBounds[k, i] = (unit.uniselector._lowerBound, unit.uniselector._upperBound)
+        rows = max([t.shape[0] for t in tables.values()] or [1])
+        cols = max([t.shape[1] for t in tables.values()] or [1])
+        self.ashbyTable = np.zeros((K, n, rows, cols), dtype=np.float64)
+        for (k, i), table in tables.items():
+            self.ashbyTable[k, i, :table.shape[0], :table.shape[1]] = table
+
+        "Connections: dense (K, n, n) matrices, shared masks and order"
+        first = engines[0]
+        self.connOrder = -np.ones((n, n), dtype=np.int64)
+        self.connLive = np.zeros((n, n), dtype=np.bool_)
+        self.connUnisel = np.zeros((n, n), dtype=np.bool_)
+        for i in range(n):
+            for slot, c in enumerate(range(first.connPtr[i], first.connPtr[i + 1])):
+                j = first.connSrc[c]
+                self.connOrder[i, slot] = j
+                self.connLive[i, j] = first.connLive[c]
+                self.connUnisel[i, j] = first.connUnisel[c]
+            if self.uniselMode[:, i].max() == 1 and self.connUnisel[i].sum() > cols:
+                raise HomeostatEnsembleError("Unit %d has more uniselector connections than its uniselector controls" % i)
+        self.weights = np.zeros((K, n, n), dtype=np.float64)
+        self.switches = np.ones((K, n, n), dtype=np.float64)
+        self.connNoise = np.zeros((K, n, n), dtype=np.float64)
+        self.connNoiseCode = np.zeros((K, n, n), dtype=np.int64)
+        for k, engine in enumerate(engines):
+            for i in range(n):
+                for c in range(engine.connPtr[i], engine.connPtr[i + 1]):
+                    j = engine.connSrc[c]
+                    self.weights[k, i, j] = engine.connWeight[c]
+                    self.switches[k, i, j] = engine.connSwitch[c]
+                    self.connNoise[k, i, j] = engine.connNoise[c]
+                    self.connNoiseCode[k, i, j] = engine.connNoiseCode[c]
+        if self.firings is None:
+            self.firings = np.zeros((K, n), dtype=np.int64)
+        self._stackNoiseSupplies()
+
+    def unpack(self):
+        '''Write the batched state back into the units, connections and uniselectors'''
+
+        for k, engine in enumerate(self.engines):
+            for name in ('dev', 'vel', 'acc', 'out', 'torque', 'uniselTime', 'uniselActivated'):
+                getattr(engine, name)[:] = getattr(self, name)[k]
+            for i in range(len(engine.units)):
+                for c in range(engine.connPtr[i], engine.connPtr[i + 1]):
+                    j = engine.connSrc[c]
+                    engine.connWeight[c] = self.weights[k, i, j]
+                    engine.connSwitch[c] = self.switches[k, i, j]
+            engine.homeostat._time = self.time
+            engine.unpack()
+            for i, unit in enumerate(engine.units):
+                if not engine.active[i]:
+                    continue
+                if self.uniselMode[k, i] in (1, 2):
+                    for c in range(engine.connPtr[i], engine.connPtr[i + 1]):
+                        conn = engine.connections[c]
+                        conn._weight = float(engine.connWeight[c])
+                        conn._switch = float(engine.connSwitch[c])
+                if self.uniselMode[k, i] == 1:
+                    unit.uniselector._index = int(self.ashbyIndex[k, i])
+                    unit.uniselector._unitIndex = int(self.ashbyUnitIndex[k, i])
+
+#===============================================================================
+# Running methods
+#===============================================================================
+
+    def _noiseDraws(self):
+        "Values a replicate may draw in one tick, from each block of its noise supply"
+
+        n = self.kind.shape[1]
+        return n + 2 * n * n
+
+    def _stackNoiseSupplies(self):
+        '''Make the noise supplies of the homeostats keep their blocks and cursors in
+           the rows of (K, blockSize) and (K, 2) arrays (see HomeoNoiseSupply.shareBlocks),
+           so that one kernel call can draw from all of them'''
+
+        supplies = [hom.noiseSupply for hom in self.homeostats]
+        if len(set(id(supply) for supply in supplies)) < len(supplies):
+            raise HomeostatEnsembleError("The homeostats of an ensemble cannot share a noise supply")
+        size = max([supply.blockSize() for supply in supplies] + [self._noiseDraws()])
+        for supply in supplies:
+            supply.ensureBlockSize(size)
+        self.normals = np.empty((len(supplies), size))
+        self.uniforms = np.empty((len(supplies), size))
+        self.cursors = np.empty((len(supplies), 2), dtype=np.int64)
+        for k, supply in enumerate(supplies):
+            supply.shareBlocks(self.normals[k], self.uniforms[k], self.cursors[k])
+        self.supplies = supplies
+
+    def advance(self, ticks):
+        '''Advance all the replicates by ticks ticks, without unpacking.
+           All the replicates run in one kernel call, each drawing from the noise
+           supply of its own homeostat through the stacked blocks. The kernel stops
+           a replicate whose blocks run short: its supply is refilled here and the
+           kernel called again, until all the replicates have run ticks ticks'''
+
+        if ticks <= 0:
+            return
+        maxViscosity = float(HomeoUnit.DefaultParameters['maxViscosity'])
+        draws = self._noiseDraws()
+        ticksRun = np.zeros(len(self.homeostats), dtype=np.int64)
+        while _jit_run_ensemble(ticks, self.kind, self.active, self.dev, self.vel,
+                                self.acc, self.out, self.torque, self.noise,
+                                self.visc, maxViscosity, self.mass, self.maxDev,
+                                self.outLow, self.outHigh, self.dtFast,
+                                self.critThreshold, self.uniselMode, self.uniselTime,
+                                self.uniselInterval, self.uniselActivated, self.ouParams,
+                                self.noiseCode, self.unifBounds, self.ashbyTable, self.ashbyRows,
+                                self.ashbyIndex, self.ashbyUnitIndex, self.connOrder,
+                                self.connLive, self.connUnisel, self.weights, self.switches,
+                                self.connNoise, self.connNoiseCode, self.firings, self.time, self.window,
+                                self.burnIn, self.stability, self.normals,
+                                self.uniforms, self.cursors, ticksRun):
+            for k in np.flatnonzero(ticksRun < ticks):
+                self.supplies[k].reserve(draws, draws)
+        self.time += ticks
+
+    def runFor(self, ticks):
+        '''Advance all the replicates until their time reaches ticks,
+           then write their state back into the homeostats'''
+
+        self.advance(ticks - self.time)
+        self.unpack()
+
+    def runWithEvents(self, totalTicks, events = None):
+        '''Run all the replicates with scheduled events, as
+           Simulator.AshbyOriginalExperiments.run_with_events does for one homeostat.
+           events is a list of (tick, callable(homeostat)) pairs: at each event tick
+           the ensemble is unpacked, the event is applied to every homeostat and
+           the ensemble is packed again. Per-tick callbacks are not supported.'''
+
+        for tick, event in sorted(events or [], key = lambda e: e[0]):
+            if tick >= totalTicks:
+                break
+            self.runFor(max(tick, self.time))
+            for hom in self.homeostats:
+                event(hom)
+            self.pack()
+        self.runFor(totalTicks)
+
+#===============================================================================
+# Results
+#===============================================================================
+
+    def criticalDeviations(self):
+        '''Return a (K, n_units) array with the current critical deviations'''
+
+        return self.dev
+
+    def outputs(self):
+        return self.out
+
+    def signedWeights(self):
+        '''Return a (K, n_units, n_units) array of weight * switch,
+           where [k, i, j] is the connection into unit i from unit j'''
+
+        return self.weights * self.switches
+
+    def totalUniselectorFirings(self):
+        '''Return, for each replicate, how many times its uniselectors fired'''
+
+        return self.firings.sum(axis = 1)
+
+    def stabilityAchievedAt(self):
+        '''Return, for each replicate, the first tick at which a stable run of
+           window ticks started (as StabilityTracker.stability_achieved_at), or None'''
+
+        return [int(s) if s >= 0 else None for s in self.stability[:, 1]]
+
+    def lastStabilityAt(self):
+        return [int(s) if s >= 0 else None for s in self.stability[:, 2]]
+
+    def currentlyStable(self):
+        return [bool(run >= self.window and self.time - self.window >= self.burnIn)
+                for run in self.stability[:, 0]]
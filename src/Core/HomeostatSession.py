@@ -0,0 +1,215 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+
+Stepper for driving a Homeostat one tick (or a few ticks) at a time.
+
+Homeostat.runFor() checks that the homeostat is ready, warms up the compiled
+kernels and resyncs the connection arrays of every unit each time it is called,
+which is negligible for a long run but dominates the cost of runOnce() when a
+simulation, a GA worker or an experiment script advances the homeostat tick by tick.
+A HomeostatSession does that preparation once, when it is created, and then
+offers a cheap step(). The usual pattern is:
+
+    session = aHomeostat.session()
+    for tick in range(ticks):
+        session.step()
+        ...                       # look at the homeostat, apply events, etc.
+    session.close()
+
+Anything that changes connections from outside the units (new weights or switches
+set by an event, units added or removed, etc.) must be followed by refresh().
+
+When the homeostat has fast-forward enabled (see Homeostat.enableFastForward()) the
+session skips the ticks in which the homeostat sits in a quiet fixed point or limit
+cycle, still feeding every skipped tick to the collector, run file, tick hooks and
+state logger. On the array engine it looks for a cycle between chunks of ticks.
+'''
+
+from Core.HomeoJIT import warmup_jit
+from Core.HomeoArrayEngine import HomeoArrayEngine
+from Core.HomeoUniselectorContinuousNetwork import HomeoUniselectorContinuousNetwork
+from Helpers.QObjectProxyEmitter import emitter
+import time
+
+
+class HomeostatSessionError(Exception):
+    pass
+
+class HomeostatSession(object):
+    '''
+    HomeostatSession advances a homeostat with the same tick loop as Homeostat.runFor(),
+    after having done the per-run preparation once.
+    The data collector, run file writer, state logger, tick hooks, headless flag and
+    slowing factor are read from the homeostat at every call of step(), so they
+    can be changed while the session is open.
+
+    Instance Variables:
+        homeostat       <aHomeostat>    the homeostat being stepped
+        slowed          <aBoolean>      whether step() waits slowingFactor milliseconds after each tick, as runFor() does
+        usesArrayEngine <aBoolean>      whether step() hands the ticks to HomeoArrayEngine (see Homeostat.canRunOnArrayEngine)
+        ouNetwork       <aHomeoUniselectorContinuousNetwork>  steps the continuous uniselectors of a headless homeostat, or None
+        fastForward     <aHomeoFastForward>  the fast-forward detector of the homeostat, or None if disabled or not applicable
+    '''
+
+    def __init__(self, aHomeostat, slowed = True):
+        if not aHomeostat.isReadyToGo():
+            raise HomeostatSessionError("Homeostat is not ready to start")
+        self.homeostat = aHomeostat
+        self.slowed = slowed
+        self.ouNetwork = None
+        self.fastForward = None
+        if aHomeostat.time is None:
+            aHomeostat.time = 0
+        self.refresh()
+
+    def refresh(self):
+        '''Redo the preparation of the session: let the units draw from the random stream
+           of the homeostat, check whether the array engine can be used and, in headless mode,
+           rebuild the connection arrays of all the active units and the network stepping
+           their continuous uniselectors, and restart the fast-forward detector, if any.
+           Call after changing weights, switches or units from outside the units'''
+
+        hom = self.homeostat
+        hom.shareRandomStream()
+        self._units = hom.homeoUnits
+        self._unitsCount = len(self._units)
+        self.usesArrayEngine = hom.canRunOnArrayEngine()
+        if self.ouNetwork is not None:
+            self.ouNetwork.detach()
+            self.ouNetwork = None
+        if getattr(hom, '_headless', False) and not self.usesArrayEngine:
+            warmup_jit()
+            for unit in self._units:
+                if unit.isActive():
+                    unit._sync_jit_arrays()
+            self.ouNetwork = HomeoUniselectorContinuousNetwork.forUnits(self._units)
+            if self.ouNetwork is not None:
+                self.ouNetwork.attach()
+        self.fastForward = hom.fastForward
+        if self.fastForward is not None:
+            if self.fastForward.canFastForward(hom):
+                self.fastForward.reset(hom)
+            else:
+                self.fastForward = None
+
+    def step(self, ticks = 1):
+        '''Advance the homeostat by ticks. Return the new time'''
+
+        return self.runUntil(self.homeostat.time + ticks)
+
+    def runUntil(self, ticks):
+        '''Advance the homeostat until its time reaches ticks. Return the new time'''
+
+        hom = self.homeostat
+        units = hom.homeoUnits
+        if units is not self._units or len(units) != self._unitsCount:
+            self.refresh()
+        fastForward = self.fastForward
+        if self.usesArrayEngine:
+            if fastForward is None:
+                HomeoArrayEngine(hom).runFor(ticks)
+                return hom.time
+            "Run on the engine, looking for a cycle whenever the homeostat is quiet at the end of a chunk."
+            "Chunks start at checkInterval ticks and double after every window that finds none"
+            interval = fastForward.checkInterval
+            while hom.time < ticks:
+                HomeoArrayEngine(hom).runFor(min(ticks, hom.time + interval))
+                fastForward.reset(hom)
+                if fastForward.isQuiet():
+                    self._runTicks(min(ticks, hom.time + fastForward.window), ticks)
+                    interval *= 2
+            return hom.time
+        self._runTicks(ticks, ticks)
+        return hom.time
+
+    def _runTicks(self, until, horizon):
+        '''Run the object tick loop until the time of the homeostat reaches until.
+           When the fast-forward detector recognizes a cycle, jump as close to horizon as the cycle allows'''
+
+        hom = self.homeostat
+        units = hom.homeoUnits
+        headless = getattr(hom, '_headless', False)
+        collector = hom.dataCollector if hom.collectsData else None
+        runFileWriter = getattr(hom, '_runFileWriter', None)
+        tickHooks = getattr(hom, '_tickHooks', None) or ()
+        stateLogger = getattr(hom, '_state_logger', None)
+        sleepTime = hom.slowingFactor if self.slowed else 0
+        ouNetwork = self.ouNetwork
+        fastForward = self.fastForward
+        while hom.time < until:
+            now = hom.time
+            if runFileWriter is not None:
+                runFileWriter.recordTick(now)
+            for unit in units:
+                if collector is not None:
+                    collector.atTimeIndexAddDataUnitForAUnit(now, unit)
+                unit.time = now
+                if unit.isActive():
+                    unit.selfUpdate()
+            if ouNetwork is not None:
+                ouNetwork.step(hom.noiseSupply)
+            hom.time = now + 1
+            for hook in tickHooks:
+                hook(now + 1)
+            if stateLogger is not None:
+                stateLogger.log_tick(now + 1)
+            if not headless:
+                emitter(hom).homeostatTimeChanged.emit(now + 1)
+            if fastForward is not None:
+                period = fastForward.observe(now + 1)
+                if period is not None:
+                    self._jump(period, horizon, collector, runFileWriter, tickHooks, stateLogger)
+            if sleepTime > 0:
+                time.sleep(sleepTime / 1000)           # sleep accepts seconds, slowingFactor is in milliseconds
+
+    def _jump(self, period, horizon, collector, runFileWriter, tickHooks, stateLogger):
+        '''Move the clock forward by the largest multiple of period that does not pass horizon,
+           replaying the recorded cycle for the collector, run file, tick hooks and state logger'''
+
+        hom = self.homeostat
+        fastForward = self.fastForward
+        start = hom.time
+        end = start + (horizon - start) // period * period
+        if end == start:
+            return
+        if (collector is not None or runFileWriter is not None or
+                tickHooks or stateLogger is not None):
+            for now in range(start, end):
+                if runFileWriter is not None:
+                    runFileWriter.recordTick(now)
+                if collector is not None:
+                    for unit in hom.homeoUnits:
+                        collector.atTimeIndexAddDataUnitForAUnit(now, unit)
+                fastForward.restore(fastForward.cycleState(start, period, now + 1))
+                hom._time = now + 1
+                for hook in tickHooks:
+                    hook(now + 1)
+                if stateLogger is not None:
+                    stateLogger.log_tick(now + 1)
+        else:
+            fastForward.restore(fastForward.cycleState(start, period, end))
+        for unit in hom.homeoUnits:
+            unit._time = end - 1
+        fastForward.advanceUniselectorTimes(end - start)
+        fastForward.noteJump(start, end, period)
+        hom.time = end
+
+    def close(self):
+        '''Flush the run file the homeostat may be recording on and give the units
+           back the stepping of their continuous uniselectors'''
+
+        if self.ouNetwork is not None:
+            self.ouNetwork.detach()
+            self.ouNetwork = None
+        runFileWriter = getattr(self.homeostat, '_runFileWriter', None)
+        if runFileWriter is not None:
+            runFileWriter.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+        return False
@@ -0,0 +1,263 @@
+'''
+Columnar storage for the per-tick state logs of HomeostatStateLogger
+and AshbyStateLogger.
+
+Formatting every value of every logged tick as text dominates the cost of
+long runs with state logging on.  A ColumnarStateLogWriter instead copies
+each row into a preallocated float64 buffer and, every chunk_rows rows,
+writes the buffer as one compressed array per column.  The output is a
+zip archive in numpy's .npz layout, so it can be opened with np.load():
+
+    __metadata__.npy            JSON string: columns, dtypes, header metadata,
+                                decimation window
+    c000000/<column>.npy        first chunk of every column
+    c000001/<column>.npy        ...
+
+With decimation=N the writer also produces, in the same pass, a reduced
+log holding the min, max and mean of every column over windows of N rows
+(columns '<name>_min', '<name>_max', '<name>_mean'; the index column, e.g.
+'tick', keeps the first value of each window).  It is written next to the
+full log (see decimated_filepath) and can be read the same way, which is
+convenient for plotting long runs.  full_resolution=False only keeps the
+reduced log.
+
+ColumnarStateLog reads both kinds of file and converts them to the TSV
+layout of the text state logs.
+
+Usage:
+    log = ColumnarStateLogWriter(path, ['tick', 'x'], decimation=100)
+    log.append((tick, x))
+    log.close()
+    x = ColumnarStateLog(path).column('x')
+
+@author: stefano
+'''
+
+import json
+import os
+import zipfile
+import numpy as np
+
+
+class ColumnarStateLogError(Exception):
+    pass
+
+
+Extension = '.npz'
+DefaultChunkRows = 65536
+Statistics = ('min', 'max', 'mean')
+
+
+def decimated_filepath(filepath, decimation):
+    '''Return the path of the reduced log written next to filepath
+    for windows of decimation rows: name.npz -> name-dec<decimation>.npz'''
+    base, ext = os.path.splitext(filepath)
+    return '%s-dec%d%s' % (base, decimation, ext or Extension)
+
+
+def decimate(block, decimation, index_column=0):
+    '''Reduce the (rows, columns) block to (windows, 3 * columns) rows holding
+    the min, max and mean of each column over windows of decimation rows
+    (the last window may be shorter).  Column index_column is reduced to
+    its first value per window instead and keeps a single column.'''
+    rows, ncols = block.shape
+    starts = np.arange(0, rows, decimation)
+    mins = np.minimum.reduceat(block, starts, axis=0)
+    maxs = np.maximum.reduceat(block, starts, axis=0)
+    counts = np.diff(np.append(starts, rows))
+    means = np.add.reduceat(block, starts, axis=0) / counts[:, None]
+    parts = []
+    for j in range(ncols):
+        if j == index_column:
+            parts.append(block[starts, j])
+        else:
+            parts += [mins[:, j], maxs[:, j], means[:, j]]
+    return np.column_stack(parts)
+
+
+def decimated_columns(columns, index_column=0):
+    '''Column names of a log decimated with decimate()'''
+    names = []
+    for j, name in enumerate(columns):
+        if j == index_column:
+            names.append(name)
+        else:
+            names += ['%s_%s' % (name, stat) for stat in Statistics]
+    return names
+
+
+class _ChunkFile:
+    '''One columnar zip file: metadata first, then chunks of every column.'''
+
+    def __init__(self, filepath, columns, dtypes, metadata):
+        self.filepath = filepath
+        self.columns = list(columns)
+        self.dtypes = [np.dtype(d) for d in dtypes]
+        self.n_chunks = 0
+        self.n_rows = 0
+        self._zip = zipfile.ZipFile(filepath, 'w', zipfile.ZIP_DEFLATED)
+        info = dict(metadata)
+        info['columns'] = self.columns
+        info['dtypes'] = [d.str for d in self.dtypes]
+        self._write_array('__metadata__', np.array(json.dumps(info)))
+
+    def _write_array(self, name, array):
+        with self._zip.open(name + '.npy', 'w', force_zip64=True) as member:
+            np.lib.format.write_array(member, np.ascontiguousarray(array),
+                                      allow_pickle=False)
+
+    def write_block(self, block):
+        prefix = 'c%06d/' % self.n_chunks
+        for j, name in enumerate(self.columns):
+            self._write_array(prefix + name, block[:, j].astype(self.dtypes[j]))
+        self.n_chunks += 1
+        self.n_rows += len(block)
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+
+
+class ColumnarStateLogWriter:
+    '''Accumulate rows of a state log in memory and write them in
+    compressed columnar chunks, optionally with a decimated copy.
+
+    Constructor parameters:
+        filepath:        output path (conventionally ending in .npz)
+        columns:         column names; the first one is the index column
+        dtypes:          per-column dtypes (default float64); rows are
+                         buffered as float64 and cast when written
+        metadata:        dict of header values stored with the log
+        chunk_rows:      rows buffered before a chunk is written (rounded
+                         up to a multiple of decimation)
+        decimation:      if given, also write a min/max/mean log over
+                         windows of this many rows
+        full_resolution: if False only the decimated log is written
+    '''
+
+    def __init__(self, filepath, columns, dtypes=None, metadata=None,
+                 chunk_rows=DefaultChunkRows, decimation=None,
+                 full_resolution=True):
+        self.columns = list(columns)
+        ncols = len(self.columns)
+        if dtypes is None:
+            dtypes = [np.float64] * ncols
+        if len(dtypes) != ncols:
+            raise ColumnarStateLogError('%d dtypes given for %d columns' %
+                                        (len(dtypes), ncols))
+        if decimation is not None:
+            decimation = int(decimation)
+            if decimation < 1:
+                raise ColumnarStateLogError('decimation must be a positive number of rows')
+            chunk_rows = -(-chunk_rows // decimation) * decimation
+        elif not full_resolution:
+            raise ColumnarStateLogError('full_resolution=False requires a decimation window')
+        metadata = dict(metadata or {})
+        self.filepath = filepath
+        self.decimation = decimation
+        self.chunk_rows = int(chunk_rows)
+        self._buffer = np.empty((self.chunk_rows, ncols), dtype=np.float64)
+        self._rows = 0
+        self._full = None
+        self._reduced = None
+        if full_resolution:
+            self._full = _ChunkFile(filepath, self.columns, dtypes, metadata)
+        if decimation is not None:
+            self.decimated_filepath = (decimated_filepath(filepath, decimation)
+                                       if full_resolution else filepath)
+            reduced_dtypes = []
+            for j, dtype in enumerate(dtypes):
+                reduced_dtypes += [dtype] if j == 0 else [np.float64] * len(Statistics)
+            reduced_metadata = dict(metadata, decimation=decimation)
+            self._reduced = _ChunkFile(self.decimated_filepath,
+                                       decimated_columns(self.columns),
+                                       reduced_dtypes, reduced_metadata)
+
+    @property
+    def closed(self):
+        return self._buffer is None
+
+    def append(self, row):
+        '''Add one row, a sequence with a value per column.'''
+        self._buffer[self._rows] = row
+        self._rows += 1
+        if self._rows == self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        '''Write the buffered rows as a new chunk.'''
+        if not self._rows:
+            return
+        block = self._buffer[:self._rows]
+        if self._full is not None:
+            self._full.write_block(block)
+        if self._reduced is not None:
+            self._reduced.write_block(decimate(block, self.decimation))
+        self._rows = 0
+
+    def close(self):
+        '''Write the buffered rows and close the output files.'''
+        if self.closed:
+            return
+        self.flush()
+        for chunk_file in (self._full, self._reduced):
+            if chunk_file is not None:
+                chunk_file.close()
+        self._buffer = None
+
+
+class ColumnarStateLog:
+    '''Read a log written by ColumnarStateLogWriter (full or decimated).
+
+    Instance variables:
+        filepath:  path of the log
+        metadata:  dict of header values, with 'columns' and 'dtypes'
+        columns:   list of column names
+    '''
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        try:
+            self._npz = np.load(filepath, allow_pickle=False)
+            self.metadata = json.loads(self._npz['__metadata__'].item())
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+            raise ColumnarStateLogError('%s is not a columnar state log: %s' %
+                                        (filepath, e))
+        self.columns = self.metadata['columns']
+        self._chunks = sorted(set(name.split('/')[0] for name in self._npz.files
+                                  if '/' in name))
+
+    def __len__(self):
+        return sum(len(self._npz['%s/%s' % (chunk, self.columns[0])])
+                   for chunk in self._chunks)
+
+    def column(self, name):
+        '''Return the whole column name as one array.'''
+        if name not in self.columns:
+            raise ColumnarStateLogError('No column %s in %s' % (name, self.filepath))
+        dtype = np.dtype(self.metadata['dtypes'][self.columns.index(name)])
+        if not self._chunks:
+            return np.empty(0, dtype=dtype)
+        return np.concatenate([self._npz['%s/%s' % (chunk, name)]
+                               for chunk in self._chunks])
+
+    def data(self):
+        '''Return a dict mapping every column name to its array.'''
+        return dict((name, self.column(name)) for name in self.columns)
+
+    def write_text(self, filepath, fmt='%.6f'):
+        '''Write the log in the TSV layout of the text state logs: #-prefixed
+        metadata lines, a line of column names, one tab-separated row per tick.'''
+        arrays = [self.column(name) for name in self.columns]
+        formats = ['%d' if a.dtype.kind in 'iub' else fmt for a in arrays]
+        with open(filepath, 'w') as f:
+            for key, value in self.metadata.items():
+                if key not in ('columns', 'dtypes'):
+                    f.write('# %s\t%s\n' % (key, value))
+            f.write('\t'.join(self.columns) + '\n')
+            if arrays and len(arrays[0]):
+                np.savetxt(f, np.column_stack(arrays), fmt=formats, delimiter='\t')
+
+    def close(self):
+        self._npz.close()
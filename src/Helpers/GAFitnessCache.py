@@ -0,0 +1,103 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+
+Content-addressed cache of the fitnesses computed by a GA run.
+
+The key of a fitness is a hash of the genome, quantized to a given quantum so that
+genes differing only by floating-point noise share the entry, together with the
+experiment, the number of steps and the seed of the evaluation: a fitness computed
+with different settings is never reused.
+Entries are kept in a SQLite database, so that a cache stored on a file survives
+across GA runs and can be shared by concurrent runs of the same experiment.
+When the cache holds more than maxEntries fitnesses the least recently used ones are evicted.
+'''
+
+import sqlite3, json, hashlib
+from itertools import count
+
+
+class GAFitnessCacheError(Exception):
+    pass
+
+
+class GAFitnessCache(object):
+    '''
+    GAFitnessCache maps genomes to fitness tuples. Use ':memory:' as filename
+    (the default) for a cache that only lives as long as the object.
+
+    Instance Variables:
+        filename       <aString>      the SQLite file holding the cache, or ':memory:'
+        maxEntries     <anInteger>    the maximum number of fitnesses kept
+        quantum        <aFloat>       the resolution genes are rounded to before hashing
+        hits           <anInteger>    the number of lookups answered by the cache
+        misses         <anInteger>    the number of lookups not found in the cache
+    '''
+
+    DefaultMaxEntries = 100000
+    DefaultQuantum = 1e-6
+
+    def __init__(self, filename = ':memory:', maxEntries = DefaultMaxEntries, quantum = DefaultQuantum):
+        if maxEntries < 1:
+            raise GAFitnessCacheError("A fitness cache must hold at least one entry")
+        if quantum <= 0:
+            raise GAFitnessCacheError("The quantum of a fitness cache must be positive")
+        self.filename = filename
+        self.maxEntries = maxEntries
+        self.quantum = quantum
+        self.hits = 0
+        self.misses = 0
+        self._connection = sqlite3.connect(filename, timeout = 60)
+        self._connection.execute('CREATE TABLE IF NOT EXISTS fitness '
+                                 '(key TEXT PRIMARY KEY, fitness TEXT NOT NULL, lastUsed INTEGER NOT NULL)')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS fitnessLastUsed ON fitness (lastUsed)')
+        self._connection.commit()
+        "Use counter, continuing from the most recent use recorded in the file"
+        last = self._connection.execute('SELECT MAX(lastUsed) FROM fitness').fetchone()[0]
+        self._clock = count((last or 0) + 1)
+
+    def keyFor(self, genome, experiment, stepsSize, seed = None):
+        '''Return the key of the fitness of genome evaluated in experiment for stepsSize steps with seed'''
+
+        quantized = [int(round(gene / self.quantum)) for gene in genome]
+        encoded = json.dumps([experiment, stepsSize, seed, quantized])
+        return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        '''Return the fitness tuple stored at key, or None'''
+
+        row = self._connection.execute('SELECT fitness FROM fitness WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._connection.execute('UPDATE fitness SET lastUsed = ? WHERE key = ?', (next(self._clock), key))
+        self._connection.commit()
+        return tuple(json.loads(row[0]))
+
+    def put(self, key, fitness):
+        '''Store the fitness tuple at key, evicting the least recently used entries if the cache is full'''
+
+        self._connection.execute('INSERT OR REPLACE INTO fitness (key, fitness, lastUsed) VALUES (?, ?, ?)',
+                                 (key, json.dumps([float(value) for value in fitness]), next(self._clock)))
+        excess = len(self) - self.maxEntries
+        if excess > 0:
+            self._connection.execute('DELETE FROM fitness WHERE key IN '
+                                     '(SELECT key FROM fitness ORDER BY lastUsed LIMIT ?)', (excess,))
+        self._connection.commit()
+
+    def __len__(self):
+        return self._connection.execute('SELECT COUNT(*) FROM fitness').fetchone()[0]
+
+    def __contains__(self, key):
+        return self._connection.execute('SELECT 1 FROM fitness WHERE key = ?', (key,)).fetchone() is not None
+
+    def clear(self):
+        self._connection.execute('DELETE FROM fitness')
+        self._connection.commit()
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
@@ -0,0 +1,122 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+
+Append-only store of the logbook and history of a GA run.
+
+runGaSimulation used to pickle the whole DEAP Logbook and History after every
+generation, so the data written by a run grew with the square of its generations
+and the last generations of a long run waited seconds for their files. A GARunStore
+is a SQLite database (extension .garun) with one row per logbook record and one row
+per history entry: at every save only the records and the individuals added since
+the previous one are written, in a single transaction, so an interrupted run leaves
+a store holding all the generations saved so far.
+logbook() and history() rebuild the DEAP objects from the store.
+Records and individuals are pickled one by one: as with the old pickled logbooks,
+the creator classes of the individuals must exist when a store is read.
+'''
+
+from deap import tools
+import sqlite3, json, pickle
+
+
+class GARunStoreError(Exception):
+    pass
+
+
+Extension = 'garun'
+
+
+class GARunStore(object):
+    '''
+    GARunStore holds the Logbook and the History of a GA run.
+
+    Instance Variables:
+        filename       <aString>      the SQLite file holding the store
+    '''
+
+    @classmethod
+    def isRunStore(cls, filename):
+        "Check whether filename is a GA run store"
+
+        with open(filename, 'rb') as fileIn:
+            if fileIn.read(16) != b'SQLite format 3\x00':
+                return False
+        connection = sqlite3.connect(filename)
+        try:
+            return connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'logbook'").fetchone() is not None
+        finally:
+            connection.close()
+
+    def __init__(self, filename):
+        self.filename = filename
+        try:
+            self._connection = sqlite3.connect(filename, timeout = 60)
+            self._connection.execute('CREATE TABLE IF NOT EXISTS logbook '
+                                     '(seq INTEGER PRIMARY KEY, record BLOB NOT NULL)')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS history '
+                                     '(idx INTEGER PRIMARY KEY, parents TEXT NOT NULL, individual BLOB NOT NULL)')
+            self._connection.commit()
+        except sqlite3.DatabaseError as e:
+            raise GARunStoreError("%s is not a GA run store: %s" % (filename, e))
+
+    def logbookLength(self):
+        "Return the number of logbook records in the store"
+
+        return self._connection.execute('SELECT COUNT(*) FROM logbook').fetchone()[0]
+
+    def lastHistoryIndex(self):
+        "Return the highest genealogy index in the store, 0 if the history is empty"
+
+        return self._connection.execute('SELECT MAX(idx) FROM history').fetchone()[0] or 0
+
+    def appendLogbook(self, logbook):
+        '''Store the records of logbook not stored yet. logbook must be the
+           logbook whose first records were stored by the previous calls'''
+
+        stored = self.logbookLength()
+        with self._connection:
+            self._connection.executemany('INSERT INTO logbook (seq, record) VALUES (?, ?)',
+                                         ((seq, pickle.dumps(record, pickle.HIGHEST_PROTOCOL))
+                                          for seq, record in enumerate(logbook[stored:], stored)))
+
+    def appendHistory(self, history):
+        '''Store the entries of history with a genealogy index higher than
+           the ones already stored'''
+
+        last = self.lastHistoryIndex()
+        with self._connection:
+            self._connection.executemany('INSERT INTO history (idx, parents, individual) VALUES (?, ?, ?)',
+                                         ((idx, json.dumps(history.genealogy_tree[idx]),
+                                           pickle.dumps(history.genealogy_history[idx], pickle.HIGHEST_PROTOCOL))
+                                          for idx in sorted(history.genealogy_history) if idx > last))
+
+    def records(self, start = 0):
+        "Iterate over the (position, record) pairs of the logbook records from position start on"
+
+        for seq, record in self._connection.execute('SELECT seq, record FROM logbook WHERE seq >= ? ORDER BY seq', (start,)):
+            yield seq, pickle.loads(record)
+
+    def logbook(self):
+        "Return the DEAP Logbook rebuilt from the stored records"
+
+        logbook = tools.Logbook()
+        for seq, record in self.records():
+            logbook.record(**record)
+        return logbook
+
+    def history(self):
+        "Return the DEAP History rebuilt from the stored entries"
+
+        history = tools.History()
+        for idx, parents, individual in self._connection.execute('SELECT idx, parents, individual FROM history ORDER BY idx'):
+            history.genealogy_tree[idx] = tuple(json.loads(parents))
+            history.genealogy_history[idx] = pickle.loads(individual)
+            history.genealogy_index = idx
+        return history
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
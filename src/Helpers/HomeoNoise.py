@@ -8,6 +8,11 @@ import numpy as np
 import random
 import sys
 
+
+class HomeoNoiseError(Exception):
+    pass
+
+
 class HomeoNoise(object, metaclass=Singleton):
     '''
     HomeoNoise is a utility class that provides different algorithms to deal with 
@@ -28,9 +33,23 @@ class HomeoNoise(object, metaclass=Singleton):
 
     The noise-computing algorithm is selected by changing the values of 
     the three iVars mode, distribution, and ratio, and then calling the method getNoise. 
-    This method constructs a selector string from the values of the ivar and calls the corresponding method. 
-
+    The setters look the algorithm up in the class's dispatch table, so getNoise 
+    just calls it.
+
+    Noise models
+    The twelve algorithms are also available as static methods noise<Mode><Distribution><Ratio>
+    taking (current, noise, rng), which units and connections use directly. A noise model is
+    identified by its name (e.g. 'DistortingNormalLinear') or by its code, the position of
+    the algorithm in HomeoNoise.algorithms: code = 6 * mode + 2 * distribution + ratio,
+    with the indexes of mode, distribution and ratio in Modes, Distributions and Ratios.
+    The compiled kernels (see Core.HomeoJIT._jit_noise) implement the same algorithms,
+    selected by the same codes.
     '''
+
+    Modes = ('Degrading', 'Distorting')
+    Distributions = ('Constant', 'Normal', 'Uniform')
+    Ratios = ('Linear', 'Proportional')
+
     def __init__(self):
         '''
         Initialize the instance to a current of 1 and noise of 0, representing a full current and no noise. 
@@ -44,6 +63,34 @@ class HomeoNoise(object, metaclass=Singleton):
         self._mode = 'Distorting'
         self._distribution = 'Normal'
         self._ratio = 'Proportional'
+        self._selectAlgorithm()
+
+    @staticmethod
+    def modelNames():
+        '''Return the names of all noise models, in the order of their codes'''
+        return tuple(mode + distribution + ratio
+                     for mode in HomeoNoise.Modes
+                     for distribution in HomeoNoise.Distributions
+                     for ratio in HomeoNoise.Ratios)
+
+    @staticmethod
+    def modelCode(aModel):
+        '''Return the code of a noise model given either by name or by code'''
+        if isinstance(aModel, str):
+            try:
+                return HomeoNoise.modelNames().index(aModel)
+            except ValueError:
+                raise HomeoNoiseError("Unknown noise model: %s" % aModel)
+        if isinstance(aModel, (int, np.integer)) and 0 <= aModel < len(HomeoNoise.algorithms):
+            return int(aModel)
+        raise HomeoNoiseError("Unknown noise model: %s" % (aModel,))
+
+    @staticmethod
+    def modelName(aCode):
+        return HomeoNoise.modelNames()[HomeoNoise.modelCode(aCode)]
+
+    def _selectAlgorithm(self):
+        self._algorithm = HomeoNoise.algorithms[HomeoNoise.modelCode(self._mode + self._distribution + self._ratio)]
 
     def getCurrent(self):
         return self._current
@@ -112,33 +159,38 @@ class HomeoNoise(object, metaclass=Singleton):
         if self._noise == 0:
             return 0
         else:
-            noiseAlg = 'getNoise' + self._mode + self._distribution + self._ratio
-            producedNoise =  getattr(self, noiseAlg)()
-            return producedNoise
+            return self._algorithm(self._current, self._noise, np.random)
 
     "Methods setting noise's mode"
     def degrading(self):
         self._mode = 'Degrading'
+        self._selectAlgorithm()
 
     def distorting(self):
         self._mode = 'Distorting'
+        self._selectAlgorithm()
 
     "Methods setting noise's ratio"
     def proportional(self):
         self._ratio = 'Proportional'
+        self._selectAlgorithm()
 
     def linear(self):
         self._ratio = 'Linear'
+        self._selectAlgorithm()
         
     "Methods setting noise's distribution"
     def normal(self):
         self._distribution = 'Normal'
+        self._selectAlgorithm()
         
     def uniform(self):
         self._distribution = 'Uniform'
+        self._selectAlgorithm()
         
     def constant(self): 
         self._distribution = 'Constant'
+        self._selectAlgorithm()
 
 #    "Noise algorithms"
 #
@@ -190,7 +242,8 @@ class HomeoNoise(object, metaclass=Singleton):
 #        return (abs(self._current) - (self._noise * abs(self._current) *noiseSign)) * currentSign
     "Noise algorithms"
 
-    def getNoiseDegradingConstantLinear(self):
+    @staticmethod
+    def noiseDegradingConstantLinear(current, noise, rng = None):
         '''Return a degrading noise (with sign always opposite to affected current), 
             and constant value equal to the noise parameter.
             
@@ -198,167 +251,196 @@ class HomeoNoise(object, metaclass=Singleton):
             that  noise is some kind of extraneous activity that always takes
             place, regardless of whether there is some current on the 
             affected line'''
-        
-        if self._current == 0:
-            return self._noise * -1
-        else:
-            return self._noise * -1 * np.sign(self._current)
 
-    def getNoiseDegradingConstantProportional(self):
+        if noise == 0:
+            return 0.0
+        if current == 0:
+            return -noise
+        return -noise if current > 0 else noise
+
+    @staticmethod
+    def noiseDegradingConstantProportional(current, noise, rng = None):
         '''Return a degrading noise (with sign always opposite to affected current), 
             and constant value equal to the ratio between the noise parameter and the affected current'''
 
-        if self.noise == 0:
-            return 0
-        else:
-            if self.current == 0:
-                return - self.noise
-            else:
-                return (self._noise * abs(self._current)) * np.sign(self._current) * -1
+        if noise == 0:
+            return 0.0
+        if current == 0:
+            return -noise
+        return -noise * current
 
-    def getNoiseDegradingNormalLinear(self):
+    @staticmethod
+    def noiseDegradingNormalLinear(current, noise, rng = None):
         '''Return a degrading noise (sign always opposite to current),
-           normally distributed and proportional to the absolute magnitude of the noise parameter'''
+           normally distributed and proportional to the absolute magnitude of the noise parameter.
+           The value is trimmed within the interval (0, 2 * noise)'''
 
-        if self.noise == 0:
-            return 0
-        else:
-            noiseSign = np.sign(self._current) * -1 
-            noiseAbsValue = np.random.normal(self._noise, self._noise * 1 / 3.)
-
-            "trim noise within the interval (0, 2 * noise)"
-            return np.clip(noiseAbsValue, 0, 2* self.noise) * noiseSign
+        if noise == 0:
+            return 0.0
+        rng = np.random if rng is None else rng
+        noiseAbsValue = rng.normal(noise, noise / 3.)
+        return max(0.0, min(2 * noise, noiseAbsValue)) * -_sign(current)
 
-    def getNoiseDegradingNormalProportional(self):
+    @staticmethod
+    def noiseDegradingNormalProportional(current, noise, rng = None):
         '''Return a degrading noise (with sign always opposite to affected current), 
             and normally distributed value in the interval [0, 2 * noise * abs(current)]
             If the affected current is = 0, still returns a value in the interval 
-            (0 , 2 * noise)'''
+            (0 , noise)'''
 
-        if self.noise == 0:
-            return 0
-        else:
-            if self._current != 0:
-                minNoise = - self._noise * abs(self._current)
-                maxNoise = self._noise * abs(self._current)
-            else:
-                minNoise = - self._noise
-                maxNoise = self._noise
-
-        if self.noise == 0:
-            return 0
+        if noise == 0:
+            return 0.0
+        if current != 0:
+            noiseSign = -_sign(current)
+            maxAbsNoise = noise * abs(current) * 2
         else:
-            if self._current != 0:
-                noiseSign = np.sign(self._current) * -1 
-                minAbsNoise = 0
-                maxAbsNoise = self._noise * abs(self._current) * 2
-            else:
-                noiseSign = -1
-                minAbsNoise = 0
-                maxAbsNoise = self._noise
-
-            noiseAbsValue = np.random.normal(maxAbsNoise / 2, maxAbsNoise / 6.)
-        
-            "trim noise within the interval {0, 2 *noise *current abs}"
-            return np.clip(noiseAbsValue, minAbsNoise, maxAbsNoise) * noiseSign
+            noiseSign = -1.0
+            maxAbsNoise = noise
+        rng = np.random if rng is None else rng
+        noiseAbsValue = rng.normal(maxAbsNoise / 2, maxAbsNoise / 6.)
+        return max(0.0, min(maxAbsNoise, noiseAbsValue)) * noiseSign
 
-    def getNoiseDegradingUniformLinear(self):
+    @staticmethod
+    def noiseDegradingUniformLinear(current, noise, rng = None):
         '''Return a degrading noise (sign always opposite to current) uniformly distributed
              and proportional to the absolute magnitude of the noise parameter'''
 
-        currentSign = np.sign(self._current) * -1
-        maxNoise = self._noise
-        noiseAbsValue = np.random.uniform(0, (2 * maxNoise))
+        if noise == 0:
+            return 0.0
+        rng = np.random if rng is None else rng
+        return rng.uniform(0, 2 * noise) * -_sign(current)
 
-        return noiseAbsValue * currentSign
-    
-    def getNoiseDegradingUniformProportional(self):
+    @staticmethod
+    def noiseDegradingUniformProportional(current, noise, rng = None):
         '''Return a degrading noise (with sign always opposite to affected current), 
             and uniformly distributed value in the interval [0, 2 * noise * current ]'''
 
-        currentSign = np.sign(self._current)  * -1
-        maxNoise = 2 * self._noise * abs(self._current)
-        noiseAbsValue = np.random.uniform(0, maxNoise)
-        return noiseAbsValue * currentSign
+        if noise == 0:
+            return 0.0
+        rng = np.random if rng is None else rng
+        return rng.uniform(0, 2 * noise * abs(current)) * -_sign(current)
 
-    def getNoiseDistortingConstantLinear(self):
+    @staticmethod
+    def noiseDistortingConstantLinear(current, noise, rng = None):
         '''Return a distorting noise (centered around 0),  
             with absolute value equal to the noise parameter'''
 
-        randomSign = np.sign(np.random.uniform(-1,1))
-        return  self._noise * randomSign
+        if noise == 0:
+            return 0.0
+        rng = np.random if rng is None else rng
+        return noise * _sign(rng.uniform(-1, 1))
 
-    def getNoiseDistortingConstantProportional(self):
+    @staticmethod
+    def noiseDistortingConstantProportional(current, noise, rng = None):
         '''Return a distorting noise (centered around 0),
             equal to the ratio between the absolute magnitude
             of the affected current and the noise parameter'''
 
-        randomSign = np.sign(np.random.uniform(-1,1))
-        return self.noise *abs(self._current) * randomSign
+        if noise == 0:
+            return 0.0
+        rng = np.random if rng is None else rng
+        return noise * abs(current) * _sign(rng.uniform(-1, 1))
 
-    def getNoiseDistortingNormalLinear(self):
+    @staticmethod
+    def noiseDistortingNormalLinear(current, noise, rng = None):
         '''Returns a distorting noise (centered around 0),
              normally distributed and proportional to 
-             the  absolute magnitude of the noise parameter'''
- 
-        if self.noise == 0:
-            return 0
-        else:
-            noiseValue =  np.random.normal(0, self._noise / 3.)
-        
-        "trim noise within the interval { -noise, noise}"
-        return max(-self._noise, min(self._noise, noiseValue))
-            
-    def getNoiseDistortingNormalProportional(self):
+             the  absolute magnitude of the noise parameter,
+             trimmed within the interval [-noise, noise]'''
+
+        if noise == 0:
+            return 0.0
+        rng = np.random if rng is None else rng
+        noiseValue = rng.normal(0.0, noise / 3.)
+        return max(-noise, min(noise, noiseValue))
+
+    @staticmethod
+    def noiseDistortingNormalProportional(current, noise, rng = None):
         '''Returns a distorting noise (centered around 0), normally distributed
          and proportional to the absolute magnitude of the affected current
          
          Standard deviation of the normal distribution is 1/3 of noise's value'''
 
+        if noise == 0:
+            return 0.0
+        bound = noise * abs(current) if current != 0 else noise
+        rng = np.random if rng is None else rng
+        noiseValue = rng.normal(0.0, bound / 3.)
+        return max(-bound, min(bound, noiseValue))
 
-        if self.noise == 0:
-            return 0
-        else:
-            if self._current != 0:
-                minNoise = - self._noise * abs(self._current)
-                maxNoise = self._noise * abs(self._current)
-            else:
-                minNoise = - self._noise
-                maxNoise = self._noise
-
-        noiseValue = np.random.normal(0, maxNoise / 3.)
-    
-        "trim noise within the interval (0, 2 *noise)"
-        return max(minNoise, min(maxNoise, noiseValue))
-        
-
-    def getNoiseDistortingUniformLinear(self):
+    @staticmethod
+    def noiseDistortingUniformLinear(current, noise, rng = None):
         '''Return a distorting noise (centered around 0),
              uniformly distributed in the interval [-noise, noise]'''
 
-        maxNoise = self._noise
-        noiseAbsValue = np.random.uniform(- maxNoise, maxNoise)
-
-        return noiseAbsValue
+        if noise == 0:
+            return 0.0
+        rng = np.random if rng is None else rng
+        return rng.uniform(-noise, noise)
 
-    def getNoiseDistortingUniformProportional(self):
+    @staticmethod
+    def noiseDistortingUniformProportional(current, noise, rng = None):
         '''Return a distorting noise (centered around 0), 
             uniformly distributed in the interval [-noise * abs(current), noise * abs(current) ]'''
 
-        maxNoise = self._noise * abs(self._current)
-        noiseValue = np.random.uniform(- maxNoise, maxNoise)
+        if noise == 0:
+            return 0.0
+        bound = noise * abs(current)
+        rng = np.random if rng is None else rng
+        return rng.uniform(-bound, bound)
 
-        return noiseValue
+    "Instance methods applying the algorithms to current and noise, drawing from numpy.random"
+
+    def getNoiseDegradingConstantLinear(self):
+        return HomeoNoise.noiseDegradingConstantLinear(self._current, self._noise, np.random)
+
+    def getNoiseDegradingConstantProportional(self):
+        return HomeoNoise.noiseDegradingConstantProportional(self._current, self._noise, np.random)
+
+    def getNoiseDegradingNormalLinear(self):
+        return HomeoNoise.noiseDegradingNormalLinear(self._current, self._noise, np.random)
+
+    def getNoiseDegradingNormalProportional(self):
+        return HomeoNoise.noiseDegradingNormalProportional(self._current, self._noise, np.random)
+
+    def getNoiseDegradingUniformLinear(self):
+        return HomeoNoise.noiseDegradingUniformLinear(self._current, self._noise, np.random)
+
+    def getNoiseDegradingUniformProportional(self):
+        return HomeoNoise.noiseDegradingUniformProportional(self._current, self._noise, np.random)
+
+    def getNoiseDistortingConstantLinear(self):
+        return HomeoNoise.noiseDistortingConstantLinear(self._current, self._noise, np.random)
+
+    def getNoiseDistortingConstantProportional(self):
+        return HomeoNoise.noiseDistortingConstantProportional(self._current, self._noise, np.random)
+
+    def getNoiseDistortingNormalLinear(self):
+        return HomeoNoise.noiseDistortingNormalLinear(self._current, self._noise, np.random)
+
+    def getNoiseDistortingNormalProportional(self):
+        return HomeoNoise.noiseDistortingNormalProportional(self._current, self._noise, np.random)
+
+    def getNoiseDistortingUniformLinear(self):
+        return HomeoNoise.noiseDistortingUniformLinear(self._current, self._noise, np.random)
+
+    def getNoiseDistortingUniformProportional(self):
+        return HomeoNoise.noiseDistortingUniformProportional(self._current, self._noise, np.random)
 
     @staticmethod
-    def connNoise(current, noise):
+    def connNoise(current, noise, rng = None):
         '''Inlined distorting-normal-proportional noise for connections.
            Equivalent to getNoiseDistortingNormalProportional but avoids
-           singleton re-init, string dispatch, and numpy scalar overhead.'''
+           singleton re-init, string dispatch, and numpy scalar overhead.
+           rng is the numpy Generator or HomeoNoiseSupply to draw from (see Core.HomeoRandom),
+           the random module is used when it is None'''
         if noise == 0:
             return 0.0
         bound = noise * abs(current) if current != 0 else noise
-        val = random.gauss(0, bound / 3.0)
+        if rng is None:
+            val = random.gauss(0, bound / 3.0)
+        else:
+            val = rng.normal(0.0, bound / 3.0)
         if val < -bound:
             return -bound
         if val > bound:
@@ -366,16 +448,31 @@ class HomeoNoise(object, metaclass=Singleton):
         return val
 
     @staticmethod
-    def unitNoise(noise):
+    def unitNoise(noise, rng = None):
         '''Inlined distorting-normal-linear noise for units.
            Equivalent to getNoiseDistortingNormalLinear but avoids
-           singleton re-init, string dispatch, and numpy scalar overhead.'''
+           singleton re-init, string dispatch, and numpy scalar overhead.
+           rng is as in connNoise'''
         if noise == 0:
             return 0.0
-        val = random.gauss(0, noise / 3.0)
+        if rng is None:
+            val = random.gauss(0, noise / 3.0)
+        else:
+            val = rng.normal(0.0, noise / 3.0)
         if val < -noise:
             return -noise
         if val > noise:
             return noise
         return val
 
+
+def _sign(aNumber):
+    if aNumber > 0:
+        return 1.0
+    if aNumber < 0:
+        return -1.0
+    return 0.0
+
+
+"The dispatch table of the noise models, indexed by code (see HomeoNoise.modelCode)"
+HomeoNoise.algorithms = tuple(getattr(HomeoNoise, 'noise' + name) for name in HomeoNoise.modelNames())
@@ -8,6 +8,11 @@ are written once in the header; per-tick columns capture deviation,
 output, velocity, torque, stress, signed connection weights, OU sigma,
 sensor readings, motor speeds, and robot position.
 
+With columnar=True the log is written in compressed columnar chunks
+instead (see Helpers.ColumnarStateLog), which avoids formatting every
+value as text; decimation=N also writes a min/max/mean log over windows
+of N logged ticks in the same pass.
+
 In headless mode the JIT arrays (_jit_weights, _jit_switches) are the
 authoritative source of connection weights — the Connection objects may
 be stale.  The logger detects headless mode and reads from JIT arrays.
@@ -26,6 +31,7 @@ import os
 import time
 import numpy as np
 from math import sqrt, degrees
+from Helpers.ColumnarStateLog import ColumnarStateLogWriter, DefaultChunkRows
 
 
 class HomeostatStateLogger:
@@ -38,10 +44,18 @@ class HomeostatStateLogger:
         log_interval: only log every N-th tick (default 1 = every tick)
         target_pos:   (x, y) of the light source (default (7, 7))
         seed:         RNG seed used for this run (logged in metadata header)
+        columnar:     write a columnar .npz log instead of a TSV file
+        decimation:   with columnar, also write a min/max/mean log over
+                      windows of this many logged ticks
+        chunk_rows:   with columnar, rows buffered before a chunk is written
+        resume_offset: continue the TSV file filepath from this offset (see
+                      file_position), dropping what was written after it
     '''
 
     def __init__(self, homeostat, khepera_sim, filepath,
-                 log_interval=1, target_pos=(7, 7), seed=None):
+                 log_interval=1, target_pos=(7, 7), seed=None,
+                 columnar=False, decimation=None, chunk_rows=DefaultChunkRows,
+                 resume_offset=None):
         self._seed = seed
         self._hom = homeostat
         self._sim = khepera_sim
@@ -101,50 +115,81 @@ class HomeostatStateLogger:
                 cols.append('sigma_%s' % name)
         self._columns = cols
         self._ncols = len(cols)
+        # Row format of the TSV file: heading has 3 decimals, tick none
+        self._row_format = '\t'.join(['%d', '%.6f', '%.6f', '%.6f', '%.3f'] +
+                                     ['%.6f'] * (self._ncols - 5)) + '\n'
+
+        if columnar:
+            if resume_offset is not None:
+                raise ValueError('columnar state logs cannot be resumed')
+            self._f = None
+            self._log = ColumnarStateLogWriter(
+                filepath, cols, dtypes=[np.int64] + [np.float64] * (self._ncols - 1),
+                metadata=dict([('format', 'HomeostatStateLog v1')] + self._metadata()),
+                chunk_rows=chunk_rows, decimation=decimation)
+        else:
+            if decimation is not None:
+                raise ValueError('decimation requires a columnar state log')
+            self._log = None
+            if resume_offset is not None:
+                self._f = open(filepath, 'r+')
+                self._f.truncate(resume_offset)
+                self._f.seek(resume_offset)
+                return
+            # Open file and write header
+            self._f = open(filepath, 'w')
+            self._write_metadata_header()
+            self._f.write('\t'.join(self._columns) + '\n')
+            self._f.flush()
 
-        # Open file and write header
-        self._f = open(filepath, 'w')
-        self._write_metadata_header()
-        self._f.write('\t'.join(self._columns) + '\n')
-        self._f.flush()
-
-    def _write_metadata_header(self):
-        '''Write #-prefixed metadata lines with constant parameters.'''
-        f = self._f
-        f.write('# HomeostatStateLog v1\n')
-        f.write('# date\t%s\n' % time.strftime('%Y-%m-%d %H:%M:%S'))
+    def _metadata(self):
+        '''Return the (key, value) pairs of the metadata header,
+        values formatted as strings.'''
+        items = [('date', time.strftime('%Y-%m-%d %H:%M:%S'))]
         if self._seed is not None:
-            f.write('# seed\t%d\n' % self._seed)
-        f.write('# log_interval\t%d\n' % self._interval)
-        f.write('# target_x\t%.3f\n' % self._target[0])
-        f.write('# target_y\t%.3f\n' % self._target[1])
-        f.write('# headless\t%s\n' % self._headless)
-        f.write('# min_dt_fast\t%.6f\n' % self._min_dt_fast)
-        f.write('# n_units\t%d\n' % len(self._units))
-
-        from Core.HomeoUniselectorContinuous import HomeoUniselectorContinuous
+            items.append(('seed', '%d' % self._seed))
+        items += [('log_interval', '%d' % self._interval),
+                  ('target_x', '%.3f' % self._target[0]),
+                  ('target_y', '%.3f' % self._target[1]),
+                  ('headless', '%s' % self._headless),
+                  ('min_dt_fast', '%.6f' % self._min_dt_fast),
+                  ('n_units', '%d' % len(self._units))]
 
         for i, unit in enumerate(self._units):
-            prefix = '# unit_%s' % unit.name
-            f.write('%s_type\t%s\n' % (prefix, type(unit).__name__))
-            f.write('%s_mass\t%.6f\n' % (prefix, unit.mass))
-            f.write('%s_viscosity\t%.6f\n' % (prefix, unit.viscosity))
-            f.write('%s_maxDeviation\t%.6f\n' % (prefix, unit.maxDeviation))
-            dt_fast = getattr(unit, '_dt_fast', 1.0)
-            f.write('%s_dt_fast\t%.6f\n' % (prefix, dt_fast))
+            prefix = 'unit_%s' % unit.name
+            items += [(prefix + '_type', type(unit).__name__),
+                      (prefix + '_mass', '%.6f' % unit.mass),
+                      (prefix + '_viscosity', '%.6f' % unit.viscosity),
+                      (prefix + '_maxDeviation', '%.6f' % unit.maxDeviation),
+                      (prefix + '_dt_fast', '%.6f' % getattr(unit, '_dt_fast', 1.0))]
             if self._has_ou[i]:
                 unis = unit.uniselector
-                f.write('%s_tau_a\t%.6f\n' % (prefix, unis._tau_a))
-                f.write('%s_theta\t%.6f\n' % (prefix, unis._theta))
-                f.write('%s_sigma_base\t%.6f\n' % (prefix, unis._sigma_base))
-                f.write('%s_sigma_crit\t%.6f\n' % (prefix, unis._sigma_crit))
-                f.write('%s_stress_exponent\t%.6f\n' % (
-                    prefix, unis._stress_exponent))
+                items += [(prefix + '_tau_a', '%.6f' % unis._tau_a),
+                          (prefix + '_theta', '%.6f' % unis._theta),
+                          (prefix + '_sigma_base', '%.6f' % unis._sigma_base),
+                          (prefix + '_sigma_crit', '%.6f' % unis._sigma_crit),
+                          (prefix + '_stress_exponent', '%.6f' % unis._stress_exponent)]
+        return items
+
+    def _write_metadata_header(self):
+        '''Write #-prefixed metadata lines with constant parameters.'''
+        f = self._f
+        f.write('# HomeostatStateLog v1\n')
+        for key, value in self._metadata():
+            f.write('# %s\t%s\n' % (key, value))
 
     def log_tick(self, tick):
         '''Write one row of state data.  Call after all units have updated.'''
         if tick % self._interval != 0:
             return
+        vals = self._row(tick)
+        if self._log is not None:
+            self._log.append(vals)
+        else:
+            self._f.write(self._row_format % tuple(vals))
+
+    def _row(self, tick):
+        '''Return the values of one row of state data.'''
 
         robot = self._robot
         rx = robot.body.position[0]
@@ -158,20 +203,14 @@ class HomeostatStateLogger:
 
         phys_time = tick * self._min_dt_fast
 
-        vals = ['%d' % tick,
-                '%.6f' % phys_time,
-                '%.6f' % rx, '%.6f' % ry,
-                '%.3f' % heading, '%.6f' % dist,
-                '%.6f' % l_sensor, '%.6f' % r_sensor,
-                '%.6f' % l_speed, '%.6f' % r_speed]
+        vals = [tick, phys_time, rx, ry, heading, dist,
+                l_sensor, r_sensor, l_speed, r_speed]
 
         # Per-unit columns
         for unit in self._units:
-            vals.append('%.6f' % unit.criticalDeviation)
-            vals.append('%.6f' % unit.currentOutput)
-            vals.append('%.6f' % unit.currentVelocity)
-            vals.append('%.6f' % unit.inputTorque)
-            vals.append('%.6f' % unit.stressLevel())
+            vals += [unit.criticalDeviation, unit.currentOutput,
+                     unit.currentVelocity, unit.inputTorque,
+                     unit.stressLevel()]
 
         # Connection weights (signed = weight * switch)
         for source in self._conn_sources:
@@ -181,23 +220,35 @@ class HomeostatStateLogger:
             else:
                 _, unit, conn = source
                 w = conn.weight * conn.switch
-            vals.append('%.6f' % w)
+            vals.append(w)
 
         # OU sigma columns
         for i, unit in enumerate(self._units):
             if self._has_ou[i]:
                 stress = unit.stressLevel()
                 sigma = unit.uniselector.sigma(stress)
-                vals.append('%.6f' % sigma)
-
-        self._f.write('\t'.join(vals) + '\n')
+                vals.append(sigma)
+        return vals
 
     def flush(self):
         '''Flush the output buffer to disk.'''
+        if self._log is not None:
+            self._log.flush()
+        else:
+            self._f.flush()
+
+    def file_position(self):
+        '''Flush a TSV log and return its current offset, where a resumed
+        run continues it (see resume_offset).  None for columnar logs.'''
+        if self._log is not None:
+            return None
         self._f.flush()
+        return self._f.tell()
 
     def close(self):
         '''Flush and close the log file.'''
-        if self._f and not self._f.closed:
+        if self._log is not None:
+            self._log.close()
+        elif self._f and not self._f.closed:
             self._f.flush()
             self._f.close()
@@ -0,0 +1,200 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+
+Indexed view of the individuals recorded in the logbook of a GA run.
+
+Finding an individual, the individuals of a generation or the best ones used to
+mean unpickling the whole logbook and scanning all its records at every query,
+which takes minutes on campaigns of 100k individuals. A LogbookIndex reads the
+logbook once and keeps ID, generation, fitness and genome of every individual
+record (the records with an indivId) in a SQLite file next to the logbook
+(<logbook filename>.lgbidx), indexed by ID, generation and fitness. The general
+info records (the ones with a date) are kept as well, without their final population.
+
+The index is brought up to date when it is opened: the records added to a GA run
+store (see Helpers.GARunStore) since the index was built are appended to it, while
+a pickled logbook (.lgb) is indexed again from scratch when the file changes.
+When the index cannot be written next to the logbook it is kept in memory.
+'''
+
+from Helpers.GARunStore import GARunStore
+import sqlite3, json, pickle, os
+import numpy as np
+
+
+class LogbookIndexError(Exception):
+    pass
+
+
+Extension = 'lgbidx'
+Version = 1
+
+
+def _generationOf(indID):
+    "Return the generation encoded in an individual ID of the form #gen-#, or None"
+
+    try:
+        return int(indID.split('-')[0])
+    except (ValueError, AttributeError):
+        return None
+
+
+class LogbookIndex(object):
+    '''
+    LogbookIndex answers queries about the individuals of a logbook.
+    Queries return dictionaries with indivId, fitness and genome at the
+    respective keys, as extractGenomeOfIndID does.
+
+    Instance Variables:
+        logbookFilename <aString>      the logbook file, a GA run store or a pickled logbook
+        filename        <aString>      the SQLite file holding the index, or ':memory:'
+    '''
+
+    @classmethod
+    def indexFilename(cls, logbookFilename):
+        "Return the name of the index file of logbookFilename"
+
+        return logbookFilename + '.' + Extension
+
+    def __init__(self, logbookFilename):
+        if not os.path.exists(logbookFilename):
+            raise IOError("No logbook file %s" % logbookFilename)
+        self.logbookFilename = logbookFilename
+        self.filename = self.indexFilename(logbookFilename)
+        try:
+            self._connection = self._openIndex(self.filename)
+        except sqlite3.DatabaseError:
+            "Read-only directory, or a damaged index: keep the index in memory"
+            self.filename = ':memory:'
+            self._connection = self._openIndex(self.filename)
+        self.refresh()
+
+    def _openIndex(self, filename):
+        connection = sqlite3.connect(filename, timeout = 60)
+        try:
+            connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            connection.execute('CREATE TABLE IF NOT EXISTS individuals '
+                               '(seq INTEGER PRIMARY KEY, id TEXT, generation INTEGER, fitness REAL, '
+                               'fitnessValues TEXT NOT NULL, genome BLOB NOT NULL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS individualsId ON individuals (id)')
+            connection.execute('CREATE INDEX IF NOT EXISTS individualsGeneration ON individuals (generation)')
+            connection.execute('CREATE INDEX IF NOT EXISTS individualsFitness ON individuals (fitness)')
+            connection.execute('CREATE TABLE IF NOT EXISTS info (seq INTEGER PRIMARY KEY, record BLOB NOT NULL)')
+            connection.commit()
+        except sqlite3.DatabaseError:
+            connection.close()
+            raise
+        return connection
+
+    def _meta(self, key):
+        row = self._connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def _sourceSignature(self):
+        stat = os.stat(self.logbookFilename)
+        return [Version, stat.st_size, stat.st_mtime_ns]
+
+    def refresh(self):
+        '''Bring the index up to date with the logbook file. Return the number
+           of logbook records indexed'''
+
+        signature = self._sourceSignature()
+        if signature == self._meta('signature'):
+            return 0
+        if GARunStore.isRunStore(self.logbookFilename):
+            "A run store only grows: index the records added since the last refresh"
+            start = self._meta('indexedRecords') if self._meta('source') == 'store' else None
+            if start is None:
+                self._clear()
+                start = 0
+            store = GARunStore(self.logbookFilename)
+            try:
+                records = list(store.records(start))
+            finally:
+                store.close()
+            source = 'store'
+        else:
+            "Imported here, since StatsAnalyzer uses LogbookIndex"
+            from Helpers.StatsAnalyzer import loadLogbook
+            self._clear()
+            start = 0
+            try:
+                records = list(enumerate(loadLogbook(self.logbookFilename)))
+            except (pickle.UnpicklingError, EOFError) as e:
+                raise LogbookIndexError("Cannot read logbook %s: %s" % (self.logbookFilename, e))
+            source = 'pickle'
+        with self._connection:
+            self._connection.executemany('INSERT INTO individuals (seq, id, generation, fitness, fitnessValues, genome) '
+                                         'VALUES (?, ?, ?, ?, ?, ?)',
+                                         ((seq, record['indivId'], _generationOf(record['indivId']),
+                                           float(record['fitness'][0]) if len(record['fitness']) else None,
+                                           json.dumps([float(value) for value in record['fitness']]),
+                                           np.asarray(record['genome'], dtype = np.float64).tobytes())
+                                          for seq, record in records if 'indivId' in record))
+            self._connection.executemany('INSERT INTO info (seq, record) VALUES (?, ?)',
+                                         ((seq, pickle.dumps({key: value for key, value in record.items() if key != 'finalIndivs'},
+                                                             pickle.HIGHEST_PROTOCOL))
+                                          for seq, record in records if 'date' in record))
+            self._connection.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                                         (('signature', json.dumps(signature)),
+                                          ('source', json.dumps(source)),
+                                          ('indexedRecords', json.dumps(start + len(records)))))
+        return len(records)
+
+    def _clear(self):
+        with self._connection:
+            self._connection.execute('DELETE FROM individuals')
+            self._connection.execute('DELETE FROM info')
+            self._connection.execute('DELETE FROM meta')
+
+    def _individuals(self, query, parameters = ()):
+        return [{'indivId': indID, 'fitness': tuple(json.loads(fitness)), 'genome': np.frombuffer(genome).tolist()}
+                for indID, fitness, genome in self._connection.execute(query, parameters)]
+
+    def __len__(self):
+        return self._connection.execute('SELECT COUNT(*) FROM individuals').fetchone()[0]
+
+    def individual(self, indID):
+        '''Return the first record of individual indID, or None'''
+
+        found = self._individuals('SELECT id, fitnessValues, genome FROM individuals WHERE id = ? '
+                                  'ORDER BY seq LIMIT 1', (indID,))
+        return found[0] if found else None
+
+    def generation(self, gen):
+        '''Return the records of the individuals of generation gen, in logbook order'''
+
+        return self._individuals('SELECT id, fitnessValues, genome FROM individuals WHERE generation = ? '
+                                 'ORDER BY seq', (gen,))
+
+    def generations(self):
+        "Return the sorted generations of the indexed individuals"
+
+        return [gen for (gen,) in self._connection.execute('SELECT DISTINCT generation FROM individuals '
+                                                           'WHERE generation IS NOT NULL ORDER BY generation')]
+
+    def best(self, num = 10, max = False):
+        '''Return the records of the num individuals with the lowest first fitness,
+           or the highest if max is True. All the individuals if num is None'''
+
+        return self._individuals('SELECT id, fitnessValues, genome FROM individuals WHERE fitness IS NOT NULL '
+                                 'ORDER BY fitness %s, seq LIMIT ?' % ('DESC' if max else 'ASC'),
+                                 (-1 if num is None else num,))
+
+    def genomes(self):
+        "Return the set of the genomes of the indexed individuals, as tuples"
+
+        return set(tuple(np.frombuffer(genome).tolist()) for (genome,) in self._connection.execute('SELECT genome FROM individuals'))
+
+    def generalInfo(self):
+        '''Return the first general info record of the logbook, or None'''
+
+        row = self._connection.execute('SELECT record FROM info ORDER BY seq LIMIT 1').fetchone()
+        return None if row is None else pickle.loads(row[0])
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
@@ -0,0 +1,320 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+
+Binary trajectory format for the internal Khepera simulator.
+
+RobotTrajectoryWriter formats and writes a text line at every simulation step.
+BufferedTrajectoryWriter records the same data in a binary file instead:
+each step only stores the robot's pose in a preallocated buffer, and full
+buffers are written to disk in large blocks by a background thread.
+A binary trajectory file consists of:
+
+    8 bytes       magic string b'HOMEOTRJ'
+    4 bytes       format version (little-endian uint32)
+    4 bytes       length of the metadata (little-endian uint32)
+    metadata      a JSON dictionary with the dtype of the data, the light records
+                  of the text header (see RobotTrajectoryWriter.lightRecords), the
+                  position of the lights whose distance is recorded and the
+                  vehicle's initial position
+    padding       spaces up to a multiple of 64 bytes
+    data          rows of robot_x, robot_y and angle (in radians), one per step
+
+Light positions and distances, which are constant or follow from the pose,
+are not stored: RobotTrajectoryFile computes them when the file is read
+and converts the file to the text format read by TrajectoryGrapher.
+The converter can be run from the command line:
+
+    python -m Helpers.RobotTrajectoryFile file.btraj [file.btraj ...]
+'''
+
+from Helpers.RobotTrajectoryWriter import RobotTrajectoryWriter, lightRecords, trajFileHeader
+from threading import Thread
+from queue import Queue
+import numpy as np
+import json, os, sys, atexit, datetime
+
+
+class RobotTrajectoryFileError(Exception):
+    pass
+
+
+Magic = b'HOMEOTRJ'
+Version = 1
+HeaderAlignment = 64
+Columns = ('robot_x', 'robot_y', 'angle')
+
+"Writers with an open file, closed at exit so that their buffered steps are not lost"
+_openWriters = set()
+
+
+def trajectoryMetadata(records, initialPos, trackedLights, dtype):
+    '''Return the metadata of a binary trajectory: the light records of the text header
+       (see RobotTrajectoryWriter.lightRecords), the initial position of the vehicle and
+       the positions of the lights whose distance is recorded'''
+
+    return {'dtype': np.dtype(dtype).str,
+            'columns': list(Columns),
+            'lights': [list(record) for record in records],
+            'trackedLights': [[float(x), float(y)] for x, y in trackedLights],
+            'initialPosition': [float(value) for value in initialPos],
+            'created': str(datetime.datetime.now())}
+
+def writeTrajectoryFileHeader(fileOut, metadata):
+    '''Write the header of a binary trajectory file with metadata on the binary file fileOut'''
+
+    encoded = json.dumps(metadata).encode('utf-8')
+    headerSize = len(Magic) + 8 + len(encoded)
+    padding = (-headerSize) % HeaderAlignment
+    fileOut.write(Magic)
+    fileOut.write(np.array([Version, len(encoded) + padding], dtype = '<u4').tobytes())
+    fileOut.write(encoded + b' ' * padding)
+
+def _writeBlocks(fileOut, blocks, errors):
+    "Body of the flushing thread: write the blocks found in the queue until None arrives"
+
+    while True:
+        block = blocks.get()
+        if block is None:
+            return
+        try:
+            fileOut.write(block.tobytes())
+        except Exception as e:
+            errors.append(e)
+
+def _closeOpenWriters():
+    for writer in list(_openWriters):
+        writer.closeTrajFile()
+
+atexit.register(_closeOpenWriters)
+
+
+class BufferedTrajectoryWriter(RobotTrajectoryWriter):
+    '''
+    BufferedTrajectoryWriter is a RobotTrajectoryWriter saving binary trajectory files (.btraj).
+    Poses are accumulated in a buffer of blockRows steps, which is handed to a background
+    thread when full (or written directly if background is False). The buffered steps
+    are written when the file is closed.
+
+    Instance Variables:
+        dtype          <aNumpyDtype>  float32 or float64
+        blockRows      <anInteger>    the number of steps buffered before writing
+        background     <aBoolean>     whether blocks are written by a background thread
+        filename       <aString>      the path of the current trajectory file
+    '''
+
+    trajExtension = 'btraj'
+    DefaultBlockRows = 65536
+
+    def __init__(self, modelName, initialPos, lights, dataDir = None, experimentName = None,
+                 dtype = np.float64, blockRows = DefaultBlockRows, background = True):
+        self.dtype = np.dtype(dtype)
+        self.blockRows = blockRows
+        self.background = background
+        self.filename = None
+        self._file = None
+        self._thread = None
+        super(BufferedTrajectoryWriter, self).__init__(modelName, initialPos, lights,
+                                                       dataDir = dataDir, experimentName = experimentName)
+
+    def openTrajFile(self, modelName = None):
+        "Open a new binary trajectory file for modelName"
+
+        self.filename = self.buildTrajFilename(modelName)
+        self.startWriting(open(self.filename, 'wb'))
+
+    def reopenTrajFile(self, filename, offset):
+        fileOut = open(filename, 'r+b')
+        fileOut.truncate(offset)
+        fileOut.seek(offset)
+        self.filename = filename
+        self.startWriting(fileOut)
+        return fileOut
+
+    def startWriting(self, fileOut):
+        "Start buffering steps for the open binary file fileOut"
+
+        self._file = fileOut
+        self.posFile = self._file
+        self.newBuffer()
+        self._rows = 0
+        self._errors = []
+        if self.background:
+            self._blocks = Queue()
+            self._thread = Thread(target = _writeBlocks, args = (self._file, self._blocks, self._errors),
+                                  name = 'trajectoryWriter', daemon = True)
+            self._thread.start()
+        _openWriters.add(self)
+
+    def newBuffer(self):
+        self._buffer = np.empty((self.blockRows, len(Columns)), dtype = self.dtype)
+        self._view = memoryview(self._buffer).cast('B').cast(self.dtype.char)
+
+    def writeTrajFileHeader(self, initialPos, lights):
+        writeTrajectoryFileHeader(self._file, self.trajectoryMetadata(initialPos, lights))
+
+    def trajectoryMetadata(self, initialPos, lights):
+        return trajectoryMetadata(lightRecords(lights), initialPos,
+                                  [(light.position[0], light.position[1]) for light in self.lights],
+                                  self.dtype)
+
+    def writePosition(self, robotBody):
+        "Buffer the robot's pose"
+
+        x, y = robotBody.position
+        "Fill the buffer through a flat memoryview, cheaper than indexing the array"
+        i = self._rows * len(Columns)
+        view = self._view
+        view[i] = x
+        view[i + 1] = y
+        view[i + 2] = robotBody.angle
+        self._rows += 1
+        if self._rows == self.blockRows:
+            self.flushBlock()
+
+    def flushBlock(self):
+        "Write the buffered steps, or hand them to the flushing thread"
+
+        if self._rows == 0:
+            return
+        block = self._buffer[:self._rows]
+        if self.background:
+            self._blocks.put(block)
+            self.newBuffer()
+        else:
+            self._file.write(block.tobytes())
+        self._rows = 0
+
+    def filePosition(self):
+        '''Write the buffered steps, waiting for the flushing thread to write them,
+           and return (filename, offset) of the current file'''
+
+        self.flushBlock()
+        if self._thread is not None:
+            self.stopFlushing()
+            self._thread = Thread(target = _writeBlocks, args = (self._file, self._blocks, self._errors),
+                                  name = 'trajectoryWriter', daemon = True)
+            self._thread.start()
+        self._file.flush()
+        return self.filename, self._file.tell()
+
+    def stopFlushing(self):
+        "Wait for the flushing thread to write the blocks it was handed and stop it"
+
+        self._blocks.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def closeTrajFile(self):
+        '''Write the buffered steps and close the current file.
+           Wait for the flushing thread to write the blocks it was handed'''
+
+        if self._file is None:
+            return
+        self.flushBlock()
+        if self._thread is not None:
+            self.stopFlushing()
+        self._file.close()
+        self._file = None
+        _openWriters.discard(self)
+        if self._errors:
+            raise RobotTrajectoryFileError("Could not write trajectory file %s: %s" % (self.filename, self._errors[0]))
+
+
+class RobotTrajectory(object):
+    '''
+    RobotTrajectory holds the metadata and the poses of a recorded trajectory:
+    trajectoryData() returns the columns of the equivalent text file
+    and writeText() converts it to the text format.
+
+    Instance Variables:
+        metadata         <aDictionary>  the JSON metadata of the trajectory (see trajectoryMetadata)
+        lights           <aList>        (name, x, y, intensity, isOn) of the lights in the header
+        trackedLights    <anArray>      (lights, 2) positions of the lights whose distance is recorded
+        initialPosition  <aList>        the vehicle's initial position as (x, 0, y)
+        poses            <anArray>      (steps, 3) robot_x, robot_y and angle of every step
+    '''
+
+    def __init__(self, metadata, poses):
+        self.metadata = metadata
+        self.lights = [tuple(record) for record in metadata['lights']]
+        self.trackedLights = np.array(metadata['trackedLights'], dtype = np.float64).reshape(-1, 2)
+        self.initialPosition = metadata['initialPosition']
+        self.poses = poses
+
+    def numberOfSteps(self):
+        return len(self.poses)
+
+    def header(self):
+        "Return the header of the equivalent text trajectory file"
+
+        return trajFileHeader(self.lights, self.initialPosition)
+
+    def trajectoryData(self):
+        '''Return the rows of the equivalent text trajectory file:
+           robot_x, robot_y and heading in degrees, then x, y and distance of every tracked light'''
+
+        rx = self.poses[:, 0].astype(np.float64)
+        ry = self.poses[:, 1].astype(np.float64)
+        columns = [rx, ry, np.degrees(self.poses[:, 2].astype(np.float64)) % 360]
+        for lx, ly in self.trackedLights:
+            columns.extend([np.full_like(rx, lx), np.full_like(rx, ly), np.sqrt((rx - lx)**2 + (ry - ly)**2)])
+        return np.column_stack(columns) if len(rx) else np.empty((0, len(columns)))
+
+    def writeText(self, filename):
+        "Write the trajectory on filename in the text format of RobotTrajectoryWriter"
+
+        with open(filename, 'w') as fileOut:
+            fileOut.write(self.header())
+            np.savetxt(fileOut, self.trajectoryData(), delimiter = '\t',
+                       fmt = ['%f', '%f', '%.1f'] + ['%f'] * (3 * len(self.trackedLights)))
+
+
+class RobotTrajectoryFile(RobotTrajectory):
+    '''
+    RobotTrajectoryFile reads a binary trajectory file. The poses are mapped with np.memmap.
+
+    Instance Variables:
+        filename         <aString>      the path of the trajectory file
+    '''
+
+    @classmethod
+    def isTrajectoryFile(cls, filename):
+        "Check whether filename is a binary trajectory file"
+
+        with open(filename, 'rb') as fileIn:
+            return fileIn.read(len(Magic)) == Magic
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as fileIn:
+            if fileIn.read(len(Magic)) != Magic:
+                raise RobotTrajectoryFileError("%s is not a binary trajectory file" % filename)
+            version, metadataSize = np.frombuffer(fileIn.read(8), dtype = '<u4')
+            if version > Version:
+                raise RobotTrajectoryFileError("Unsupported trajectory file version %d" % version)
+            metadata = json.loads(fileIn.read(metadataSize).decode('utf-8'))
+        offset = len(Magic) + 8 + int(metadataSize)
+        dtype = np.dtype(metadata['dtype'])
+        steps = (os.path.getsize(filename) - offset) // (dtype.itemsize * len(Columns))
+        if steps > 0:
+            poses = np.memmap(filename, dtype = dtype, mode = 'r', offset = offset, shape = (steps, len(Columns)))
+        else:
+            poses = np.empty((0, len(Columns)), dtype = dtype)
+        super(RobotTrajectoryFile, self).__init__(metadata, poses)
+
+
+def convertToText(filename, textFilename = None):
+    '''Convert the binary trajectory file filename to a text trajectory file,
+       by default with the same name and the .traj extension. Return the name of the text file'''
+
+    if textFilename is None:
+        textFilename = os.path.splitext(filename)[0] + '.' + RobotTrajectoryWriter.trajExtension
+    RobotTrajectoryFile(filename).writeText(textFilename)
+    return textFilename
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:]:
+        print("Converted %s to %s" % (name, convertToText(name)))
@@ -21,9 +21,31 @@ class EnumerateClass(object):
             setattr(self, name, number)
 
 
+def lightRecords(lights):
+    "Return the (name, x, y, intensity, isOn) data of lights recorded in trajectory file headers"
+
+    return [(light.userData['name'], light.userData['lightPos'][0], light.userData['lightPos'][2],
+             light.userData['lightIntensity'], light.userData['lightIsOn']) for light in lights]
+
+
+def trajFileHeader(records, initialPos):
+    '''Return the header of a trajectory file: general info, followed
+       by position of light sources (see lightRecords) and initial position of vehicle'''
+
+    header = "# Position data for Homeo simulation run\n#\n#\n"
+    header += "# Light sources positioned at:\n"
+    for name, x, y, intensity, isOn in records:
+        header += name + '\t%f\t%f\t%f\t%s\n' % (x, y, intensity, isOn)
+    header += "# Vehicle's initial position at:\n"
+    header += '%f\t %f\n\n' % (initialPos[0], initialPos[2])
+    header += "# robot_x\trobot_y\theading\tlight_x\tlight_y\tdistance\n"
+    return header
+
+
 class RobotTrajectoryWriter(object):
     State = EnumerateClass('SAVE CLOSEFILE NEWFILE DONOTHING')
     state = State.SAVE
+    trajExtension = 'traj'
         
     def __init__(self, modelName, initialPos, lights, dataDir = None, experimentName = None):
         """state determines the controller's behavior. Possible values:
@@ -37,9 +59,9 @@ class RobotTrajectoryWriter(object):
         self.experimentName = experimentName
         self.setDataDir(dataDir)
         self._state = self.State.SAVE
-        self.posFile = open(self.buildTrajFilename(modelName), 'w')
+        self.openTrajFile(modelName)
         self.writeTrajFileHeader(initialPos, lights)
-                
+
     def runOnce(self,position=None, transitionMessage=None, modelName = None, lights = None):     
             "update state if necessary"
             if transitionMessage is not None:
@@ -58,16 +80,16 @@ class RobotTrajectoryWriter(object):
                 self.writePosition(position)
             elif self._state == self.State.CLOSEFILE:
 #                print "I am in state CLOSE"
-                self.posFile.close()
+                self.closeTrajFile()
                 self._state = self.State.DONOTHING
 #                print "I am in state DONOTHING"
             elif self._state == self.State.NEWFILE:
 #                print "I am in state NEWFILE"
                 try:
-                    self.posFile.close()
+                    self.closeTrajFile()
                 except IOError:
                     print("Trajectory file already close")
-                self.posFile = open(self.buildTrajFilename(modelName = modelName), 'w')
+                self.openTrajFile(modelName)
                 self.writeTrajFileHeader(position,lights)
                 self._state = self.State.SAVE
 #                print "I am in state SAVE"
@@ -92,21 +114,41 @@ class RobotTrajectoryWriter(object):
         '''Write data file header with General info, followed
            by position of light sources and initial position of vehicle'''
                              
-        "Get position of the light sources"
-        self.posFile.write("# Position data for Homeo simulation run\n#\n#\n")
-        self.posFile.write("# Light sources positioned at:\n")
-        
-        for light in lights:
-                self.posFile.write(light.userData['name'] +'\t%f\t%f\t%f\t%s\n' % (light.userData['lightPos'][0],
-                                                                  light.userData['lightPos'][2],
-                                                                  light.userData['lightIntensity'],
-                                                                  light.userData['lightIsOn']))
-                self.posFile.flush()
-        self.posFile.write("# Vehicle's initial position at:\n")
-        self.posFile.write('%f\t %f\n\n' % (initialPos[0], initialPos[2]))
-        self.posFile.write("# robot_x\trobot_y\theading\tlight_x\tlight_y\tdistance\n")
+        self.posFile.write(trajFileHeader(lightRecords(lights), initialPos))
         self.posFile.flush()
 
+    def openTrajFile(self, modelName = None):
+        "Open a new trajectory file for modelName"
+
+        self.posFile = open(self.buildTrajFilename(modelName), 'w')
+
+    def closeTrajFile(self):
+        self.posFile.close()
+
+    def filePosition(self):
+        '''Write the pending steps and return (filename, offset) of the current
+           trajectory file, for continueFile'''
+
+        self.posFile.flush()
+        return self.posFile.name, self.posFile.tell()
+
+    def continueFile(self, filename, offset):
+        '''Go on writing the trajectory file filename from offset, dropping what was
+           written after it. The file opened by the receiver in the meantime, which only
+           holds a header, is removed'''
+
+        current = self.posFile.name
+        self.closeTrajFile()
+        if os.path.abspath(current) != os.path.abspath(filename) and exists(current):
+            os.remove(current)
+        self.posFile = self.reopenTrajFile(filename, offset)
+
+    def reopenTrajFile(self, filename, offset):
+        fileOut = open(filename, 'r+')
+        fileOut.truncate(offset)
+        fileOut.seek(offset)
+        return fileOut
+
         
     def trajFileRename(self, trajFileHandle, oldFileName, modelName):
         "rename trajectory file to include robot's model, if needed"
@@ -150,9 +192,9 @@ class RobotTrajectoryWriter(object):
         dataDir = self.dataDir
         curDateTime = time.strftime("%Y-%m-%d-%H-%M-%S")
         if self.experimentName:
-            trajFilename = self.experimentName + '-' + curDateTime + '.traj'
+            trajFilename = self.experimentName + '-' + curDateTime + '.' + self.trajExtension
         else:
-            trajFilename = 'trajData-'+curDateTime+"-ID-"+ modelName+'.traj'
+            trajFilename = 'trajData-'+curDateTime+"-ID-"+ modelName+'.' + self.trajExtension
         return  os.path.join(dataDir, trajFilename)
     
     def setDataDir(self, dataDir):
@@ -0,0 +1,198 @@
+'''
+Periodic checkpoints of long headless runs, and their resumption.
+
+A run of a few hundred thousand ticks lost to a crash or a reboot had to be
+started again from tick 0.  A RunCheckpointer saves, every N ticks or every
+M seconds, everything the rest of the run depends on:
+
+    - the homeostat, as a HomeoCheckpoint (units, connections, uniselectors
+      and its own random stream)
+    - the state of the Khepera world: pose and velocities of every body and
+      the wheel speeds of the robot (KheperaSimulation.worldState)
+    - the offsets reached by the trajectory file and by the TSV state log
+    - the global numpy and Python random generators, which the uniselectors
+      and the experiment setup draw from
+    - a dictionary of progress values of the calling script (closest
+      approach so far, paths of its log files, ...)
+
+into one file, replaced atomically so that a crash while writing leaves
+the previous checkpoint intact.  To resume, the script builds the
+experiment again exactly as at the start of the run (same seed), opens its
+state log with the saved offset and calls restore(): the trajectory file
+and the log are truncated back to the checkpoint, and the run continues
+exactly as it would have without the interruption.
+
+Box2D carries joint impulses from one physics step to the next, which
+cannot be read back.  Checkpoints are therefore only taken at boundary
+ticks (multiples of every_ticks, or of DefaultBoundaryTicks with
+every_seconds) where the physics solver is restarted in the running world
+as well, whether a checkpoint is due or not: the results of a run depend
+on the boundary, never on the moment checkpoints are written.
+
+Usage:
+    checkpointer = RunCheckpointer(path, hom, khepera_sim, state_logger,
+                                   every_seconds=600)
+    while hom.time < total:
+        hom.runFor(checkpointer.next_stop(hom.time, total))
+        checkpointer.at_tick(hom.time, progress)
+
+    # later, after rebuilding the experiment:
+    state = RunCheckpointer.load(path)
+    checkpointer.restore(state)
+
+@author: stefano
+'''
+
+import json
+import math
+import os
+import pickle
+import random
+import time
+import numpy as np
+from Core.HomeoCheckpoint import HomeoCheckpoint
+
+
+class RunCheckpointError(Exception):
+    pass
+
+
+Version = 1
+DefaultBoundaryTicks = 1000
+
+
+def replace_atomically(filepath, data):
+    '''Write the bytes data on filepath through a temporary file, so that
+    filepath holds either its old content or data, whatever happens.'''
+    temporary = filepath + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, filepath)
+
+
+def save_batch_results(filepath, results):
+    '''Record the results (a list of JSON-serialisable dicts) of the runs of
+    a batch completed so far, for load_batch_results.'''
+    replace_atomically(filepath, json.dumps(results, indent=1).encode('utf-8'))
+
+
+def load_batch_results(filepath):
+    '''Return the results recorded by save_batch_results, or [] if none.'''
+    if not os.path.exists(filepath):
+        return []
+    with open(filepath) as f:
+        return json.load(f)
+
+
+class RunCheckpointer:
+    '''Save and restore checkpoints of a run of homeostat and Khepera world.
+
+    Constructor parameters:
+        filepath:      the checkpoint file, replaced at every checkpoint
+        homeostat:     the Homeostat being run
+        khepera_sim:   the KheperaSimulation it drives, or None
+        state_logger:  the HomeostatStateLogger of the run, or None
+        every_ticks:   checkpoint every this many ticks
+        every_seconds: checkpoint at the first boundary tick after this
+                       many seconds from the previous checkpoint
+    '''
+
+    def __init__(self, filepath, homeostat, khepera_sim=None, state_logger=None,
+                 every_ticks=None, every_seconds=None):
+        if not every_ticks and not every_seconds:
+            raise ValueError('a checkpoint interval in ticks or in seconds is needed')
+        self.filepath = filepath
+        self._hom = homeostat
+        self._sim = khepera_sim
+        self._state_logger = state_logger
+        self.every_ticks = int(every_ticks) if every_ticks else None
+        self.every_seconds = every_seconds
+        if self.every_ticks and every_seconds:
+            self.boundary = math.gcd(self.every_ticks, DefaultBoundaryTicks)
+        else:
+            self.boundary = self.every_ticks or DefaultBoundaryTicks
+        self.saved = 0
+        self._last_save = time.monotonic()
+
+    def next_stop(self, tick, limit):
+        '''Return the first boundary tick after tick, or limit if it comes first.'''
+        return min(limit, (tick // self.boundary + 1) * self.boundary)
+
+    def at_tick(self, tick, progress=None):
+        '''Call at the end of every tick, or at least at every boundary tick
+        (see next_stop).  On boundary ticks restart the physics solver and
+        save a checkpoint if one is due.  Return True if one was saved.'''
+        if tick % self.boundary != 0:
+            return False
+        if self._sim is not None:
+            self._sim.restartSolver()
+        due = ((self.every_ticks and tick % self.every_ticks == 0) or
+               (self.every_seconds and
+                time.monotonic() - self._last_save >= self.every_seconds))
+        if due:
+            self.save(tick, progress)
+        return bool(due)
+
+    def state(self, tick, progress=None, finished=False):
+        '''Return the checkpoint of the run at tick as a dictionary.  The
+        checkpoint of a finished run only records tick and progress.'''
+        state = {'version': Version,
+                 'tick': tick,
+                 'finished': finished,
+                 'every_ticks': self.every_ticks,
+                 'every_seconds': self.every_seconds,
+                 'progress': dict(progress or {})}
+        if finished:
+            return state
+        state.update(homeostat=self._hom.checkpoint().toBytes(),
+                     numpy_random=np.random.get_state(),
+                     python_random=random.getstate())
+        if self._sim is not None:
+            state['world'] = self._sim.worldState()
+            state['trajectory'] = self._sim.trajectoryWriter.filePosition()
+        if self._state_logger is not None:
+            state['state_log_offset'] = self._state_logger.file_position()
+        return state
+
+    def save(self, tick, progress=None, finished=False):
+        '''Write the checkpoint of the run at tick, replacing the previous one.
+        finished marks the checkpoint of a completed run.'''
+        replace_atomically(self.filepath,
+                           pickle.dumps(self.state(tick, progress, finished),
+                                        protocol=pickle.HIGHEST_PROTOCOL))
+        self.saved += 1
+        self._last_save = time.monotonic()
+
+    @classmethod
+    def load(cls, filepath):
+        '''Return the checkpoint saved in filepath, or None if there is none.'''
+        if not os.path.exists(filepath):
+            return None
+        try:
+            with open(filepath, 'rb') as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            raise RunCheckpointError('Cannot read run checkpoint %s: %s' % (filepath, e))
+        if not isinstance(state, dict) or state.get('version') != Version:
+            raise RunCheckpointError('%s is not a run checkpoint' % filepath)
+        return state
+
+    def restore(self, state):
+        '''Put homeostat, world, trajectory file and random generators in the
+        checkpointed state and return its progress values.  The homeostat and
+        the world must have been built as at the start of the checkpointed run,
+        and the state logger opened with resume_offset=state['state_log_offset'].'''
+        if state['finished']:
+            raise RunCheckpointError('The checkpointed run is finished')
+        self._hom.restoreCheckpoint(HomeoCheckpoint.fromBytes(state['homeostat']))
+        if self._sim is not None:
+            if 'world' not in state:
+                raise RunCheckpointError('The checkpoint has no world state')
+            self._sim.restoreWorldState(state['world'])
+            self._sim.trajectoryWriter.continueFile(*state['trajectory'])
+        np.random.set_state(state['numpy_random'])
+        random.setstate(state['python_random'])
+        self._last_save = time.monotonic()
+        return dict(state['progress'])
@@ -41,11 +41,36 @@ from deap import creator, base
 import numpy as np
 import glob
 from itertools import combinations
+from Helpers.GARunStore import GARunStore
 
 def _load_pickle(fileObj):
     """Load a pickle file with latin-1 encoding for Python 2 compatibility."""
     return pickle.Unpickler(fileObj, encoding='latin-1').load()
 
+def loadLogbook(filename):
+    """Return the DEAP logbook saved in filename, either a GA run store
+       or a pickled logbook (.lgb) of older runs"""
+    if GARunStore.isRunStore(filename):
+        store = GARunStore(filename)
+        try:
+            return store.logbook()
+        finally:
+            store.close()
+    with open(filename, 'rb') as logbookFile:
+        return _load_pickle(logbookFile)
+
+def loadHistory(filename):
+    """Return the DEAP history saved in filename, either a GA run store
+       or a pickled history (.hist) of older runs"""
+    if GARunStore.isRunStore(filename):
+        store = GARunStore(filename)
+        try:
+            return store.history()
+        finally:
+            store.close()
+    with open(filename, 'rb') as historyFile:
+        return _load_pickle(historyFile)
+
 def main():
     "All function calls in the main() functions are for testing purposes only"  
     dirL='/home/stefano/Documents/Projects/Homeostat/Simulator/Python-port/Homeo/SimulationsData/'
@@ -69,7 +94,7 @@ def main():
     
     #
     #---------------------------------------------
-    history = _load_pickle(open(filename,'rb'))
+    history = loadHistory(filename)
     showGenealogyTree(history)
     #hDebug('ga',"Logbook loaded")
     #indivs = indivsDecodedFromLogbook(logbook)
@@ -150,6 +175,13 @@ def indivsDecodedFromLogbook(logbook, noUnits=6, noEvolvedUnits=None):
         print("ind: %s\t has fitness: %.2f" % ( name, fit[0]))
     return indivs
 
+def indivsDecodedFromIndex(index, num=None, max=False, noUnits=6, noEvolvedUnits=None):
+    """Decode the best num individuals of a LogbookIndex (all of them if num is None),
+    sorted by fitness as in hallOfFameInds, to the tuples returned by indivsDecodedFromLogbook.
+    noEvolvedUnits defaults to noUnits for backward compatibility."""
+    return [(genomeDecoder(noUnits, ind["genome"], noEvolvedUnits=noEvolvedUnits), ind["fitness"], ind["indivId"])
+            for ind in index.best(num, max=max)]
+
 def hallOfFameInds(indivs, num, max=False):
     """Return the best num individuals from indivs (a list of individuals).
        Expects a list of tuples/list containing the genome at [0] and the fitness at [1].
@@ -159,8 +191,10 @@ def hallOfFameInds(indivs, num, max=False):
 
 def hallOfFame(logbook, num=10, max=False):
     """Return a string containing a formatted and sorted hall of fame list
-       of individuals extracted from the logbook"""
-    
+       of individuals extracted from the logbook, or from a LogbookIndex"""
+    from Helpers.LogbookIndex import LogbookIndex
+    if isinstance(logbook, LogbookIndex):
+        return genomeAndFitnessPrettyPrinter(indivsDecodedFromIndex(logbook, num, max=max))
     return genomeAndFitnessPrettyPrinter(hallOfFameInds(indivsDecodedFromLogbook(logbook),
                                                         num, max=max))
                                                          
@@ -221,36 +255,29 @@ def genomeAndFitnessPrettyPrinter(individuals, noUnits=6, noEvolvedUnits=None):
     return tabulate(individuals, headers, tablefmt='orgtbl')
 
 def extractGenomeOfIndID(indID, logbookFileWithPath):
-    """Extract the genome of individual indID from a DEAP logbook file.
+    """Extract the genome of individual indID from a DEAP logbook file,
+    through the LogbookIndex of the file.
     Return a dictionary with indivId, genome, and fitness found at respective keys,
     returns 'Not Found' otherwise."""
-    genome = {'indivId' : indID, 'genome': "Not Found"}
-    logbookFile = open(logbookFileWithPath, 'rb')
-    logbook = _load_pickle(logbookFile)
-    logbookFile.close()
-    for entry in range(len(logbook)):
-        try:
-            if logbook[entry]['indivId'] == indID:
-                genome['genome'] = logbook[entry]['genome']
-                genome['fitness'] = logbook[entry]['fitness']
-                break
-        except KeyError:
-            pass
-    return genome        
+    from Helpers.LogbookIndex import LogbookIndex
+    index = LogbookIndex(logbookFileWithPath)
+    try:
+        genome = index.individual(indID)
+    finally:
+        index.close()
+    if genome is None:
+        return {'indivId' : indID, 'genome': "Not Found"}
+    return genome
 
 def extractAllGenomes(logbookFileWithPath):
     """Extracts all genomes of a GA given simulation
-       to a set of unique individuals"""
-    inds = set()
-    logbookFile = open(logbookFileWithPath, 'rb')
-    logbook = _load_pickle(logbookFile)
-    logbookFile.close()
-    for entry in range(len(logbook)):
-        try:
-            inds.add(tuple(logbook[entry]['genome']))  # convert genome list to tuple for sets
-        except KeyError:
-            pass
-    return inds        
+       to a set of unique individuals, through the LogbookIndex of the file"""
+    from Helpers.LogbookIndex import LogbookIndex
+    index = LogbookIndex(logbookFileWithPath)
+    try:
+        return index.genomes()
+    finally:
+        index.close()
 
 def showGenealogyTree(history):
     """ Show the GA run genealogy as a tree on the basis of the GA run's history obiect"""
@@ -12,12 +12,14 @@ from PyQt5.QtCore import *
 from PyQt5.QtWidgets import *
 from PyQt5.QtGui import *
 from Helpers.TrajectoryGrapher import graphTrajectory
-from Helpers.StatsAnalyzer import plotFitnessesFromLogBook, genomeAndFitnessList, indivsDecodedFromLogbook, showGenealogyTree
+from Helpers.TrajectoryArchive import TrajectoryArchive, Extension as TrajectoryArchiveExtension
+from Helpers.StatsAnalyzer import plotFitnessesFromLogBook, genomeAndFitnessList, indivsDecodedFromIndex, showGenealogyTree, loadLogbook
+from Helpers.GARunStore import GARunStoreError, Extension as GARunStoreExtension
+from Helpers.LogbookIndex import LogbookIndex, LogbookIndexError
 import sys
 import os
 from glob import glob
 from sys import stderr
-import pickle
 import dill
 sys.modules['dill.dill'] = dill._dill  # old logbooks were pickled with dill.dill, renamed to dill._dill
 # Old logbooks were pickled under Python 2 which had types like ListType, DictType, etc.
@@ -42,6 +44,7 @@ class TrajectoryViewer(QWidget):
         super(TrajectoryViewer,self).__init__(parent)
         self.appRef = appRef
         self._dirPath = self.setOpeningPath()
+        self._currentLogbookIndex = None
         self.buidGui()
         self.setDirpath(self._dirPath)
         self._currentLogbookName = self.setCurrentLogbookName()
@@ -173,6 +176,8 @@ class TrajectoryViewer(QWidget):
         filepath = os.path.join(self._dirPath, str(self.currentTrajEntry.text()))
         if filepath.endswith('.log'):
             self.visualizeLog(filepath)
+        elif filepath.endswith('.' + TrajectoryArchiveExtension):
+            self.visualizeArchive(filepath)
         else:
             try:
                 graphTrajectory(filepath)
@@ -182,6 +187,31 @@ class TrajectoryViewer(QWidget):
                 msgBox.setInformativeText(str(e))
                 msgBox.exec_()
 
+    def visualizeArchive(self, filepath):
+        "Ask which individual's trajectory to chart from a trajectory archive"
+        try:
+            archive = TrajectoryArchive(filepath)
+            try:
+                IDs = archive.ids()
+            finally:
+                archive.close()
+        except Exception as e:
+            self.warningBox(str(e))
+            return
+        if not IDs:
+            self.warningBox("The archive %s holds no trajectories" % os.path.basename(filepath))
+            return
+        ID, ok = QInputDialog.getItem(self, "Trajectory archive", "Individual:", IDs, 0, False)
+        if not ok:
+            return
+        try:
+            graphTrajectory(filepath, trajectoryID=str(ID))
+        except Exception as e:
+            msgBox = QMessageBox()
+            msgBox.setText("Invalid trajectory archive")
+            msgBox.setInformativeText(str(e))
+            msgBox.exec_()
+
     def visualizeLog(self, filepath):
         """Display a .log file in a scrollable window with monospace font."""
         try:
@@ -230,10 +260,10 @@ class TrajectoryViewer(QWidget):
         self.appRef.exit()
             
     def supportedTrajExtensions(self):
-        return  ['traj', 'txt', 'log']
+        return  ['traj', 'btraj', TrajectoryArchiveExtension, 'txt', 'log']
     
     def supportedLogBookExtensions(self):
-        return ['lgb']
+        return ['lgb', GARunStoreExtension]
      
     def _trajectories(self):
         # Find the matching files for each valid
@@ -282,7 +312,7 @@ class TrajectoryViewer(QWidget):
         
     def setCurrentLogbookName(self):
         """Return the first logbook in current dir, i.e, the  
-           first filename with extension .lgb"""
+           first filename with extension .lgb or .garun"""
         logFilenames = []
         for extension in self.supportedLogBookExtensions():
             pattern = os.path.join(self._dirPath, '*.%s' % extension)
@@ -292,22 +322,33 @@ class TrajectoryViewer(QWidget):
         except IndexError:
             return 'NO LOGBOOKS PRESENT'
     
+    def currentLogbookPath(self):
+        return os.path.join(self._dirPath, self._currentLogbookName)
+
     def setCurrentLogbook(self):
-        """Unpickle the logbook whose filename is in self._currentLogbookName
-           and store it in an iVar"""
+        """Open the LogbookIndex of the logbook whose filename is in self._currentLogbookName
+           and store it in an iVar. If it is already open, only bring it up to date"""
         if not self._currentLogbookName == "NO LOGBOOKS PRESENT":
             try:
-                logbookFile = open(os.path.join(self._dirPath, self._currentLogbookName),'rb')
-                self._currentLogbook=pickle.load(logbookFile)
-                logbookFile.close()
-            except (IOError, ModuleNotFoundError) as e:
-                self._currentLogbook = None
+                if (self._currentLogbookIndex is not None and
+                    self._currentLogbookIndex.logbookFilename == self.currentLogbookPath()):
+                    self._currentLogbookIndex.refresh()
+                else:
+                    self.closeCurrentLogbook()
+                    self._currentLogbookIndex = LogbookIndex(self.currentLogbookPath())
+            except (IOError, ModuleNotFoundError, GARunStoreError, LogbookIndexError) as e:
+                self.closeCurrentLogbook()
                 msgBox = QMessageBox()
                 msgBox.setText("Cannot load logbook")
                 msgBox.setInformativeText(str(e))
                 msgBox.exec_()
         else:
-            self._currentLogbook = None            
+            self.closeCurrentLogbook()
+
+    def closeCurrentLogbook(self):
+        if self._currentLogbookIndex is not None:
+            self._currentLogbookIndex.close()
+            self._currentLogbookIndex = None
     
     def refreshLogbook(self):
         self._currentLogbookName = self.setCurrentLogbookName()
@@ -318,18 +359,14 @@ class TrajectoryViewer(QWidget):
         'Read GA run general infos from the logbook'
         
         outstring = ''
-        try:
-            for entry in self._currentLogbook:
-                if 'date' in entry:
-                    for key, value in entry.items():
-                        if not key == 'finalIndivs':
-                            outstring += '<b>'+key+'</b>' +':  ' +str(value) +'<br>'
-                    return outstring
-                else:
-                    pass
-            return "No info found"
-        except TypeError:
+        if self._currentLogbookIndex is None:
             return "No logbook found"
+        entry = self._currentLogbookIndex.generalInfo()
+        if entry is None:
+            return "No info found"
+        for key, value in entry.items():
+            outstring += '<b>'+key+'</b>' +':  ' +str(value) +'<br>'
+        return outstring
     
     def visualizeGenInfo(self):
         'Fill the gen info text box with data extracted from the logbook'
@@ -342,12 +379,10 @@ class TrajectoryViewer(QWidget):
            Use a QTableWidget with a list containing
            a list of headers at [0] and a list of rows at [1]"""
 
-        if self._currentLogbook is not None:
-            decodedInds = indivsDecodedFromLogbook(self._currentLogbook)
-            if all:
-                hof = genomeAndFitnessList(decodedInds, num=len(decodedInds))
-            else:
-                hof = genomeAndFitnessList(decodedInds, num = 10)
+        if self._currentLogbookIndex is not None:
+            "The index sorts the individuals, so only the ones shown are decoded"
+            decodedInds = indivsDecodedFromIndex(self._currentLogbookIndex, None if all else num)
+            hof = genomeAndFitnessList(decodedInds, num=len(decodedInds))
             self.hofWidget.clear()
             self.hofWidget.setSelectionBehavior(QAbstractItemView.SelectRows)
             self.hofWidget.setRowCount(len(hof[1]))
@@ -386,8 +421,8 @@ class TrajectoryViewer(QWidget):
     def visualizeAvgFitnessGraph(self):
         """Show a Matplotlib chart of fitnesses if data are present"""
         
-        if self._currentLogbook is not None:
-            logbook = self._currentLogbook
+        if self._currentLogbookIndex is not None:
+            logbook = loadLogbook(self.currentLogbookPath())
             plotFitnessesFromLogBook(logbook)
         else:
             self.warningBox('No logbook data to visualize')
@@ -0,0 +1,166 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+
+Trajectory archives: all the trajectories of a GA generation in a single file.
+
+Saving a trajectory file per evaluated genome leaves tens of thousands of small
+files in the data directory of a long GA run. A TrajectoryArchive is a SQLite
+database (extension .trajdb) holding one record per individual ID, with the
+metadata and the poses of a binary trajectory (see Helpers.RobotTrajectoryFile).
+ArchiveTrajectoryWriter keeps the trajectory of the current robot model in memory
+and stores it in the archive when the trajectory is closed. Several processes can
+store trajectories in the same archive.
+'''
+
+from Helpers.RobotTrajectoryFile import BufferedTrajectoryWriter, RobotTrajectory, Columns, _openWriters
+import sqlite3, json
+import numpy as np
+
+
+class TrajectoryArchiveError(Exception):
+    pass
+
+
+Extension = 'trajdb'
+
+
+class TrajectoryArchive(object):
+    '''
+    TrajectoryArchive maps individual IDs to RobotTrajectory objects.
+
+    Instance Variables:
+        filename       <aString>      the SQLite file holding the archive
+    '''
+
+    @classmethod
+    def isArchive(cls, filename):
+        "Check whether filename is a trajectory archive"
+
+        with open(filename, 'rb') as fileIn:
+            if fileIn.read(16) != b'SQLite format 3\x00':
+                return False
+        connection = sqlite3.connect(filename)
+        try:
+            return connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'trajectories'").fetchone() is not None
+        finally:
+            connection.close()
+
+    def __init__(self, filename):
+        self.filename = filename
+        try:
+            self._connection = sqlite3.connect(filename, timeout = 60)
+            self._connection.execute('CREATE TABLE IF NOT EXISTS trajectories '
+                                     '(id TEXT PRIMARY KEY, metadata TEXT NOT NULL, steps INTEGER NOT NULL, poses BLOB NOT NULL)')
+            self._connection.commit()
+        except sqlite3.DatabaseError as e:
+            raise TrajectoryArchiveError("%s is not a trajectory archive: %s" % (filename, e))
+
+    def put(self, ID, metadata, poses):
+        '''Store the trajectory with metadata and poses, a (steps, 3) array, as the record of ID'''
+
+        poses = np.ascontiguousarray(poses, dtype = np.dtype(metadata['dtype']))
+        self._connection.execute('INSERT OR REPLACE INTO trajectories (id, metadata, steps, poses) VALUES (?, ?, ?, ?)',
+                                 (ID, json.dumps(metadata), len(poses), poses.tobytes()))
+        self._connection.commit()
+
+    def trajectory(self, ID):
+        '''Return the RobotTrajectory recorded for ID'''
+
+        row = self._connection.execute('SELECT metadata, poses FROM trajectories WHERE id = ?', (ID,)).fetchone()
+        if row is None:
+            raise TrajectoryArchiveError("No trajectory for %s in %s" % (ID, self.filename))
+        metadata = json.loads(row[0])
+        poses = np.frombuffer(row[1], dtype = np.dtype(metadata['dtype'])).reshape(-1, len(Columns))
+        return RobotTrajectory(metadata, poses)
+
+    def ids(self):
+        "Return the sorted IDs of the archived trajectories"
+
+        return [row[0] for row in self._connection.execute('SELECT id FROM trajectories ORDER BY id')]
+
+    def keepOnly(self, IDs):
+        '''Remove the trajectories of all individuals but those in IDs and shrink the file'''
+
+        keep = set(IDs)
+        self._connection.executemany('DELETE FROM trajectories WHERE id = ?',
+                                     [(ID,) for ID in self.ids() if ID not in keep])
+        self._connection.commit()
+        self._connection.execute('VACUUM')
+
+    def __len__(self):
+        return self._connection.execute('SELECT COUNT(*) FROM trajectories').fetchone()[0]
+
+    def __contains__(self, ID):
+        return self._connection.execute('SELECT 1 FROM trajectories WHERE id = ?', (ID,)).fetchone() is not None
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class ArchiveTrajectoryWriter(BufferedTrajectoryWriter):
+    '''
+    ArchiveTrajectoryWriter records trajectories in memory and stores them in the archive
+    archiveFilename when they are closed, with the robot's model name as ID.
+    Trajectories of the 'Unspecified' model and empty ones are not stored.
+    The archive a trajectory goes to is the one set when the trajectory was opened,
+    so archiveFilename can be changed at any time.
+
+    Instance Variables:
+        archiveFilename  <aString>      the archive new trajectories are stored in
+        modelName        <aString>      the model whose trajectory is being recorded
+    '''
+
+    DefaultBlockRows = 4096
+
+    def __init__(self, modelName, initialPos, lights, archiveFilename, dataDir = None, experimentName = None,
+                 dtype = np.float64, blockRows = DefaultBlockRows):
+        self.archiveFilename = archiveFilename
+        self._recording = False
+        super(ArchiveTrajectoryWriter, self).__init__(modelName, initialPos, lights, dataDir = dataDir,
+                                                      experimentName = experimentName, dtype = dtype,
+                                                      blockRows = blockRows, background = False)
+
+    def openTrajFile(self, modelName = None):
+        "Start recording the trajectory of modelName"
+
+        self.modelName = modelName
+        self._recordArchive = self.archiveFilename
+        self._blockList = []
+        self.newBuffer()
+        self._rows = 0
+        self._recording = True
+        _openWriters.add(self)
+
+    def writeTrajFileHeader(self, initialPos, lights):
+        self._metadata = self.trajectoryMetadata(initialPos, lights)
+
+    def flushBlock(self):
+        if self._rows == 0:
+            return
+        self._blockList.append(self._buffer[:self._rows])
+        self.newBuffer()
+        self._rows = 0
+
+    def filePosition(self):
+        raise TrajectoryArchiveError("Trajectories recorded for an archive are kept in memory until closed")
+
+    def closeTrajFile(self):
+        "Store the trajectory recorded so far in the archive"
+
+        if not self._recording:
+            return
+        self.flushBlock()
+        self._recording = False
+        _openWriters.discard(self)
+        if not self._blockList or self.modelName in (None, '', 'Unspecified') or self._recordArchive is None:
+            return
+        archive = TrajectoryArchive(self._recordArchive)
+        try:
+            archive.put(self.modelName, self._metadata, np.concatenate(self._blockList))
+        finally:
+            archive.close()
+        self._blockList = []
@@ -12,22 +12,26 @@ import os
 import numpy as np
 import sys
 from math import sqrt
+from Helpers.RobotTrajectoryFile import RobotTrajectoryFile
+from Helpers.TrajectoryArchive import TrajectoryArchive
 
 
 def main(argv):
     import argparse
     parser = argparse.ArgumentParser(description='Chart a Homeostat trajectory.')
-    parser.add_argument('traj_file', help='Path to the .traj file')
+    parser.add_argument('traj_file', help='Path to the .traj, .btraj or .trajdb file')
+    parser.add_argument('--id', default=None,
+                        help='ID of the individual whose trajectory is charted, for .trajdb archives')
     parser.add_argument('--output', '-o', default=None,
                         help='Save figure to file (PDF, PNG, etc.) instead of displaying')
     parser.add_argument('--dark', action='store_true',
                         help='Treat the light source as a darkness source '
                              '(reverses the irradiance gradient)')
     args = parser.parse_args(argv[1:])
-    graphTrajectory(args.traj_file, output_path=args.output, dark=args.dark)
+    graphTrajectory(args.traj_file, output_path=args.output, dark=args.dark, trajectoryID=args.id)
 
 
-def graphTrajectory(trajDataFilename, output_path=None, dark=False):
+def graphTrajectory(trajDataFilename, output_path=None, dark=False, trajectoryID=None):
     """Chart the vehicle's trajectory with matplotlib.
 
     The background shows a radial grey gradient centered on the light
@@ -37,21 +41,43 @@ def graphTrajectory(trajDataFilename, output_path=None, dark=False):
     and the edges bright (the robot is seeking darkness).
 
     Args:
-        trajDataFilename: path to a .traj file
+        trajDataFilename: path to a .traj file, to a binary .btraj file or
+                          to a .trajdb trajectory archive
         output_path: if provided, save the figure to this path (PDF, PNG, etc.)
                      instead of displaying interactively.
         dark: if True, treat the source as a "darkness source" (reverses
               the gradient direction).
+        trajectoryID: the individual whose trajectory is charted when
+                      trajDataFilename is an archive (default: the first one).
     """
 
     'Read simulation general data from header'
-    dataFileHeader = readDataFileHeader(trajDataFilename)
+    title = os.path.split(trajDataFilename)[1]
+    if TrajectoryArchive.isArchive(trajDataFilename):
+        archive = TrajectoryArchive(trajDataFilename)
+        try:
+            if trajectoryID is None:
+                trajectoryID = archive.ids()[0]
+            trajFile = archive.trajectory(trajectoryID)
+        finally:
+            archive.close()
+        title += ' - ' + trajectoryID
+        dataFileHeader = trajFile.header().splitlines(True)
+    elif RobotTrajectoryFile.isTrajectoryFile(trajDataFilename):
+        trajFile = RobotTrajectoryFile(trajDataFilename)
+        dataFileHeader = trajFile.header().splitlines(True)
+    else:
+        trajFile = None
+        dataFileHeader = readDataFileHeader(trajDataFilename)
     lightsOnDic = readLightsFromHeader(dataFileHeader)
     initPos = readInitPosFromHeader(dataFileHeader)
 
     'read trajectory data'
     try:
-        trajData = np.loadtxt(trajDataFilename, skiprows=len(dataFileHeader))
+        if trajFile is not None:
+            trajData = trajFile.trajectoryData()
+        else:
+            trajData = np.loadtxt(trajDataFilename, skiprows=len(dataFileHeader))
     except Exception as e:
         print("Cannot open the file: ", e)
 
@@ -96,9 +122,9 @@ def graphTrajectory(trajDataFilename, output_path=None, dark=False):
                   cmap='gray', vmin=0, vmax=1, aspect='equal', zorder=0)
 
     ax.plot(trajData[:,0], trajData[:,1], zorder=2)
-    ax.set_title(os.path.split(trajDataFilename)[1])
+    ax.set_title(title)
     if output_path is None:
-        fig.canvas.manager.set_window_title(os.path.split(trajDataFilename)[1])
+        fig.canvas.manager.set_window_title(title)
 
     'Add summary info above the plot'
     if ticks >= 1000000:
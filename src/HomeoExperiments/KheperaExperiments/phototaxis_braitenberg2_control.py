@@ -112,6 +112,7 @@ def setup_phototaxis(backendSimulator=None):
     hom = initializeBraiten2_2Pos(backendSimulator=backendSimulator)
 
     _tune_for_phototaxis(hom)
+    backendSimulator.attachHomeostat(hom)
 
     return hom, backendSimulator
 
@@ -204,8 +205,9 @@ def run_headless(total_steps=10000, report_interval=500):
     min_dist = dist_to_target()
     min_t = 0
 
+    session = hom.session()
     for target_tick in range(report_interval, total_steps + 1, report_interval):
-        hom.runFor(target_tick)
+        session.runUntil(target_tick)
         rx, ry = robot.body.position[0], robot.body.position[1]
         d = dist_to_target()
         a = degrees(robot.body.angle) % 360
@@ -302,9 +304,11 @@ def run_visualized():
             vl.draw(GL_LINES)
         program.stop()
 
+    session = hom.session()
+
     def update(dt):
         state[0] += state[1]
-        hom.runFor(state[0])
+        session.runUntil(state[0])
         # Update window title with progress
         rx, ry = robot.body.position[0], robot.body.position[1]
 
@@ -48,6 +48,10 @@ Usage
     # Batch mode
     python -m HomeoExperiments.KheperaExperiments.phototaxis_braitenberg2_direct --batch 10
 
+    # Batch checkpointed every 10 minutes in DIR, then resumed after a crash
+    python -m HomeoExperiments.KheperaExperiments.phototaxis_braitenberg2_direct --batch 10 --checkpoint-dir DIR --checkpoint-seconds 600
+    python -m HomeoExperiments.KheperaExperiments.phototaxis_braitenberg2_direct --batch 10 --checkpoint-dir DIR --resume
+
 @author: stefano
 '''
 
@@ -59,6 +63,9 @@ from math import sqrt, degrees
 
 import numpy as np
 
+from Helpers.RunCheckpoint import (RunCheckpointer, save_batch_results,
+                                   load_batch_results)
+
 
 def setup_phototaxis(topology='fixed', backendSimulator=None,
                      mass_range=(1, 10), max_speed_fraction=0.8,
@@ -162,10 +169,7 @@ def setup_phototaxis(topology='fixed', backendSimulator=None,
 
     # Override light intensity
     if light_intensity != 100:
-        sim = backendSimulator.kheperaSimulation
-        target_body = sim.allBodies['TARGET']
-        target_body.userData['intensity'] = light_intensity
-        target_body.userData['lightIntensity'] = light_intensity
+        backendSimulator.kheperaSimulation.setLightIntensity('TARGET', light_intensity)
 
     # Apply topology-specific wiring
     kwargs = dict(mass_range=mass_range,
@@ -177,6 +181,7 @@ def setup_phototaxis(topology='fixed', backendSimulator=None,
         _direct_random_topology(hom, **kwargs)
     else:
         _direct_fixed_topology(hom, **kwargs)
+    backendSimulator.attachHomeostat(hom)
 
     return hom, backendSimulator, seed
 
@@ -299,7 +304,9 @@ def _direct_random_topology(hom, mass_range=(1, 10),
 def run_headless(topology='fixed', total_steps=60000, report_interval=500,
                  light_intensity=100, early_stop_distance=None, quiet=False,
                  uniselector_type='ashby', continuous_params=None,
-                 state_log=False, state_log_interval=1, seed=None):
+                 state_log=False, state_log_interval=1, seed=None,
+                 checkpoint_path=None, checkpoint_every=None,
+                 checkpoint_seconds=None, resume=False):
     '''Run the simplified 2+2 phototaxis experiment headless.
 
     Parameters and return value are the same as in
@@ -308,6 +315,15 @@ def run_headless(topology='fixed', total_steps=60000, report_interval=500,
     from Helpers.HomeostatConditionLogger import (
         log_homeostat_conditions, log_homeostat_conditions_json)
 
+    saved = None
+    if resume and checkpoint_path is not None:
+        saved = RunCheckpointer.load(checkpoint_path)
+    if saved is not None and saved['finished']:
+        return dict(saved['progress']['result'], hom=None, backend=None)
+    if saved is not None:
+        progress = saved['progress']
+        seed = progress['seed']
+
     hom, backend, seed = setup_phototaxis(topology=topology,
                                           light_intensity=light_intensity,
                                           uniselector_type=uniselector_type,
@@ -325,28 +341,47 @@ def run_headless(topology='fixed', total_steps=60000, report_interval=500,
     target_pos = (7, 7)
     exp_name = sim.experimentName
 
-    # Log initial conditions
-    timestamp = time.strftime("%Y-%m-%d-%H-%M-%S")
-    log_dir = sim.dataDir
-    log_path = os.path.join(log_dir, exp_name + '-' + timestamp + '.log')
-    json_path = os.path.join(log_dir, exp_name + '-' + timestamp + '.json')
-    log_homeostat_conditions(hom, log_path, 'INITIAL CONDITIONS', exp_name)
-    log_homeostat_conditions_json(hom, json_path, 'INITIAL CONDITIONS', exp_name,
-                                  seed=seed)
+    def dist_to_target():
+        rx, ry = robot.body.position[0], robot.body.position[1]
+        return sqrt((rx - target_pos[0])**2 + (ry - target_pos[1])**2)
+
+    if saved is None:
+        # Log initial conditions
+        timestamp = time.strftime("%Y-%m-%d-%H-%M-%S")
+        log_dir = sim.dataDir
+        log_path = os.path.join(log_dir, exp_name + '-' + timestamp + '.log')
+        json_path = os.path.join(log_dir, exp_name + '-' + timestamp + '.json')
+        log_homeostat_conditions(hom, log_path, 'INITIAL CONDITIONS', exp_name)
+        log_homeostat_conditions_json(hom, json_path, 'INITIAL CONDITIONS', exp_name,
+                                      seed=seed)
+        progress = {'seed': seed, 'log_path': log_path, 'json_path': json_path,
+                    'state_log_path': (os.path.join(log_dir, exp_name + '-' + timestamp + '.statelog')
+                                       if state_log else None),
+                    'state_log_interval': state_log_interval,
+                    'reached': 0, 'min_dist': dist_to_target(), 'min_t': 0}
+    log_path, json_path = progress['log_path'], progress['json_path']
+    state_log_path = progress['state_log_path']
 
     # Optional per-tick state logger
-    state_log_path = None
-    if state_log:
+    state_logger = None
+    if state_log_path is not None:
         from Helpers.HomeostatStateLogger import HomeostatStateLogger
-        state_log_path = os.path.join(log_dir, exp_name + '-' + timestamp + '.statelog')
         state_logger = HomeostatStateLogger(
-            hom, sim, state_log_path, log_interval=state_log_interval, seed=seed)
-        state_logger.log_tick(0)
+            hom, sim, state_log_path, log_interval=progress['state_log_interval'], seed=seed,
+            resume_offset=None if saved is None else saved['state_log_offset'])
+        if saved is None:
+            state_logger.log_tick(0)
         hom._state_logger = state_logger
 
-    def dist_to_target():
-        rx, ry = robot.body.position[0], robot.body.position[1]
-        return sqrt((rx - target_pos[0])**2 + (ry - target_pos[1])**2)
+    checkpointer = None
+    if saved is not None:
+        checkpoint_every, checkpoint_seconds = saved['every_ticks'], saved['every_seconds']
+    if checkpoint_path is not None and (checkpoint_every or checkpoint_seconds):
+        checkpointer = RunCheckpointer(checkpoint_path, hom, sim, state_logger,
+                                       every_ticks=checkpoint_every,
+                                       every_seconds=checkpoint_seconds)
+    if saved is not None:
+        checkpointer.restore(saved)
 
     mode_label = 'fixed topology' if topology == 'fixed' else 'random topology'
     if not quiet:
@@ -357,13 +392,25 @@ def run_headless(topology='fixed', total_steps=60000, report_interval=500,
         print()
         print(f'{"Step":>6}  {"Robot X":>8}  {"Robot Y":>8}  {"Angle":>7}  {"Dist":>7}  {"L Sens":>7}  {"R Sens":>7}')
         print('-' * 65)
+        if saved is not None:
+            print(f'Resumed at t={saved["tick"]}')
 
-    min_dist = dist_to_target()
-    min_t = 0
+    min_dist = progress['min_dist']
+    min_t = progress['min_t']
     early_stopped = False
 
-    for target_tick in range(report_interval, total_steps + 1, report_interval):
-        hom.runFor(target_tick)
+    # Reports every report_interval ticks, with stops at the checkpoint boundaries in between
+    session = hom.session()
+    last_tick = total_steps - total_steps % report_interval
+    while progress['reached'] < last_tick:
+        target_tick = (progress['reached'] // report_interval + 1) * report_interval
+        if checkpointer is not None:
+            target_tick = checkpointer.next_stop(progress['reached'], target_tick)
+        session.runUntil(target_tick)
+        progress['reached'] = target_tick
+        if target_tick % report_interval != 0:
+            checkpointer.at_tick(target_tick, dict(progress, min_dist=min_dist, min_t=min_t))
+            continue
         rx, ry = robot.body.position[0], robot.body.position[1]
         d = dist_to_target()
         a = degrees(robot.body.angle) % 360
@@ -383,9 +430,12 @@ def run_headless(topology='fixed', total_steps=60000, report_interval=500,
             early_stopped = True
             break
 
+        if checkpointer is not None:
+            checkpointer.at_tick(target_tick, dict(progress, min_dist=min_dist, min_t=min_t))
+
     final_dist = dist_to_target()
     final_x, final_y = robot.body.position[0], robot.body.position[1]
-    steps_run = target_tick
+    steps_run = progress['reached']
 
     if not quiet:
         print()
@@ -394,27 +444,35 @@ def run_headless(topology='fixed', total_steps=60000, report_interval=500,
 
     sim.saveTrajectory()
 
-    if state_log and hom._state_logger is not None:
-        hom._state_logger.close()
+    if state_logger is not None:
+        state_logger.close()
         hom._state_logger = None
 
     # Log final conditions
     log_homeostat_conditions(hom, log_path, 'FINAL CONDITIONS')
     log_homeostat_conditions_json(hom, json_path, 'FINAL CONDITIONS')
 
-    return dict(hom=hom, backend=backend,
-                final_dist=final_dist, min_dist=min_dist, min_t=min_t,
-                steps_run=steps_run, final_x=final_x, final_y=final_y,
-                early_stopped=early_stopped,
-                log_path=log_path, json_path=json_path,
-                state_log_path=state_log_path, seed=seed)
+    result = dict(final_dist=final_dist, min_dist=min_dist, min_t=min_t,
+                  steps_run=steps_run, final_x=final_x, final_y=final_y,
+                  early_stopped=early_stopped,
+                  log_path=log_path, json_path=json_path,
+                  state_log_path=state_log_path, seed=seed)
+    if checkpointer is not None:
+        checkpointer.save(steps_run, {'result': result}, finished=True)
+    return dict(result, hom=hom, backend=backend)
 
 
 def run_batch(n_runs=10, topology='fixed', total_steps=2000000,
               report_interval=500, light_intensity=100,
               early_stop_distance=None,
-              uniselector_type='ashby', continuous_params=None):
-    '''Run a batch of experiments and print a summary table.'''
+              uniselector_type='ashby', continuous_params=None,
+              checkpoint_dir=None, checkpoint_every=None,
+              checkpoint_seconds=None, resume=False):
+    '''Run a batch of experiments and print a summary table.
+
+    Parameters and return value are the same as in
+    phototaxis_braitenberg2_Ashby.run_batch().
+    '''
     import csv as _csv
 
     mode = 'dark' if light_intensity < 0 else 'light'
@@ -422,7 +480,14 @@ def run_batch(n_runs=10, topology='fixed', total_steps=2000000,
     print()
 
     results = []
-    for i in range(n_runs):
+    batch_path = None
+    if checkpoint_dir is not None:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        batch_path = os.path.join(checkpoint_dir, 'batch.json')
+        if resume:
+            results = load_batch_results(batch_path)
+            print(f'Resuming after {len(results)} completed runs', flush=True)
+    for i in range(len(results), n_runs):
         t0 = time.time()
         print(f'--- Run {i+1}/{n_runs} ---', flush=True)
         r = run_headless(topology=topology, total_steps=total_steps,
@@ -431,12 +496,19 @@ def run_batch(n_runs=10, topology='fixed', total_steps=2000000,
                          early_stop_distance=early_stop_distance,
                          quiet=True,
                          uniselector_type=uniselector_type,
-                         continuous_params=continuous_params)
+                         continuous_params=continuous_params,
+                         checkpoint_path=(os.path.join(checkpoint_dir, f'run{i+1}.ckpt')
+                                          if checkpoint_dir is not None else None),
+                         checkpoint_every=checkpoint_every,
+                         checkpoint_seconds=checkpoint_seconds,
+                         resume=resume)
         elapsed = time.time() - t0
         r.pop('hom'); r.pop('backend')
         r['run'] = i + 1
         r['wall_time'] = elapsed
         results.append(r)
+        if batch_path is not None:
+            save_batch_results(batch_path, results)
         print(f'  final_dist={r["final_dist"]:.3f}  min_dist={r["min_dist"]:.3f}  '
               f'steps={r["steps_run"]}  early_stop={r["early_stopped"]}  '
               f'wall={elapsed:.1f}s', flush=True)
@@ -531,9 +603,11 @@ def run_visualized(topology='fixed'):
             vl.draw(GL_LINES)
         program.stop()
 
+    session = hom.session()
+
     def update(dt):
         state[0] += state[1]
-        hom.runFor(state[0])
+        session.runUntil(state[0])
         rx, ry = robot.body.position[0], robot.body.position[1]
 
         if trail_last[0] is not None:
@@ -618,6 +692,24 @@ if __name__ == '__main__':
         if idx + 1 < len(sys.argv):
             seed = int(sys.argv[idx + 1])
 
+    # Parse --checkpoint-dir DIR, --checkpoint-every N, --checkpoint-seconds M, --resume
+    checkpoint_dir = None
+    if '--checkpoint-dir' in sys.argv:
+        idx = sys.argv.index('--checkpoint-dir')
+        if idx + 1 < len(sys.argv):
+            checkpoint_dir = sys.argv[idx + 1]
+    checkpoint_every = None
+    if '--checkpoint-every' in sys.argv:
+        idx = sys.argv.index('--checkpoint-every')
+        if idx + 1 < len(sys.argv):
+            checkpoint_every = int(sys.argv[idx + 1])
+    checkpoint_seconds = None
+    if '--checkpoint-seconds' in sys.argv:
+        idx = sys.argv.index('--checkpoint-seconds')
+        if idx + 1 < len(sys.argv):
+            checkpoint_seconds = float(sys.argv[idx + 1])
+    resume = '--resume' in sys.argv
+
     if '--visualize' in sys.argv:
         run_visualized(topology=topology)
     elif n_batch is not None:
@@ -625,12 +717,23 @@ if __name__ == '__main__':
                   total_steps=total_steps,
                   light_intensity=light_intensity,
                   early_stop_distance=early_stop_distance,
-                  uniselector_type=uniselector_type)
+                  uniselector_type=uniselector_type,
+                  checkpoint_dir=checkpoint_dir,
+                  checkpoint_every=checkpoint_every,
+                  checkpoint_seconds=checkpoint_seconds,
+                  resume=resume)
     else:
+        if checkpoint_dir is not None:
+            os.makedirs(checkpoint_dir, exist_ok=True)
         run_headless(topology=topology, total_steps=total_steps,
                      light_intensity=light_intensity,
                      early_stop_distance=early_stop_distance,
                      uniselector_type=uniselector_type,
+                     checkpoint_path=(os.path.join(checkpoint_dir, 'run.ckpt')
+                                      if checkpoint_dir is not None else None),
+                     checkpoint_every=checkpoint_every,
+                     checkpoint_seconds=checkpoint_seconds,
+                     resume=resume,
                      state_log=state_log,
                      state_log_interval=state_log_interval,
                      seed=seed)
@@ -34,6 +34,9 @@ from os import getcwd
 from math import sin, cos, asin, acos, atan, pi, radians, degrees, sqrt, atan2
 from Helpers.General_Helper_Functions import normalize
 from Helpers.RobotTrajectoryWriter import RobotTrajectoryWriter
+from Helpers.RobotTrajectoryFile import BufferedTrajectoryWriter
+from Helpers.TrajectoryArchive import ArchiveTrajectoryWriter
+from Core.HomeoJIT import _jit_irradiances
 from time import sleep, time, strftime, localtime
 from datetime import datetime
 
@@ -222,6 +225,17 @@ b2Body.update = b2BodyDefaultUpdate
 
 "Khepera simulation classes"
 
+def lightArrays(lightsList):
+    """Return a dictionary of arrays with the parameters of the lights in lightsList
+       used to compute irradiances: 'position' (lights x 2, from the lights' 'lightPos',
+       Webots-style (x, height, y)), 'intensity', 'ambRatio' and 'attenVec' (lights x 3)"""
+
+    return {'position': np.array([(light.userData['lightPos'][0], light.userData['lightPos'][2])
+                                  for light in lightsList], dtype=float).reshape(-1, 2),
+            'intensity': np.array([light.userData['intensity'] for light in lightsList], dtype=float),
+            'ambRatio': np.array([light.userData['ambRatio'] for light in lightsList], dtype=float),
+            'attenVec': np.array([light.userData['attenVec'] for light in lightsList], dtype=float).reshape(-1, 3)}
+
 class KheperaRobot(object):
     """The body of a Khepera-like robot.
        The body is implemented as a simple circle with two wheels and light sensors.
@@ -278,6 +292,12 @@ class KheperaRobot(object):
         "create ivars for wheels and sensors"
         self.wheels = {}  # Dictionary indexed by 'right' and 'left' 
         self.sensors = {} # Dictionary indexed by 'right' , 'center' , and 'left'
+        self._sensorNames = []
+        self._sensorArrays = None
+        "Sensor reads of the detectable lights, cached for the simulation step they were computed at"
+        self.currentStep = 0
+        self._sensorReads = None
+        self._sensorReadsStep = None
         self.rightSpeed = 0
         self.leftSpeed = 0
         self.speedIncrease = 1
@@ -361,6 +381,24 @@ class KheperaRobot(object):
         "Add a pyglet shape to robot's body for rendering"
         self.setRenderingParameters(color = color)
 
+    detectableLights = property(fget = lambda self: self.getDetectableLights(),
+                                fset = lambda self, value: self.setDetectableLights(value))
+
+    def getDetectableLights(self):
+        return self._detectableLights
+
+    def setDetectableLights(self, lightsList):
+        "Set the lights the robot's sensors can detect and cache their parameters as arrays"
+        self._detectableLights = lightsList
+        self.updateLightArrays()
+
+    def updateLightArrays(self):
+        """Recompute the cached arrays of the detectable lights' parameters.
+           Must be called after changing the userData of a detectable light
+           (see KheperaSimulation.setLightIntensity)"""
+        self._lightArrays = lightArrays(self._detectableLights)
+        self.invalidateSensorReads()
+
     def setModelName(self,ID_String):
         "Resets the ID, or modelName, of the robot"
         self.body.userData['ID'] = ID_String
@@ -410,6 +448,45 @@ class KheperaRobot(object):
             sensorFixture.userData['pygletShape'] = None
         sensorFixture.userData['color'] = (0., 0.8, 0., 0.5)
         sensorFixture.userData['position'] = circleShape.pos
+        if sensorName not in self._sensorNames:
+            self._sensorNames.append(sensorName)
+        self._sensorArrays = None
+        self._sensorReads = None
+        self._sensorReadsStep = None
+
+    def sensorArrays(self):
+        """Return a dictionary of arrays with the parameters of the robot's sensors, in the
+           order of self._sensorNames: 'position' (sensors x 2, relative to the body),
+           'angle' (in radians from the robot's heading), 'maxValue', 'maxRange' and 'halfAngleRange' (in degrees).
+           The arrays are computed at the first call after a sensor is added"""
+
+        if self._sensorArrays is None:
+            fixtures = [self.sensors[name] for name in self._sensorNames]
+            self._sensorArrays = {
+                'position': np.array([tuple(f.shape.pos) for f in fixtures], dtype=float).reshape(-1, 2),
+                'angle': np.radians([f.userData[name + 'Angle'] for name, f in zip(self._sensorNames, fixtures)]),
+                'maxValue': np.array([f.userData[name + 'MaxValue'] for name, f in zip(self._sensorNames, fixtures)], dtype=float),
+                'maxRange': np.array([f.userData[name + 'MaxRange'] for name, f in zip(self._sensorNames, fixtures)], dtype=float),
+                'halfAngleRange': np.array([f.userData[name + 'AngleRange'] for name, f in zip(self._sensorNames, fixtures)], dtype=float) / 2}
+        return self._sensorArrays
+
+    def irradAtSensors(self, lights = None):
+        """Return an array with the irradiance at each of the robot's sensors (in the order of self._sensorNames),
+           computed for all sensors and all lights at once by a compiled kernel.
+           lights is a dictionary of arrays as returned by lightArrays, and defaults to the
+           cached arrays of the detectable lights. See irradAtSensor for the irradiance model"""
+
+        if lights is None:
+            lights = self._lightArrays
+        sensors = self.sensorArrays()
+        irradiances = np.empty(len(self._sensorNames))
+        position = self.body.position
+        _jit_irradiances(position[0], position[1], self.body.angle,
+                         sensors['position'], sensors['angle'],
+                         sensors['maxValue'], sensors['maxRange'], sensors['halfAngleRange'],
+                         lights['position'], lights['intensity'], lights['ambRatio'], lights['attenVec'],
+                         irradiances)
+        return irradiances
 
     def irradAtSensor(self, sensorName, lightsList):
         """Return a scalar representing the intensity of the light 
@@ -429,97 +506,25 @@ class KheperaRobot(object):
             end
         """
         
-#         print "                In irradAtSensor"
-# #         try:
-#         print "                    trying to acquire the fixture"
-#         print "                    I am a: %s" % type(self)
-#         print "                    with %.0f sensors, and I am looking for %s" % (len(self.sensors), sensorName)
-#         print "                    At time %s  robot ID is %s and ID  of right wheel is %s " % (datetime.now().strftime('%Y:%m:%d:%H:%M:%S.%f'),id(self), id(self.wheels['right']))
-#         print "                    trying to access right wheel's position: ", self.wheels['right'].body.position
-#         print "                    At time %s robot ID is %s and ID of right eye is %s " %(datetime.now().strftime('%Y:%m:%d:%H:%M:%S.%f'), id(self), id(self.sensors['rightEye']))
-#         print "                    right: ", self.sensors.values()[0] 
-#         print "                    my sensors are: ", self.sensors
-#         print "                    sensor is at: ", self.sensors['rightEye']
-        sensorFixture = self.sensors[sensorName]
-#         print "the fixture is: %s\n the  shape is: %s " % (sensorFixture, sensorFixture.shape)#.pos
-#         except KeyError as e:
-#             print "Cannot find the desired sensor: %s, KeyError: %s" % (sensorName, e)
-#         return 0
-        
-        sensorIrrad = 0 
-        
-        rotMatrix = b2Rot(self.body.angle)
-        sensorRelPosition = rotMatrix * sensorFixture.shape.pos
-        sensorPosition = self.body.position + sensorRelPosition
-        
-        for targetLight in lightsList:
-            targetPose = b2Vec2(targetLight.userData['lightPos'][0],targetLight.userData['lightPos'][2])
-            vecToTarget = targetPose-sensorPosition
-            targetDistance = vecToTarget.length
-            lightIntensity = targetLight.userData['intensity']
-            lightAttenVec = targetLight.userData['attenVec']
-            eyeMaxValue = sensorFixture.userData[sensorName+'MaxValue']
-            eyeAngleRange = sensorFixture.userData[sensorName+'AngleRange']
-            eyeMaxRange = sensorFixture.userData[sensorName+'MaxRange']
-            lightAmbRatio = targetLight.userData['ambRatio']
-        
-        
-            "Compute vector of eye's normal from the robot's angle and cached eyeAngle."
-            eyeAngle = (self.body.angle + radians(sensorFixture.userData[sensorName+'Angle']))
-#             eyeNormalVec = b2Vec2(cos(eyeAngle), sin(eyeAngle))
-            eyeNormalVec = np.array([cos(eyeAngle),sin(eyeAngle)])
-#             print "eye normal vector length = %.12f (numpy) %.12f (Box2D)" % (np.linalg.norm(eyeNormalVec), eyeNormalVec.length)
-#             cosAngleToTarget = b2Dot(vecToTarget/vecToTarget.length,eyeNormalVec)
-#             if np.linalg.norm(vecToTarget/np.linalg.norm(vecToTarget)) != 1:
-#                 print "the vector to target normalized vector is <> from 1", np.linalg.norm(vecToTarget/np.linalg.norm(vecToTarget))
-#             else:
-#                 print "OK"
-#             
-#             if np.linalg.norm(eyeNormalVec) != 1:
-#                 print "The eye normal vector normalized is <>  from 1"
-#             else:
-#                 print "OK"
-    
-#             cosAngleToTarget = np.dot(vecToTarget/np.linalg.norm(vecToTarget),eyeNormalVec)
-            cosAngleToTarget = np.dot(normalize(vecToTarget),eyeNormalVec)
-#             targetAngle = atan(vecToTarget[1]/vecToTarget[0])
-#             cosAngleToTarget = cos(eyeAngle - targetAngle)
-#             print "cosAngle to Target = ", cosAngleToTarget
-            "Testing"
-#             print "V2T: %.3f,%.3f   eyeNormV: %.12f,%.12f normV2T: %.3f,%.3f   NormNormzdV2T: %.25f NormNormalEyeVec: %.25f, eyeAngle: %.5f, cos:%.12f"% (vecToTarget[0], vecToTarget[1], 
-#                                                                                   eyeNormalVec[0],eyeNormalVec[1], 
-#                                                                                   normalize(vecToTarget)[0], normalize(vecToTarget)[1], 
-#                                                                                   np.linalg.norm(vecToTarget/np.linalg.norm(vecToTarget)),
-#                                                                                   np.linalg.norm(eyeNormalVec),
-#                                                                                   degrees(eyeAngle),
-#                                                                                   cosAngleToTarget)
-#             assert -1 <= cosAngleToTarget <= 1
-#             np.testing.assert_allclose(np.linalg.norm(eyeNormalVec), 1)
-#             np.testing.assert_allclose(np.linalg.norm(normalize(vecToTarget)),1.0)      
-
-            "End testing"
-        
-            "Is target in range?"
-    #         print "to target: %.3f, robot's angle: %3f, angle to target: %.3f, vectToTarget: %s, OUT OF RANGE ==> %s" %(targetDistance, 
-    #                                                                                            self.allBodies[self.robotName].angle,
-    #                                                                                            degrees(acos(cosAngleToTarget)),
-    #                                                                                            vecToTarget,
-    #                                                                                            (targetDistance > eyeMaxRange or abs(degrees(acos(cosAngleToTarget))) > eyeAngleRange/2))
-    #         print targetDistance, degrees(acos(cosAngleToTarget))
-            try:
-                if targetDistance > eyeMaxRange or (abs(degrees(acos(cosAngleToTarget))) > eyeAngleRange / 2):
-                    sensorIrrad +=  0
-                else:        
-                    directIntens = (lightIntensity * (1-lightAmbRatio)) * cosAngleToTarget
-                    attenuationFactor = 1/( lightAttenVec[0]+
-                                           (lightAttenVec[1]*targetDistance)+
-                                           (lightAttenVec[2]*targetDistance**2))
-        #             print "Irradiance: %.5f" % min((directIntens + (lightIntensity*lightAmbRatio)) * attenuationFactor, eyeMaxValue)            
-                    sensorIrrad +=  min((directIntens + (lightIntensity*lightAmbRatio)) * attenuationFactor, eyeMaxValue) # clip sensor's output to its max value
-            except Exception as e:
-                print(e)
-                raise
-        return sensorIrrad
+        self.sensors[sensorName]                      # KeyError for unknown sensors
+        if lightsList is self._detectableLights:
+            return float(self.sensorReads()[self._sensorNames.index(sensorName)])
+        return float(self.irradAtSensors(lightArrays(lightsList))[self._sensorNames.index(sensorName)])
+
+    def sensorReads(self):
+        """Return the array of irradiances of the detectable lights at all the sensors (see irradAtSensors),
+           computed at most once per simulation step: the reads are cached until the step changes
+           (KheperaSimulation.advanceSim) or the robot is moved (moveTo, rotateTo).
+           Code setting the body's pose directly must call invalidateSensorReads"""
+
+        if self._sensorReadsStep != self.currentStep or self._sensorReads is None:
+            self._sensorReads = self.irradAtSensors()
+            self._sensorReadsStep = self.currentStep
+        return self._sensorReads
+
+    def invalidateSensorReads(self):
+        self._sensorReads = None
+        self._sensorReadsStep = None
     
     def setRenderingParameters(self, color = (1.,0.,0.,0.5)):
         "default rendering: circle of partially transparent red color"
@@ -576,6 +581,7 @@ class KheperaRobot(object):
         self.body.angle = angleRad
         for wheel in self.wheels.values():
             wheel.body.angle = angleRad
+        self.invalidateSensorReads()
             
     def moveTo(self, posVec):
         """Move robot and its jointed bodies to posVec.
@@ -584,6 +590,7 @@ class KheperaRobot(object):
         self.body.position = posVec
         for wheel in self.wheels.values():
             wheel.body.position = wheel.body.position + posVec 
+        self.invalidateSensorReads()
               
 class KheperaWheel(object):
     """The Khepera-like robot's wheel-motor class. 
@@ -815,6 +822,9 @@ class KheperaSimulation(object):
         self.dataDir = getcwd()
         self.experimentName = None
         self.allBodies = {} #Dictionary containing refs to all relevant bodies in the world
+        self.physicsStepsPerTick = 1   # steps taken by advanceTick
+        self.binaryTrajectories = False   # when True trajectories are saved by a BufferedTrajectoryWriter
+        self.trajectoryArchive = None     # when set trajectories are stored in this TrajectoryArchive file
    
         "Pyglet grid is created lazily (requires GL context)"
         self.gridDefaultSize = 40
@@ -857,6 +867,7 @@ class KheperaSimulation(object):
         except AttributeError:
             raise Exception("Cannot find ** %s ** among my experiment setup methods" % self.homeoWorldToRun)
         self.currentStep = 0
+        self._initialBodyStates = self.bodyStates()
 #         sleep(1.5)
 #         print "Now leaving setupWorld. Robot is at: ", self.allBodies[self.robotName].body.position
 
@@ -869,14 +880,142 @@ class KheperaSimulation(object):
         self.setupWorld()
 #         self.trajectoryWriter.runOnce(transitionMessage="SAVE")
 
+    def bodyStates(self):
+        """Return the pose and the fixtures' friction of every body in the world,
+           in the form used by resetWorldInPlace"""
+        return [(body, tuple(body.position), body.angle, [fixture.friction for fixture in body.fixtures])
+                for body in self.world.bodies]
+
+    def resetWorldInPlace(self):
+        """Reset world to the initial conditions of the last setupWorld without rebuilding it:
+           every body is moved back to its initial pose and stopped, and the robots' wheels
+           speeds are set to 0. Objects referring to the world's bodies (e.g. sensor transducers)
+           remain valid. Falls back on resetWorld if the world was never set up"""
+        
+        if getattr(self, '_initialBodyStates', None) is None:
+            self.resetWorld()
+            return
+        self.trajectoryWriter.runOnce(transitionMessage = "CLOSEFILE")
+        self.currentStep = 0
+        for body, position, angle, frictions in self._initialBodyStates:
+            body.transform = (position, angle)           # position and angle must be set together
+            body.linearVelocity = (0, 0)
+            body.angularVelocity = 0
+            body.awake = True
+            for fixture, friction in zip(body.fixtures, frictions):
+                fixture.friction = friction
+        self.world.ClearForces()
+        "Recreate the joints, which would otherwise warm start from the impulses of the previous run"
+        for joint in list(self.world.joints):
+            jointDef = self.jointDefinition(joint)
+            self.world.DestroyJoint(joint)
+            self.world.CreateJoint(jointDef)
+        for body in self.allBodies.values():
+            if isinstance(body, KheperaRobot):
+                body.rightSpeed = 0
+                body.leftSpeed = 0
+                body.currentStep = 0
+                body.invalidateSensorReads()
+                for wheel in body.wheels.values():
+                    wheel.force = 0
+                    wheel.impulseCounter = 0
+
+    def worldState(self):
+        """Return the dynamic state of the world as plain values, for restoreWorldState:
+           the current step, the pose, velocities and fixtures' friction of every body
+           and the wheel speeds of the robots. Box2D also carries the joints' impulses from
+           a step to the next, which cannot be read: call restartSolver before taking a
+           state that the run will continue from"""
+
+        bodies = [{'position': list(body.position), 'angle': body.angle,
+                   'linearVelocity': list(body.linearVelocity), 'angularVelocity': body.angularVelocity,
+                   'awake': body.awake, 'frictions': [fixture.friction for fixture in body.fixtures]}
+                  for body in self.world.bodies]
+        robots = {}
+        for name, body in self.allBodies.items():
+            if isinstance(body, KheperaRobot):
+                robots[name] = {'rightSpeed': body.rightSpeed, 'leftSpeed': body.leftSpeed,
+                                'wheels': dict((side, [wheel.force, wheel.impulseCounter])
+                                               for side, wheel in body.wheels.items())}
+        return {'step': self.currentStep, 'bodies': bodies, 'robots': robots}
+
+    def restoreWorldState(self, state):
+        """Put the world back in a state returned by worldState. The world must have been
+           set up by the same method as the one the state was taken from. Objects referring
+           to the world's bodies (e.g. sensor transducers) remain valid"""
+
+        bodies = list(self.world.bodies)
+        if len(bodies) != len(state['bodies']):
+            raise Exception("The world has %d bodies, the state %d" % (len(bodies), len(state['bodies'])))
+        for body, bodyState in zip(bodies, state['bodies']):
+            body.transform = (bodyState['position'], bodyState['angle'])
+            body.linearVelocity = bodyState['linearVelocity']
+            body.angularVelocity = bodyState['angularVelocity']
+            body.awake = bodyState['awake']
+            for fixture, friction in zip(body.fixtures, bodyState['frictions']):
+                fixture.friction = friction
+        self.world.ClearForces()
+        self.currentStep = state['step']
+        for name, robotState in state['robots'].items():
+            robot = self.allBodies[name]
+            robot.rightSpeed = robotState['rightSpeed']
+            robot.leftSpeed = robotState['leftSpeed']
+            robot.currentStep = self.currentStep
+            robot.invalidateSensorReads()
+            for side, (force, impulseCounter) in robotState['wheels'].items():
+                robot.wheels[side].force = force
+                robot.wheels[side].impulseCounter = impulseCounter
+        self.restartSolver()
+
+    def restartSolver(self):
+        """Drop the state the Box2D solver carries from a step to the next: the joints are
+           recreated, in the same order, without the impulses they warm start from, and
+           the bodies' sleep timers are reset. A world restored by restoreWorldState
+           then steps exactly as the one its state was taken from after this call"""
+
+        joints = list(self.world.joints)
+        jointDefs = [self.jointDefinition(joint) for joint in joints]
+        for joint in joints:
+            self.world.DestroyJoint(joint)
+        "Joints are added at the head of the world's list"
+        for jointDef in reversed(jointDefs):
+            self.world.CreateJoint(jointDef)
+        for body in self.world.bodies:
+            body.awake = body.awake
+
+    def jointDefinition(self, joint):
+        "Return the definition of a revolute joint like joint"
+
+        jointDef = b2RevoluteJointDef()
+        jointDef.bodyA = joint.bodyA
+        jointDef.bodyB = joint.bodyB
+        jointDef.localAnchorA = joint.GetLocalAnchorA()
+        jointDef.localAnchorB = joint.GetLocalAnchorB()
+        jointDef.referenceAngle = joint.GetReferenceAngle()
+        jointDef.enableLimit = joint.limitEnabled
+        jointDef.lowerAngle = joint.lowerLimit
+        jointDef.upperAngle = joint.upperLimit
+        return jointDef
+
     def destroyWorld(self):
         """Destroy the Box2D world and nulls the variables containing 
            references to box2D objects"""
         list(self.allBodies.values())[0].sensors = None
         del(self.allBodies)
         self.allBodies = {}
+        self._initialBodyStates = None
         del(self.world)
              
+    def setLightIntensity(self, lightName, intensity):
+        """Set the intensity of light lightName and update the light arrays cached
+           by the robots that can detect it"""
+        light = self.allBodies[lightName]
+        light.userData['intensity'] = intensity
+        light.userData['lightIntensity'] = intensity
+        for body in self.allBodies.values():
+            if isinstance(body, KheperaRobot) and light in body.detectableLights:
+                body.updateLightArrays()
+
     def setRobotModelName(self,robotName,newID):
         "Resets the ID, or modelName, of robot robotName"
         self.allBodies[robotName].body.userData['ID'] = newID
@@ -890,6 +1029,9 @@ class KheperaSimulation(object):
             body.update()
         self.world.Step(self.timeStep, self.vel_iters, self.pos_iters)
         self.currentStep += 1
+        for body in self.allBodies.values():
+            if isinstance(body, KheperaRobot):
+                body.currentStep = self.currentStep
         
         self.trajectoryWriter.runOnce(position=self.allBodies[self.robotName].body)
         "for testing irradiance function"
@@ -903,6 +1045,42 @@ class KheperaSimulation(object):
 #                                                                                                         self.allBodies['kheperaRobot'].wheels['left'].getForwardNormal(),
 #                                                                                                         self.allBodies['kheperaRobot'].wheels['right'].getForwardNormal())
     
+    def advanceTick(self, time = None):
+        """Advance the simulation physicsStepsPerTick steps.
+           Called once per homeostat tick when the robot's motors buffer their commands"""
+        for step in range(self.physicsStepsPerTick):
+            self.advanceSim()
+
+    def newTrajectoryWriter(self, modelName, initialPos, lights):
+        """Return the writer recording the robot's trajectory: an ArchiveTrajectoryWriter
+           if trajectoryArchive is set, a BufferedTrajectoryWriter saving binary files 
+           if binaryTrajectories is set, a RobotTrajectoryWriter otherwise"""
+        if self.trajectoryArchive is not None:
+            return ArchiveTrajectoryWriter(modelName, initialPos, lights, self.trajectoryArchive,
+                                           dataDir = self.dataDir, experimentName = self.experimentName)
+        if self.binaryTrajectories:
+            writerClass = BufferedTrajectoryWriter
+        else:
+            writerClass = RobotTrajectoryWriter
+        return writerClass(modelName, initialPos, lights, dataDir = self.dataDir, experimentName = self.experimentName)
+
+    def setTrajectoryArchive(self, filename):
+        """Store the trajectories opened from now on in the TrajectoryArchive filename.
+           If the world is already set up and its writer saves trajectory files, 
+           the current trajectory is saved and the writer replaced by an ArchiveTrajectoryWriter"""
+        self.trajectoryArchive = filename
+        writer = getattr(self, 'trajectoryWriter', None)
+        if writer is None:
+            return
+        if isinstance(writer, ArchiveTrajectoryWriter):
+            writer.archiveFilename = filename
+        elif getattr(self, 'robotName', None) in self.allBodies:
+            self.saveTrajectory()
+            robot = self.allBodies[self.robotName]
+            self.trajectoryWriter = self.newTrajectoryWriter(robot.body.userData['ID'],
+                                                             (robot.body.position[0], 0, robot.body.position[1]),
+                                                             robot.detectableLights)
+
     def saveTrajectory(self):
         "Asks the TrajectorytWriter to save the robot's trajectory"
         self.trajectoryWriter.runOnce(transitionMessage = "CLOSEFILE")
@@ -976,7 +1154,7 @@ class KheperaSimulation(object):
         lightBody.userData['lightIsOn'] =  True
         
         lights = [lightBody]        
-        self.trajectoryWriter = RobotTrajectoryWriter(kheperaRobotDefaultID, (kheperaDefaultPosition[0],0,kheperaDefaultPosition[1]), lights, dataDir = self.dataDir, experimentName = self.experimentName)
+        self.trajectoryWriter = self.newTrajectoryWriter(kheperaRobotDefaultID, (kheperaDefaultPosition[0],0,kheperaDefaultPosition[1]), lights)
         
         "Finally, inform the robot of the existing detectable lights"
         self.allBodies[kheperaRobotDefaultName].detectableLights = lights                  
@@ -246,9 +246,12 @@ class HOMEO_DiffMotor(Transducer):
        Instance variables:
        - wheel     aString: the right or left wheel 
        - robot     aString: the string identifying the robot in the HOMEO simulation
-       - simul     aRef: reference to the simulation (needed to advance it in single step after each command is actuating command"""
+       - simul     aRef: reference to the simulation (needed to advance it in single step after each command is actuating command
+       - stepsPhysics aBoolean: whether each command advances the simulation by one step. When False the command
+                                only sets the wheel's speed, and the simulation is advanced by someone else
+                                once per homeostat tick (see SimulatorBackendHOMEO's bufferedActuation)"""
     
-    def __init__(self, wheel, robotRef, simul):
+    def __init__(self, wheel, robotRef, simul, stepsPhysics = True):
         "Wheel could either 'right or 'left' and nothing else"
 
         if wheel == 'right':
@@ -261,6 +264,7 @@ class HOMEO_DiffMotor(Transducer):
         self._wheel = wheel
         self.robot = robotRef
         self.simul = simul
+        self.stepsPhysics = stepsPhysics
         self._range = self.getRange()
 
 
@@ -279,7 +283,8 @@ class HOMEO_DiffMotor(Transducer):
         
         try:         
             getattr(self.simul.allBodies[self.robot], self._transdFunction)(self.funcParameters)
-            self.simul.advanceSim()
+            if self.stepsPhysics:
+                self.simul.advanceSim()
         except:
             stderr.write("Motor command to HOMEO motor:%sWheel failed " % self._wheel)
             raise #TransducerException("Motor command to HOMEO motor:%sWheel failed " % self._wheel)
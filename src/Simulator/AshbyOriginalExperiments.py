@@ -7,7 +7,8 @@ All seed both numpy.random and random before any stochastic initialization.
 
 The event-driven run loop (run_with_events) replaces Homeostat.runFor()
 when mid-run perturbations are needed (polarity reversal, stimulus
-injection, constraint changes).
+injection, constraint changes).  run_branches runs a burned-in prefix
+once and continues it in several branches with their own events or seeds.
 
 @author: stefano (with Claude)
 '''
@@ -15,7 +16,9 @@ injection, constraint changes).
 import os
 import sys
 import time
+import copy
 import random
+import multiprocessing
 import numpy as np
 
 from Core.Homeostat import Homeostat
@@ -23,6 +26,7 @@ from Core.HomeoUnit import HomeoUnit
 from Core.HomeoUnitNewtonian import HomeoUnitNewtonian
 from Core.HomeoConnection import HomeoConnection
 from Core.HomeoUniselectorAshby import HomeoUniselectorAshby
+from Helpers.ColumnarStateLog import ColumnarStateLogWriter, DefaultChunkRows
 from Helpers.HomeostatConditionLogger import (
     log_homeostat_conditions, log_homeostat_conditions_json)
 
@@ -104,10 +108,14 @@ class AshbyStateLogger:
     '''Lightweight per-tick TSV logger for non-robotic Ashby experiments.
 
     Logs: tick, per-unit (critDev, output, velocity, uniselector_fired),
-    and per-connection signed weights.
+    and per-connection signed weights.  With columnar=True the log is
+    written in compressed columnar chunks instead, optionally with a
+    min/max/mean copy decimated over windows of decimation logged ticks
+    (see Helpers.ColumnarStateLog).
     '''
 
-    def __init__(self, homeostat, filepath, seed=None, log_interval=1):
+    def __init__(self, homeostat, filepath, seed=None, log_interval=1,
+                 columnar=False, decimation=None, chunk_rows=DefaultChunkRows):
         self._hom = homeostat
         self._interval = max(1, int(log_interval))
         self._units = [u for u in homeostat.homeoUnits if u.isActive()]
@@ -130,46 +138,69 @@ class AshbyStateLogger:
                      '%s_velocity' % name, '%s_unisel_fired' % name]
         cols += self._conn_keys
         self._columns = cols
+        self._row_format = '\t'.join(
+            ['%d'] + ['%.6f', '%.6f', '%.6f', '%d'] * len(self._units) +
+            ['%.6f'] * len(self._conn_keys)) + '\n'
 
-        self._f = open(filepath, 'w')
-        self._f.write('# AshbyExperimentLog v1\n')
-        self._f.write('# date\t%s\n' % time.strftime('%Y-%m-%d %H:%M:%S'))
+        metadata = [('date', time.strftime('%Y-%m-%d %H:%M:%S'))]
         if seed is not None:
-            self._f.write('# seed\t%d\n' % seed)
-        self._f.write('# n_units\t%d\n' % len(self._units))
+            metadata.append(('seed', '%d' % seed))
+        metadata.append(('n_units', '%d' % len(self._units)))
         for unit in self._units:
-            prefix = '# unit_%s' % unit.name
-            self._f.write('%s_mass\t%.6f\n' % (prefix, unit.mass))
-            self._f.write('%s_viscosity\t%.6f\n' % (prefix, unit.viscosity))
-            self._f.write('%s_maxDeviation\t%.6f\n' % (prefix, unit.maxDeviation))
-            self._f.write('%s_noise\t%.6f\n' % (prefix, unit.noise))
-            self._f.write('%s_potentiometer\t%.6f\n' % (prefix, unit.potentiometer))
-            self._f.write('%s_switch\t%d\n' % (prefix, unit.switch))
-            self._f.write('%s_uniselectorActive\t%s\n' % (
-                prefix, unit.uniselectorActive))
-            self._f.write('%s_uniselectorTimeInterval\t%d\n' % (
-                prefix, unit.uniselectorTimeInterval))
+            prefix = 'unit_%s' % unit.name
+            metadata += [(prefix + '_mass', '%.6f' % unit.mass),
+                         (prefix + '_viscosity', '%.6f' % unit.viscosity),
+                         (prefix + '_maxDeviation', '%.6f' % unit.maxDeviation),
+                         (prefix + '_noise', '%.6f' % unit.noise),
+                         (prefix + '_potentiometer', '%.6f' % unit.potentiometer),
+                         (prefix + '_switch', '%d' % unit.switch),
+                         (prefix + '_uniselectorActive', '%s' % unit.uniselectorActive),
+                         (prefix + '_uniselectorTimeInterval',
+                          '%d' % unit.uniselectorTimeInterval)]
+
+        if columnar:
+            self._f = None
+            dtypes = ([np.int64] + [np.float64, np.float64, np.float64, np.int8] * len(self._units) +
+                      [np.float64] * len(self._conn_keys))
+            self._log = ColumnarStateLogWriter(
+                filepath, cols, dtypes=dtypes,
+                metadata=dict([('format', 'AshbyExperimentLog v1')] + metadata),
+                chunk_rows=chunk_rows, decimation=decimation)
+            return
+        if decimation is not None:
+            raise ValueError('decimation requires a columnar state log')
+        self._log = None
+        self._f = open(filepath, 'w')
+        self._f.write('# AshbyExperimentLog v1\n')
+        for key, value in metadata:
+            self._f.write('# %s\t%s\n' % (key, value))
         self._f.write('\t'.join(self._columns) + '\n')
         self._f.flush()
 
     def log_tick(self, tick):
         if tick % self._interval != 0:
             return
-        vals = ['%d' % tick]
+        vals = [tick]
         for unit in self._units:
-            vals.append('%.6f' % unit.criticalDeviation)
-            vals.append('%.6f' % unit.currentOutput)
-            vals.append('%.6f' % unit.currentVelocity)
-            vals.append('%d' % unit.uniselectorActivated)
+            vals += [unit.criticalDeviation, unit.currentOutput,
+                     unit.currentVelocity, unit.uniselectorActivated]
         for conn in self._conn_refs:
-            vals.append('%.6f' % (conn.weight * conn.switch))
-        self._f.write('\t'.join(vals) + '\n')
+            vals.append(conn.weight * conn.switch)
+        if self._log is not None:
+            self._log.append(vals)
+        else:
+            self._f.write(self._row_format % tuple(vals))
 
     def flush(self):
-        self._f.flush()
+        if self._log is not None:
+            self._log.flush()
+        else:
+            self._f.flush()
 
     def close(self):
-        if self._f and not self._f.closed:
+        if self._log is not None:
+            self._log.close()
+        elif self._f and not self._f.closed:
             self._f.flush()
             self._f.close()
 
@@ -190,8 +221,15 @@ def run_with_events(hom, total_ticks, events=None, tick_callback=None,
         state_logger:     AshbyStateLogger instance (optional)
         stability_tracker: StabilityTracker instance (optional)
 
-    The loop replicates the logic of Homeostat.runFor() but adds event
-    dispatch and per-tick callbacks.
+    The homeostat is advanced by a HomeostatSession (see Homeostat.session()),
+    refreshed after events and callbacks since they may change weights and
+    switches. As before, slowingFactor is ignored. The state logger and the
+    stability tracker only look at the homeostat, so they are called as tick
+    hooks: unless a tick_callback is given the session runs straight to the
+    next event, and, with fast-forward enabled (see
+    Homeostat.enableFastForward()), it can skip the ticks in which the
+    homeostat sits in a quiet fixed point or cycle, still logging and
+    checking every one of them.
     '''
     if events is None:
         events = []
@@ -206,33 +244,171 @@ def run_with_events(hom, total_ticks, events=None, tick_callback=None,
     if state_logger is not None:
         state_logger.log_tick(0)
 
-    while hom.time < total_ticks:
-        # Dispatch any events scheduled for this tick
-        while event_idx < len(events) and events[event_idx][0] <= hom.time:
-            events[event_idx][1](hom)
-            event_idx += 1
+    # Log state and check stability after every update
+    hooks = []
+    if state_logger is not None:
+        hooks.append(state_logger.log_tick)
+    if stability_tracker is not None:
+        hooks.append(stability_tracker.check)
+    for hook in hooks:
+        hom.addTickHook(hook)
+
+    session = hom.session(slowed=False)
+    try:
+        while hom.time < total_ticks:
+            # Dispatch any events scheduled for this tick
+            changed = False
+            while event_idx < len(events) and events[event_idx][0] <= hom.time:
+                events[event_idx][1](hom)
+                event_idx += 1
+                changed = True
+
+            # Per-tick callback (e.g. for trainer logic)
+            if tick_callback is not None:
+                tick_callback(hom, hom.time)
+                changed = True
+
+            if changed:
+                session.refresh()
+
+            # Update all active units
+            if tick_callback is not None:
+                session.step()
+            elif event_idx < len(events):
+                session.runUntil(min(events[event_idx][0], total_ticks))
+            else:
+                session.runUntil(total_ticks)
+    finally:
+        session.close()
+        for hook in hooks:
+            hom.removeTickHook(hook)
 
-        # Per-tick callback (e.g. for trainer logic)
-        if tick_callback is not None:
-            tick_callback(hom, hom.time)
 
-        # Update all active units
-        for unit in hom.homeoUnits:
-            if hom.collectsData:
-                hom.dataCollector.atTimeIndexAddDataUnitForAUnit(hom.time, unit)
-            unit.time = hom.time
-            if unit.isActive():
-                unit.selfUpdate()
+# ---------------------------------------------------------------
+#  Branching runs
+# ---------------------------------------------------------------
+
+class Branch:
+    '''One continuation of a homeostat from a shared burned-in prefix
+    (see run_branches).
+
+    Constructor parameters:
+        name:     label of the branch in the result table
+        events:   list of (tick, callable(hom)) pairs, as in run_with_events.
+                  Ticks are absolute: events before the branch point fire
+                  at its first tick
+        seed:     if not None, reseed the homeostat's random stream and
+                  numpy.random and random at the branch point; otherwise the
+                  branch continues the random streams of the prefix
+        probe:    callable(hom) returning an object whose check(tick) is
+                  called after every tick of the branch (e.g. a ResponseMeasurer)
+        measure:  callable(hom, probe) returning a dict of extra columns of
+                  the branch's row in the result table
+    '''
+
+    def __init__(self, name, events=None, seed=None, probe=None, measure=None):
+        self.name = name
+        self.events = list(events or [])
+        self.seed = seed
+        self.probe = probe
+        self.measure = measure
 
-        hom.time += 1
 
-        # Log state after update
-        if state_logger is not None:
-            state_logger.log_tick(hom.time)
+def run_branches(hom, branch_tick, branches, total_ticks, prefix_events=None,
+                 processes=None, window=200):
+    '''Run hom up to branch_tick once, then continue it to total_ticks
+    once for every Branch in branches, and return the result table: one
+    dict per branch, in the order of branches.
 
-        # Check stability
-        if stability_tracker is not None:
-            stability_tracker.check(hom.time)
+    Parameters:
+        hom:            Homeostat instance, left in its state at branch_tick
+        branch_tick:    tick at which the branches start
+        branches:       list of Branch instances
+        total_ticks:    tick at which every branch ends
+        prefix_events:  events of the shared prefix, as in run_with_events.
+                        Events at or after branch_tick belong to the branches
+        processes:      number of branches run at once (default: number of
+                        CPUs).  With more than one, branches are forked
+                        worker processes sharing the prefix copy-on-write;
+                        with 1, or where fork is not available, they are run
+                        one after the other on clones of hom
+        window:         window of the StabilityTracker of the run
+
+    The stability tracker of the prefix is carried on by every branch.
+    Each row has the branch's name and seed, branch_tick, total_ticks,
+    elapsed_seconds, the StabilityTracker results and the columns returned
+    by the branch's measure.  A branch runs the same whether it is forked
+    or cloned, since the random states of the branch point are restored in
+    both cases.
+    '''
+    global _branchPoint
+
+    tracker = StabilityTracker(hom, window=window)
+    if branch_tick > (hom.time or 0):
+        run_with_events(hom, branch_tick, events=prefix_events,
+                        stability_tracker=tracker)
+    randomStates = (np.random.get_state(), random.getstate())
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(branches))
+    if processes <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        return [_run_branch(hom.clone(), copy.copy(tracker), branch,
+                            total_ticks, randomStates)
+                for branch in branches]
+
+    # Forked workers inherit the prefix: only branch indices and rows are pickled.
+    # Every branch gets a new worker, forked from the branch point
+    _branchPoint = (hom, tracker, branches, total_ticks, randomStates)
+    try:
+        with multiprocessing.get_context('fork').Pool(processes, maxtasksperchild=1) as pool:
+            return pool.map(_run_forked_branch, range(len(branches)), chunksize=1)
+    finally:
+        _branchPoint = None
+
+
+_branchPoint = None
+
+
+def _run_forked_branch(index):
+    hom, tracker, branches, total_ticks, randomStates = _branchPoint
+    return _run_branch(hom, tracker, branches[index], total_ticks, randomStates)
+
+
+def _run_branch(hom, tracker, branch, total_ticks, randomStates):
+    '''Run hom, in its state at the branch point, as branch and return its row'''
+    np.random.set_state(randomStates[0])
+    random.setstate(randomStates[1])
+    if branch.seed is not None:
+        hom.seedRandom(branch.seed)
+        np.random.seed(branch.seed)
+        random.seed(branch.seed)
+    tracker.hom = hom
+    branch_tick = hom.time
+    probe = branch.probe(hom) if branch.probe is not None else None
+    if probe is not None:
+        hom.addTickHook(probe.check)
+    t0 = time.time()
+    try:
+        run_with_events(hom, total_ticks, events=branch.events,
+                        stability_tracker=tracker)
+    finally:
+        if probe is not None:
+            hom.removeTickHook(probe.check)
+    row = {
+        'branch': branch.name,
+        'seed': branch.seed,
+        'branch_tick': branch_tick,
+        'total_ticks': total_ticks,
+        'elapsed_seconds': time.time() - t0,
+        'stability_achieved_at': tracker.stability_achieved_at,
+        'last_stability_at': tracker.last_stability_at,
+        'currently_stable': tracker.currently_stable,
+        'total_uniselector_firings': tracker.total_uniselector_firings,
+    }
+    if branch.measure is not None:
+        row.update(branch.measure(hom, probe))
+    return row
 
 
 # ---------------------------------------------------------------
@@ -698,9 +874,10 @@ class ResponseMeasurer:
         self._peak = 0.0
 
     def check(self, tick):
-        unit = self.hom.homeoUnits[self.target_idx]
-        dev = unit.criticalDeviation
+        self.record(tick, self.hom.homeoUnits[self.target_idx].criticalDeviation)
 
+    def record(self, tick, dev):
+        '''As check, given the deviation dev of the target unit at tick.'''
         if tick in self.stimulus_ticks:
             self._measuring = True
             self._measure_start = tick
@@ -716,6 +893,37 @@ class ResponseMeasurer:
                 self._measuring = False
 
 
+def measure_ensemble_responses(ensemble, total_ticks, events, measurers):
+    '''Run a HomeostatEnsemble with scheduled events, as its runWithEvents
+    does, feeding measurers[k] (the ResponseMeasurer of replicate k) the
+    deviation of its target unit at every tick of its measurement windows,
+    as run_with_events would with a check(tick) callback.  The ensemble is
+    stepped tick by tick only inside the windows.
+    '''
+    events = sorted(events or [], key=lambda e: e[0])
+    watched = set()
+    for measurer in measurers:
+        for stimulus in measurer.stimulus_ticks:
+            watched.update(range(stimulus, stimulus + measurer.measure_window + 1))
+    event_idx = 0
+    for tick in sorted(watched | set(e[0] for e in events)):
+        if tick >= total_ticks:
+            break
+        if event_idx < len(events) and events[event_idx][0] <= tick:
+            ensemble.runFor(max(tick, ensemble.time))
+            while event_idx < len(events) and events[event_idx][0] <= tick:
+                for hom in ensemble.homeostats:
+                    events[event_idx][1](hom)
+                event_idx += 1
+            ensemble.pack()
+        else:
+            ensemble.advance(tick - ensemble.time)
+        if tick in watched:
+            for k, measurer in enumerate(measurers):
+                measurer.record(tick, ensemble.dev[k, measurer.target_idx])
+    ensemble.runFor(total_ticks)
+
+
 # ===============================================================
 #  EXPERIMENT 7: Multistable System (DftB 16/8)
 # ===============================================================
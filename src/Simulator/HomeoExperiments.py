@@ -2502,9 +2502,7 @@ def initializeBraiten2_2_Full_GA_phototaxis(homeoGenome, noHomeoParameters=4,
         backendSimulator=backendSimulator, dataDir=dataDir,
         noNoise=noNoise, noUnisel=noUnisel, transducers=transducers)
     if backendSimulator is not None:
-        target = backendSimulator.kheperaSimulation.allBodies['TARGET']
-        target.userData['intensity'] = -100
-        target.userData['lightIntensity'] = -100
+        backendSimulator.kheperaSimulation.setLightIntensity('TARGET', -100)
     return hom
 
 initializeBraiten2_2_Full_GA_phototaxis.noEvolvedUnits = 4
@@ -2554,9 +2552,7 @@ def initializeBraiten2_2_Full_GA_phototaxis_continuous(homeoGenome, noHomeoParam
 
     # Set negative light intensity (darkness source / phototaxis)
     if backendSimulator is not None:
-        target = backendSimulator.kheperaSimulation.allBodies['TARGET']
-        target.userData['intensity'] = -100
-        target.userData['lightIntensity'] = -100
+        backendSimulator.kheperaSimulation.setLightIntensity('TARGET', -100)
 
     # Replace discrete uniselectors with continuous OU process on evolved units
     if not noUnisel:
@@ -2741,9 +2737,7 @@ def _setup_continuous_weightfree_homeostat(homeoGenome, backendSimulator,
 
     "8. Set negative light intensity (phototaxis)"
     if backendSimulator is not None:
-        target = backendSimulator.kheperaSimulation.allBodies['TARGET']
-        target.userData['intensity'] = -100
-        target.userData['lightIntensity'] = -100
+        backendSimulator.kheperaSimulation.setLightIntensity('TARGET', -100)
 
     "9. Socket setup for WEBOTS"
     if backendSimulator.name == "WEBOTS":
@@ -2985,9 +2979,7 @@ def _setup_continuous_weightfree_homeostat_direct(homeoGenome, backendSimulator,
 
     "8. Set negative light intensity (phototaxis)"
     if backendSimulator is not None:
-        target = backendSimulator.kheperaSimulation.allBodies['TARGET']
-        target.userData['intensity'] = -100
-        target.userData['lightIntensity'] = -100
+        backendSimulator.kheperaSimulation.setLightIntensity('TARGET', -100)
 
     "9. Socket setup for WEBOTS"
     if backendSimulator.name == "WEBOTS":
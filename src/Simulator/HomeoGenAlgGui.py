@@ -13,7 +13,7 @@ from deap import tools
 from deap.tools.mutation import mutFlipBit
 # from dill import dump
 # import dill as pickle
-from pickle import dump
+import sqlite3
 from Simulator.HomeoQtSimulation import HomeoQtSimulation
 import Simulator.HomeoExperiments
 from Helpers.SimulationThread import SimulationThread
@@ -49,15 +49,41 @@ from time import time, strftime, localtime, sleep
 from tabulate import tabulate
 from Helpers.ExceptionAndDebugClasses import TCPConnectionError, HomeoDebug, hDebug
 from Helpers.StatsAnalyzer import extractGenomeOfIndID
+from Helpers.GAFitnessCache import GAFitnessCache
+from Helpers.GARunStore import GARunStore, Extension as GARunStoreExtension
+from Helpers.HomeoNoise import HomeoNoise
+from Helpers.TrajectoryArchive import TrajectoryArchive, Extension as TrajectoryArchiveExtension
 from Simulator.SimulatorBackend import SimulatorBackendHOMEO,SimulatorBackendVREP,SimulatorBackendWEBOTS
 from threading import Lock
 from glob import glob
+import random
 
 
 # --- Module-level configuration for multiprocessing workers ---
 # Set by _init_worker() in each spawned worker process.
 _worker_config = {}
 
+# The worker-resident evaluator, created by the first evaluation in each worker.
+_worker_evaluator = None
+
+
+def _seedEvaluation(seed):
+    """Seed the Python, numpy and compiled-code random generators before an evaluation,
+    so that evaluating the same genome with the same seed gives the same fitness.
+    The homeostat built for the evaluation takes its random stream from numpy.random
+    (see Core.HomeoRandom), so the fitness does not depend on what the worker
+    evaluated before, nor on the number of workers."""
+    from Core.HomeoJIT import _jit_seed
+    random.seed(seed)
+    np.random.seed(seed)
+    _jit_seed(seed)
+
+
+def trajectoryArchiveFilename(dataDir, ID):
+    """Return the trajectory archive of the generation of the individual with ID,
+    the first field of the IDs assigned by HomeoGASimulation.runGaSimulation."""
+    return os.path.join(dataDir, 'Trajectories-Gen-%s.%s' % (ID.split('-')[0], TrajectoryArchiveExtension))
+
 
 def _init_worker(config):
     """Pool initializer: copy config into the module-level dict.
@@ -68,8 +94,9 @@ def _init_worker(config):
     from the parent process, causing shader compilation to fail when
     KheperaWheel tries to create pyglet shapes.
     """
-    global _worker_config
+    global _worker_config, _worker_evaluator
     _worker_config = config
+    _worker_evaluator = None
 
     # Clear stale pyglet GL context inherited from the parent process
     try:
@@ -79,73 +106,105 @@ def _init_worker(config):
         pass
 
 
+class GenomeWorkerEvaluator(object):
+    """Fitness evaluator living in a pool worker for the whole GA run.
+
+    The SimulatorBackendHOMEO, its Khepera world and the HomeoQtSimulation
+    are built once per process. Between evaluations the world is reset in
+    place (KheperaSimulation.resetWorldInPlace) instead of being destroyed
+    and rebuilt, so the transducers built on it stay valid, and only the
+    homeostat is rebuilt from the new genome by the experiment function
+    (which applies the genome to the units through initialize_GA).
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.backend = SimulatorBackendHOMEO(robotName='Khepera', lock=None, reusesWorld=True,
+                                             bufferedActuation=config.get('bufferedActuation', False),
+                                             binaryTrajectories=config.get('binaryTrajectories', True))
+        self.backend.setDataDir(config['dataDir'])
+        self.simulation = HomeoQtSimulation(experiment=config['experiment'], dataDir=config['dataDir'])
+        self.evaluations = 0
+
+    def evaluate(self, genome):
+        cfg = self.config
+        stepsSize = cfg['stepsSize']
+        backend = self.backend
+        sim = self.simulation
+
+        if self.evaluations > 0:
+            backend.reset()
+        if cfg.get('evaluationSeed') is not None:
+            _seedEvaluation(cfg['evaluationSeed'])
+
+        params = dict(cfg['experimentParams'])
+        params['homeoGenome'] = genome
+        params['backendSimulator'] = backend
+        sim.initializeExperSetup(
+            message="Building Homeostat from genome %s" % genome.ID,
+            **params)
+
+        if cfg.get('trajectoryArchive'):
+            backend.setTrajectoryArchive(trajectoryArchiveFilename(cfg['dataDir'], genome.ID))
+        backend.setRobotModel(genome.ID)
+        sim.homeostat.connectUnitsToNetwork()
+        sim.maxRuns = stepsSize
+        "Discard the live data of the previous genome's units"
+        sim.liveData.clear()
+        sim.liveDataWindow.clear()
+        sim.unitsSelfWeights.clear()
+        sim.initializeLiveData()
+
+        # Enable headless/JIT optimizations for GA evaluation
+        hom = sim.homeostat
+        hom._headless = True
+        hom._collectsData = False
+        hom._slowingFactor = 0
+        for u in hom.homeoUnits:
+            u._headless = True
+        hom.setNoiseModels(*cfg.get('noiseModels', (None, None)))
+        unstableFitness = cfg.get('unstableFitness')
+        if unstableFitness is not None and not hom.predictsStability():
+            self.evaluations += 1
+            print(" Model %s predicted unstable, not simulated: fitness %.5f" % (genome.ID, unstableFitness))
+            return unstableFitness,
+
+        # Compute actual tick count.  stepsSize means "simulated seconds".
+        # When units have dt_fast < 1, more ticks are needed to cover the
+        # same simulated time.  Use the smallest dt_fast across all evolved
+        # units (those with the attribute) to determine the conversion.
+        min_dt_fast = 1.0
+        for u in hom.homeoUnits:
+            dt = getattr(u, '_dt_fast', 1.0)
+            if dt < min_dt_fast:
+                min_dt_fast = dt
+        actual_ticks = int(math.ceil(stepsSize / min_dt_fast))
+
+        timeNow = time()
+        for i in range(actual_ticks):
+            sim.step()
+        backend.saveTrajectory()
+
+        finalDis = backend.finalDisFromTarget()
+        fitness = cfg.get('fitnessSign', 1) * finalDis
+        self.evaluations += 1
+        print(" Evaluation for model %s (%d ticks, min_dt=%.2f) took time: %s with fitness %.5f" % (
+            genome.ID, actual_ticks, min_dt_fast,
+            str(datetime.timedelta(seconds=time() - timeNow)), fitness))
+        return fitness,
+
+
 def _evaluate_genome_worker(genome):
     """Standalone fitness evaluation for use with multiprocessing.Pool.
 
-    Creates its own SimulatorBackendHOMEO and HomeoQtSimulation per call,
-    avoiding all shared state. Reads experiment parameters from the
-    module-level _worker_config dict (set by _init_worker at pool start).
+    Delegates to the worker's GenomeWorkerEvaluator, created on first use
+    from the module-level _worker_config dict (set by _init_worker at
+    pool start), which keeps the simulation and its world across calls.
     """
-    cfg = _worker_config
-    experiment = cfg['experiment']
-    stepsSize = cfg['stepsSize']
-    dataDir = cfg['dataDir']
-
-    backend = SimulatorBackendHOMEO(robotName='Khepera', lock=None)
-    backend.setDataDir(dataDir)
-
-    sim = HomeoQtSimulation(experiment=experiment, dataDir=dataDir)
-    sim.maxRuns = stepsSize
-
-    params = dict(cfg['experimentParams'])
-    params['homeoGenome'] = genome
-    params['backendSimulator'] = backend
-
-    sim.initializeExperSetup(
-        message="Building Homeostat from genome %s" % genome.ID,
-        **params)
-
-    backend.connect()
-    backend.reset()
-    sim.initializeExperSetup(
-        message="Rebuilding world after reset", **params)
-    backend.close()
-    backend.connect()
-
-    backend.setRobotModel(genome.ID)
-    sim.homeostat.connectUnitsToNetwork()
-    sim.maxRuns = stepsSize
-    sim.initializeLiveData()
-
-    # Enable headless/JIT optimizations for GA evaluation
-    hom = sim.homeostat
-    hom._headless = True
-    hom._collectsData = False
-    hom._slowingFactor = 0
-    for u in hom.homeoUnits:
-        u._headless = True
-
-    # Compute actual tick count.  stepsSize means "simulated seconds".
-    # When units have dt_fast < 1, more ticks are needed to cover the
-    # same simulated time.  Use the smallest dt_fast across all evolved
-    # units (those with the attribute) to determine the conversion.
-    min_dt_fast = 1.0
-    for u in hom.homeoUnits:
-        dt = getattr(u, '_dt_fast', 1.0)
-        if dt < min_dt_fast:
-            min_dt_fast = dt
-    actual_ticks = int(math.ceil(stepsSize / min_dt_fast))
-
-    timeNow = time()
-    for i in range(actual_ticks):
-        sim.step()
-
-    finalDis = backend.finalDisFromTarget()
-    fitness = cfg.get('fitnessSign', 1) * finalDis
-    print(" Evaluation for model %s (%d ticks, min_dt=%.2f) took time: %s with fitness %.5f" % (
-        genome.ID, actual_ticks, min_dt_fast,
-        str(datetime.timedelta(seconds=time() - timeNow)), fitness))
-    return fitness,
+    global _worker_evaluator
+    if _worker_evaluator is None:
+        _worker_evaluator = GenomeWorkerEvaluator(_worker_config)
+    return _worker_evaluator.evaluate(genome)
 
 
 class QTextEditStream(QObject):
@@ -429,7 +488,7 @@ class HomeoGASimulGUI(QWidget):
         """Open a file dialog to select a logbook, then extract a genome from it."""
         filename, _ = QFileDialog.getOpenFileName(
             self, "Select Logbook File", "",
-            "Logbook files (*.lgb);;All files (*.*)")
+            "Logbook files (*.lgb *.%s);;All files (*.*)" % GARunStoreExtension)
         if filename:
             indId, ok = QInputDialog.getText(self, "Individual ID",
                 "Enter the ID of the individual to clone (e.g., '018-006'):")
@@ -512,6 +571,23 @@ class HomeoGASimulation(object):
     The debugging parameter is a string containing the name of the error
     classes HomeoDebug should print. See HomeoDebug class comment for 
     allowable error classes names. 
+
+    When evaluationSeed is given, the random generators are seeded with it before
+    each evaluation. With bufferedActuation the HOMEO backend advances the robot
+    simulation once per homeostat tick instead of once per wheel command. With binaryTrajectories
+    (the default) the HOMEO backend saves the robots' trajectories in binary .btraj files,
+    see Helpers.RobotTrajectoryFile. With trajectoryArchive set to 'all' (or 'hof') the
+    HOMEO backend stores the trajectories of each generation (or of the hall of fame
+    members only) in a TrajectoryArchive file per generation instead, see
+    Helpers.TrajectoryArchive. When fitnessCache is given (a file name, or ':memory:'),
+    fitnesses are stored in a GAFitnessCache keyed on genome, experiment, stepsSize
+    and evaluationSeed, and genomes already evaluated are not simulated again.
+    unitNoiseModel and connectionNoiseModel, when given, are the HomeoNoise models
+    (see HomeoNoise.modelNames()) of the noise of all the units and connections of
+    the evaluated homeostats, which otherwise keep the models set by the experiment.
+    When unstableFitness is given, homeostats whose configuration the linear stability
+    oracle predicts unstable (see Core.HomeoLinearStability) are not simulated and
+    get unstableFitness; the sensor units are held at their initial outputs.
     '''
     
     from Helpers.General_Helper_Functions import simulations_data_dir as _sdd
@@ -535,7 +611,16 @@ class HomeoGASimulation(object):
                                    debugging = None,
                                    simulatorBackend = "VREP",
                                    vrepPort = None,
-                                   nWorkers = 1):
+                                   nWorkers = 1,
+                                   evaluationSeed = None,
+                                   fitnessCache = None,
+                                   fitnessCacheSize = GAFitnessCache.DefaultMaxEntries,
+                                   bufferedActuation = False,
+                                   binaryTrajectories = True,
+                                   trajectoryArchive = None,
+                                   unitNoiseModel = None,
+                                   connectionNoiseModel = None,
+                                   unstableFitness = None):
         
         self.worldBeingResetLock = Lock()
         self._stopRequested = False
@@ -551,7 +636,9 @@ class HomeoGASimulation(object):
                                                            10020,              # robot port
                                                            robotName = self._robotName)
         elif simulatorBackend == "HOMEO":
-            self.simulatorBackend =  SimulatorBackendHOMEO(robotName = self._robotName, lock = self.worldBeingResetLock)
+            self.simulatorBackend =  SimulatorBackendHOMEO(robotName = self._robotName, lock = self.worldBeingResetLock,
+                                                           bufferedActuation = bufferedActuation,
+                                                           binaryTrajectories = binaryTrajectories)
         else:
             self.simulatorBackend = None
 
@@ -582,6 +669,19 @@ class HomeoGASimulation(object):
         self.stepsSize = stepsSize
         self.generSize = generSize
         self.experiment = exp
+        self.evaluationSeed = evaluationSeed
+        self.bufferedActuation = bufferedActuation
+        if trajectoryArchive not in (None, 'all', 'hof'):
+            raise ValueError("trajectoryArchive must be None, 'all' or 'hof', not %r" % trajectoryArchive)
+        self.trajectoryArchive = trajectoryArchive
+        "Validate the noise models here rather than in every evaluation"
+        self.noiseModels = tuple(None if model is None else HomeoNoise.modelName(model)
+                                 for model in (unitNoiseModel, connectionNoiseModel))
+        self.unstableFitness = unstableFitness
+        if fitnessCache is not None:
+            self.fitnessCache = GAFitnessCache(fitnessCache, maxEntries = fitnessCacheSize)
+        else:
+            self.fitnessCache = None
         self.cxProb = cxProb 
         self.mutationProb = mutationProb 
         self.indivProb = indivProb 
@@ -654,6 +754,12 @@ class HomeoGASimulation(object):
                 'stepsSize': stepsSize,
                 'dataDir': self.dataDir,
                 'fitnessSign': self.fitnessSign,
+                'evaluationSeed': evaluationSeed,
+                'bufferedActuation': bufferedActuation,
+                'binaryTrajectories': binaryTrajectories,
+                'trajectoryArchive': trajectoryArchive,
+                'noiseModels': self.noiseModels,
+                'unstableFitness': unstableFitness,
             }
 
             ctx = multiprocessing.get_context('forkserver')
@@ -809,12 +915,13 @@ class HomeoGASimulation(object):
 
             # Evaluate the entire population
             print("-- Generation 0 --")
-            fitnesses = list(self.toolbox.map(self.toolbox.evaluate, pop))
+            fitnesses = self.evaluateIndividuals(pop)
             for ind, fit in zip(pop, fitnesses):
                 ind.fitness.values = fit
                 "record the data about the newly evaluated individual's genome in the logbook"
                 self.logbook.record(indivId = ind.ID, fitness = fit, genome = list(ind))
             self.hof.update(pop)
+            self.pruneTrajectoryArchive(gen)
             self.hist.update(pop)
             print("  Evaluated %i individuals" % len(pop))
             print("  Pop now includes: ", end="")
@@ -883,7 +990,7 @@ class HomeoGASimulation(object):
                     #print "Now changed to: ", ind.ID
 
                 'Re-evaluate'
-                fitnesses = self.toolbox.map(self.toolbox.evaluate, invalid_ind)
+                fitnesses = self.evaluateIndividuals(invalid_ind)
                 for ind, fit in zip(invalid_ind, fitnesses):
                     if self._stopRequested:
                         break
@@ -912,6 +1019,7 @@ class HomeoGASimulation(object):
                 record = self.stats.compile(pop)
                 self.logbook.record(gen=g+1, evaluations = len(invalid_ind), **record)
                 self.hof.update(pop)
+                self.pruneTrajectoryArchive(g+1)
 
                 if progressCallback:
                     progressCallback(g+1, record, self.hof[0].fitness.values[0])
@@ -970,35 +1078,91 @@ class HomeoGASimulation(object):
             if self._pool is not None:
                 self._pool.close()
                 self._pool.join()
+            if self.fitnessCache is not None:
+                self.fitnessCache.close()
+            if getattr(self, '_runStore', None) is not None:
+                self._runStore.close()
+                self._runStore = None
         
             
 
+    def evaluateIndividuals(self, individuals):
+        """Return the list of fitnesses of individuals, evaluated with the toolbox's
+           map and evaluate functions.
+           With a fitness cache, the fitnesses of genomes already evaluated come from
+           the cache and identical genomes in individuals are evaluated only once."""
+
+        if self.fitnessCache is None:
+            return list(self.toolbox.map(self.toolbox.evaluate, individuals))
+
+        "Buffered actuation changes the dynamics of the robot, and hence the fitnesses"
+        experiment = self.experiment + ('/bufferedActuation' if getattr(self, 'bufferedActuation', False) else '')
+        "So do the noise models"
+        for kind, model in zip(('unitNoise', 'connectionNoise'), getattr(self, 'noiseModels', (None, None))):
+            if model is not None:
+                experiment += '/%s=%s' % (kind, model)
+        "And the screening of unstable genomes"
+        if getattr(self, 'unstableFitness', None) is not None:
+            experiment += '/unstableFitness=%r' % self.unstableFitness
+        keys = [self.fitnessCache.keyFor(ind, experiment, self.stepsSize, self.evaluationSeed)
+                for ind in individuals]
+        fitnesses = {}
+        toEvaluate = []
+        for ind, key in zip(individuals, keys):
+            if key in fitnesses:
+                continue
+            fitnesses[key] = self.fitnessCache.get(key)
+            if fitnesses[key] is None:
+                toEvaluate.append((key, ind))
+        for (key, ind), fit in zip(toEvaluate,
+                                   self.toolbox.map(self.toolbox.evaluate, [ind for key, ind in toEvaluate])):
+            fitnesses[key] = fit
+            self.fitnessCache.put(key, fit)
+        print("  %d individuals evaluated, %d fitnesses found in cache" % (
+            len(toEvaluate), len(individuals) - len(toEvaluate)))
+        return [fitnesses[key] for key in keys]
+
+    def pruneTrajectoryArchive(self, generation):
+        """In 'hof' trajectory archive mode, remove from the archive of generation
+           the trajectories of the individuals not in the hall of fame"""
+
+        if getattr(self, 'trajectoryArchive', None) != 'hof':
+            return
+        filename = trajectoryArchiveFilename(self.dataDir, str(generation).zfill(self.IDPad))
+        if not os.path.exists(filename):
+            return
+        archive = TrajectoryArchive(filename)
+        try:
+            archive.keepOnly([ind.ID for ind in self.hof])
+        finally:
+            archive.close()
+
     def saveLogbook(self, pop, timeElapsed, timeStarted):
         """Insert general info about the GA run into logbook
-           and the logbook for the GA run to a pickled object
-           for later analysis. Name the file according to the time
-           the simulation started and save it in current directory.
-           Overwrite existing file is necessary, i.e. update with 
-           the latest version 
+           and append the logbook records added since the last save
+           to the run store (see runStore) for later analysis.
            """
         self.recordGADataToLogbook(timeElapsed, pop)   
-        logbookFilename = self.getTimeFormattedCompleteFilename(timeStarted, 'Logbook', 'lgb')
         try:
-            dump(self.logbook, open(logbookFilename, "wb"))
-        except IOError: #as e:
-            #sys.stderr.write("Could not save the logbook to file:" + e.__str__ + "\n")
-            print("Could not save the logbook to file:") #, e.__str__
+            self.runStore(timeStarted).appendLogbook(self.logbook)
+        except (IOError, sqlite3.Error) as e:
+            print("Could not save the logbook to file:", e)
 
     def saveHistory(self, timeStarted):
-        """Save the history for the GA run to a pickled object
-           for later analysis. Name the file according to the time
-           the simulation started and save it in current directory"""
-        historyFilename = self.getTimeFormattedCompleteFilename(timeStarted, 'History', 'hist')
+        """Append the history entries added since the last save
+           to the run store (see runStore) for later analysis."""
         try:
-            dump(self.hist, open(historyFilename, "wb"))
-        except IOError: #as e:
-            #sys.stderr.write("Could not save the logbook to file:" + e.__str__ + "\n")
-            print("Could not save the history to file:") #, e.__str__
+            self.runStore(timeStarted).appendHistory(self.hist)
+        except (IOError, sqlite3.Error) as e:
+            print("Could not save the history to file:", e)
+
+    def runStore(self, timeStarted):
+        """Return the GARunStore holding logbook and history of the GA run,
+           opening it at the first call. Name the file according to the time
+           the simulation started and save it in the data directory"""
+        if getattr(self, '_runStore', None) is None:
+            self._runStore = GARunStore(self.getTimeFormattedCompleteFilename(timeStarted, 'GARun', GARunStoreExtension))
+        return self._runStore
     
     
     def getTimeFormattedCompleteFilename(self,timeStarted, prefix, extension, path = None):
@@ -1142,6 +1306,8 @@ class HomeoGASimulation(object):
         hDebug('network', "Connected")
         hDebug('network', "Resetting simulation world")
         self.simulatorBackend.reset()
+        if getattr(self, 'evaluationSeed', None) is not None:
+            _seedEvaluation(self.evaluationSeed)
         if self.simulatorBackend.name == "HOMEO":
             self._simulation.initializeExperSetup(
                 message="Rebuilding world after reset",
@@ -1155,6 +1321,8 @@ class HomeoGASimulation(object):
         hDebug('network', "Connecting units to network")
         #
         #
+        if getattr(self, 'trajectoryArchive', None) and self.simulatorBackend.name == "HOMEO":
+            self.simulatorBackend.setTrajectoryArchive(trajectoryArchiveFilename(self.dataDir, genome.ID))
         self.simulatorBackend.setRobotModel(genome.ID)
         
         "testing"
@@ -1173,6 +1341,11 @@ class HomeoGASimulation(object):
         hom._slowingFactor = 0
         for u in hom.homeoUnits:
             u._headless = True
+        hom.setNoiseModels(*getattr(self, 'noiseModels', (None, None)))
+        unstableFitness = getattr(self, 'unstableFitness', None)
+        if unstableFitness is not None and not hom.predictsStability():
+            print(" Model %s predicted unstable, not simulated: fitness %.5f" % (genome.ID, unstableFitness))
+            return unstableFitness,
 
         # Compute actual tick count (stepsSize = simulated seconds).
         min_dt_fast = 1.0
@@ -1191,6 +1364,8 @@ class HomeoGASimulation(object):
             hDebug('eval', ("Step: "+ str(i+1)+"\n"))
             self._simulation.step()
         self.worldBeingResetLock.release()
+        if self.simulatorBackend.name == "HOMEO":
+            self.simulatorBackend.saveTrajectory()
         hDebug('eval', ("Elapsed time in seconds was " + str(round((time() - timeNow),3))))
         finalDis =self.simulatorBackend.finalDisFromTarget()
         fitness = self.fitnessSign * finalDis
@@ -1237,7 +1412,7 @@ class HomeoGASimulation(object):
     
     def cleanUpTrajFiles(self):
         "Remove all files not related to specific homeostat models from dataDir"
-        unspecificFileList = glob(self.dataDir+"/*-Unspecified.traj")
+        unspecificFileList = glob(self.dataDir+"/*-Unspecified.traj") + glob(self.dataDir+"/*-Unspecified.btraj")
         for f in unspecificFileList:
             os.remove(f)
     
@@ -4,6 +4,7 @@ Created on Mar 19, 2013
 @author: stefano
 '''
 from Core.Homeostat import *
+from Core.HomeostatSession import HomeostatSessionError
 from Core.HomeoDataCollector  import *
 from Core.HomeoUnitNewtonian  import *
 try:
@@ -197,7 +198,7 @@ class HomeoQtSimulation(QObject):
         self.maxDataPoints = 50
         self.liveDataWindow = {}
         self.panningCharts = True       # default is to use panning charts. Can be changed in the Gui
-        self.tick_callbacks = []        # list of callables, each called with (homeostat, tick) after every runOnce()
+        self.tick_callbacks = []        # list of callables, each called with (homeostat, tick) after every tick
                 
     def initializeLiveData(self):
         "set up the liveData dictionary for live graphing"
@@ -218,6 +219,8 @@ class HomeoQtSimulation(QObject):
             self._homeostat = getattr(Simulator.HomeoExperiments,self.currentExperiment)()
         else:
             self._homeostat = getattr(Simulator.HomeoExperiments,self.currentExperiment)(**params)
+            if params.get('backendSimulator') is not None:
+                params['backendSimulator'].attachHomeostat(self._homeostat)
         self._dataFilename = self.currentExperiment + '--Plot-Data'
         #----------------------------------------------------------------------------- #
         # FIXME 
@@ -240,10 +243,11 @@ class HomeoQtSimulation(QObject):
         if not self.liveData:
             self.initializeLiveData()
 
+        session = self.homeostatSession()
+        if session is None:
+            return
         while self._homeostat.time  < self._maxRuns  and self._isRunning == True:
-            self._homeostat.runOnce()
-            for cb in self.tick_callbacks:
-                cb(self._homeostat, self._homeostat.time)
+            self.stepSession(session)
 #            if self.liveDataOn:
             self.updateLiveData()
             time.sleep(self._simulDelay / 1000)
@@ -264,15 +268,42 @@ class HomeoQtSimulation(QObject):
     def step(self):
         "Advance the simulation one step"
         if self._homeostat.time  < self._maxRuns:
-            self._homeostat.runOnce()
-            for cb in self.tick_callbacks:
-                cb(self._homeostat, self._homeostat.time)
+            session = self.homeostatSession()
+            if session is None:
+                return
+            self.stepSession(session)
             self.updateLiveData()
 #            time.sleep(self._simulDelay / 1000)
             if QApplication.instance() is not None:
                 QApplication.processEvents() 
 
     
+    def homeostatSession(self):
+        '''Return the HomeostatSession stepping the current homeostat, opening a new one
+           when the homeostat has been replaced. Return None if the homeostat is not ready'''
+
+        session = getattr(self, '_session', None)
+        if session is None or session.homeostat is not self._homeostat:
+            if session is not None:
+                session.close()
+            try:
+                session = self._homeostat.session()
+            except HomeostatSessionError as e:
+                sys.stderr.write('Warning: %s' % e)
+                session = None
+            self._session = session
+        return session
+
+    def stepSession(self, session):
+        '''Advance the homeostat one tick with session and call the tick callbacks.
+           The callbacks may change weights and switches, so the session is refreshed after them'''
+
+        session.step()
+        if self.tick_callbacks:
+            for cb in self.tick_callbacks:
+                cb(self._homeostat, self._homeostat.time)
+            session.refresh()
+
     def updateLiveData(self):
 #        import pdb;
 #        pdb.set_trace()
@@ -127,15 +127,31 @@ class SimulatorBackendAbstract(object, metaclass=ABCMeta):
         "Return a reference to a robot's sensor, which can be used to read its value"
         pass
 
-class SimulatorBackendHOMEO(SimulatorBackendAbstract):
-    "Interface to the internal HOMEO Khepera-like robotic simulator" 
+    def attachHomeostat(self, homeostat):
+        "Prepare homeostat to drive the simulation, if the backend needs it. Do nothing by default"
+        pass
 
-    def __init__(self, lock = None, robotName='', dataDir = None):
+class SimulatorBackendHOMEO(SimulatorBackendAbstract):
+    """Interface to the internal HOMEO Khepera-like robotic simulator.
+       When reusesWorld is True the Box2D world is built only once: start does not rebuild 
+       a world that is already running and reset moves its bodies back to their initial 
+       conditions (see KheperaSimulation.resetWorldInPlace).
+       By default every wheel command advances the simulation by one step. When bufferedActuation
+       is True wheel commands only set the wheels' speeds, and the simulation advances 
+       physicsStepsPerTick steps at the end of each tick of the homeostats passed to attachHomeostat.
+       binaryTrajectories has the robot's trajectories saved in binary files (see Helpers.RobotTrajectoryFile)""" 
+
+    def __init__(self, lock = None, robotName='', dataDir = None, reusesWorld = False,
+                 bufferedActuation = False, physicsStepsPerTick = 1, binaryTrajectories = False):
         self._robotName = robotName
         self.lock = lock
+        self.reusesWorld = reusesWorld
+        self.bufferedActuation = bufferedActuation
         if KheperaSimulation is None:
             raise ImportError("KheperaSimulator requires Box2D. Install with: pip install box2d-py")
         self.kheperaSimulation = KheperaSimulation()
+        self.kheperaSimulation.physicsStepsPerTick = physicsStepsPerTick
+        self.kheperaSimulation.binaryTrajectories = binaryTrajectories
         self.host = None
         self.port = None
 
@@ -152,6 +168,15 @@ class SimulatorBackendHOMEO(SimulatorBackendAbstract):
         self.kheperaSimulation.setRobotModelName(self._robotName, modelName)
         self.kheperaSimulation.newTrajectoryFile()
                  
+    def saveTrajectory(self):
+        "Close the trajectory being recorded, so that it is completely saved"
+        self.kheperaSimulation.saveTrajectory()
+
+    def setTrajectoryArchive(self, filename):
+        """Store the trajectories recorded from now on in the TrajectoryArchive filename
+           (see KheperaSimulation.setTrajectoryArchive)"""
+        self.kheperaSimulation.setTrajectoryArchive(filename)
+
     def reset(self):
         """The internal simulator's resetWorld resets a simulation
            to initial conditions.
@@ -159,7 +184,10 @@ class SimulatorBackendHOMEO(SimulatorBackendAbstract):
         if self.lock is not None:
             self.lock.acquire()
         try:
-            self.kheperaSimulation.resetWorld()
+            if self.reusesWorld:
+                self.kheperaSimulation.resetWorldInPlace()
+            else:
+                self.kheperaSimulation.resetWorld()
         finally:
             if self.lock is not None:
                 self.lock.release()
@@ -197,11 +225,19 @@ class SimulatorBackendHOMEO(SimulatorBackendAbstract):
         """Internal simulator is started by creating the experimental setup.
            Use the instance's lock to prevent access to the world before it is properly set up"""
 
+        if self.reusesWorld and self.isRunningWorld(world):
+            return
         if self.lock is not None:
             with self.lock:
                 self.kheperaSimulation.setupWorld(world)
         else:
             self.kheperaSimulation.setupWorld(world)
+
+    def isRunningWorld(self, world):
+        "Return True if the internal simulator has already set up world"
+        
+        return (getattr(self.kheperaSimulation, 'world', None) is not None and
+                getattr(self.kheperaSimulation, 'homeoWorldToRun', None) == world)
     
     def quit(self):
         """Trash the existing simulation instance """     
@@ -211,7 +247,17 @@ class SimulatorBackendHOMEO(SimulatorBackendAbstract):
         """Return a transducer to a HOMEO's khepera-like robot's wheel.
            Wheel is a string: 'left' or 'right'"""
         
-        return HOMEO_DiffMotor(wheel, self._robotName ,self.kheperaSimulation)
+        return HOMEO_DiffMotor(wheel, self._robotName ,self.kheperaSimulation,
+                               stepsPhysics = not self.bufferedActuation)
+
+    def attachHomeostat(self, homeostat):
+        """With buffered actuation, have homeostat advance the simulation at the end of each of its ticks.
+           Do nothing otherwise"""
+        if self.bufferedActuation:
+            homeostat.addTickHook(self.advanceTick)
+
+    def advanceTick(self, time = None):
+        self.kheperaSimulation.advanceTick(time)
 
     def getSensor(self,eye):
         """Return a transducer to a HOMEO's khepera-like robot's 'eye'.
@@ -0,0 +1,104 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+'''
+from   Helpers.ColumnarStateLog import *
+from   Simulator.AshbyOriginalExperiments import setup_exp1_basic_ultrastability, AshbyStateLogger
+
+import unittest, os, shutil, tempfile
+import numpy as np
+
+
+class ColumnarStateLogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dataDir = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.dataDir, 'test.statelog.npz')
+
+    def tearDown(self):
+        shutil.rmtree(self.dataDir)
+
+    def testChunksAndDecimation(self):
+        rng = np.random.RandomState(3)
+        rows = np.column_stack([np.arange(1000), rng.normal(size = (1000, 2))])
+        writer = ColumnarStateLogWriter(self.filepath, ['tick', 'a', 'b'],
+                                        dtypes = [np.int64, np.float64, np.float32],
+                                        metadata = {'seed': '3'}, chunk_rows = 90, decimation = 40)
+        self.assertEqual(writer.chunk_rows, 120)
+        for row in rows:
+            writer.append(row)
+        writer.close()
+        writer.close()
+
+        log = ColumnarStateLog(self.filepath)
+        self.assertEqual(len(log), 1000)
+        self.assertEqual(log.metadata['seed'], '3')
+        self.assertEqual(log.column('tick').dtype, np.int64)
+        self.assertTrue(np.array_equal(log.column('tick'), np.arange(1000)))
+        self.assertTrue(np.array_equal(log.column('a'), rows[:, 1]))
+        self.assertTrue(np.array_equal(log.column('b'), rows[:, 2].astype(np.float32)))
+        self.assertRaises(ColumnarStateLogError, log.column, 'c')
+        log.close()
+
+        reduced = ColumnarStateLog(decimated_filepath(self.filepath, 40))
+        self.assertEqual(reduced.columns, ['tick', 'a_min', 'a_max', 'a_mean', 'b_min', 'b_max', 'b_mean'])
+        self.assertEqual(reduced.metadata['decimation'], 40)
+        self.assertEqual(len(reduced), 25)
+        self.assertTrue(np.array_equal(reduced.column('tick'), np.arange(0, 1000, 40)))
+        windows = rows[:, 1].reshape(25, 40)
+        self.assertTrue(np.array_equal(reduced.column('a_min'), windows.min(axis = 1)))
+        self.assertTrue(np.array_equal(reduced.column('a_max'), windows.max(axis = 1)))
+        self.assertTrue(np.allclose(reduced.column('a_mean'), windows.mean(axis = 1)))
+        reduced.close()
+
+    def testPartialWindowAndDecimatedOnly(self):
+        writer = ColumnarStateLogWriter(self.filepath, ['tick', 'x'], decimation = 4, full_resolution = False)
+        for tick in range(10):
+            writer.append((tick, tick * 2))
+        writer.close()
+        self.assertEqual(os.listdir(self.dataDir), ['test.statelog.npz'])
+        reduced = ColumnarStateLog(self.filepath)
+        self.assertEqual(list(reduced.column('tick')), [0, 4, 8])
+        self.assertEqual(list(reduced.column('x_max')), [6, 14, 18])
+        self.assertEqual(list(reduced.column('x_mean')), [3, 11, 17])
+        reduced.close()
+        self.assertRaises(ColumnarStateLogError, ColumnarStateLogWriter, self.filepath, ['tick'],
+                          full_resolution = False)
+
+    def testNotAColumnarLog(self):
+        with open(self.filepath, 'w') as f:
+            f.write('# AshbyExperimentLog v1\n')
+        self.assertRaises(ColumnarStateLogError, ColumnarStateLog, self.filepath)
+
+    def testAshbyStateLoggerFormatsAgree(self):
+        '''The columnar log converted to text must match the TSV log row by row'''
+        hom, seed, metadata = setup_exp1_basic_ultrastability(5)
+        textPath = os.path.join(self.dataDir, 'test.statelog')
+        textLogger = AshbyStateLogger(hom, textPath, seed = seed)
+        columnarLogger = AshbyStateLogger(hom, self.filepath, seed = seed, columnar = True,
+                                          decimation = 10, chunk_rows = 30)
+        session = hom.session(slowed = False)
+        for tick in range(101):
+            textLogger.log_tick(hom.time)
+            columnarLogger.log_tick(hom.time)
+            session.step()
+        textLogger.close()
+        columnarLogger.close()
+
+        convertedPath = os.path.join(self.dataDir, 'converted.statelog')
+        log = ColumnarStateLog(self.filepath)
+        self.assertEqual(log.metadata['format'], 'AshbyExperimentLog v1')
+        log.write_text(convertedPath)
+        log.close()
+        with open(textPath) as textFile, open(convertedPath) as convertedFile:
+            textLines = [line for line in textFile if not line.startswith('#')]
+            convertedLines = [line for line in convertedFile if not line.startswith('#')]
+        self.assertEqual(len(textLines), 102)
+        self.assertEqual(convertedLines, textLines)
+        self.assertEqual(len(ColumnarStateLog(decimated_filepath(self.filepath, 10))), 11)
+        self.assertRaises(ValueError, AshbyStateLogger, hom, textPath, decimation = 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+'''
+from   Core.HomeoUnit import HomeoUnit
+from   Core.HomeoUnitNewtonian import HomeoUnitNewtonian
+from   Core.HomeoUniselectorContinuous import HomeoUniselectorContinuous
+from   Core.HomeoArrayEngine import HomeoArrayEngine, HomeoArrayEngineError
+from   Core.Homeostat import *
+from   RobotSimulator.HomeoUnitNewtonianTransduc import HomeoUnitInput
+
+import unittest, pickle, numpy
+
+
+class HomeoArrayEngineTest(unittest.TestCase):
+
+    def buildHomeostat(self, unitClass, nUnits = 4):
+        '''A fully connected noiseless homeostat with fast uniselectors,
+           set up for headless runs'''
+
+        homeostat = Homeostat()
+        for i in range(nUnits):
+            homeostat.addFullyConnectedUnit(unitClass())
+        for unit in homeostat.homeoUnits:
+            unit.noise = 0
+            unit.uniselectorTimeInterval = 5
+            unit.criticalDeviation = numpy.random.uniform(-5, 5)
+            for conn in unit.inputConnections:
+                conn.noise = 0
+                if conn.incomingUnit is not unit:
+                    conn.state = 'uniselector'
+        homeostat.slowingFactor = 0
+        homeostat.collectsData = False
+        homeostat._headless = True
+        for unit in homeostat.homeoUnits:
+            unit._headless = True
+        return homeostat
+
+    def assertSameState(self, hom1, hom2):
+        self.assertEqual(hom1.time, hom2.time)
+        for unit1, unit2 in zip(hom1.homeoUnits, hom2.homeoUnits):
+            self.assertAlmostEqual(unit1.criticalDeviation, unit2.criticalDeviation, places = 10)
+            self.assertAlmostEqual(unit1.currentOutput, unit2.currentOutput, places = 10)
+            self.assertAlmostEqual(unit1.currentVelocity, unit2.currentVelocity, places = 10)
+            self.assertEqual(unit1.uniselectorTime, unit2.uniselectorTime)
+            for conn1, conn2 in zip(unit1.inputConnections, unit2.inputConnections):
+                self.assertAlmostEqual(conn1.weight * conn1.switch, conn2.weight * conn2.switch, places = 10)
+
+    def testEngineMatchesObjectPathHomeoUnit(self):
+        "Without noise the engine must reproduce the per-unit Python loop exactly"
+
+        hom1 = self.buildHomeostat(HomeoUnit)
+        hom2 = pickle.loads(pickle.dumps(hom1))
+        hom2.usesArrayEngine = True
+        self.assertTrue(hom2.canRunOnArrayEngine())
+        hom1.runFor(2000)
+        hom2.runFor(2000)
+        self.assertSameState(hom1, hom2)
+
+    def testEngineMatchesObjectPathNewtonian(self):
+        hom1 = self.buildHomeostat(HomeoUnitNewtonian)
+        hom2 = pickle.loads(pickle.dumps(hom1))
+        hom2.usesArrayEngine = True
+        hom1.runFor(2000)
+        hom2.runFor(2000)
+        self.assertSameState(hom1, hom2)
+
+    def testEngineMatchesObjectPathWithNoise(self):
+        "With noise both paths take the same draws from the homeostat's noise supply"
+
+        hom1 = self.buildHomeostat(HomeoUnit)
+        for unit in hom1.homeoUnits:
+            unit.noise = 0.05
+            for conn in unit.inputConnections:
+                conn.noise = 0.05
+        hom1.seedRandom(4)
+        hom2 = pickle.loads(pickle.dumps(hom1))
+        hom2.usesArrayEngine = True
+        hom1.runFor(2000)
+        hom2.runFor(2000)
+        self.assertSameState(hom1, hom2)
+        self.assertEqual(hom1.noiseSupply.standard_normal(), hom2.noiseSupply.standard_normal())
+
+    def testEngineMatchesObjectPathWithNoiseModels(self):
+        "Every unit and connection uses its own noise model in the engine too"
+
+        hom1 = self.buildHomeostat(HomeoUnit)
+        hom1.setNoiseModels('DegradingNormalProportional', 'DistortingUniformLinear')
+        for i, unit in enumerate(hom1.homeoUnits):
+            unit.noise = 0.05
+            for conn in unit.inputConnections:
+                conn.noise = 0.05
+            unit.inputConnections[0].noiseModel = 'DegradingConstantLinear'
+        hom1.homeoUnits[1].noiseModel = 'DistortingConstantProportional'
+        hom1.seedRandom(5)
+        hom2 = pickle.loads(pickle.dumps(hom1))
+        hom2.usesArrayEngine = True
+        hom1.runFor(2000)
+        hom2.runFor(2000)
+        self.assertSameState(hom1, hom2)
+        self.assertEqual(hom2.homeoUnits[1].noiseModel, 'DistortingConstantProportional')
+
+    def testEngineRunsInSeveralChunks(self):
+        "Running 1000 + 1000 ticks must give the same state as 2000 ticks"
+
+        hom1 = self.buildHomeostat(HomeoUnitNewtonian)
+        hom2 = pickle.loads(pickle.dumps(hom1))
+        hom1.usesArrayEngine = True
+        hom2.usesArrayEngine = True
+        hom1.runFor(2000)
+        hom2.runFor(1000)
+        hom2.runFor(2000)
+        self.assertSameState(hom1, hom2)
+
+    def testEngineMatchesObjectPathContinuousUniselector(self):
+        "Continuous uniselectors are stepped as HomeoUniselectorContinuousNetwork does"
+
+        for exact in (False, True):
+            hom1 = self.buildHomeostat(HomeoUnitNewtonian)
+            for unit in hom1.homeoUnits:
+                unit.uniselector = HomeoUniselectorContinuous()
+                unit.uniselector.sigma_crit = 0.2
+                unit.uniselector.exact = exact
+            hom1.seedRandom(11)
+            hom2 = pickle.loads(pickle.dumps(hom1))
+            hom2.seedRandom(11)
+            hom2.usesArrayEngine = True
+            hom1.runFor(1000)
+            hom2.runFor(1000)
+            self.assertSameState(hom1, hom2)
+
+    def testContinuousUniselectorStaysInRange(self):
+        hom = self.buildHomeostat(HomeoUnitNewtonian)
+        for unit in hom.homeoUnits:
+            unit.uniselector = HomeoUniselectorContinuous()
+            unit.uniselector.sigma_crit = 0.5
+        hom.usesArrayEngine = True
+        hom.runFor(500)
+        self.assertEqual(hom.time, 500)
+        for unit in hom.homeoUnits:
+            self.assertTrue(unit.minDeviation <= unit.criticalDeviation <= unit.maxDeviation)
+            for conn in unit.inputConnections:
+                self.assertTrue(0 <= conn.weight <= 1)
+
+    def testUnsupportedUnitsFallBackToObjectPath(self):
+        hom = self.buildHomeostat(HomeoUnitNewtonian, nUnits = 2)
+        hom.addFullyConnectedUnit(HomeoUnitInput())
+        hom.usesArrayEngine = True
+        self.assertFalse(HomeoArrayEngine.canRun(hom))
+        self.assertFalse(hom.canRunOnArrayEngine())
+        self.assertRaises(HomeoArrayEngineError, HomeoArrayEngine, hom)
+
+    def testEngineNeedsHeadlessRunWithoutDataCollection(self):
+        hom = self.buildHomeostat(HomeoUnit)
+        hom.usesArrayEngine = True
+        hom.collectsData = True
+        self.assertFalse(hom.canRunOnArrayEngine())
+        hom.collectsData = False
+        hom._headless = False
+        self.assertFalse(hom.canRunOnArrayEngine())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -110,5 +110,31 @@ class Braiten2_2_HOMEO_Test(unittest.TestCase):
         self.assertGreater(distance, 0)
 
 
+    def test_each_motor_command_steps_physics(self):
+        """By default every wheel command advances the simulation, twice per tick with two motors."""
+        hom = initializeBraiten2_2(backendSimulator=self.backend)
+        self.backend.attachHomeostat(hom)
+        hom.runFor(20)
+        self.assertEqual(self.backend.kheperaSimulation.currentStep, 40)
+
+    def test_buffered_actuation_steps_physics_once_per_tick(self):
+        """With buffered actuation the simulation advances physicsStepsPerTick steps per homeostat tick."""
+        for stepsPerTick in (1, 3):
+            backend = SimulatorBackendHOMEO(lock=self.lock, robotName='Khepera', bufferedActuation=True,
+                                            physicsStepsPerTick=stepsPerTick)
+            backend.kheperaSimulation.dataDir = self._tmpdir
+            hom = initializeBraiten2_2(backendSimulator=backend)
+            backend.attachHomeostat(hom)
+            backend.attachHomeostat(hom)
+            hom.slowingFactor = 0
+            self.assertFalse(hom.canRunOnArrayEngine())
+            robot = backend.kheperaSimulation.allBodies['Khepera']
+            start = tuple(robot.body.position)
+            hom.runFor(500)
+            self.assertEqual(backend.kheperaSimulation.currentStep, 500 * stepsPerTick)
+            self.assertNotEqual(tuple(robot.body.position), start)
+            backend.quit()
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,123 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+'''
+from   Core.HomeoUnit import HomeoUnit
+from   Core.HomeoUnitNewtonian import HomeoUnitNewtonian
+from   Core.HomeoUniselectorAshby import HomeoUniselectorAshby
+from   Core.HomeoUniselectorContinuous import HomeoUniselectorContinuous
+from   Core.HomeoCheckpoint import HomeoCheckpoint, HomeoCheckpointError
+from   Core.Homeostat import *
+
+import unittest, numpy, os, tempfile
+
+
+class HomeoCheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        numpy.random.seed(11)
+        self.homeostat = Homeostat()
+        for i in range(4):
+            unit = HomeoUnitNewtonian()
+            unit.setRandomValues()
+            unit.uniselectorActive = True
+            unit.uniselectorTimeInterval = 20
+            self.homeostat.addFullyConnectedUnit(unit)
+        self.homeostat.homeoUnits[1].uniselector = HomeoUniselectorAshby()
+        self.homeostat.seedRandom(3)
+        self.homeostat._headless = True
+        self.homeostat.slowingFactor = 0
+        self.homeostat.runFor(300)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+        os.rmdir(self.directory)
+
+    def stateOf(self, homeostat):
+        return [(u.name, u.criticalDeviation, u.currentVelocity, u.currentOutput, u.uniselectorTime,
+                 [(c.incomingUnit.name, c.weight, c.switch, c.noise, c.state) for c in u.inputConnections])
+                for u in homeostat.homeoUnits]
+
+    def testCloneContinuesAsTheOriginal(self):
+        clone = self.homeostat.clone()
+        self.assertEqual(clone.time, self.homeostat.time)
+        self.assertEqual(self.stateOf(clone), self.stateOf(self.homeostat))
+        self.assertEqual(clone.dataCollector.numberOfTicks(), 0)
+        for homeostat in (self.homeostat, clone):
+            homeostat.runFor(1500)
+        self.assertEqual(self.stateOf(clone), self.stateOf(self.homeostat))
+
+    def testClonesAreIndependent(self):
+        checkpoint = self.homeostat.checkpoint()
+        first, second = checkpoint.restore(), checkpoint.restore()
+        first.homeoUnits[0].inputConnections[1].newWeight(0.123)
+        self.assertNotEqual(second.homeoUnits[0].inputConnections[1].weight, 0.123)
+        self.assertTrue(all(c.outgoingUnit is u and c.incomingUnit in first.homeoUnits
+                            for u in first.homeoUnits for c in u.inputConnections))
+
+        forked = [self.homeostat.clone(seed = k) for k in range(2)]
+        for homeostat in forked:
+            homeostat.runFor(1000)
+        self.assertNotEqual(self.stateOf(forked[0]), self.stateOf(forked[1]))
+
+    def testCheckpointFile(self):
+        filename = os.path.join(self.directory, 'run.ckp')
+        pickled = os.path.join(self.directory, 'run.pickle')
+        self.homeostat.saveCheckpointTo(filename)
+        self.homeostat.saveTo(pickled)
+        self.assertLess(os.path.getsize(filename), os.path.getsize(pickled))
+
+        restored = Homeostat.readCheckpointFrom(filename)
+        self.assertEqual(self.stateOf(restored), self.stateOf(self.homeostat))
+        for homeostat in (self.homeostat, restored):
+            homeostat.runFor(1500)
+        self.assertEqual(self.stateOf(restored), self.stateOf(self.homeostat))
+
+        fileOut = open(filename, 'wb')
+        fileOut.write(b'not a checkpoint')
+        fileOut.close()
+        self.assertRaises(HomeostatError, Homeostat.readCheckpointFrom, filename)
+
+    def testContinuousUniselectorOnArrayEngine(self):
+        for unit in self.homeostat.homeoUnits:
+            unit.uniselector = HomeoUniselectorContinuous()
+        self.homeostat.collectsData = False
+        self.homeostat.usesArrayEngine = True
+        restored = HomeoCheckpoint.fromBytes(self.homeostat.checkpoint().toBytes()).restore()
+        for homeostat in (self.homeostat, restored):
+            homeostat.runFor(2000)
+        self.assertEqual(self.stateOf(restored), self.stateOf(self.homeostat))
+
+    def testRestoreIntoARebuiltHomeostat(self):
+        "A homeostat rebuilt as the original takes its state and keeps its own objects"
+
+        checkpoint = self.homeostat.checkpoint()
+        self.homeostat.runFor(1000)
+        self.setUp()
+        rebuilt = self.homeostat
+        collector, units = rebuilt.dataCollector, list(rebuilt.homeoUnits)
+        rebuilt.runFor(450)
+        rebuilt.restoreCheckpoint(checkpoint)
+        self.assertEqual(rebuilt.time, 300)
+        self.assertIs(rebuilt.dataCollector, collector)
+        self.assertTrue(all(u is v for u, v in zip(rebuilt.homeoUnits, units)))
+        reference = checkpoint.restore()
+        for homeostat in (rebuilt, reference):
+            homeostat.runFor(1000)
+        self.assertEqual(self.stateOf(rebuilt), self.stateOf(reference))
+
+        other = Homeostat()
+        for i in range(3):
+            other.addFullyConnectedUnit(HomeoUnitNewtonian())
+        self.assertRaises(HomeostatError, other.restoreCheckpoint, checkpoint)
+
+    def testForeignConnectionsAreRefused(self):
+        self.homeostat.homeoUnits[0].addConnectionWithRandomValues(HomeoUnit())
+        self.assertRaises(HomeoCheckpointError, self.homeostat.checkpoint)
+
+
+if __name__ == "__main__":
+    unittest.main()
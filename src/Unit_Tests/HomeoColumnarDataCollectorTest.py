@@ -0,0 +1,209 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+'''
+from   Core.HomeoUnit import *
+from   Core.HomeoDataCollector import *
+from   Core.HomeoColumnarDataCollector import *
+from   Core.Homeostat import *
+from   Core.HomeoUnitNewtonian import HomeoUnitNewtonian
+from   Core.HomeoUniselectorContinuous import HomeoUniselectorContinuous
+from   Core.HomeoUniselectorAshby import HomeoUniselectorAshby
+
+import unittest, os, tempfile, glob, numpy, random
+
+
+class HomeoColumnarDataCollectorTest(unittest.TestCase):
+
+    def setUp(self):
+        "setup a standard Ashby 4 units homeostat to be used in various tests"
+
+        self.homeostat = Homeostat()
+        for unit in range(4):
+            unit = HomeoUnit()
+            unit.setRandomValues()
+            self.homeostat.addFullyConnectedUnit(unit)
+        self.homeostat.slowingFactor = 0
+        self.homeostat._headless = True
+
+    def collectInto(self, collector, ticks):
+        "Record ticks ticks of the homeostat's run in collector, as Homeostat.runFor does"
+
+        for tick in range(ticks):
+            for unit in self.homeostat.homeoUnits:
+                collector.atTimeIndexAddDataUnitForAUnit(self.homeostat.time, unit)
+                unit.time = self.homeostat.time
+                unit.selfUpdate()
+            self.homeostat.time += 1
+
+    def testHomeostatUsesColumnarCollector(self):
+        self.assertIsInstance(self.homeostat.dataCollector, HomeoColumnarDataCollector)
+        self.homeostat.dataCollector = HomeoColumnarDataCollector(capacity = 50)
+        self.homeostat.flushData()
+        self.assertEqual(self.homeostat.dataCollector.capacity, 50)
+
+    def testSameDataAsDictCollector(self):
+        '''The columnar collector must return the same data as HomeoDataCollector,
+           both through the arrays and through the rebuilt states'''
+
+        columnar = HomeoColumnarDataCollector()
+        reference = HomeoDataCollector()
+        for tick in range(30):
+            for unit in self.homeostat.homeoUnits:
+                columnar.atTimeIndexAddDataUnitForAUnit(self.homeostat.time, unit)
+                reference.atTimeIndexAddDataUnitForAUnit(self.homeostat.time, unit)
+                unit.time = self.homeostat.time
+                unit.selfUpdate()
+            self.homeostat.time += 1
+
+        self.assertTrue(numpy.array_equal(columnar.criticalDevAsNPArrayForAllUnits(),
+                                          reference.criticalDevAsNPArrayForAllUnits()))
+        unit = self.homeostat.homeoUnits[2]
+        self.assertEqual(columnar.criticalDevAsCollectionForUnit(unit),
+                         reference.criticalDevAsCollectionForUnit(unit))
+        states = columnar.states
+        self.assertEqual(list(states.keys()), list(reference.states.keys()))
+        for time in states:
+            for name, dataUnit in states[time].items():
+                referenceUnit = reference.states[time][name]
+                self.assertEqual(dataUnit.criticalDeviation, referenceUnit.criticalDeviation)
+                self.assertEqual(dataUnit.output, referenceUnit.output)
+                self.assertEqual(dataUnit.uniselectorState, referenceUnit.uniselectorState)
+                self.assertEqual(dataUnit.connectedTo, referenceUnit.connectedTo)
+        self.assertEqual(columnar.printPlottingDataForROnAString('').splitlines()[3:],
+                         reference.printPlottingDataForROnAString('').splitlines()[3:])
+
+    def testCriticalDevArrayIsAView(self):
+        collector = HomeoColumnarDataCollector()
+        self.collectInto(collector, 10)
+        data = collector.criticalDevAsNPArrayForAllUnits()
+        self.assertEqual(data.shape, (10, 8))
+        self.assertTrue(numpy.shares_memory(data, collector._devUnisel))
+
+    def testGrowsBeyondInitialSize(self):
+        collector = HomeoColumnarDataCollector()
+        self.collectInto(collector, HomeoColumnarDataCollector.DefaultInitialRows + 10)
+        self.assertEqual(collector.numberOfTicks(), HomeoColumnarDataCollector.DefaultInitialRows + 10)
+        self.assertTrue((numpy.diff(collector.times()) == 1).all())
+
+    def testRingBufferKeepsLastTicks(self):
+        collector = HomeoColumnarDataCollector(capacity = 16)
+        reference = HomeoColumnarDataCollector()
+        for tick in range(40):
+            for unit in self.homeostat.homeoUnits:
+                collector.atTimeIndexAddDataUnitForAUnit(self.homeostat.time, unit)
+                reference.atTimeIndexAddDataUnitForAUnit(self.homeostat.time, unit)
+                unit.time = self.homeostat.time
+                unit.selfUpdate()
+            self.homeostat.time += 1
+        self.assertEqual(collector.numberOfTicks(), 16)
+        self.assertEqual(list(collector.times()), list(range(24, 40)))
+        self.assertEqual(list(collector.states.keys()), list(range(24, 40)))
+        self.assertTrue(numpy.array_equal(collector.criticalDevAsNPArrayForAllUnits(),
+                                          reference.criticalDevAsNPArrayForAllUnits()[24:]))
+
+    def testSpillToDisk(self):
+        directory = tempfile.mkdtemp()
+        collector = HomeoColumnarDataCollector(capacity = 16, spillPath = os.path.join(directory, 'run'))
+        self.collectInto(collector, 40)
+        self.assertEqual(len(collector.spilledFiles), 2)
+        self.assertEqual(collector.numberOfTicks(), 8)
+        times = [numpy.load(f)['times'] for f in collector.spilledFiles] + [collector.times()]
+        self.assertEqual(list(numpy.concatenate(times)), list(range(40)))
+        chunk = numpy.load(collector.spilledFiles[0])
+        self.assertEqual(chunk['criticalDeviation'].shape, (16, 4))
+        self.assertEqual(list(chunk['unitNames']), collector.unitNames)
+        for f in glob.glob(os.path.join(directory, '*')):
+            os.remove(f)
+        os.rmdir(directory)
+
+    def testConnectionsAreLoggedOnlyWhenTheyChange(self):
+        '''Connection values rebuilt from the event log must be those of every tick,
+           also across uniselector firings'''
+
+        for unit in self.homeostat.homeoUnits:
+            unit.uniselectorTimeInterval = 3
+            unit.criticalDeviation = unit.maxDeviation
+            for conn in unit.inputConnections:
+                if conn.incomingUnit is not unit:
+                    conn.state = 'uniselector'
+        columnar = HomeoColumnarDataCollector()
+        reference = HomeoDataCollector()
+        for tick in range(100):
+            for unit in self.homeostat.homeoUnits:
+                columnar.atTimeIndexAddDataUnitForAUnit(self.homeostat.time, unit)
+                reference.atTimeIndexAddDataUnitForAUnit(self.homeostat.time, unit)
+                unit.time = self.homeostat.time
+                unit.selfUpdate()
+            self.homeostat.time += 1
+        self.assertTrue(16 < columnar.nEvents < 16 * 100)
+        for time in reference.states:
+            for name, referenceUnit in reference.states[time].items():
+                self.assertEqual(columnar.states[time][name].connectedTo, referenceUnit.connectedTo)
+        weights = columnar.connWeightsAsNPArray()
+        self.assertEqual(weights.shape, (100, 16))
+        name, incomingName = columnar.connKeys[5]
+        self.assertEqual(weights[42, 5], numpy.prod(reference.states[42][name].connectedTo[incomingName][:2]))
+
+    def testConnectionMemoryDoesNotGrowWithTicks(self):
+        homeostat = Homeostat()
+        for i in range(10):
+            homeostat.addFullyConnectedUnit(HomeoUnit())
+        for unit in homeostat.homeoUnits:
+            unit.uniselectorActive = False
+        collector = HomeoColumnarDataCollector()
+        for tick in range(2000):
+            for unit in homeostat.homeoUnits:
+                collector.atTimeIndexAddDataUnitForAUnit(tick, unit)
+        self.assertEqual(collector.nEvents, 100)
+        "Less than 40 bytes per unit per tick: the per-tick connection data would need over 2500"
+        self.assertTrue(collector.memoryUsage() < 40 * 10 * 2048)
+
+        "A ring buffer keeps only the events needed by its ticks, also when uniselectors change the connections all the time"
+        for uniselectorClass in (HomeoUniselectorContinuous, HomeoUniselectorAshby):
+            numpy.random.seed(5)
+            random.seed(5)
+            self.homeostat = Homeostat()
+            for i in range(4):
+                unit = HomeoUnitNewtonian()
+                unit.setRandomValues()
+                unit.uniselector = uniselectorClass()
+                unit.uniselectorTimeInterval = 2
+                "Critical at almost every tick: the Ashby uniselectors keep firing"
+                unit.critThreshold = 0.01
+                for conn in unit.inputConnections:
+                    conn.state = 'uniselector'
+                self.homeostat.addFullyConnectedUnit(unit)
+            self.homeostat.seedRandom(5)
+            ring = HomeoColumnarDataCollector(capacity = 100)
+            reference = HomeoColumnarDataCollector()
+            for ticks in (1000, 3000):
+                for tick in range(ticks):
+                    for unit in self.homeostat.homeoUnits:
+                        ring.atTimeIndexAddDataUnitForAUnit(self.homeostat.time, unit)
+                        reference.atTimeIndexAddDataUnitForAUnit(self.homeostat.time, unit)
+                        unit.time = self.homeostat.time
+                        unit.selfUpdate()
+                    self.homeostat.time += 1
+                if ticks == 1000:
+                    memory = ring.memoryUsage()
+            self.assertTrue(reference.nEvents > 4000)
+            self.assertTrue(ring.nEvents < reference.nEvents / 10)
+            self.assertEqual(ring.memoryUsage(), memory)
+            for name, array in ring.connectionsAsNPArrays().items():
+                self.assertTrue(numpy.array_equal(array, reference.connectionsAsNPArrays()[name][-100:]))
+
+    def testSaveEssentialDataOnFile(self):
+        collector = HomeoColumnarDataCollector()
+        self.collectInto(collector, 20)
+        filename = tempfile.mktemp()
+        collector.saveEssentialDataOnFile(filename)
+        lines = open(filename).read().splitlines()
+        os.remove(filename)
+        self.assertEqual(len(lines), 4 + 20)
+        self.assertEqual(len(lines[-1].split(',')), 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
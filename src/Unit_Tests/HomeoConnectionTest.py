@@ -6,6 +6,7 @@ Created on Mar 11, 2013
 from   Core.HomeoUnit import *
 from   Core.Homeostat import *
 import unittest, string, random
+import numpy as np
 from copy import copy
 
 class HomeoConnectionTest(unittest.TestCase):
@@ -101,7 +102,27 @@ class HomeoConnectionTest(unittest.TestCase):
                                 ((inputUnit.currentOutput * self.connection.weight * self.connection.switch) - self.connection.noise)) 
                                 < errorTolerance)
             inputUnit.selfUpdate()
-            
+
+    def testOutputDrawsFromTheHoldingUnitStream(self):
+        "Without an explicit rng the noise comes from the random stream of the homeostat holding the connection"
+        outputs = []
+        for seed in (1, 2, 1):
+            "The global generator is reseeded, so that only the homeostat's stream can tell the runs apart"
+            np.random.seed(0)
+            random.seed(0)
+            homeostat = Homeostat()
+            for i in range(2):
+                homeostat.addFullyConnectedUnit(HomeoUnit())
+            homeostat.seedRandom(seed)
+            homeostat.shareRandomStream()
+            connection = homeostat.homeoUnits[0].inputConnections[1]
+            self.assertIs(connection.holdingUnit(), homeostat.homeoUnits[0])
+            connection.incomingUnit.currentOutput = 0.5
+            connection.noise = 0.5
+            outputs.append(connection.output())
+        self.assertNotEqual(outputs[0], outputs[1])
+        self.assertEqual(outputs[0], outputs[2])
+
 if __name__ == "__main__":
     #import sys;sys.argv = ['', 'Test.testName']
     unittest.main()
\ No newline at end of file
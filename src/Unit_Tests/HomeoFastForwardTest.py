@@ -0,0 +1,136 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+'''
+from   Core.HomeoUnit import HomeoUnit
+from   Core.HomeoUnitNewtonian import HomeoUnitNewtonian
+from   Core.HomeoFastForward import HomeoFastForward
+from   Core.Homeostat import *
+
+import unittest, numpy
+
+
+class HomeoFastForwardTest(unittest.TestCase):
+
+    def buildHomeostat(self, unitClass, seed = 1, mass = 1):
+        '''A noiseless homeostat of 3 units with strong negative self-connections
+           and weak random cross-connections, which settles on an equilibrium'''
+
+        numpy.random.seed(seed)
+        homeostat = Homeostat()
+        for i in range(3):
+            homeostat.addFullyConnectedUnit(unitClass())
+        for unit in homeostat.homeoUnits:
+            unit.noise = 0
+            unit.mass = mass
+            unit.viscosity = HomeoUnit.DefaultParameters['maxViscosity'] / 2
+            unit.uniselectorActive = True
+            unit.uniselectorTimeInterval = 7
+            unit.criticalDeviation = numpy.random.uniform(-5, 5)
+            unit.computeOutput()
+            for conn in unit.inputConnections:
+                conn.noise = 0
+                conn.state = 'uniselector'
+                conn.newWeight(-0.9 if conn.incomingUnit is unit else numpy.random.uniform(-0.2, 0.2))
+        homeostat.seedRandom(seed)
+        homeostat.slowingFactor = 0
+        homeostat.collectsData = False
+        homeostat._headless = True
+        return homeostat
+
+    def stateOf(self, homeostat):
+        return [(u.criticalDeviation, u.currentVelocity, u.currentOutput, u.inputTorque,
+                 u.uniselectorTime, u.uniselectorActivated, u.time,
+                 [c.weight * c.switch for c in u.inputConnections])
+                for u in homeostat.homeoUnits]
+
+    def assertFastForwardKeepsResults(self, unitClass, mass, ticks = 4000, usesArrayEngine = False):
+        reference = self.buildHomeostat(unitClass, mass = mass)
+        reference.usesArrayEngine = usesArrayEngine
+        reference.runFor(ticks)
+
+        homeostat = self.buildHomeostat(unitClass, mass = mass)
+        homeostat.usesArrayEngine = usesArrayEngine
+        fastForward = homeostat.enableFastForward()
+        homeostat.runFor(ticks)
+
+        self.assertTrue(fastForward.jumps)
+        self.assertEqual(fastForward.jumps[-1][1], ticks)
+        self.assertEqual(homeostat.time, ticks)
+        self.assertEqual(self.stateOf(homeostat), self.stateOf(reference))
+
+    def testFixedPointHomeoUnit(self):
+        self.assertFastForwardKeepsResults(HomeoUnit, mass = 1)
+
+    def testFixedPointHomeoUnitNewtonian(self):
+        self.assertFastForwardKeepsResults(HomeoUnitNewtonian, mass = 10)
+
+    def testFixedPointOnArrayEngine(self):
+        self.assertFastForwardKeepsResults(HomeoUnitNewtonian, mass = 10, ticks = 20000, usesArrayEngine = True)
+
+    def testSkippedTicksAreRecorded(self):
+        "The collector and the tick hooks see every tick, jumps or not"
+
+        runs = []
+        for fastForward in (False, True):
+            homeostat = self.buildHomeostat(HomeoUnit)
+            homeostat.collectsData = True
+            seen = []
+            homeostat.addTickHook(lambda tick, hom = homeostat, seen = seen:
+                                  seen.append((tick, [u.criticalDeviation for u in hom.homeoUnits])))
+            if fastForward:
+                homeostat.enableFastForward()
+            homeostat.runFor(3000)
+            runs.append((homeostat, seen))
+        (reference, referenceSeen), (homeostat, seen) = runs
+        self.assertTrue(homeostat.fastForward.jumps)
+        self.assertEqual(seen, referenceSeen)
+        self.assertEqual(list(homeostat.dataCollector.times()), list(range(3000)))
+        numpy.testing.assert_array_equal(homeostat.dataCollector.criticalDevAsNPArrayForAllUnits(),
+                                         reference.dataCollector.criticalDevAsNPArrayForAllUnits())
+        numpy.testing.assert_array_equal(homeostat.dataCollector.outputAsNPArrayForAllUnits(),
+                                         reference.dataCollector.outputAsNPArrayForAllUnits())
+
+    def testNoiseNeedsTolerance(self):
+        homeostat = self.buildHomeostat(HomeoUnit)
+        homeostat.homeoUnits[0].noise = 0.05
+        self.assertFalse(HomeoFastForward().canFastForward(homeostat))
+        self.assertTrue(HomeoFastForward(tolerance = 1e-6).canFastForward(homeostat))
+        homeostat.homeoUnits[0].noise = 0
+        homeostat.homeoUnits[1].inputConnections[0].noise = 0.05
+        self.assertFalse(HomeoFastForward().canFastForward(homeostat))
+
+    def testDetectsLimitCycles(self):
+        homeostat = self.buildHomeostat(HomeoUnit)
+        fastForward = HomeoFastForward(maxPeriod = 5)
+        fastForward.reset(homeostat)
+        unit = homeostat.homeoUnits[0]
+        cycle = [1.0, 2.0, -1.5]
+        periods = []
+        for tick in range(1, 10):
+            unit._criticalDeviation = cycle[tick % 3]
+            periods.append(fastForward.observe(tick))
+        self.assertEqual(periods, [None] * 5 + [3] * 4)
+        self.assertEqual(fastForward.cycleState(9, 3, 11)[0][0], cycle[11 % 3])
+
+    def testIgnoresCriticalStatesAndSlowDrifts(self):
+        homeostat = self.buildHomeostat(HomeoUnit)
+        unit = homeostat.homeoUnits[0]
+        fastForward = HomeoFastForward()
+        fastForward.reset(homeostat)
+        unit._criticalDeviation = unit.maxDeviation
+        self.assertEqual([fastForward.observe(tick) for tick in range(1, 5)], [None] * 4)
+
+        "Within tolerance for a period, but not over the whole window"
+        fastForward = HomeoFastForward(tolerance = 0.1, maxPeriod = 5)
+        fastForward.reset(homeostat)
+        periods = []
+        for tick in range(1, 30):
+            unit._criticalDeviation = 0.02 * tick
+            periods.append(fastForward.observe(tick))
+        self.assertEqual(periods, [None] * 29)
+
+
+if __name__ == "__main__":
+    unittest.main()
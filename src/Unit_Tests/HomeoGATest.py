@@ -5,6 +5,9 @@ Tests for the GA simulation infrastructure:
 - GenomeDecoder: encoding/decoding of homeostat genomes
 - HomeoGASimulation: basic GA operations (population creation, individual init, bounds checking)
 - StatsAnalyzer: utility functions for GA analysis
+- GAFitnessCache: content-addressed cache of evaluated fitnesses
+- GARunStore: append-only store of GA logbooks and histories
+- LogbookIndex: indexed queries on the individuals of a logbook
 
 These tests do not require external robotic simulators (Webots, V-REP).
 HomeoGASimulation tests require Box2D (for the internal HOMEO simulator) and are
@@ -17,8 +20,12 @@ import unittest
 import numpy as np
 import os
 import tempfile
+from glob import glob
 
 from Helpers.GenomeDecoder import genomeDecoder, genomePrettyPrinter, statFileDecoder
+from Helpers.GAFitnessCache import GAFitnessCache
+from Helpers.GARunStore import GARunStore, GARunStoreError
+from Helpers.LogbookIndex import LogbookIndex
 from Core.HomeoUnit import HomeoUnit
 from Core.HomeoConnection import HomeoConnection
 
@@ -271,6 +278,360 @@ class HomeoGASimulationTest(unittest.TestCase):
                             "Toolbox missing operator: %s" % op)
 
 
+@unittest.skipUnless(HAS_BOX2D, "Box2D not installed — HOMEO backend unavailable")
+class GenomeWorkerEvaluatorTest(unittest.TestCase):
+    """Tests for the worker-resident evaluator used by parallel GA runs"""
+
+    def driveRobot(self, kheperaSimulation, steps=200):
+        robot = kheperaSimulation.allBodies[kheperaSimulation.robotName]
+        for i in range(steps):
+            robot.setRightSpeed(3.0 + (i % 7) * 0.3)
+            robot.setLeftSpeed(2.0)
+            kheperaSimulation.advanceSim()
+        return tuple(robot.body.position), robot.body.angle
+
+    def testResetWorldInPlaceRestoresInitialConditions(self):
+        """A world reset in place evolves exactly like a freshly built one"""
+        kheperaSimulation = KheperaSimulation()
+        kheperaSimulation.setDataDir(tempfile.mkdtemp())
+        kheperaSimulation.setupWorld('kheperaBraitenberg2_HOMEO_World')
+        world = kheperaSimulation.world
+        fresh = self.driveRobot(kheperaSimulation)
+        kheperaSimulation.resetWorldInPlace()
+        self.assertIs(kheperaSimulation.world, world)
+        self.assertEqual(kheperaSimulation.currentStep, 0)
+        self.assertEqual(self.driveRobot(kheperaSimulation), fresh)
+
+    def testEvaluatorReusesWorld(self):
+        """Successive evaluations in a worker share one world and start from the initial pose"""
+        from deap import base, creator
+        from Simulator.HomeoGenAlgGui import GenomeWorkerEvaluator
+        if not hasattr(creator, 'FitnessMin'):
+            creator.create("FitnessMin", base.Fitness, weights=(-1.0,))
+        if not hasattr(creator, 'Individual'):
+            creator.create("Individual", list, fitness=creator.FitnessMin, ID=None)
+        dataDir = tempfile.mkdtemp()
+        config = {'experiment': 'initializeBraiten2_2_Full_GA',
+                  'experimentParams': {'dataDir': dataDir, 'noNoise': False, 'noUnisel': False},
+                  'stepsSize': 20,
+                  'dataDir': dataDir,
+                  'fitnessSign': 1}
+        evaluator = GenomeWorkerEvaluator(config)
+        kheperaSimulation = evaluator.backend.kheperaSimulation
+        worlds = []
+        for i in range(3):
+            genome = creator.Individual(np.random.uniform(0, 1, 40))
+            genome.ID = 'Test%03d' % i
+            fitness = evaluator.evaluate(genome)
+            self.assertEqual(len(fitness), 1)
+            self.assertGreater(fitness[0], 0)
+            worlds.append(kheperaSimulation.world)
+        self.assertIs(worlds[0], worlds[2])
+        evaluator.backend.reset()
+        robot = kheperaSimulation.allBodies['Khepera']
+        self.assertAlmostEqual(robot.body.position[0], 4)
+        self.assertAlmostEqual(robot.body.position[1], 4)
+
+
+class GAFitnessCacheTest(unittest.TestCase):
+    """Tests for the content-addressed fitness cache"""
+
+    def testKeyQuantizesGenesAndIncludesSettings(self):
+        cache = GAFitnessCache(quantum=1e-3)
+        key = cache.keyFor([0.1, 0.2], 'exp', 100, 1)
+        self.assertEqual(key, cache.keyFor([0.1000001, 0.2], 'exp', 100, 1))
+        self.assertNotEqual(key, cache.keyFor([0.102, 0.2], 'exp', 100, 1))
+        self.assertNotEqual(key, cache.keyFor([0.1, 0.2], 'other', 100, 1))
+        self.assertNotEqual(key, cache.keyFor([0.1, 0.2], 'exp', 200, 1))
+        self.assertNotEqual(key, cache.keyFor([0.1, 0.2], 'exp', 100, 2))
+
+    def testHitsAndMisses(self):
+        cache = GAFitnessCache()
+        key = cache.keyFor([0.5] * 4, 'exp', 10)
+        self.assertIsNone(cache.get(key))
+        cache.put(key, (np.float64(1.25),))
+        self.assertEqual(cache.get(key), (1.25,))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def testLeastRecentlyUsedEntriesAreEvicted(self):
+        cache = GAFitnessCache(maxEntries=3)
+        keys = [cache.keyFor([i], 'exp', 10) for i in range(4)]
+        for i in range(3):
+            cache.put(keys[i], (i,))
+        cache.get(keys[0])
+        cache.put(keys[3], (3,))
+        self.assertEqual(len(cache), 3)
+        self.assertNotIn(keys[1], cache)
+        for i in (0, 2, 3):
+            self.assertIn(keys[i], cache)
+
+    def testCachePersistsOnFile(self):
+        filename = os.path.join(tempfile.mkdtemp(), 'fitness.sqlite')
+        cache = GAFitnessCache(filename)
+        key = cache.keyFor([0.3, 0.7], 'exp', 10)
+        cache.put(key, (2.5,))
+        cache.close()
+        cache = GAFitnessCache(filename)
+        self.assertEqual(cache.get(key), (2.5,))
+        cache.close()
+        os.remove(filename)
+
+
+class GARunStoreTest(unittest.TestCase):
+    """Tests for the append-only store of GA logbooks and histories"""
+
+    def setUp(self):
+        from deap import base, creator, tools
+        if not hasattr(creator, 'FitnessMin'):
+            creator.create("FitnessMin", base.Fitness, weights=(-1.0,))
+        if not hasattr(creator, 'Individual'):
+            creator.create("Individual", list, fitness=creator.FitnessMin, ID=None)
+        self.creator = creator
+        self.logbook = tools.Logbook()
+        self.hist = tools.History()
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'GARun-test.garun')
+
+    def tearDown(self):
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+        os.rmdir(self.directory)
+
+    def runGeneration(self, gen, pop):
+        """Vary pop as the GA does, recording the new individuals in the history
+           and a statistics and an info record in the logbook"""
+        for ind in pop:
+            ind[0] += 0.1
+            ind.fitness.values = (sum(ind),)
+        self.hist.update(pop)
+        fits = np.array([ind.fitness.values[0] for ind in pop])
+        self.logbook.record(gen=gen, evaluations=len(pop), avg=fits.mean(), min=fits.min())
+        self.logbook.record(finalIndivs=[(ind.ID, ind.fitness.values, list(ind)) for ind in pop])
+
+    def testOnlyNewRecordsAreAppended(self):
+        pop = [self.creator.Individual([i, 0.5]) for i in range(3)]
+        for i, ind in enumerate(pop):
+            ind.ID = '000-%03d' % (i + 1)
+        self.hist.update(pop)
+        store = GARunStore(self.filename)
+        for gen in range(1, 4):
+            self.runGeneration(gen, pop)
+            store.appendLogbook(self.logbook)
+            store.appendHistory(self.hist)
+            self.assertEqual(store.logbookLength(), 2 * gen)
+            self.assertEqual(store.lastHistoryIndex(), 3 * (gen + 1))
+        store.appendLogbook(self.logbook)
+        store.appendHistory(self.hist)
+        self.assertEqual(store.logbookLength(), 6)
+        store.close()
+
+        store = GARunStore(self.filename)
+        logbook, history = store.logbook(), store.history()
+        store.close()
+        self.assertEqual(logbook, self.logbook)
+        self.assertEqual(logbook.select('avg'), self.logbook.select('avg'))
+        self.assertEqual(history.genealogy_index, self.hist.genealogy_index)
+        self.assertEqual(history.genealogy_tree, self.hist.genealogy_tree)
+        self.assertEqual(history.genealogy_history, self.hist.genealogy_history)
+        self.assertEqual(history.genealogy_history[12].fitness.values, pop[2].fitness.values)
+        self.assertEqual(history.getGenealogy(pop[0]), self.hist.getGenealogy(pop[0]))
+
+    def testLogbooksAreLoadedFromStoresAndPickles(self):
+        import pickle
+        from Helpers.StatsAnalyzer import loadLogbook, loadHistory, extractGenomeOfIndID
+        pop = [self.creator.Individual([0.25, 0.5])]
+        pop[0].ID = '001-001'
+        self.hist.update(pop)
+        self.runGeneration(1, pop)
+        self.logbook.record(indivId='001-001', genome=list(pop[0]), fitness=pop[0].fitness.values)
+        store = GARunStore(self.filename)
+        store.appendLogbook(self.logbook)
+        store.appendHistory(self.hist)
+        store.close()
+        pickled = os.path.join(self.directory, 'Logbook-test.lgb')
+        with open(pickled, 'wb') as logbookFile:
+            pickle.dump(self.logbook, logbookFile)
+
+        self.assertTrue(GARunStore.isRunStore(self.filename))
+        self.assertFalse(GARunStore.isRunStore(pickled))
+        for filename in (self.filename, pickled):
+            self.assertEqual(loadLogbook(filename), self.logbook)
+            self.assertEqual(extractGenomeOfIndID('001-001', filename)['genome'], list(pop[0]))
+        self.assertEqual(loadHistory(self.filename).genealogy_tree, self.hist.genealogy_tree)
+        self.assertRaises(GARunStoreError, GARunStore, pickled)
+
+
+class LogbookIndexTest(unittest.TestCase):
+    """Tests for the indexed view of the individuals of a logbook"""
+
+    def setUp(self):
+        from deap import tools
+        self.directory = tempfile.mkdtemp()
+        self.rng = np.random.RandomState(11)
+        self.logbook = tools.Logbook()
+        self.logbook.record(date='Sun, 18 Oct 2026 10:00:00', exp='testExp', finalIndivs=[('000-001', (1.0,), [0.5])])
+        for gen in range(3):
+            self.recordGeneration(self.logbook, gen)
+
+    def tearDown(self):
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+        os.rmdir(self.directory)
+
+    def recordGeneration(self, logbook, gen, size=4):
+        """Record individuals of generation gen as the GA does, followed by a statistics record"""
+        for i in range(size):
+            logbook.record(indivId='%03d-%03d' % (gen, i + 1), fitness=(self.rng.uniform(0, 10),),
+                           genome=list(self.rng.uniform(0, 1, 60)))
+        logbook.record(gen=gen, evaluations=size, avg=5.0, std=1.0, min=0.0, max=10.0)
+
+    def pickledLogbook(self):
+        import pickle
+        filename = os.path.join(self.directory, 'Logbook-test.lgb')
+        with open(filename, 'wb') as logbookFile:
+            pickle.dump(self.logbook, logbookFile)
+        return filename
+
+    def individuals(self):
+        return [record for record in self.logbook if 'indivId' in record]
+
+    def testQueries(self):
+        from Helpers.StatsAnalyzer import (hallOfFameInds, indivsDecodedFromLogbook, indivsDecodedFromIndex,
+                                           extractGenomeOfIndID, extractAllGenomes)
+        filename = self.pickledLogbook()
+        index = LogbookIndex(filename)
+        self.assertEqual(index.filename, filename + '.lgbidx')
+        self.assertEqual(len(index), 12)
+        found = index.individual('001-003')
+        expected = self.individuals()[6]
+        self.assertEqual((found['indivId'], found['fitness'], found['genome']),
+                         (expected['indivId'], expected['fitness'], expected['genome']))
+        self.assertIsNone(index.individual('007-001'))
+        self.assertEqual([ind['indivId'] for ind in index.generation(2)], ['002-001', '002-002', '002-003', '002-004'])
+        self.assertEqual(index.generations(), [0, 1, 2])
+        byFitness = sorted(self.individuals(), key=lambda record: record['fitness'])
+        self.assertEqual([ind['indivId'] for ind in index.best(3)], [record['indivId'] for record in byFitness[:3]])
+        self.assertEqual([ind['indivId'] for ind in index.best(2, max=True)], [record['indivId'] for record in byFitness[:-3:-1]])
+        self.assertEqual(len(index.best(None)), 12)
+        self.assertEqual(index.generalInfo(), {'date': 'Sun, 18 Oct 2026 10:00:00', 'exp': 'testExp'})
+        self.assertEqual(indivsDecodedFromIndex(index, 5), hallOfFameInds(indivsDecodedFromLogbook(self.logbook), 5))
+        index.close()
+
+        self.assertEqual(extractGenomeOfIndID('001-003', filename)['genome'], expected['genome'])
+        self.assertEqual(extractGenomeOfIndID('007-001', filename)['genome'], 'Not Found')
+        self.assertEqual(extractAllGenomes(filename), set(tuple(record['genome']) for record in self.individuals()))
+
+    def testIndexIsCachedAndFollowsTheLogbook(self):
+        filename = self.pickledLogbook()
+        LogbookIndex(filename).close()
+        index = LogbookIndex(filename)
+        self.assertEqual(index.refresh(), 0)
+        self.recordGeneration(self.logbook, 3)
+        os.utime(self.pickledLogbook(), ns=(0, 0))
+        self.assertEqual(index.refresh(), len(self.logbook))
+        self.assertEqual(len(index), 16)
+        index.close()
+
+        store = GARunStore(os.path.join(self.directory, 'GARun-test.garun'))
+        store.appendLogbook(self.logbook)
+        index = LogbookIndex(store.filename)
+        self.assertEqual(len(index), 16)
+        self.recordGeneration(self.logbook, 4)
+        store.appendLogbook(self.logbook)
+        self.assertEqual(index.refresh(), 5)
+        self.assertEqual([ind['indivId'] for ind in index.generation(4)], ['004-001', '004-002', '004-003', '004-004'])
+        self.assertEqual(len(index), 20)
+        index.close()
+        store.close()
+
+
+@unittest.skipUnless(HAS_BOX2D, "Box2D not installed — HOMEO backend unavailable")
+class FitnessCacheEvaluationTest(unittest.TestCase):
+    """Tests for the evaluation of individuals through a fitness cache"""
+
+    def testIdenticalAndCachedGenomesAreNotReevaluated(self):
+        from Simulator.HomeoGenAlgGui import HomeoGASimulation
+        ga = HomeoGASimulation(popSize=4, stepsSize=10, noUnits=4, essentParams=4,
+                               simulatorBackend="HOMEO", evaluationSeed=7, fitnessCache=':memory:')
+        evaluated = []
+        def evaluate(genome):
+            evaluated.append(list(genome))
+            return sum(genome),
+        ga.toolbox.register('evaluate', evaluate)
+        pop = ga.generateRandomPop(randomSeed=42)
+        pop[3][:] = pop[0]
+        fitnesses = ga.evaluateIndividuals(pop)
+        self.assertEqual(len(evaluated), 3)
+        self.assertEqual(fitnesses[3], fitnesses[0])
+        self.assertEqual(ga.evaluateIndividuals(pop[:2]), fitnesses[:2])
+        self.assertEqual(len(evaluated), 3)
+        ga.fitnessCache.close()
+
+    def testSeededEvaluationsAreRepeatable(self):
+        """With an evaluation seed a genome always gets the same fitness, so caching it is safe"""
+        from deap import base, creator
+        from Simulator.HomeoGenAlgGui import GenomeWorkerEvaluator
+        if not hasattr(creator, 'FitnessMin'):
+            creator.create("FitnessMin", base.Fitness, weights=(-1.0,))
+        if not hasattr(creator, 'Individual'):
+            creator.create("Individual", list, fitness=creator.FitnessMin, ID=None)
+        dataDir = tempfile.mkdtemp()
+        config = {'experiment': 'initializeBraiten2_2_Full_GA',
+                  'experimentParams': {'dataDir': dataDir, 'noNoise': False, 'noUnisel': False},
+                  'stepsSize': 20,
+                  'dataDir': dataDir,
+                  'fitnessSign': 1,
+                  'evaluationSeed': 3}
+        evaluator = GenomeWorkerEvaluator(config)
+        genome = creator.Individual(np.random.uniform(0, 1, 40))
+        genome.ID = 'Seeded'
+        first = evaluator.evaluate(genome)
+        evaluator.evaluate(creator.Individual(np.random.uniform(0, 1, 40)))
+        self.assertEqual(evaluator.evaluate(genome), first)
+
+    def testTrajectoryArchive(self):
+        """Workers store the trajectories of a generation in one archive, pruned to the hall of fame"""
+        from deap import base, creator
+        from Simulator.HomeoGenAlgGui import GenomeWorkerEvaluator, HomeoGASimulation, trajectoryArchiveFilename
+        from Helpers.TrajectoryArchive import TrajectoryArchive
+        if not hasattr(creator, 'FitnessMin'):
+            creator.create("FitnessMin", base.Fitness, weights=(-1.0,))
+        if not hasattr(creator, 'Individual'):
+            creator.create("Individual", list, fitness=creator.FitnessMin, ID=None)
+        dataDir = tempfile.mkdtemp()
+        config = {'experiment': 'initializeBraiten2_2_Full_GA',
+                  'experimentParams': {'dataDir': dataDir, 'noNoise': False, 'noUnisel': False},
+                  'stepsSize': 20,
+                  'dataDir': dataDir,
+                  'fitnessSign': 1,
+                  'trajectoryArchive': 'hof'}
+        evaluator = GenomeWorkerEvaluator(config)
+        genomes = []
+        for ID in ('003-001', '003-002', '003-003'):
+            genome = creator.Individual(np.random.uniform(0, 1, 40))
+            genome.ID = ID
+            evaluator.evaluate(genome)
+            genomes.append(genome)
+        archive = TrajectoryArchive(trajectoryArchiveFilename(dataDir, '003-001'))
+        self.assertEqual(archive.ids(), ['003-001', '003-002', '003-003'])
+        self.assertGreater(archive.trajectory('003-002').numberOfSteps(), 0)
+        archive.close()
+        self.assertFalse(glob(os.path.join(dataDir, '*003-00*traj')))
+
+        ga = HomeoGASimulation(popSize=4, stepsSize=10, noUnits=4, essentParams=4,
+                               simulatorBackend="HOMEO", trajectoryArchive='hof')
+        ga.dataDir = dataDir
+        ga.IDPad = 3
+        ga.hof = genomes[1:2]
+        ga.pruneTrajectoryArchive(3)
+        ga.pruneTrajectoryArchive(4)
+        archive = TrajectoryArchive(trajectoryArchiveFilename(dataDir, '003-001'))
+        self.assertEqual(archive.ids(), ['003-002'])
+        archive.close()
+        self.assertRaises(ValueError, HomeoGASimulation, popSize=4, stepsSize=10, noUnits=4, essentParams=4,
+                          simulatorBackend="HOMEO", trajectoryArchive='best')
+
+
 @unittest.skipUnless(HAS_BOX2D, "Box2D not installed — HOMEO backend unavailable")
 class HomeoGASimulationTrimmedGenomeTest(unittest.TestCase):
     """Test that 6-unit system with 4 evolved units produces trimmed genome"""
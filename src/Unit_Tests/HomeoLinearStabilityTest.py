@@ -0,0 +1,121 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+'''
+from   Core.HomeoUnit import HomeoUnit
+from   Core.HomeoUnitNewtonian import HomeoUnitNewtonian
+from   Core.HomeoUniselectorAshby import HomeoUniselectorAshby
+from   Core.HomeoLinearStability import HomeoLinearStability
+from   Core.Homeostat import *
+
+import unittest, numpy, random
+
+
+class HomeoLinearStabilityTest(unittest.TestCase):
+
+    def buildHomeostat(self, unitClass, nUnits = 4):
+        '''A fully connected noiseless homeostat with its uniselectors off,
+           its needles close to the center'''
+
+        homeostat = Homeostat()
+        for i in range(nUnits):
+            homeostat.addFullyConnectedUnit(unitClass())
+        for unit in homeostat.homeoUnits:
+            unit.noise = 0
+            unit.uniselectorActive = False
+            unit.criticalDeviation = numpy.random.uniform(-0.5, 0.5)
+            unit.computeOutput()
+            for conn in unit.inputConnections:
+                conn.noise = 0
+        homeostat.slowingFactor = 0
+        homeostat.collectsData = False
+        return homeostat
+
+    def stateOf(self, oracle):
+        state = numpy.ones(oracle.dimension + 1)
+        for i, unit in enumerate(oracle.units):
+            state[i] = unit.criticalDeviation
+            if oracle.velIndex[i] >= 0:
+                state[oracle.velIndex[i]] = unit.currentVelocity
+        return state
+
+    def assertMatrixPredictsTicks(self, unitClass):
+        hom = self.buildHomeostat(unitClass)
+        oracle = hom.linearStability()
+        M = oracle.systemMatrix()
+        state = self.stateOf(oracle)
+        for tick in range(5):
+            state = M @ state
+            hom.runFor(hom.time + 1)
+            numpy.testing.assert_allclose(self.stateOf(oracle), state, atol = 1e-9)
+
+    def testMatrixPredictsTicksHomeoUnit(self):
+        "In the linear regime the tick map is exactly the one the homeostat follows"
+        self.assertMatrixPredictsTicks(HomeoUnit)
+
+    def testMatrixPredictsTicksHomeoUnitNewtonian(self):
+        self.assertMatrixPredictsTicks(HomeoUnitNewtonian)
+
+    def testPredictionsMatchRuns(self):
+        '''Configurations predicted stable settle at the equilibrium, in those with
+           spectral radius above 1 some needle reaches the end of its range'''
+
+        for trial in range(20):
+            hom = self.buildHomeostat(HomeoUnitNewtonian, nUnits = 3)
+            for unit in hom.homeoUnits:
+                unit.viscosity = HomeoUnit.DefaultParameters['maxViscosity'] / 2
+            oracle = hom.linearStability()
+            radius = oracle.spectralRadius()
+            reachedLimit = False
+            with hom.session() as session:
+                for tick in range(3000):
+                    session.step()
+                    reachedLimit = reachedLimit or any(abs(u.criticalDeviation) == u.maxDeviation
+                                                       for u in hom.homeoUnits)
+            deviations = numpy.array([u.criticalDeviation for u in hom.homeoUnits])
+            if radius < 0.99:
+                numpy.testing.assert_allclose(deviations, oracle.equilibrium(), atol = 1e-3)
+                self.assertFalse(reachedLimit)
+            elif radius > 1.01:
+                self.assertTrue(reachedLimit)
+
+    def testUnstableSelfConnection(self):
+        hom = self.buildHomeostat(HomeoUnit, nUnits = 2)
+        for unit in hom.homeoUnits:
+            for conn in unit.inputConnections:
+                conn.newWeight(1 if conn.incomingUnit is unit else 0)
+        self.assertGreater(hom.linearStability().spectralRadius(), 1)
+        self.assertFalse(hom.predictsStability())
+
+    def testFixedUnitsEnterAsConstants(self):
+        hom = self.buildHomeostat(HomeoUnit, nUnits = 3)
+        fixed = hom.homeoUnits[2]
+        fixed.status = 'Non Active'
+        oracle = hom.linearStability()
+        self.assertEqual(oracle.units, hom.homeoUnits[:2])
+        self.assertEqual(oracle.fixedUnits, [fixed])
+        self.assertTrue(all(conn.incomingUnit is not fixed for conn in oracle.connections))
+
+    def testAshbyUniselectorScreensPositions(self):
+        "Seeded, so that the uniselector is known to find stable positions"
+        numpy.random.seed(3)
+        random.seed(3)
+        hom = self.buildHomeostat(HomeoUnit, nUnits = 3)
+        unit = hom.homeoUnits[0]
+        unit.uniselector = HomeoUniselectorAshby()
+        unit.uniselector.screensStability = True
+        for conn in unit.inputConnections:
+            if conn.incomingUnit is not unit:
+                conn.state = 'uniselector'
+        accepted = 0
+        for firing in range(5):
+            if unit.uniselector.skipUnstablePositionsFor(unit):
+                accepted += 1
+                unit.operateUniselector()
+                self.assertTrue(HomeoLinearStability.forUnit(unit).isStable())
+        self.assertGreater(accepted, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,7 +4,9 @@ Created on Mar 15, 2013
 @author: stefano
 '''
 from   Core.HomeoUnit import HomeoUnit
-from   Helpers.HomeoNoise import HomeoNoise
+from   Helpers.HomeoNoise import HomeoNoise, HomeoNoiseError
+from   Core.HomeoRandom import newGenerator, HomeoNoiseSupply
+from   Core.HomeoJIT import _jit_noise
 
 import scipy.stats as stats
 import unittest,numpy
@@ -899,6 +901,41 @@ class HomeoNoiseTest(unittest.TestCase):
         # self.assertTrue(producedNoise == 0)
         #=======================================================================
 
+    def testModelCodes(self):
+        self.assertEqual(len(HomeoNoise.algorithms), 12)
+        for code, name in enumerate(HomeoNoise.modelNames()):
+            self.assertEqual(HomeoNoise.modelCode(name), code)
+            self.assertEqual(HomeoNoise.modelName(code), name)
+            self.assertIs(HomeoNoise.algorithms[code], getattr(HomeoNoise, 'noise' + name))
+        self.assertEqual(HomeoNoise.modelCode('DistortingNormalLinear'), 8)
+        self.assertEqual(HomeoNoise.modelCode('DistortingNormalProportional'), 9)
+        self.assertRaises(HomeoNoiseError, HomeoNoise.modelCode, 'DistortingCauchyLinear')
+        self.assertRaises(HomeoNoiseError, HomeoNoise.modelCode, 12)
+
+        "getNoise uses the algorithm selected by the setters"
+        self.noise.withCurrentAndNoise(0.5, 0.2)
+        self.noise.degrading()
+        self.noise.constant()
+        self.noise.linear()
+        self.assertEqual(self.noise.getNoise(), -0.2)
+        self.noise.proportional()
+        self.assertAlmostEqual(self.noise.getNoise(), -0.1)
+
+    def testCompiledModelsMatchPythonModels(self):
+        """The compiled kernel must produce exactly the values of the Python
+           algorithms when both draw from the same noise supply"""
+
+        for code in range(len(HomeoNoise.algorithms)):
+            supply1 = HomeoNoiseSupply(newGenerator(code), blockSize = 64)
+            supply2 = HomeoNoiseSupply(newGenerator(code), blockSize = 64)
+            for current in (0.7, -0.4, 0.0) * 50:
+                expected = HomeoNoise.algorithms[code](current, 0.3, supply1)
+                supply2.reserve(1, 1)
+                produced = _jit_noise(code, current, 0.3, supply2.normals, supply2.uniforms, supply2.cursor)
+                self.assertEqual(expected, produced, HomeoNoise.modelName(code))
+            self.assertEqual(supply1.standard_normal(), supply2.standard_normal())
+            self.assertEqual(supply1.random(), supply2.random())
+
     def tearDown(self):
         pass
 
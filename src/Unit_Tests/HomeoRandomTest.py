@@ -0,0 +1,78 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+'''
+from Core.HomeoRandom import *
+from Core.HomeoJIT import _jit_reserve, _jit_next
+
+import unittest
+import numpy as np
+
+
+class HomeoRandomTest(unittest.TestCase):
+
+    def testSeededGeneratorsRepeat(self):
+        self.assertEqual(list(newGenerator(5).normal(size = 3)), list(newGenerator(5).normal(size = 3)))
+        np.random.seed(3)
+        first = newGenerator().uniform()
+        np.random.seed(3)
+        self.assertEqual(newGenerator().uniform(), first)
+        self.assertRaises(HomeoRandomError, newGenerator, newGenerator(1))
+
+    def testSpawnedStreamsAreIndependentOfTheirNumber(self):
+        few = [g.uniform() for g in spawnGenerators(9, 2)]
+        many = [g.uniform() for g in spawnGenerators(9, 5)]
+        self.assertEqual(many[:2], few)
+        self.assertEqual(len(set(many)), 5)
+
+    def testSeedForKey(self):
+        self.assertEqual(seedForKey(1, '001-004'), seedForKey(1, '001-004'))
+        self.assertNotEqual(seedForKey(1, '001-004'), seedForKey(1, '001-005'))
+        self.assertNotEqual(seedForKey(1, 4), seedForKey(2, 4))
+
+    def testNoiseSupplyHandsOutTheGeneratorStream(self):
+        '''Scalar, vector and compiled draws, refills and block growth must
+           not change the sequence of values'''
+        supply = HomeoNoiseSupply(newGenerator(1), blockSize = 7)
+        cursor = supply.cursor
+        values = [supply.standard_normal() for i in range(5)]
+        values += list(supply.standard_normal(10))
+        for i in range(3):
+            _jit_reserve(supply.normals, cursor, 0, 4, supply.rng)
+            values += [_jit_next(supply.normals, cursor, 0) for j in range(4)]
+        supply.ensureBlockSize(20)
+        values += list(supply.normal(0.0, 1.0, 30))
+        self.assertEqual(supply.blockSize(), 20)
+        self.assertTrue(np.array_equal(values, newGenerator(1).standard_normal(57)))
+
+        uniforms = supply.uniform(-1, 1, 9)
+        self.assertTrue(np.allclose(uniforms, newGenerator(1).spawn(1)[0].uniform(-1, 1, 9)))
+        self.assertRaises(HomeoRandomError, HomeoNoiseSupply, newGenerator(1), 0)
+
+    def testNoiseSupplyState(self):
+        "A supply rebuilt from its state hands out the same values, its streams spawn the same children"
+        supply = HomeoNoiseSupply(newGenerator(4), blockSize = 7)
+        supply.standard_normal(3)
+        supply.random(9)
+        copy = HomeoNoiseSupply.fromState(supply.getState())
+        self.assertTrue(np.array_equal(copy.standard_normal(20), supply.standard_normal(20)))
+        self.assertTrue(np.array_equal(copy.random(20), supply.random(20)))
+        self.assertEqual(copy.rng.spawn(1)[0].uniform(), supply.rng.spawn(1)[0].uniform())
+        self.assertEqual(generatorFromState(generatorState(supply.rng)).normal(), supply.rng.normal())
+
+    def testSharedBlocksKeepTheStream(self):
+        "A supply moved into the rows of stacked blocks goes on handing out its stream, refills included"
+        supply = HomeoNoiseSupply(newGenerator(2), blockSize = 7)
+        values = list(supply.standard_normal(3))
+        normals, uniforms, cursors = np.empty((2, 7)), np.empty((2, 7)), np.empty((2, 2), dtype = np.int64)
+        supply.shareBlocks(normals[1], uniforms[1], cursors[1])
+        for i in range(3):
+            supply.reserve(4, 4)
+            values += [_jit_next(normals[1], cursors[1], 0) for j in range(4)]
+        self.assertTrue(np.array_equal(values, newGenerator(2).standard_normal(15)))
+        self.assertTrue(np.shares_memory(supply.normals, normals))
+
+
+if __name__ == "__main__":
+    unittest.main()
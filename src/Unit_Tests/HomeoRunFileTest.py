@@ -0,0 +1,88 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+'''
+from   Core.HomeoUnit import *
+from   Core.Homeostat import *
+from   Core.HomeoRunFile import *
+
+import unittest, os, tempfile, pickle, numpy
+
+
+class HomeoRunFileTest(unittest.TestCase):
+
+    def setUp(self):
+        "setup a standard Ashby 4 units homeostat to be used in various tests"
+
+        self.homeostat = Homeostat()
+        for unit in range(4):
+            unit = HomeoUnit()
+            unit.setRandomValues()
+            self.homeostat.addFullyConnectedUnit(unit)
+        self.homeostat.slowingFactor = 0
+        self.homeostat._headless = True
+        self.filename = tempfile.mktemp(suffix = '.homeorun')
+
+    def tearDown(self):
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def testRunFileMatchesCollectedData(self):
+        self.homeostat.recordRunOn(self.filename)
+        self.homeostat.runFor(300)
+        self.homeostat.stopRecordingRun()
+
+        runFile = HomeoRunFile(self.filename)
+        collector = self.homeostat.dataCollector
+        self.assertIsInstance(runFile.data, numpy.memmap)
+        self.assertEqual(runFile.numberOfTicks(), 300)
+        self.assertEqual(runFile.unitNames, [unit.name for unit in self.homeostat.homeoUnits])
+        self.assertEqual(runFile.connKeys, collector.connKeys)
+        self.assertTrue(numpy.array_equal(runFile.times(), numpy.arange(300)))
+        self.assertTrue(numpy.array_equal(runFile.criticalDevAsNPArrayForAllUnits(),
+                                          collector.criticalDevAsNPArrayForAllUnits()))
+        self.assertTrue(numpy.array_equal(runFile.connectionWeights(), collector.connWeightsAsNPArray()))
+
+    def testRunsAreAppendedAndCanBeSliced(self):
+        self.homeostat.recordRunOn(self.filename, dtype = numpy.float32)
+        self.homeostat.runFor(100)
+        self.assertEqual(HomeoRunFile(self.filename).numberOfTicks(), 100)
+        self.homeostat.runFor(250)
+        self.homeostat.stopRecordingRun()
+
+        runFile = HomeoRunFile(self.filename)
+        self.assertEqual(runFile.data.dtype, numpy.float32)
+        self.assertEqual(runFile.numberOfTicks(), 250)
+        unitName = self.homeostat.homeoUnits[1].name
+        deviations = runFile.criticalDeviations([unitName], startTick = 120, stopTick = 130)
+        self.assertEqual(deviations.shape, (10, 1))
+        self.assertTrue(numpy.allclose(deviations[:, 0],
+                                       runFile.data[120:130, runFile.columnIndex(unitName + '.criticalDeviation')]))
+
+    def testPickledHomeostatKeepsRecording(self):
+        self.homeostat.recordRunOn(self.filename)
+        self.homeostat.runFor(50)
+        copy = pickle.loads(pickle.dumps(self.homeostat))
+        copy.runFor(80)
+        copy.stopRecordingRun()
+        self.assertTrue(numpy.array_equal(HomeoRunFile(self.filename).times(), numpy.arange(80)))
+
+    def testCollectorSavesRunFile(self):
+        self.homeostat.runFor(60)
+        collector = self.homeostat.dataCollector
+        collector.saveBinaryRunOnFile(self.filename)
+        runFile = HomeoRunFile(self.filename)
+        self.assertEqual(runFile.numberOfTicks(), 60)
+        self.assertTrue(numpy.array_equal(runFile.criticalDevAsNPArrayForAllUnits(),
+                                          collector.criticalDevAsNPArrayForAllUnits()))
+
+    def testNotARunFile(self):
+        fileOut = open(self.filename, 'w')
+        fileOut.write('time:    0    name: Unit 1')
+        fileOut.close()
+        self.assertRaises(HomeoRunFileError, HomeoRunFile, self.filename)
+
+
+if __name__ == "__main__":
+    unittest.main()
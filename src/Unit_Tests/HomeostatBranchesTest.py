@@ -0,0 +1,61 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+'''
+from   Simulator.AshbyOriginalExperiments import (setup_exp6_habituation, make_stimulus_events,
+                                                  run_with_events, run_branches, Branch,
+                                                  StabilityTracker, ResponseMeasurer)
+
+import unittest
+
+
+class HomeostatBranchesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.stimuli = make_stimulus_events(unit_index = 0, delta = 5.0, interval = 300,
+                                            n_stimuli = 5, settle_first = 500)
+        self.stimulusTicks = [tick for tick, event in self.stimuli]
+
+    def buildHomeostat(self):
+        hom, seed, metadata = setup_exp6_habituation(3)
+        hom.collectsData = False
+        return hom
+
+    def branches(self):
+        "Branch 0 continues the prefix as is, the others are reseeded, the last one is not stimulated"
+
+        return [Branch('branch%d' % k, events = self.stimuli if k < 3 else [],
+                       seed = k if k > 0 else None,
+                       probe = lambda hom: ResponseMeasurer(hom, 1, self.stimulusTicks, 100),
+                       measure = lambda hom, measurer: {'responses': measurer.responses,
+                                                        'deviation': hom.homeoUnits[1].criticalDeviation})
+                for k in range(4)]
+
+    def testUnseededBranchFollowsTheUnbranchedRun(self):
+        hom = self.buildHomeostat()
+        rows = run_branches(hom, 400, self.branches(), 2500, processes = 1)
+        self.assertEqual(hom.time, 400)
+        self.assertEqual([row['branch'] for row in rows], ['branch0', 'branch1', 'branch2', 'branch3'])
+
+        reference = self.buildHomeostat()
+        tracker = StabilityTracker(reference, window = 200)
+        measurer = ResponseMeasurer(reference, 1, self.stimulusTicks, 100)
+        reference.addTickHook(measurer.check)
+        run_with_events(reference, 2500, events = self.stimuli, stability_tracker = tracker)
+        self.assertEqual(rows[0]['responses'], measurer.responses)
+        self.assertEqual(rows[0]['deviation'], reference.homeoUnits[1].criticalDeviation)
+        self.assertEqual(rows[0]['total_uniselector_firings'], tracker.total_uniselector_firings)
+        self.assertEqual(rows[0]['stability_achieved_at'], tracker.stability_achieved_at)
+        self.assertNotEqual(rows[1]['deviation'], rows[2]['deviation'])
+
+    def testForkedBranchesMatchClonedBranches(self):
+        cloned = run_branches(self.buildHomeostat(), 400, self.branches(), 2500, processes = 1)
+        forked = run_branches(self.buildHomeostat(), 400, self.branches(), 2500, processes = 2)
+        for row in cloned + forked:
+            del row['elapsed_seconds']
+        self.assertEqual(forked, cloned)
+
+
+if __name__ == "__main__":
+    unittest.main()
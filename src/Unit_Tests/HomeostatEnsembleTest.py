@@ -0,0 +1,141 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+'''
+from   Core.Homeostat import *
+from   Core.HomeoUnitNewtonian import HomeoUnitNewtonian
+from   Core.HomeoUniselectorUniformRandom import HomeoUniselectorUniformRandom
+from   Core.HomeostatEnsemble import HomeostatEnsemble, HomeostatEnsembleError
+from   Simulator.AshbyOriginalExperiments import (setup_exp1_basic_ultrastability,
+                                                  setup_exp2_self_reorganization,
+                                                  exp2_reversal_event, setup_exp6_habituation,
+                                                  make_stimulus_events, ResponseMeasurer,
+                                                  measure_ensemble_responses,
+                                                  run_with_events, StabilityTracker)
+
+import unittest, pickle
+
+
+def noiselessExp1(seed = None):
+    hom, seed, metadata = setup_exp1_basic_ultrastability(seed)
+    for unit in hom.homeoUnits:
+        unit.noise = 0
+        for conn in unit.inputConnections:
+            conn.noise = 0
+    hom.collectsData = False
+    return hom, seed, metadata
+
+
+class HomeostatEnsembleTest(unittest.TestCase):
+
+    def assertSameState(self, hom1, hom2):
+        self.assertEqual(hom1.time, hom2.time)
+        for unit1, unit2 in zip(hom1.homeoUnits, hom2.homeoUnits):
+            self.assertAlmostEqual(unit1.criticalDeviation, unit2.criticalDeviation, places = 10)
+            self.assertAlmostEqual(unit1.currentVelocity, unit2.currentVelocity, places = 10)
+            for conn1, conn2 in zip(unit1.inputConnections, unit2.inputConnections):
+                self.assertAlmostEqual(conn1.weight * conn1.switch, conn2.weight * conn2.switch, places = 10)
+
+    def testEnsembleMatchesIndependentRuns(self):
+        '''Without noise, every replicate must follow exactly the trajectory
+           it would follow on its own, Ashby uniselector firings included'''
+
+        ensemble = HomeostatEnsemble.fromSetup(noiselessExp1, range(6))
+        references = [pickle.loads(pickle.dumps(hom)) for hom in ensemble.homeostats]
+        ensemble.runFor(2000)
+        for k, reference in enumerate(references):
+            tracker = StabilityTracker(reference, window = 200)
+            run_with_events(reference, 2000, stability_tracker = tracker)
+            self.assertSameState(reference, ensemble.homeostats[k])
+            self.assertEqual(tracker.stability_achieved_at, ensemble.stabilityAchievedAt()[k])
+            self.assertEqual(tracker.total_uniselector_firings, ensemble.totalUniselectorFirings()[k])
+            self.assertEqual(reference.homeoUnits[0].uniselector._index,
+                             ensemble.homeostats[k].homeoUnits[0].uniselector._index)
+
+    def testEnsembleWithEvents(self):
+        def noiselessExp2(seed = None):
+            hom, seed, metadata = setup_exp2_self_reorganization(seed)
+            for unit in hom.homeoUnits:
+                unit.noise = 0
+                for conn in unit.inputConnections:
+                    conn.noise = 0
+            return hom, seed, metadata
+
+        events = [(1000, exp2_reversal_event)]
+        ensemble = HomeostatEnsemble.fromSetup(noiselessExp2, range(3))
+        references = [pickle.loads(pickle.dumps(hom)) for hom in ensemble.homeostats]
+        ensemble.runWithEvents(2000, events)
+        for k, reference in enumerate(references):
+            run_with_events(reference, 2000, events = events)
+            self.assertSameState(reference, ensemble.homeostats[k])
+
+    def testUniformRandomUniselectorsStayInBounds(self):
+        ensemble = HomeostatEnsemble.fromSetup(setup_exp1_basic_ultrastability, range(4), seed = 1)
+        for hom in ensemble.homeostats:
+            for unit in hom.homeoUnits:
+                unit.uniselector = HomeoUniselectorUniformRandom()
+        ensemble.pack()
+        ensemble.runFor(3000)
+        self.assertEqual(ensemble.signedWeights().shape, (4, 4, 4))
+        self.assertTrue((abs(ensemble.signedWeights()) <= 1).all())
+        self.assertEqual(ensemble.criticalDeviations().shape, (4, 4))
+
+    def testNoisyEnsembleMatchesIndependentRuns(self):
+        '''With noise, every replicate draws from the random stream of its own
+           homeostat, with its own noise models, so it must follow the trajectory
+           of a headless run of that homeostat on its own'''
+
+        ensemble = HomeostatEnsemble.fromSetup(setup_exp1_basic_ultrastability, range(3), seed = 7)
+        ensemble.homeostats[1].setNoiseModels('DegradingUniformLinear', 'DistortingConstantProportional')
+        ensemble.pack()
+        references = [pickle.loads(pickle.dumps(hom)) for hom in ensemble.homeostats]
+        ensemble.runFor(1000)
+        for k, reference in enumerate(references):
+            reference._headless = True
+            reference.collectsData = False
+            for unit in reference.homeoUnits:
+                unit._headless = True
+            reference.runFor(1000)
+            self.assertSameState(reference, ensemble.homeostats[k])
+
+    def testResponsesMeasuredOnEnsemble(self):
+        '''Measuring the responses to the stimuli of Exp 6 while the ensemble runs
+           only inside the measurement windows gives the amplitudes a measurer
+           checking the unpacked homeostats at every tick finds'''
+
+        events = make_stimulus_events(unit_index=0, delta=5.0, interval=150,
+                                      n_stimuli=5, settle_first=100)
+        stimuli = [e[0] for e in events]
+        ensemble, reference = [HomeostatEnsemble.fromSetup(setup_exp6_habituation, range(3), seed = 5)
+                               for i in range(2)]
+        measurers = [ResponseMeasurer(hom, stimulus_ticks = stimuli, measure_window = 50)
+                     for hom in ensemble.homeostats]
+        measure_ensemble_responses(ensemble, 1000, events, measurers)
+
+        references = [ResponseMeasurer(hom, stimulus_ticks = stimuli, measure_window = 50)
+                      for hom in reference.homeostats]
+        for tick in range(1000):
+            for eventTick, event in events:
+                if eventTick == tick:
+                    for hom in reference.homeostats:
+                        event(hom)
+                    reference.pack()
+            for measurer in references:
+                measurer.check(tick)
+            reference.runFor(tick + 1)
+        for k, measurer in enumerate(measurers):
+            self.assertEqual(len(measurer.responses), 5)
+            self.assertEqual(measurer.responses, references[k].responses)
+            self.assertSameState(reference.homeostats[k], ensemble.homeostats[k])
+        self.assertNotEqual(measurers[0].responses, measurers[1].responses)
+
+    def testDifferentTopologiesAreRejected(self):
+        hom1 = noiselessExp1(1)[0]
+        hom2 = noiselessExp1(2)[0]
+        hom2.homeoUnits[0].inputConnections[1].status = False
+        self.assertRaises(HomeostatEnsembleError, HomeostatEnsemble, [hom1, hom2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,9 +6,12 @@ Created on Mar 11, 2013
 from   Core.HomeoUnit import *
 from   Core.HomeoUniselector import *
 from   Core.Homeostat import *
+from   Core.HomeostatSession import HomeostatSessionError
 from   Helpers.General_Helper_Functions import *
 
-import unittest, pickle, os, time
+import unittest, pickle, os, time, random
+import numpy as np
+from   Core.HomeoJIT import _jit_seed
 from copy import copy, deepcopy
 from threading import Thread
 
@@ -250,6 +253,102 @@ class HomeostatTest(unittest.TestCase):
             timeAtEnd =  time.time()  # in seconds
             self.assertTrue((timeAtEnd - timeAtStart) >= (delay/1000))
 
+    def seedAll(self, seed):
+        random.seed(seed)
+        np.random.seed(seed)
+        _jit_seed(seed)
+
+    def testSessionMatchesRunFor(self):
+        """
+        Test that stepping a session tick by tick follows the same trajectory as runFor
+        """
+        self.homeostat.slowingFactor = 0
+        self.homeostat._headless = True
+        for unit in self.homeostat.homeoUnits:
+            unit._headless = True
+        stepped = pickle.loads(pickle.dumps(self.homeostat))
+        self.seedAll(3)
+        self.homeostat.runFor(200)
+        self.seedAll(3)
+        with stepped.session() as session:
+            for tick in range(200):
+                self.assertEqual(session.step(), tick + 1)
+        self.assertEqual(stepped.time, 200)
+        for unit, steppedUnit in zip(self.homeostat.homeoUnits, stepped.homeoUnits):
+            self.assertEqual(unit.criticalDeviation, steppedUnit.criticalDeviation)
+        self.assertEqual(len(stepped.dataCollector.states), 200)
+
+    def testSeedRandomMakesRunsRepeatable(self):
+        """
+        Test that two copies of a homeostat given the same seed follow the same noisy trajectory,
+        whatever happens to the global random generators in between
+        """
+        self.homeostat.slowingFactor = 0
+        self.homeostat.collectsData = False
+        for unit in self.homeostat.homeoUnits:
+            unit.noise = 0.5
+        other = pickle.loads(pickle.dumps(self.homeostat))
+        self.homeostat.seedRandom(11)
+        other.seedRandom(11)
+        self.seedAll(1)
+        self.homeostat.runFor(100)
+        self.seedAll(2)
+        other.runFor(100)
+        for unit, otherUnit in zip(self.homeostat.homeoUnits, other.homeoUnits):
+            self.assertEqual(unit.criticalDeviation, otherUnit.criticalDeviation)
+            self.assertIs(unit.noiseSupply, self.homeostat.noiseSupply)
+
+    def testSessionStepsAndRefresh(self):
+        """
+        Test that step(n) advances n ticks and that refresh picks up weights changed from outside the units
+        """
+        self.homeostat.slowingFactor = 0
+        self.homeostat._headless = True
+        session = self.homeostat.session()
+        self.assertEqual(session.step(10), 10)
+        self.assertEqual(session.runUntil(25), 25)
+        unit = self.homeostat.homeoUnits[1]
+        unit._headless = True
+        session.refresh()
+        conn = unit.inputConnections[2]
+        conn.newWeight(-conn.weight * conn.switch)
+        session.refresh()
+        expected = [c.weight * c.switch for c in unit.inputConnections
+                    if c.isActive() and c.incomingUnit.isActive()]
+        self.assertEqual(list(unit._jit_weights * unit._jit_switches), expected)
+        session.close()
+
+    def testNoiseModelChangedDuringSession(self):
+        """
+        Test that a noise model set while a headless session is open is used from the next tick on,
+        as if the session had been refreshed
+        """
+        self.homeostat.slowingFactor = 0
+        self.homeostat._headless = True
+        for unit in self.homeostat.homeoUnits:
+            unit._headless = True
+            for conn in unit.inputConnections:
+                conn.noise = 0.5
+        refreshed = pickle.loads(pickle.dumps(self.homeostat))
+        for hom in (self.homeostat, refreshed):
+            hom.seedRandom(7)
+        with self.homeostat.session() as session, refreshed.session() as refreshedSession:
+            session.runUntil(50)
+            refreshedSession.runUntil(50)
+            for hom in (self.homeostat, refreshed):
+                hom.homeoUnits[1].inputConnections[2].noiseModel = 'DegradingConstantLinear'
+            refreshedSession.refresh()
+            session.runUntil(100)
+            refreshedSession.runUntil(100)
+        unit = self.homeostat.homeoUnits[1]
+        self.assertEqual(list(unit._jit_noise_codes), [c.noiseCode for c in unit.inputConnections
+                                                       if c.isActive() and c.incomingUnit.isActive()])
+        for unit, refreshedUnit in zip(self.homeostat.homeoUnits, refreshed.homeoUnits):
+            self.assertEqual(unit.criticalDeviation, refreshedUnit.criticalDeviation)
+
+    def testSessionOnHomeostatNotReady(self):
+        self.assertRaises(HomeostatSessionError, Homeostat().session)
+
     def testSameAs(self):
         """
         Test that a copy of a homeostat is the equivalent to the original according 
@@ -0,0 +1,201 @@
+'''
+Created on Oct 18, 2026
+
+Tests for the internal Khepera simulator's sensor model.
+Require Box2D and are skipped if it is not installed.
+
+@author: stefano
+'''
+
+import unittest
+import tempfile
+import numpy as np
+from Helpers.RobotTrajectoryFile import RobotTrajectoryFile
+from math import sin, cos, acos, radians, degrees, sqrt
+
+try:
+    from KheperaSimulator.KheperaSimulator import KheperaSimulation
+    HAS_BOX2D = True
+except ImportError:
+    HAS_BOX2D = False
+
+
+def scalarIrradiance(robot, sensorName, lightsList):
+    "Irradiance at sensorName computed light by light with the Webots/V-REP formula"
+
+    fixture = robot.sensors[sensorName]
+    angle = robot.body.angle
+    relX, relY = fixture.shape.pos
+    sensorX = robot.body.position[0] + cos(angle) * relX - sin(angle) * relY
+    sensorY = robot.body.position[1] + sin(angle) * relX + cos(angle) * relY
+    eyeAngle = angle + radians(fixture.userData[sensorName + 'Angle'])
+    total = 0
+    for light in lightsList:
+        vecX = light.userData['lightPos'][0] - sensorX
+        vecY = light.userData['lightPos'][2] - sensorY
+        distance = sqrt(vecX ** 2 + vecY ** 2)
+        cosAngle = max(-1, min(1, (vecX * cos(eyeAngle) + vecY * sin(eyeAngle)) / distance))
+        if distance > fixture.userData[sensorName + 'MaxRange'] or \
+           degrees(acos(cosAngle)) > fixture.userData[sensorName + 'AngleRange'] / 2:
+            continue
+        intensity = light.userData['intensity']
+        ambRatio = light.userData['ambRatio']
+        attenVec = light.userData['attenVec']
+        irradiance = ((intensity * (1 - ambRatio)) * cosAngle + intensity * ambRatio) / \
+                     (attenVec[0] + attenVec[1] * distance + attenVec[2] * distance ** 2)
+        total += min(irradiance, fixture.userData[sensorName + 'MaxValue'])
+    return total
+
+
+@unittest.skipUnless(HAS_BOX2D, "Box2D not installed")
+class KheperaSensorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.simulation = KheperaSimulation()
+        self.simulation.setDataDir(tempfile.mkdtemp())
+        self.simulation.setupWorld('kheperaBraitenberg2_HOMEO_World')
+        self.robot = self.simulation.allBodies['Khepera']
+        self.lights = [self.simulation.allBodies['TARGET']]
+        rng = np.random.RandomState(1)
+        for i in range(3):
+            position = tuple(rng.uniform(0, 10, 2))
+            light = self.simulation.world.CreateBody(
+                self.simulation.KheperaWorldLightDef((1, 1, 0, 1), position, intensity = rng.uniform(-100, 100),
+                                                     ambRatio = rng.uniform(0, 0.5), attenVec = tuple(rng.uniform(0.1, 1, 3)),
+                                                     name = 'Light%d' % i))
+            light.userData['lightPos'] = (position[0], 0, position[1])
+            self.lights.append(light)
+        self.robot.detectableLights = self.lights
+
+    def testBatchedIrradiancesMatchPerLightComputation(self):
+        rng = np.random.RandomState(2)
+        for pose in range(200):
+            self.robot.body.transform = ((rng.uniform(0, 10), rng.uniform(0, 10)), rng.uniform(-7, 7))
+            self.robot.invalidateSensorReads()
+            irradiances = self.robot.irradAtSensors()
+            for i, name in enumerate(self.robot._sensorNames):
+                expected = scalarIrradiance(self.robot, name, self.lights)
+                self.assertAlmostEqual(irradiances[i], expected, places = 9)
+                self.assertEqual(self.robot.getSensorRead(name), irradiances[i])
+                self.assertAlmostEqual(self.robot.irradAtSensor(name, self.lights[:1]),
+                                       scalarIrradiance(self.robot, name, self.lights[:1]), places = 9)
+
+    def testLightsOutOfRangeAreNotSeen(self):
+        self.robot.body.transform = ((4, 4), 0)
+        self.robot.detectableLights = []
+        self.assertTrue((self.robot.irradAtSensors() == 0).all())
+        "With the robot heading along -x, the default light at (7, 7) is 135 degrees off, outside the eyes' field"
+        self.robot.detectableLights = self.lights[:1]
+        self.robot.body.transform = ((4, 4), radians(180))
+        self.robot.invalidateSensorReads()
+        self.assertEqual(self.robot.getSensorRead('leftEye'), 0)
+
+    def testSetLightIntensityUpdatesCachedArrays(self):
+        self.robot.body.transform = ((6, 6), radians(45))
+        self.robot.invalidateSensorReads()
+        before = self.robot.getSensorRead('rightEye')
+        self.simulation.setLightIntensity('TARGET', -100)
+        self.assertEqual(self.simulation.allBodies['TARGET'].userData['lightIntensity'], -100)
+        self.assertNotEqual(self.robot.getSensorRead('rightEye'), before)
+        self.assertAlmostEqual(self.robot.getSensorRead('rightEye'),
+                               scalarIrradiance(self.robot, 'rightEye', self.lights), places = 9)
+
+
+@unittest.skipUnless(HAS_BOX2D, "Box2D not installed")
+class KheperaSensorCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.simulation = KheperaSimulation()
+        self.simulation.setDataDir(tempfile.mkdtemp())
+        self.simulation.setupWorld('kheperaBraitenberg2_HOMEO_World')
+        self.robot = self.simulation.allBodies['Khepera']
+        self.robot.rotateTo(radians(45))
+        self.robot.setRightSpeed(3)
+        self.robot.setLeftSpeed(2)
+        self.computations = 0
+        irradAtSensors = self.robot.irradAtSensors
+        def countingIrradAtSensors(lights = None):
+            self.computations += 1
+            return irradAtSensors(lights)
+        self.robot.irradAtSensors = countingIrradAtSensors
+
+    def testSensorsAreComputedOncePerStep(self):
+        for step in range(5):
+            reads = [self.robot.getSensorRead(name) for name in ('leftEye', 'rightEye', 'leftEye')]
+            self.assertEqual(self.computations, step + 1)
+            self.assertEqual(reads[0], reads[2])
+            self.simulation.advanceSim()
+        self.assertEqual(self.robot.currentStep, self.simulation.currentStep)
+
+    def testCacheIsInvalidatedByStepsAndMoves(self):
+        before = self.robot.getSensorRead('rightEye')
+        self.simulation.advanceSim()
+        self.assertNotEqual(self.robot.getSensorRead('rightEye'), before)
+        self.robot.moveTo((5, 5))
+        self.robot.getSensorRead('rightEye')
+        self.robot.rotateTo(radians(40))
+        self.robot.getSensorRead('rightEye')
+        self.assertEqual(self.computations, 4)
+        self.robot.invalidateSensorReads()
+        uncached = self.robot.getSensorRead('rightEye')
+        self.robot.currentStep += 1
+        self.assertEqual(self.robot.getSensorRead('rightEye'), uncached)
+        self.assertEqual(self.computations, 6)
+
+
+@unittest.skipUnless(HAS_BOX2D, "Box2D not installed")
+class KheperaTrajectoryTest(unittest.TestCase):
+
+    def testBinaryTrajectories(self):
+        simulation = KheperaSimulation()
+        simulation.setDataDir(tempfile.mkdtemp())
+        simulation.binaryTrajectories = True
+        simulation.setupWorld('kheperaBraitenberg2_HOMEO_World')
+        robot = simulation.allBodies['Khepera']
+        robot.setRightSpeed(3)
+        robot.setLeftSpeed(2)
+        for step in range(300):
+            simulation.advanceSim()
+        simulation.saveTrajectory()
+        trajFile = RobotTrajectoryFile(simulation.trajectoryWriter.filename)
+        self.assertEqual(trajFile.numberOfSteps(), 300)
+        self.assertEqual(tuple(trajFile.poses[-1]), (robot.body.position[0], robot.body.position[1], robot.body.angle))
+        self.assertAlmostEqual(trajFile.trajectoryData()[-1, 5],
+                               simulation.getDistance('Khepera', 'TARGET'), places = 5)
+
+
+@unittest.skipUnless(HAS_BOX2D, "Box2D not installed")
+class KheperaWorldStateTest(unittest.TestCase):
+
+    def newSimulation(self):
+        simulation = KheperaSimulation()
+        simulation.setDataDir(tempfile.mkdtemp())
+        simulation.setupWorld('kheperaBraitenberg2_HOMEO_World')
+        return simulation, simulation.allBodies['Khepera']
+
+    def stateOf(self, robot):
+        body = robot.body
+        return (tuple(body.position), body.angle, tuple(body.linearVelocity), body.angularVelocity,
+                robot.getSensorRead('leftEye'), robot.getSensorRead('rightEye'))
+
+    def testRestoredWorldStepsLikeTheOriginal(self):
+        simulation, robot = self.newSimulation()
+        robot.setRightSpeed(3)
+        robot.setLeftSpeed(2)
+        for step in range(200):
+            simulation.advanceSim()
+        simulation.restartSolver()
+        state = simulation.worldState()
+        for step in range(200):
+            simulation.advanceSim()
+
+        restored, restoredRobot = self.newSimulation()
+        restored.restoreWorldState(state)
+        self.assertEqual(restored.currentStep, state['step'])
+        for step in range(200):
+            restored.advanceSim()
+        self.assertEqual(self.stateOf(restoredRobot), self.stateOf(robot))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+'''
+from Helpers.RobotTrajectoryWriter import RobotTrajectoryWriter
+from Helpers.RobotTrajectoryFile import *
+
+import unittest, os, shutil, tempfile
+import numpy as np
+
+
+class FakeBody(object):
+    "Stands for the Box2D bodies of the robot and of the lights"
+
+    def __init__(self, position, angle = 0, userData = None):
+        self.position = position
+        self.angle = angle
+        self.userData = userData
+
+
+class RobotTrajectoryFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dataDir = tempfile.mkdtemp()
+        self.lights = [FakeBody((7, 7), userData = {'name': 'TARGET', 'lightPos': (7, 0, 7),
+                                                    'lightIntensity': 100, 'lightIsOn': True}),
+                       FakeBody((-2, 3.5), userData = {'name': 'LIGHT1', 'lightPos': (-2, 0, 3.5),
+                                                       'lightIntensity': -50, 'lightIsOn': False})]
+        rng = np.random.RandomState(4)
+        self.poses = [FakeBody((x, y), angle) for x, y, angle in rng.uniform(-7, 7, (150, 3))]
+
+    def tearDown(self):
+        shutil.rmtree(self.dataDir)
+
+    def record(self, writer, poses):
+        for pose in poses:
+            writer.runOnce(position = pose)
+        writer.runOnce(transitionMessage = 'CLOSEFILE')
+
+    def testConvertedFileMatchesTextWriter(self):
+        textWriter = RobotTrajectoryWriter('text', (1, 0, 2), self.lights, dataDir = self.dataDir)
+        self.record(textWriter, self.poses)
+        binaryWriter = BufferedTrajectoryWriter('binary', (1, 0, 2), self.lights, dataDir = self.dataDir, blockRows = 16)
+        self.record(binaryWriter, self.poses)
+
+        self.assertTrue(binaryWriter.filename.endswith('.btraj'))
+        self.assertTrue(RobotTrajectoryFile.isTrajectoryFile(binaryWriter.filename))
+        self.assertFalse(RobotTrajectoryFile.isTrajectoryFile(textWriter.posFile.name))
+        converted = convertToText(binaryWriter.filename)
+        self.assertEqual(converted, binaryWriter.filename[:-len('.btraj')] + '.traj')
+        with open(textWriter.posFile.name) as textFile, open(converted) as convertedFile:
+            self.assertEqual(convertedFile.read(), textFile.read())
+
+    def testBlocksAndNewFiles(self):
+        for background in (True, False):
+            writer = BufferedTrajectoryWriter('first', (0, 0, 0), self.lights, dataDir = self.dataDir,
+                                              blockRows = 7, background = background)
+            for pose in self.poses[:100]:
+                writer.runOnce(position = pose)
+            firstFilename = writer.filename
+            writer.runOnce(transitionMessage = 'NEWFILE', modelName = 'second', position = (5, 0, 5), lights = self.lights)
+            self.record(writer, self.poses[100:])
+
+            first = RobotTrajectoryFile(firstFilename)
+            second = RobotTrajectoryFile(writer.filename)
+            self.assertEqual(first.numberOfSteps(), 100)
+            self.assertEqual(second.numberOfSteps(), 50)
+            self.assertEqual(second.initialPosition, [5, 0, 5])
+            self.assertEqual(second.lights[1], ('LIGHT1', -2, 3.5, -50, False))
+            expected = np.array([(p.position[0], p.position[1], p.angle) for p in self.poses])
+            self.assertTrue(np.array_equal(first.poses, expected[:100]))
+            self.assertTrue(np.array_equal(second.poses, expected[100:]))
+            data = second.trajectoryData()
+            self.assertEqual(data.shape, (50, 9))
+            self.assertTrue(np.allclose(data[:, 8], np.hypot(expected[100:, 0] + 2, expected[100:, 1] - 3.5)))
+
+    def testContinueFile(self):
+        "A resumed writer drops the steps after the saved position and removes its own new file"
+
+        for writerClass, extra in ((RobotTrajectoryWriter, {}),
+                                   (BufferedTrajectoryWriter, {'blockRows': 7}),
+                                   (BufferedTrajectoryWriter, {'blockRows': 7, 'background': False})):
+            straight = writerClass('straight', (1, 0, 2), self.lights, dataDir = self.dataDir, **extra)
+            self.record(straight, self.poses)
+            interrupted = writerClass('interrupted', (1, 0, 2), self.lights, dataDir = self.dataDir, **extra)
+            for pose in self.poses[:100]:
+                interrupted.runOnce(position = pose)
+            filename, offset = interrupted.filePosition()
+            self.record(interrupted, self.poses[100:130])
+
+            resumed = writerClass('resumed', (1, 0, 2), self.lights, dataDir = self.dataDir, **extra)
+            newFilename = resumed.posFile.name
+            resumed.continueFile(filename, offset)
+            self.assertFalse(os.path.exists(newFilename))
+            self.record(resumed, self.poses[100:])
+            if writerClass is RobotTrajectoryWriter:
+                with open(straight.posFile.name) as straightFile, open(filename) as resumedFile:
+                    self.assertEqual(resumedFile.read(), straightFile.read())
+            else:
+                self.assertTrue(np.array_equal(RobotTrajectoryFile(filename).poses,
+                                               RobotTrajectoryFile(straight.filename).poses))
+            for name in os.listdir(self.dataDir):
+                os.remove(os.path.join(self.dataDir, name))
+
+    def testEmptyFile(self):
+        writer = BufferedTrajectoryWriter('empty', (0, 0, 0), self.lights, dataDir = self.dataDir, dtype = np.float32)
+        writer.closeTrajFile()
+        writer.closeTrajFile()
+        trajFile = RobotTrajectoryFile(writer.filename)
+        self.assertEqual(trajFile.numberOfSteps(), 0)
+        self.assertEqual(trajFile.trajectoryData().shape, (0, 9))
+
+    def testNotATrajectoryFile(self):
+        filename = os.path.join(self.dataDir, 'notBinary.traj')
+        with open(filename, 'w') as fileOut:
+            fileOut.write('# Position data for Homeo simulation run\n')
+        self.assertRaises(RobotTrajectoryFileError, RobotTrajectoryFile, filename)
+
+
+if __name__ == "__main__":
+    unittest.main()
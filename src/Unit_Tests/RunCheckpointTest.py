@@ -0,0 +1,109 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+'''
+from   Core.HomeoUnitNewtonian import HomeoUnitNewtonian
+from   Core.HomeoUniselectorAshby import HomeoUniselectorAshby
+from   Core.Homeostat import Homeostat
+from   Helpers.RunCheckpoint import *
+
+import unittest, numpy, random, os, shutil, tempfile
+
+
+class RunCheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.directory, 'run.ckpt')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def buildHomeostat(self):
+        "The same homeostat at every call"
+
+        numpy.random.seed(5)
+        random.seed(5)
+        homeostat = Homeostat()
+        for i in range(4):
+            unit = HomeoUnitNewtonian()
+            unit.setRandomValues()
+            unit.uniselectorActive = True
+            unit.uniselectorTimeInterval = 10
+            unit.uniselector = HomeoUniselectorAshby()
+            homeostat.addFullyConnectedUnit(unit)
+        for unit in homeostat.homeoUnits:
+            for conn in unit.inputConnections:
+                if conn.incomingUnit is not unit:
+                    conn.state = 'uniselector'
+        homeostat.seedRandom(9)
+        homeostat._headless = True
+        homeostat.slowingFactor = 0
+        homeostat.collectsData = False
+        return homeostat
+
+    def stateOf(self, homeostat):
+        return [(u.criticalDeviation, u.currentVelocity, u.uniselectorTime,
+                 [c.weight * c.switch for c in u.inputConnections])
+                for u in homeostat.homeoUnits]
+
+    def testResumedRunContinuesExactly(self):
+        homeostat = self.buildHomeostat()
+        checkpointer = RunCheckpointer(self.filepath, homeostat, every_ticks = 250)
+        "The loop draws from the global generators, as the scripts setting up experiments do"
+        while homeostat.time < 600:
+            numpy.random.random(), random.random()
+            homeostat.runFor(checkpointer.next_stop(homeostat.time, 600))
+            checkpointer.at_tick(homeostat.time, {'reached': homeostat.time})
+        self.assertEqual(checkpointer.saved, 2)
+        "The run goes on after the last checkpoint, then is interrupted"
+        homeostat.runFor(2000)
+        expected = (self.stateOf(homeostat), numpy.random.random(), random.random())
+
+        resumed = self.buildHomeostat()
+        state = RunCheckpointer.load(self.filepath)
+        self.assertEqual(state['tick'], 500)
+        progress = RunCheckpointer(self.filepath, resumed, every_ticks = 250).restore(state)
+        self.assertEqual(progress, {'reached': 500})
+        self.assertEqual(resumed.time, 500)
+        numpy.random.random(), random.random()
+        resumed.runFor(2000)
+        self.assertEqual((self.stateOf(resumed), numpy.random.random(), random.random()), expected)
+
+    def testCheckpointsOnlyAtBoundaries(self):
+        checkpointer = RunCheckpointer(self.filepath, self.buildHomeostat(), every_seconds = 1e-9)
+        self.assertEqual(checkpointer.boundary, DefaultBoundaryTicks)
+        self.assertEqual(checkpointer.next_stop(1500, 5000), 2000)
+        self.assertEqual(checkpointer.next_stop(1500, 1700), 1700)
+        self.assertFalse(checkpointer.at_tick(1700))
+        self.assertTrue(checkpointer.at_tick(2000))
+        self.assertEqual(RunCheckpointer(self.filepath, None, every_ticks = 2500,
+                                         every_seconds = 60).boundary, 500)
+        self.assertRaises(ValueError, RunCheckpointer, self.filepath, None)
+
+    def testFinishedRunsAndBadFiles(self):
+        self.assertIsNone(RunCheckpointer.load(self.filepath))
+        homeostat = self.buildHomeostat()
+        checkpointer = RunCheckpointer(self.filepath, homeostat, every_ticks = 100)
+        checkpointer.save(100, {'result': 1.5}, finished = True)
+        state = RunCheckpointer.load(self.filepath)
+        self.assertTrue(state['finished'])
+        self.assertNotIn('homeostat', state)
+        self.assertRaises(RunCheckpointError, checkpointer.restore, state)
+        self.assertFalse(os.path.exists(self.filepath + '.tmp'))
+
+        with open(self.filepath, 'wb') as f:
+            f.write(b'not a checkpoint')
+        self.assertRaises(RunCheckpointError, RunCheckpointer.load, self.filepath)
+
+    def testBatchResults(self):
+        filepath = os.path.join(self.directory, 'batch.json')
+        self.assertEqual(load_batch_results(filepath), [])
+        results = [{'run': 1, 'final_dist': 0.5, 'early_stopped': True}]
+        save_batch_results(filepath, results)
+        self.assertEqual(load_batch_results(filepath), results)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+'''
+Created on Oct 18, 2026
+
+@author: stefano
+'''
+from Helpers.TrajectoryArchive import *
+from Helpers.RobotTrajectoryFile import trajectoryMetadata
+from Helpers.RobotTrajectoryWriter import lightRecords
+from Unit_Tests.RobotTrajectoryFileTest import FakeBody
+
+import unittest, os, shutil, tempfile
+import numpy as np
+
+try:
+    from KheperaSimulator.KheperaSimulator import KheperaSimulation
+    HAS_BOX2D = True
+except ImportError:
+    HAS_BOX2D = False
+
+
+class TrajectoryArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dataDir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dataDir, 'Trajectories-Gen-01.' + Extension)
+        self.lights = [FakeBody((7, 7), userData = {'name': 'TARGET', 'lightPos': (7, 0, 7),
+                                                    'lightIntensity': 100, 'lightIsOn': True})]
+        rng = np.random.RandomState(2)
+        self.poses = [FakeBody((x, y), angle) for x, y, angle in rng.uniform(-7, 7, (40, 3))]
+
+    def tearDown(self):
+        shutil.rmtree(self.dataDir)
+
+    def testPutAndKeepOnly(self):
+        archive = TrajectoryArchive(self.filename)
+        metadata = trajectoryMetadata(lightRecords(self.lights), (1, 0, 2), [(7, 7)], np.float64)
+        for i in range(3):
+            archive.put('01-0%d' % (i + 1), metadata, np.full((i + 2, 3), i, dtype = np.float64))
+        self.assertEqual(len(archive), 3)
+        self.assertEqual(archive.ids(), ['01-01', '01-02', '01-03'])
+        trajectory = archive.trajectory('01-02')
+        self.assertEqual(trajectory.numberOfSteps(), 3)
+        self.assertTrue(np.array_equal(trajectory.poses, np.ones((3, 3))))
+        self.assertEqual(trajectory.initialPosition, [1, 0, 2])
+        self.assertEqual(trajectory.trajectoryData().shape, (3, 6))
+        self.assertRaises(TrajectoryArchiveError, archive.trajectory, '02-01')
+
+        archive.keepOnly(['01-03', '02-01'])
+        self.assertEqual(archive.ids(), ['01-03'])
+        self.assertTrue('01-03' in archive)
+        self.assertFalse('01-01' in archive)
+        archive.close()
+        self.assertTrue(TrajectoryArchive.isArchive(self.filename))
+        notArchive = os.path.join(self.dataDir, 'notArchive.traj')
+        with open(notArchive, 'w') as fileOut:
+            fileOut.write('# Position data for Homeo simulation run\n')
+        self.assertFalse(TrajectoryArchive.isArchive(notArchive))
+
+    def testWriterStoresOneRecordPerModel(self):
+        writer = ArchiveTrajectoryWriter('Unspecified', (0, 0, 0), self.lights, self.filename,
+                                         dataDir = self.dataDir, blockRows = 7)
+        for pose in self.poses[:5]:
+            writer.runOnce(position = pose)
+        writer.runOnce(transitionMessage = 'NEWFILE', modelName = '01-01', position = (1, 0, 1), lights = self.lights)
+        for pose in self.poses[:30]:
+            writer.runOnce(position = pose)
+        writer.runOnce(transitionMessage = 'NEWFILE', modelName = '01-02', position = (2, 0, 2), lights = self.lights)
+        writer.runOnce(transitionMessage = 'NEWFILE', modelName = '01-03', position = (3, 0, 3), lights = self.lights)
+        for pose in self.poses:
+            writer.runOnce(position = pose)
+        writer.runOnce(transitionMessage = 'CLOSEFILE')
+        writer.closeTrajFile()
+
+        archive = TrajectoryArchive(self.filename)
+        self.assertEqual(archive.ids(), ['01-01', '01-03'])
+        expected = np.array([(p.position[0], p.position[1], p.angle) for p in self.poses])
+        self.assertTrue(np.array_equal(archive.trajectory('01-01').poses, expected[:30]))
+        self.assertTrue(np.array_equal(archive.trajectory('01-03').poses, expected))
+        self.assertEqual(archive.trajectory('01-03').initialPosition, [3, 0, 3])
+        self.assertEqual(os.listdir(self.dataDir), [os.path.basename(self.filename)])
+        archive.close()
+
+    @unittest.skipUnless(HAS_BOX2D, "Box2D not installed")
+    def testKheperaSimulationArchive(self):
+        simulation = KheperaSimulation()
+        simulation.setDataDir(self.dataDir)
+        simulation.setupWorld('kheperaBraitenberg2_HOMEO_World')
+        simulation.setTrajectoryArchive(self.filename)
+        simulation.setRobotModelName('Khepera', '01-04')
+        simulation.newTrajectoryFile()
+        robot = simulation.allBodies['Khepera']
+        robot.setRightSpeed(3)
+        robot.setLeftSpeed(2)
+        for step in range(100):
+            simulation.advanceSim()
+        simulation.saveTrajectory()
+
+        archive = TrajectoryArchive(self.filename)
+        trajectory = archive.trajectory('01-04')
+        self.assertEqual(trajectory.numberOfSteps(), 100)
+        self.assertEqual(tuple(trajectory.poses[-1]), (robot.body.position[0], robot.body.position[1], robot.body.angle))
+        archive.close()
+        self.assertFalse([name for name in os.listdir(self.dataDir) if '01-04' in name])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,9 +7,14 @@ Usage:
     python run_ashby_original_experiments.py --exp 1          # run experiment 1 only
     python run_ashby_original_experiments.py --exp 1 --seed 42 --ticks 5000
     python run_ashby_original_experiments.py --exp 6 --ticks 8000 --output-dir results/
+    python run_ashby_original_experiments.py --exp 1 --sweep 500  # 500 seeds as one ensemble
+    python run_ashby_original_experiments.py --exp 1 --columnar --decimate 100  # columnar statelog
+    python run_ashby_original_experiments.py --exp 2 --fast-forward 1e-6  # skip quiet steady states
+    python run_ashby_original_experiments.py --exp 6 --branches 16  # 16 continuations of one burn-in
 
 Each experiment produces:
-    - A .statelog TSV file with per-tick state data
+    - A .statelog TSV file with per-tick state data (with --columnar, a
+      .statelog.npz columnar log, see Helpers.ColumnarStateLog)
     - A .json file with initial and final conditions
     - Console summary with timing, stability, and uniselector statistics
 
@@ -17,6 +22,7 @@ Each experiment produces:
 '''
 
 import argparse
+import csv
 import os
 import sys
 import time
@@ -35,7 +41,9 @@ from Simulator.AshbyOriginalExperiments import (
     setup_exp6_habituation, make_stimulus_events, ResponseMeasurer,
     setup_exp7_multistable, make_multistable_callback,
     run_with_events, StabilityTracker, AshbyStateLogger,
+    Branch, run_branches, measure_ensemble_responses,
 )
+from Core.HomeostatEnsemble import HomeostatEnsemble
 from Helpers.HomeostatConditionLogger import (
     log_homeostat_conditions_json)
 
@@ -47,8 +55,15 @@ def _output_path(output_dir, exp_num, seed, ext):
     return os.path.join(output_dir, fname)
 
 
-def run_experiment(exp_num, seed=None, total_ticks=5000, output_dir='.'):
-    '''Run a single experiment and return a summary dict.'''
+def run_experiment(exp_num, seed=None, total_ticks=5000, output_dir='.',
+                   columnar=False, decimation=None, fast_forward=None):
+    '''Run a single experiment and return a summary dict.
+    columnar and decimation select the format of the state log
+    (see AshbyStateLogger).  If fast_forward is not None the ticks
+    spent in a quiet fixed point or cycle are skipped, comparing states
+    with tolerance fast_forward (see Core.HomeoFastForward): with 0
+    only noiseless runs are fast-forwarded, and their results do not
+    change.'''
 
     os.makedirs(output_dir, exist_ok=True)
 
@@ -102,10 +117,13 @@ def run_experiment(exp_num, seed=None, total_ticks=5000, output_dir='.'):
         sys.exit(1)
 
     # ---- Loggers ----
-    statelog_path = _output_path(output_dir, exp_num, seed, '.statelog')
+    columnar = columnar or decimation is not None
+    statelog_path = _output_path(output_dir, exp_num, seed,
+                                 '.statelog.npz' if columnar else '.statelog')
     json_path = _output_path(output_dir, exp_num, seed, '.json')
 
-    state_logger = AshbyStateLogger(hom, statelog_path, seed=seed)
+    state_logger = AshbyStateLogger(hom, statelog_path, seed=seed,
+                                    columnar=columnar, decimation=decimation)
     stability_tracker = StabilityTracker(hom, window=200)
 
     # Response measurer for Exp 6
@@ -129,6 +147,10 @@ def run_experiment(exp_num, seed=None, total_ticks=5000, output_dir='.'):
     print('  Statelog: %s' % statelog_path)
     print('=' * 60)
 
+    fast_forwarder = None
+    if fast_forward is not None:
+        fast_forwarder = hom.enableFastForward(tolerance=fast_forward)
+
     t0 = time.time()
 
     def combined_callback(hom, tick):
@@ -137,10 +159,13 @@ def run_experiment(exp_num, seed=None, total_ticks=5000, output_dir='.'):
         if response_measurer is not None:
             response_measurer.check(tick)
 
+    # Without per-tick logic the run can go from event to event
+    needs_callback = tick_callback is not None or response_measurer is not None
+
     run_with_events(
         hom, total_ticks,
         events=events,
-        tick_callback=combined_callback,
+        tick_callback=combined_callback if needs_callback else None,
         state_logger=state_logger,
         stability_tracker=stability_tracker,
     )
@@ -166,6 +191,9 @@ def run_experiment(exp_num, seed=None, total_ticks=5000, output_dir='.'):
         'statelog_path': statelog_path,
         'json_path': json_path,
     }
+    if fast_forwarder is not None:
+        summary['fast_forward_jumps'] = list(fast_forwarder.jumps)
+        summary['ticks_fast_forwarded'] = fast_forwarder.ticksSkipped()
 
     print('\nResults:')
     print('  Elapsed: %.1f s' % elapsed)
@@ -181,6 +209,10 @@ def run_experiment(exp_num, seed=None, total_ticks=5000, output_dir='.'):
         print('  Currently UNSTABLE (was stable earlier)')
     print('  Total uniselector firings: %d' %
           stability_tracker.total_uniselector_firings)
+    if fast_forwarder is not None:
+        print('  Fast-forward: %d ticks skipped in %d jumps %s' % (
+            fast_forwarder.ticksSkipped(), len(fast_forwarder.jumps),
+            ['%d->%d (period %d)' % jump for jump in fast_forwarder.jumps]))
 
     if exp_num == 3:
         print('  Punishments delivered: %d' % len(punishment_log))
@@ -203,6 +235,152 @@ def run_experiment(exp_num, seed=None, total_ticks=5000, output_dir='.'):
     return summary
 
 
+# Experiments driven by scheduled events only, which can be swept and branched
+_event_driven_setups = {1: setup_exp1_basic_ultrastability,
+                        2: setup_exp2_self_reorganization,
+                        4: setup_exp4_alternating_environments,
+                        6: setup_exp6_habituation}
+
+
+def _scheduled_events(exp_num, total_ticks):
+    '''Return the events of an event-driven experiment run for total_ticks,
+    as scheduled by run_experiment.'''
+    if exp_num == 2:
+        return [(total_ticks // 2, exp2_reversal_event)]
+    elif exp_num == 4:
+        return make_alternation_events(
+            interval=max(total_ticks // 10, 200), n_reversals=8)
+    elif exp_num == 6:
+        settle = total_ticks // 10
+        return make_stimulus_events(
+            unit_index=0, delta=5.0, interval=(total_ticks - settle) // 10,
+            n_stimuli=10, settle_first=settle)
+    return []
+
+
+def run_seed_sweep(exp_num, seeds, total_ticks=5000):
+    '''Run one experiment for many seeds at once as a HomeostatEnsemble.
+
+    Only experiments driven by scheduled events (1, 2, 4, 6) can be swept:
+    per-tick callbacks (Exp 3, 5, 7) need the object path.  No state logs
+    are written; the summary has one entry per seed.  For Exp 6 each entry
+    also has the response amplitudes to the stimuli, measured as by
+    run_experiment.
+    '''
+    setups = _event_driven_setups
+    if exp_num not in setups:
+        print('Experiment %d uses per-tick callbacks and cannot be swept' % exp_num)
+        sys.exit(1)
+
+    events = _scheduled_events(exp_num, total_ticks)
+
+    t0 = time.time()
+    ensemble = HomeostatEnsemble.fromSetup(setups[exp_num], seeds,
+                                           seed=seeds[0], window=200)
+    for hom in ensemble.homeostats:
+        hom.collectsData = False
+    measurers = None
+    if exp_num == 6:
+        stim_ticks = [e[0] for e in events]
+        interval = (total_ticks - total_ticks // 10) // 10
+        measurers = [ResponseMeasurer(hom, target_unit_index=1, stimulus_ticks=stim_ticks,
+                                      measure_window=interval // 3)
+                     for hom in ensemble.homeostats]
+        measure_ensemble_responses(ensemble, total_ticks, events, measurers)
+    else:
+        ensemble.runWithEvents(total_ticks, events)
+    elapsed = time.time() - t0
+
+    stable_at = ensemble.stabilityAchievedAt()
+    stable_now = ensemble.currentlyStable()
+    firings = ensemble.totalUniselectorFirings()
+    summaries = []
+    for k, seed in enumerate(ensemble.seeds):
+        summaries.append({
+            'experiment': exp_num,
+            'seed': seed,
+            'total_ticks': total_ticks,
+            'stability_achieved_at': stable_at[k],
+            'currently_stable': stable_now[k],
+            'total_uniselector_firings': int(firings[k]),
+        })
+        if measurers is not None:
+            summaries[-1]['response_amplitudes'] = [float(r) for r in measurers[k].responses]
+
+    n_stable = sum(1 for s in stable_at if s is not None)
+    print('Exp %d seed sweep: %d seeds x %d ticks in %.1f s' % (
+        exp_num, len(seeds), total_ticks, elapsed))
+    print('  Stability achieved by %d/%d seeds, stable at end: %d/%d' % (
+        n_stable, len(seeds), sum(stable_now), len(seeds)))
+    return summaries
+
+
+def run_branching(exp_num, n_branches, seed=None, total_ticks=5000,
+                  branch_tick=None, processes=None, output_dir='.'):
+    '''Run one experiment up to branch_tick once, continue it in n_branches
+    branches (see Simulator.AshbyOriginalExperiments.run_branches) and save
+    their result table as a CSV file in output_dir.  Return the table.
+
+    Every branch gets the experiment's events from branch_tick on (by
+    default the first event, or half the run).  Branch 0 continues the
+    random streams of the prefix, so it follows the unbranched run; branch
+    k is reseeded with seed + k.  For Exp 6 each row also has the response
+    amplitudes to the stimuli of the branch.  Only event-driven experiments
+    (1, 2, 4, 6) can be branched.
+    '''
+    if exp_num not in _event_driven_setups:
+        print('Experiment %d uses per-tick callbacks and cannot be branched' % exp_num)
+        sys.exit(1)
+    os.makedirs(output_dir, exist_ok=True)
+
+    hom, seed, meta = _event_driven_setups[exp_num](seed)
+    hom.collectsData = False
+    events = _scheduled_events(exp_num, total_ticks)
+    if branch_tick is None:
+        branch_tick = events[0][0] if events else total_ticks // 2
+    prefix_events = [e for e in events if e[0] < branch_tick]
+    branch_events = [e for e in events if e[0] >= branch_tick]
+
+    probe = measure = None
+    if exp_num == 6:
+        stim_ticks = [e[0] for e in branch_events]
+        interval = (total_ticks - total_ticks // 10) // 10
+
+        def probe(h):
+            return ResponseMeasurer(h, target_unit_index=1, stimulus_ticks=stim_ticks,
+                                    measure_window=interval // 3)
+
+        def measure(h, measurer):
+            return {'response_amplitudes': measurer.responses}
+
+    branches = [Branch('branch%d' % k, events=branch_events,
+                       seed=seed + k if k > 0 else None,
+                       probe=probe, measure=measure)
+                for k in range(n_branches)]
+
+    print('%s: %d branches from tick %d to %d' % (
+        meta['experiment'], n_branches, branch_tick, total_ticks))
+    t0 = time.time()
+    rows = run_branches(hom, branch_tick, branches, total_ticks,
+                        prefix_events=prefix_events, processes=processes)
+    elapsed = time.time() - t0
+
+    csv_path = _output_path(output_dir, exp_num, seed, '_branches.csv')
+    fields = []
+    for row in rows:
+        fields += [k for k in row if k not in fields]
+    with open(csv_path, 'w', newline='') as f:
+        w = csv.DictWriter(f, fieldnames=fields)
+        w.writeheader()
+        w.writerows(rows)
+
+    n_stable = sum(1 for row in rows if row['currently_stable'])
+    print('  %d branches in %.1f s, stable at end: %d/%d' % (
+        n_branches, elapsed, n_stable, n_branches))
+    print('  Result table: %s' % csv_path)
+    return rows
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Run Ashby's original Homeostat experiments")
@@ -212,24 +390,69 @@ def main():
                         help='RNG seed (default: random)')
     parser.add_argument('--ticks', type=int, default=5000,
                         help='Number of ticks to simulate (default: 5000)')
+    parser.add_argument('--sweep', type=int, default=None,
+                        help='Run N seeds (starting at --seed, default 0) '
+                             'as one batched ensemble and print a summary')
     parser.add_argument('--output-dir', type=str, default=None,
                         help='Output directory (default: SimulationsData/AshbyExperiments/)')
+    parser.add_argument('--columnar', action='store_true',
+                        help='Write the state log as compressed columnar chunks (.statelog.npz)')
+    parser.add_argument('--decimate', type=int, default=None,
+                        help='With a columnar state log, also write a min/max/mean '
+                             'log over windows of N ticks')
+    parser.add_argument('--branches', type=int, default=None,
+                        help='Run the experiment once up to --branch-at, then continue '
+                             'it in N branches with different seeds, in parallel, '
+                             'and save their result table')
+    parser.add_argument('--branch-at', type=int, default=None, metavar='TICK',
+                        help='Tick at which the branches start (default: the first '
+                             'scheduled event, or half the run)')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='Branches run at once (default: number of CPUs)')
+    parser.add_argument('--fast-forward', type=float, nargs='?', const=0.0,
+                        default=None, metavar='TOLERANCE',
+                        help='Skip the ticks spent in a quiet fixed point or cycle. '
+                             'Without TOLERANCE only noiseless runs are skipped, '
+                             'exactly; with it states within TOLERANCE count as '
+                             'repeating and noisy runs are approximated')
     args = parser.parse_args()
 
+    if args.sweep is not None:
+        if args.exp is None:
+            parser.error('--sweep requires --exp')
+        if args.fast_forward is not None:
+            parser.error('--fast-forward does not apply to --sweep')
+        first = args.seed if args.seed is not None else 0
+        run_seed_sweep(args.exp, list(range(first, first + args.sweep)),
+                       total_ticks=args.ticks)
+        return
+
     if args.output_dir is None:
         from Helpers.General_Helper_Functions import simulations_data_dir
         args.output_dir = os.path.join(simulations_data_dir(), 'AshbyExperiments')
 
+    if args.branches is not None:
+        if args.exp is None:
+            parser.error('--branches requires --exp')
+        run_branching(args.exp, args.branches, seed=args.seed,
+                      total_ticks=args.ticks, branch_tick=args.branch_at,
+                      processes=args.processes, output_dir=args.output_dir)
+        return
+
     if args.exp is not None:
         run_experiment(args.exp, seed=args.seed,
-                       total_ticks=args.ticks, output_dir=args.output_dir)
+                       total_ticks=args.ticks, output_dir=args.output_dir,
+                       columnar=args.columnar, decimation=args.decimate,
+                       fast_forward=args.fast_forward)
     else:
         print('Running all 7 Ashby experiments...\n')
         summaries = []
         for exp_num in range(1, 8):
             summary = run_experiment(
                 exp_num, seed=args.seed,
-                total_ticks=args.ticks, output_dir=args.output_dir)
+                total_ticks=args.ticks, output_dir=args.output_dir,
+                columnar=args.columnar, decimation=args.decimate,
+                fast_forward=args.fast_forward)
             summaries.append(summary)
 
         print('\n' + '=' * 60)
@@ -10,6 +10,17 @@ Usage:
     python run_validation_300k.py --steps 400000   # override step count
     python run_validation_300k.py --state-log      # enable per-tick state logging
     python run_validation_300k.py --log-interval 100  # state log every N ticks
+    python run_validation_300k.py --state-log --columnar  # columnar .statelog.npz log
+    python run_validation_300k.py --state-log --decimate 1000  # plus a min/max/mean log
+    python run_validation_300k.py --checkpoint-seconds 600  # checkpoint every 10 minutes
+    python run_validation_300k.py --checkpoint-every 50000  # checkpoint every 50k ticks
+    python run_validation_300k.py --resume DIR     # resume the runs logging to DIR
+    python run_validation_300k.py --exp 1 --checkpoint-dir DIR --resume  # resume one
+
+Checkpoints (DIR/exp<N>.ckpt, see Helpers.RunCheckpoint) hold homeostat, robot,
+log offsets and random state; a resumed run continues exactly where the last
+checkpoint was taken.  A resumed columnar state log goes on in a new
+*-resumed-<tick>.statelog.npz file.
 """
 
 import sys
@@ -25,6 +36,7 @@ import numpy as np
 SRC_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SRC_DIR)
 from Helpers.General_Helper_Functions import simulations_data_dir
+from Helpers.RunCheckpoint import RunCheckpointer
 SIMS_DATA = simulations_data_dir()
 
 # Saved JSON condition files from the original 60k runs
@@ -91,20 +103,92 @@ def restore_from_json(homeostat, json_path):
                 conn.newWeight(signed_weight)
 
 
+def open_state_logger(hom, sim, path, interval, seed, columnar, decimation,
+                      resumed_at=None, resume_offset=None):
+    """Return a HomeostatStateLogger on path: a TSV file, or a columnar
+    path + '.npz' log (with a decimated copy if decimation is given).
+
+    When resuming from the checkpoint taken at tick resumed_at, a TSV log
+    goes on from resume_offset and a columnar log, which cannot be
+    continued, in a new path + '-resumed-<tick>.npz' file.
+    """
+    from Helpers.HomeostatStateLogger import HomeostatStateLogger
+    if columnar or decimation:
+        if resumed_at is not None:
+            path += '-resumed-%d' % resumed_at
+        return HomeostatStateLogger(hom, sim, path + '.npz', log_interval=interval,
+                                    seed=seed, columnar=True, decimation=decimation)
+    return HomeostatStateLogger(hom, sim, path, log_interval=interval, seed=seed,
+                                resume_offset=resume_offset)
+
+
+# ---------------------------------------------------------------------------
+# Checkpoints
+# ---------------------------------------------------------------------------
+
+def load_checkpoint(exp_num, checkpoint_dir, resume):
+    """Return the checkpoint file of experiment exp_num in checkpoint_dir
+    (None without a checkpoint_dir) and, when resuming, the checkpoint
+    saved in it (None if there is none yet)."""
+    if checkpoint_dir is None:
+        return None, None
+    path = os.path.join(checkpoint_dir, 'exp%d.ckpt' % exp_num)
+    saved = RunCheckpointer.load(path) if resume else None
+    if resume and saved is None:
+        print("Exp %d: no checkpoint in %s, starting from tick 0" % (
+            exp_num, checkpoint_dir), flush=True)
+    return path, saved
+
+
+def open_checkpointer(path, saved, hom, sim, state_logger, every, seconds):
+    """Return the RunCheckpointer of a run, or None if it is not checkpointed.
+    A resumed run keeps the intervals of the checkpoint it resumes from, so
+    that its physics solver is restarted at the same ticks."""
+    if saved is not None:
+        every, seconds = saved['every_ticks'], saved['every_seconds']
+    if path is None or not (every or seconds):
+        return None
+    return RunCheckpointer(path, hom, sim, state_logger,
+                           every_ticks=every, every_seconds=seconds)
+
+
+def print_finished(exp_num, progress):
+    print("PROGRESS: Exp %d finished — final_dist=%.4f, min_dist=%.4f (t=%d)" % (
+        exp_num, progress['final_dist'], progress['min_dist'], progress['min_t']),
+        flush=True)
+
+
 # ---------------------------------------------------------------------------
 # Standalone experiment runners (Exp 1 & 2)
 # ---------------------------------------------------------------------------
 
 def run_standalone(exp_num, uniselector_type, json_path, total_steps,
-                   state_log=False, state_log_interval=100, seed=None):
-    """Run a standalone experiment with weights restored from JSON."""
+                   state_log=False, state_log_interval=100, seed=None,
+                   state_log_columnar=False, state_log_decimation=None,
+                   checkpoint_dir=None, checkpoint_every=None,
+                   checkpoint_seconds=None, resume=False):
+    """Run a standalone experiment with weights restored from JSON.
+
+    With a checkpoint_dir and an interval the run is checkpointed; with
+    resume it goes on from its last checkpoint in checkpoint_dir, with the
+    seed, length and log files of the interrupted run.
+    """
     from HomeoExperiments.KheperaExperiments.phototaxis_braitenberg2_Ashby import setup_phototaxis
     from Helpers.HomeostatConditionLogger import (
         log_homeostat_conditions, log_homeostat_conditions_json)
 
+    checkpoint_path, saved = load_checkpoint(exp_num, checkpoint_dir, resume)
+    if saved is not None and saved['finished']:
+        print_finished(exp_num, saved['progress'])
+        return
+    if saved is not None:
+        progress = saved['progress']
+        seed, total_steps = progress['seed'], progress['total_steps']
+
     label = 'Ashby' if uniselector_type == 'ashby' else 'OU'
-    print("PROGRESS: Exp %d started — Standalone %s (restored weights), %dk steps" % (
-        exp_num, label, total_steps // 1000), flush=True)
+    print("PROGRESS: Exp %d %s — Standalone %s (restored weights), %dk steps" % (
+        exp_num, 'started' if saved is None else 'resumed at t=%d' % saved['tick'],
+        label, total_steps // 1000), flush=True)
 
     hom, backend, seed = setup_phototaxis(
         topology='fixed', light_intensity=-100,
@@ -124,55 +208,81 @@ def run_standalone(exp_num, uniselector_type, json_path, total_steps,
     robot = sim.allBodies['Khepera']
     target_pos = (7, 7)
 
-    # Log initial conditions
-    timestamp = time.strftime("%Y-%m-%d-%H-%M-%S")
-    log_dir = sim.dataDir
-    exp_name = sim.experimentName + '-validation-300k'
-    log_path = os.path.join(log_dir, exp_name + '-' + timestamp + '.log')
-    json_log_path = os.path.join(log_dir, exp_name + '-' + timestamp + '.json')
-    log_homeostat_conditions(hom, log_path, 'INITIAL CONDITIONS (restored)', exp_name)
-    log_homeostat_conditions_json(hom, json_log_path, 'INITIAL CONDITIONS (restored)', exp_name,
-                                  seed=seed)
-
-    # Optional per-tick state logger
-    if state_log:
-        from Helpers.HomeostatStateLogger import HomeostatStateLogger
-        state_log_path = os.path.join(log_dir, exp_name + '-' + timestamp + '.statelog')
-        state_logger = HomeostatStateLogger(
-            hom, sim, state_log_path, log_interval=state_log_interval, seed=seed)
-        state_logger.log_tick(0)  # capture initial state before any dynamics
-        hom._state_logger = state_logger
-
     def dist_to_target():
         rx, ry = robot.body.position[0], robot.body.position[1]
         return math.sqrt((rx - target_pos[0])**2 + (ry - target_pos[1])**2)
 
-    min_dist = dist_to_target()
-    min_t = 0
+    if saved is None:
+        # Log initial conditions
+        timestamp = time.strftime("%Y-%m-%d-%H-%M-%S")
+        log_dir = sim.dataDir
+        exp_name = sim.experimentName + '-validation-300k'
+        log_path = os.path.join(log_dir, exp_name + '-' + timestamp + '.log')
+        json_log_path = os.path.join(log_dir, exp_name + '-' + timestamp + '.json')
+        log_homeostat_conditions(hom, log_path, 'INITIAL CONDITIONS (restored)', exp_name)
+        log_homeostat_conditions_json(hom, json_log_path, 'INITIAL CONDITIONS (restored)', exp_name,
+                                      seed=seed)
+        progress = {'seed': seed, 'total_steps': total_steps,
+                    'log_path': log_path, 'json_log_path': json_log_path,
+                    'state_log_path': (os.path.join(log_dir, exp_name + '-' + timestamp + '.statelog')
+                                       if state_log else None),
+                    'state_log_interval': state_log_interval,
+                    'state_log_columnar': state_log_columnar,
+                    'state_log_decimation': state_log_decimation,
+                    'reached': 0, 'min_dist': dist_to_target(), 'min_t': 0}
 
-    for target_tick in range(REPORT_INTERVAL, total_steps + 1, REPORT_INTERVAL):
+    # Optional per-tick state logger
+    state_logger = None
+    if progress['state_log_path'] is not None:
+        state_logger = open_state_logger(
+            hom, sim, progress['state_log_path'], progress['state_log_interval'], seed,
+            progress['state_log_columnar'], progress['state_log_decimation'],
+            resumed_at=None if saved is None else saved['tick'],
+            resume_offset=None if saved is None else saved['state_log_offset'])
+        if saved is None:
+            state_logger.log_tick(0)  # capture initial state before any dynamics
+        hom._state_logger = state_logger
+
+    checkpointer = open_checkpointer(checkpoint_path, saved, hom, sim, state_logger,
+                                     checkpoint_every, checkpoint_seconds)
+    if saved is not None:
+        checkpointer.restore(saved)
+
+    # Reports every REPORT_INTERVAL ticks, with stops at the checkpoint boundaries in between
+    last_tick = total_steps - total_steps % REPORT_INTERVAL
+    while progress['reached'] < last_tick:
+        target_tick = (progress['reached'] // REPORT_INTERVAL + 1) * REPORT_INTERVAL
+        if checkpointer is not None:
+            target_tick = checkpointer.next_stop(progress['reached'], target_tick)
         hom.runFor(target_tick)
-        d = dist_to_target()
-        if d < min_dist:
-            min_dist = d
-            min_t = target_tick
-        print("PROGRESS: Exp %d t=%d/%d dist=%.3f min_dist=%.3f (t=%d)" % (
-            exp_num, target_tick, total_steps, d, min_dist, min_t), flush=True)
+        progress['reached'] = target_tick
+        if target_tick % REPORT_INTERVAL == 0:
+            d = dist_to_target()
+            if d < progress['min_dist']:
+                progress['min_dist'] = d
+                progress['min_t'] = target_tick
+            print("PROGRESS: Exp %d t=%d/%d dist=%.3f min_dist=%.3f (t=%d)" % (
+                exp_num, target_tick, total_steps, d, progress['min_dist'],
+                progress['min_t']), flush=True)
+        if checkpointer is not None:
+            checkpointer.at_tick(target_tick, progress)
 
     final_dist = dist_to_target()
     sim.saveTrajectory()
 
     # Close state logger if active
-    if state_log and hom._state_logger is not None:
-        hom._state_logger.close()
+    if state_logger is not None:
+        state_logger.close()
         hom._state_logger = None
 
     # Log final conditions
-    log_homeostat_conditions(hom, log_path, 'FINAL CONDITIONS')
-    log_homeostat_conditions_json(hom, json_log_path, 'FINAL CONDITIONS')
+    log_homeostat_conditions(hom, progress['log_path'], 'FINAL CONDITIONS')
+    log_homeostat_conditions_json(hom, progress['json_log_path'], 'FINAL CONDITIONS')
 
-    print("PROGRESS: Exp %d finished — final_dist=%.4f, min_dist=%.4f (t=%d)" % (
-        exp_num, final_dist, min_dist, min_t), flush=True)
+    progress['final_dist'] = final_dist
+    if checkpointer is not None:
+        checkpointer.save(progress['reached'], progress, finished=True)
+    print_finished(exp_num, progress)
 
 
 # ---------------------------------------------------------------------------
@@ -180,13 +290,25 @@ def run_standalone(exp_num, uniselector_type, json_path, total_steps,
 # ---------------------------------------------------------------------------
 
 def run_ga_replay(exp_num, experiment_name, genome_raw, genome_id, total_steps,
-                  state_log=False, state_log_interval=100, seed=None):
-    """Replay a GA genome for an extended run."""
+                  state_log=False, state_log_interval=100, seed=None,
+                  state_log_columnar=False, state_log_decimation=None,
+                  checkpoint_dir=None, checkpoint_every=None,
+                  checkpoint_seconds=None, resume=False):
+    """Replay a GA genome for an extended run (checkpointed and resumed as
+    in run_standalone)."""
     import random as _random
     from deap import base, creator
     from Simulator.SimulatorBackend import SimulatorBackendHOMEO
     from Simulator.HomeoQtSimulation import HomeoQtSimulation
 
+    checkpoint_path, saved = load_checkpoint(exp_num, checkpoint_dir, resume)
+    if saved is not None and saved['finished']:
+        print_finished(exp_num, saved['progress'])
+        return
+    if saved is not None:
+        progress = saved['progress']
+        seed, total_steps = progress['seed'], progress['total_steps']
+
     # Seed both RNGs before any stochastic initialization
     if seed is None:
         seed = int.from_bytes(os.urandom(4), 'big')
@@ -194,8 +316,9 @@ def run_ga_replay(exp_num, experiment_name, genome_raw, genome_id, total_steps,
     _random.seed(seed)
 
     label = '16-gene fixed-dt' if len(genome_raw) == 16 else '20-gene variable-dt'
-    print("PROGRESS: Exp %d started — GA replay %s (ID %s), %dk steps" % (
-        exp_num, label, genome_id, total_steps // 1000), flush=True)
+    print("PROGRESS: Exp %d %s — GA replay %s (ID %s), %dk steps" % (
+        exp_num, 'started' if saved is None else 'resumed at t=%d' % saved['tick'],
+        label, genome_id, total_steps // 1000), flush=True)
 
     # Create DEAP Individual
     if not hasattr(creator, 'FitnessMin'):
@@ -206,8 +329,11 @@ def run_ga_replay(exp_num, experiment_name, genome_raw, genome_id, total_steps,
     genome.ID = genome_id
 
     # Set up data directory (in research repo)
-    sims_root = SIMS_DATA
-    log_dir = os.path.join(sims_root, 'SimsData-' + time.strftime("%Y-%m-%d"))
+    if saved is None:
+        sims_root = SIMS_DATA
+        log_dir = os.path.join(sims_root, 'SimsData-' + time.strftime("%Y-%m-%d"))
+    else:
+        log_dir = progress['log_dir']
     os.makedirs(log_dir, exist_ok=True)
 
     # Create backend and simulation (following _evaluate_genome_worker pattern)
@@ -258,89 +384,121 @@ def run_ga_replay(exp_num, experiment_name, genome_raw, genome_id, total_steps,
     robot = khep_sim.allBodies['Khepera']
     target_pos = (7, 7)
 
-    # Optional per-tick state logger
-    if state_log:
-        from Helpers.HomeostatStateLogger import HomeostatStateLogger
-        timestamp = time.strftime("%Y-%m-%d-%H-%M-%S")
-        exp_label = experiment_name.replace('initializeBraiten2_2_Full_', '')
-        state_log_path = os.path.join(log_dir, exp_label + '-' + genome_id +
-                                      '-' + timestamp + '.statelog')
-        state_logger = HomeostatStateLogger(
-            hom, khep_sim, state_log_path, log_interval=state_log_interval,
-            seed=seed)
-        state_logger.log_tick(0)  # capture initial state before any dynamics
-        hom._state_logger = state_logger
-
     def dist_to_target():
         rx, ry = robot.body.position[0], robot.body.position[1]
         return math.sqrt((rx - target_pos[0])**2 + (ry - target_pos[1])**2)
 
-    min_dist = dist_to_target()
-    min_t = 0
-    next_report = REPORT_INTERVAL
+    if saved is None:
+        state_log_path = None
+        if state_log:
+            timestamp = time.strftime("%Y-%m-%d-%H-%M-%S")
+            exp_label = experiment_name.replace('initializeBraiten2_2_Full_', '')
+            state_log_path = os.path.join(log_dir, exp_label + '-' + genome_id +
+                                          '-' + timestamp + '.statelog')
+        progress = {'seed': seed, 'total_steps': total_steps, 'log_dir': log_dir,
+                    'state_log_path': state_log_path,
+                    'state_log_interval': state_log_interval,
+                    'state_log_columnar': state_log_columnar,
+                    'state_log_decimation': state_log_decimation,
+                    'tick': 0, 'next_report': REPORT_INTERVAL,
+                    'min_dist': dist_to_target(), 'min_t': 0}
+
+    # Optional per-tick state logger
+    state_logger = None
+    if progress['state_log_path'] is not None:
+        state_logger = open_state_logger(
+            hom, khep_sim, progress['state_log_path'], progress['state_log_interval'], seed,
+            progress['state_log_columnar'], progress['state_log_decimation'],
+            resumed_at=None if saved is None else saved['tick'],
+            resume_offset=None if saved is None else saved['state_log_offset'])
+        if saved is None:
+            state_logger.log_tick(0)  # capture initial state before any dynamics
+        hom._state_logger = state_logger
+
+    checkpointer = open_checkpointer(checkpoint_path, saved, hom, khep_sim, state_logger,
+                                     checkpoint_every, checkpoint_seconds)
+    if saved is not None:
+        checkpointer.restore(saved)
+        # The session packs weights and switches: repack the restored ones
+        session = sim.homeostatSession()
+        if session is not None:
+            session.refresh()
 
     # Ticks per simulated step depends on dt_fast
     ticks_per_step = 1.0 / min_dt_fast
 
-    for tick in range(actual_ticks):
+    for tick in range(progress['tick'], actual_ticks):
         sim.step()
         simulated_time = int((tick + 1) * min_dt_fast)
 
-        if simulated_time >= next_report:
+        if simulated_time >= progress['next_report']:
             d = dist_to_target()
-            if d < min_dist:
-                min_dist = d
-                min_t = simulated_time
+            if d < progress['min_dist']:
+                progress['min_dist'] = d
+                progress['min_t'] = simulated_time
             print("PROGRESS: Exp %d t=%d/%d dist=%.3f min_dist=%.3f (t=%d)" % (
-                exp_num, simulated_time, total_steps, d, min_dist, min_t), flush=True)
-            next_report += REPORT_INTERVAL
+                exp_num, simulated_time, total_steps, d, progress['min_dist'],
+                progress['min_t']), flush=True)
+            progress['next_report'] += REPORT_INTERVAL
+
+        if checkpointer is not None:
+            progress['tick'] = tick + 1
+            checkpointer.at_tick(tick + 1, progress)
 
     final_dist = dist_to_target()
-    if final_dist < min_dist:
-        min_dist = final_dist
-        min_t = total_steps
+    if final_dist < progress['min_dist']:
+        progress['min_dist'] = final_dist
+        progress['min_t'] = total_steps
 
     khep_sim.saveTrajectory()
 
     # Close state logger if active
-    if state_log and hom._state_logger is not None:
-        hom._state_logger.close()
+    if state_logger is not None:
+        state_logger.close()
         hom._state_logger = None
 
-    print("PROGRESS: Exp %d finished — final_dist=%.4f, min_dist=%.4f (t=%d)" % (
-        exp_num, final_dist, min_dist, min_t), flush=True)
+    progress['final_dist'] = final_dist
+    if checkpointer is not None:
+        progress['tick'] = actual_ticks
+        checkpointer.save(actual_ticks, progress, finished=True)
+    print_finished(exp_num, progress)
 
 
 # ---------------------------------------------------------------------------
 # Individual experiment entry points
 # ---------------------------------------------------------------------------
 
-def run_exp1(total_steps, state_log=False, state_log_interval=100):
+def run_exp1(total_steps, state_log=False, state_log_interval=100, **options):
     run_standalone(1, 'ashby', EXP1_JSON, total_steps,
-                   state_log=state_log, state_log_interval=state_log_interval)
+                   state_log=state_log, state_log_interval=state_log_interval,
+                   **options)
 
-def run_exp2(total_steps, state_log=False, state_log_interval=100):
+def run_exp2(total_steps, state_log=False, state_log_interval=100, **options):
     run_standalone(2, 'continuous', EXP2_JSON, total_steps,
-                   state_log=state_log, state_log_interval=state_log_interval)
+                   state_log=state_log, state_log_interval=state_log_interval,
+                   **options)
 
-def run_exp3(total_steps, state_log=False, state_log_interval=100):
+def run_exp3(total_steps, state_log=False, state_log_interval=100, **options):
     run_ga_replay(3,
         'initializeBraiten2_2_Full_GA_continuous_weightfree_fixed_dt',
         EXP3_GENOME, EXP3_ID, total_steps,
-        state_log=state_log, state_log_interval=state_log_interval)
+        state_log=state_log, state_log_interval=state_log_interval,
+        **options)
 
-def run_exp4(total_steps, state_log=False, state_log_interval=100):
+def run_exp4(total_steps, state_log=False, state_log_interval=100, **options):
     run_ga_replay(4,
         'initializeBraiten2_2_Full_GA_continuous_weightfree_fixed',
         EXP4_GENOME, EXP4_ID, total_steps,
-        state_log=state_log, state_log_interval=state_log_interval)
+        state_log=state_log, state_log_interval=state_log_interval,
+        **options)
 
 
 # ---------------------------------------------------------------------------
 # Subprocess entry point (--exp N)
 # ---------------------------------------------------------------------------
 
-def run_single(exp_num, total_steps, state_log=False, state_log_interval=100):
+def run_single(exp_num, total_steps, state_log=False, state_log_interval=100,
+               **options):
     os.chdir(SRC_DIR)
     if SRC_DIR not in sys.path:
         sys.path.insert(0, SRC_DIR)
@@ -352,23 +510,37 @@ def run_single(exp_num, total_steps, state_log=False, state_log_interval=100):
         4: run_exp4,
     }
     runners[exp_num](total_steps, state_log=state_log,
-                     state_log_interval=state_log_interval)
+                     state_log_interval=state_log_interval, **options)
 
 
 # ---------------------------------------------------------------------------
 # Orchestrator (default mode)
 # ---------------------------------------------------------------------------
 
-def orchestrate(total_steps, state_log=False, state_log_interval=100):
-    timestamp = time.strftime('%Y-%m-%d-%H-%M-%S')
-    log_dir = os.path.join(SIMS_DATA,
-                           'validation-%dk-%s' % (total_steps // 1000, timestamp))
+def orchestrate(total_steps, state_log=False, state_log_interval=100,
+                state_log_columnar=False, state_log_decimation=None,
+                checkpoint_every=None, checkpoint_seconds=None, resume_dir=None):
+    """Run the 4 experiments as subprocesses logging to a new directory,
+    which also holds their checkpoints if an interval is given.  With
+    resume_dir, resume the runs logging to it from their checkpoints."""
+    if resume_dir is None:
+        timestamp = time.strftime('%Y-%m-%d-%H-%M-%S')
+        log_dir = os.path.join(SIMS_DATA,
+                               'validation-%dk-%s' % (total_steps // 1000, timestamp))
+    else:
+        log_dir = resume_dir
     os.makedirs(log_dir, exist_ok=True)
 
     print("=" * 60)
     print("  Validation: 4 Experiments x %dk Steps" % (total_steps // 1000))
     if state_log:
         print("  State logging: ON (interval=%d)" % state_log_interval)
+    if resume_dir is not None:
+        print("  Resuming from checkpoints")
+    elif checkpoint_every or checkpoint_seconds:
+        print("  Checkpoints  : every %s" % (
+            '%d ticks' % checkpoint_every if checkpoint_every else
+            '%g seconds' % checkpoint_seconds))
     print("=" * 60)
     print("  Log directory : %s" % os.path.abspath(log_dir))
     print("=" * 60)
@@ -388,8 +560,20 @@ def orchestrate(total_steps, state_log=False, state_log_interval=100):
                '--exp', str(exp_num), '--steps', str(total_steps)]
         if state_log:
             cmd += ['--state-log', '--log-interval', str(state_log_interval)]
+            if state_log_columnar:
+                cmd += ['--columnar']
+            if state_log_decimation:
+                cmd += ['--decimate', str(state_log_decimation)]
+        if resume_dir is not None:
+            cmd += ['--checkpoint-dir', log_dir, '--resume']
+        elif checkpoint_every or checkpoint_seconds:
+            cmd += ['--checkpoint-dir', log_dir]
+            if checkpoint_every:
+                cmd += ['--checkpoint-every', str(checkpoint_every)]
+            if checkpoint_seconds:
+                cmd += ['--checkpoint-seconds', str(checkpoint_seconds)]
         log_path = os.path.join(log_dir, 'exp%d.log' % exp_num)
-        log_file = open(log_path, 'w', buffering=1)
+        log_file = open(log_path, 'w' if resume_dir is None else 'a', buffering=1)
         proc = subprocess.Popen(
             cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
             bufsize=1, text=True, cwd=SRC_DIR)
@@ -442,11 +626,29 @@ if __name__ == '__main__':
     state_log_interval = 100
     if '--log-interval' in sys.argv:
         state_log_interval = int(sys.argv[sys.argv.index('--log-interval') + 1])
+    state_log_options = {'state_log_columnar': '--columnar' in sys.argv,
+                         'state_log_decimation': None}
+    if '--decimate' in sys.argv:
+        state_log_options['state_log_decimation'] = int(sys.argv[sys.argv.index('--decimate') + 1])
+    checkpoint_options = {'checkpoint_every': None, 'checkpoint_seconds': None}
+    if '--checkpoint-every' in sys.argv:
+        checkpoint_options['checkpoint_every'] = int(sys.argv[sys.argv.index('--checkpoint-every') + 1])
+    if '--checkpoint-seconds' in sys.argv:
+        checkpoint_options['checkpoint_seconds'] = float(sys.argv[sys.argv.index('--checkpoint-seconds') + 1])
 
     if '--exp' in sys.argv:
         exp_num = int(sys.argv[sys.argv.index('--exp') + 1])
+        checkpoint_dir = None
+        if '--checkpoint-dir' in sys.argv:
+            checkpoint_dir = sys.argv[sys.argv.index('--checkpoint-dir') + 1]
         run_single(exp_num, total_steps, state_log=state_log,
-                   state_log_interval=state_log_interval)
+                   state_log_interval=state_log_interval,
+                   checkpoint_dir=checkpoint_dir, resume='--resume' in sys.argv,
+                   **state_log_options, **checkpoint_options)
     else:
+        resume_dir = None
+        if '--resume' in sys.argv:
+            resume_dir = sys.argv[sys.argv.index('--resume') + 1]
         orchestrate(total_steps, state_log=state_log,
-                    state_log_interval=state_log_interval)
+                    state_log_interval=state_log_interval, resume_dir=resume_dir,
+                    **state_log_options, **checkpoint_options)